@@ -4,9 +4,15 @@
 """
 See how fast deferreds are.
 
-This is mainly useful to compare cdefer.Deferred to defer.Deferred
+Run with no arguments to time the Deferred implementation on the Python path.
+To compare it with another, give the path of another Twisted checkout::
+
+    python deferreds.py --compare /path/to/other/checkout
 """
 
+import os
+import subprocess
+import sys
 
 from twisted.internet import defer
 from timer import timeit
@@ -133,13 +139,103 @@ def pauseUnpause(n):
     d.unpause()
 pauseUnpause = benchmarkNFunc(20, ns)(pauseUnpause)
 
+def succeedAddCallback():
+    """
+    Create a deferred which already has a result and add a callback to it,
+    as most code returning an immediate result does.
+    """
+    defer.succeed(1).addCallback(lambda result: result)
+succeedAddCallback = benchmarkFunc(100000)(succeedAddCallback)
+
+def inlineCallbacksFired(n):
+    """
+    Run an inlineCallbacks generator which yields the given number of
+    deferreds which already have results.
+    """
+    def gen():
+        for i in xrange(n):
+            yield defer.succeed(i)
+    defer.inlineCallbacks(gen)()
+inlineCallbacksFired = benchmarkNFunc(20, ns)(inlineCallbacksFired)
+
+def inlineCallbacksUnfired(n):
+    """
+    Run an inlineCallbacks generator which yields the given number of
+    deferreds, each of which is given a result after it is yielded.
+    """
+    pending = []
+    def gen():
+        for i in xrange(n):
+            d = defer.Deferred()
+            pending.append(d)
+            yield d
+    defer.inlineCallbacks(gen)()
+    while pending:
+        pending.pop().callback(None)
+inlineCallbacksUnfired = benchmarkNFunc(20, ns)(inlineCallbacksUnfired)
+
+def deferredListFired(n):
+    """
+    Create a DeferredList of the given number of deferreds which already
+    have results.
+    """
+    defer.DeferredList([defer.succeed(i) for i in xrange(n)])
+deferredListFired = benchmarkNFunc(20, ns)(deferredListFired)
+
+def deferredListUnfired(n):
+    """
+    Create a DeferredList of the given number of deferreds, and then give
+    each of them a result.
+    """
+    ds = [defer.Deferred() for i in xrange(n)]
+    defer.DeferredList(ds)
+    for d in ds:
+        d.callback(None)
+deferredListUnfired = benchmarkNFunc(20, ns)(deferredListUnfired)
+
 def benchmark():
     """
     Run all of the benchmarks registered in the benchmarkFuncs list
     """
-    print defer.Deferred.__module__
+    print defer.__file__
     for func, args, iter in benchmarkFuncs:
         print func.__name__, args, timeit(func, iter, *args)
 
+def compare(otherPath):
+    """
+    Run all of the benchmarks with the Deferred implementation on the Python
+    path and with the one in the Twisted checkout at C{otherPath}, and print
+    the times side by side.
+    """
+    env = dict(os.environ)
+    runs = []
+    for path in [env.get('PYTHONPATH'), otherPath]:
+        if path is None:
+            env.pop('PYTHONPATH', None)
+        else:
+            env['PYTHONPATH'] = path
+        output = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__)], env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            stdout=subprocess.PIPE).communicate()[0]
+        runs.append(output.splitlines())
+    print 'benchmark', 'time', 'other time', 'ratio'
+    for this, other in zip(*runs):
+        name, _, thisTime = this.rpartition(' ')
+        otherTime = other.rpartition(' ')[2]
+        try:
+            ratio = float(thisTime) / float(otherTime)
+        except ValueError:
+            # Not a timing; show both.
+            print this
+            print other
+        except ZeroDivisionError:
+            print name, thisTime, otherTime, '-'
+        else:
+            print name, thisTime, otherTime, '%.2f' % (ratio,)
+
 if __name__ == '__main__':
-    benchmark()
+    if sys.argv[1:2] == ['--compare']:
+        compare(sys.argv[2])
+    else:
+        benchmark()
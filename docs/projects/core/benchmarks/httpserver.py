@@ -0,0 +1,102 @@
+"""
+Load test for twisted.web.server.Site, in the manner of wrk: several
+keep-alive connections each keep a number of pipelined requests outstanding
+for a fixed time, and the number of responses per second is reported.
+
+The server and the load generator share one process and reactor, so the
+figure reported includes the cost of generating the load.
+
+Usage: python httpserver.py [connections [pipeline [seconds]]]
+"""
+
+from __future__ import print_function
+
+import sys, time
+
+from twisted.internet import reactor, protocol
+from twisted.web.server import Site
+from twisted.web.resource import Resource
+
+BODY = b"Hello, world!\n"
+
+
+class Hello(Resource):
+    isLeaf = True
+
+    def render_GET(self, request):
+        request.setHeader(b"content-type", b"text/plain")
+        return BODY
+
+
+
+class LoadClient(protocol.Protocol):
+    """
+    Keep C{factory.pipeline} requests outstanding, counting the responses.
+    """
+    request = (b"GET / HTTP/1.1\r\n"
+               b"Host: localhost\r\n"
+               b"User-Agent: httpserver-benchmark\r\n"
+               b"Accept: */*\r\n"
+               b"\r\n")
+
+    def connectionMade(self):
+        self.buffer = b""
+        self.transport.write(self.request * self.factory.pipeline)
+
+
+    def dataReceived(self, data):
+        self.buffer += data
+        count = 0
+        while True:
+            end = self.buffer.find(b"\r\n\r\n")
+            if end == -1:
+                break
+            head = self.buffer[:end].lower()
+            length = int(head.split(b"content-length: ", 1)[1].split(
+                    b"\r\n", 1)[0])
+            if len(self.buffer) < end + 4 + length:
+                break
+            self.buffer = self.buffer[end + 4 + length:]
+            count += 1
+        if count:
+            self.factory.responses += count
+            if self.factory.running:
+                self.transport.write(self.request * count)
+            elif not self.buffer:
+                self.transport.loseConnection()
+
+
+
+class LoadFactory(protocol.ClientFactory):
+    protocol = LoadClient
+    responses = 0
+    running = True
+
+    def __init__(self, pipeline):
+        self.pipeline = pipeline
+
+
+
+def main(connections=50, pipeline=1, seconds=10):
+    site = Site(Hello())
+    site.log = lambda request: None
+    port = reactor.listenTCP(0, site, interface="127.0.0.1")
+    factory = LoadFactory(pipeline)
+    for i in range(connections):
+        reactor.connectTCP("127.0.0.1", port.getHost().port, factory)
+
+    start = time.time()
+    def report():
+        factory.running = False
+        elapsed = time.time() - start
+        print("connections: %d pipeline: %d seconds: %.1f" % (
+                connections, pipeline, elapsed))
+        print("requests/sec: %.1f" % (factory.responses / elapsed,))
+        reactor.stop()
+    reactor.callLater(seconds, report)
+    reactor.run()
+
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:]])
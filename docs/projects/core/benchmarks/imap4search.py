@@ -0,0 +1,94 @@
+"""
+Time to evaluate IMAP4 SEARCH queries against a mailbox, by applying the
+search_* methods of IMAP4Server to every message as is done for mailboxes
+without an index, and with a MessageIndex.
+
+Usage: python imap4search.py [messages]
+"""
+
+import sys, time, copy
+
+from zope.interface import implements
+
+from twisted.mail import imap4
+
+
+QUERIES = [
+    "UNSEEN",
+    "FROM alice SINCE 1-Jan-2013",
+    "OR FLAGGED (SUBJECT report NOT DELETED)",
+    "LARGER 4000 NOT SEEN",
+    ]
+
+
+class Message(object):
+    implements(imap4.IMessage)
+
+    def __init__(self, uid):
+        self.uid = uid
+        self.headers = {
+            'from': ('alice', 'bob', 'carol')[uid % 3] + '@example.com',
+            'to': 'dave@example.com',
+            'subject': ('report %d' % (uid,), 'lunch', 'minutes')[uid % 3],
+            'date': 'Mon, %d Jan %d 10:00:00 GMT' % (
+                1 + uid % 28, 2010 + uid % 5),
+            }
+        self.flags = [('\\Seen', '\\Flagged', '\\Deleted')[uid % 3]]
+        self.date = self.headers['date']
+        self.size = 1000 + (uid * 37) % 8000
+
+    def getHeaders(self, negate, *names):
+        return dict([(name, self.headers[name])
+                     for name in names if name in self.headers])
+
+    def getFlags(self):
+        return self.flags
+
+    def getInternalDate(self):
+        return self.date
+
+    def getSize(self):
+        return self.size
+
+    def getUID(self):
+        return self.uid
+
+
+
+def timed(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+
+def main(count=100000):
+    messages = [(i, Message(i)) for i in range(1, count + 1)]
+    server = imap4.IMAP4Server()
+    start = time.time()
+    index = imap4.MessageIndex()
+    for (i, message) in messages:
+        index.add(message)
+    print "index of %d messages built in %.1f ms" % (
+        count, (time.time() - start) * 1000)
+
+    print "%-40s %12s %12s" % ("query", "per message", "index")
+    for query in QUERIES:
+        parsed = imap4.parseNestedParens(query)
+
+        def unindexed():
+            last = messages[-1]
+            for (i, message) in messages:
+                server._searchFilter(copy.deepcopy(parsed), i, message,
+                                     last[0], last[1].getUID())
+
+        def indexed():
+            index.search(parsed)
+
+        print "%-40s %9.1f ms %9.1f ms" % (
+            query, timed(unindexed) * 1000, timed(indexed) * 1000)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
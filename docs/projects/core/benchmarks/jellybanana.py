@@ -0,0 +1,85 @@
+"""
+Throughput of jelly and banana round trips of large object graphs, as
+Perspective Broker sends them: each graph is jellied, encoded, delivered to
+a decoder in transport-sized chunks, decoded and unjellied.
+
+Usage: python jellybanana.py [iterations [chunkSize]]
+"""
+
+import sys, time
+
+from twisted.spread import banana, jelly
+
+
+class Collector(banana.Banana):
+    """
+    A L{banana.Banana} which collects the expressions it receives.
+    """
+    def __init__(self):
+        banana.Banana.__init__(self, isClient=False)
+        self.expressions = []
+        self.expressionReceived = self.expressions.append
+
+
+
+class Sequence(object):
+    """
+    A transport which collects the data written to it.
+    """
+    def __init__(self):
+        self.pieces = []
+
+
+    def write(self, data):
+        self.pieces.append(data)
+
+
+    def writeSequence(self, pieces):
+        self.pieces.extend(pieces)
+
+
+
+def graphs():
+    """
+    Return some large object graphs, with their names.
+    """
+    records = [{'id': i, 'name': 'record %d' % (i,), 'score': i / 7.0,
+                'tags': ['a', 'b', 'c'], 'owner': None}
+               for i in range(2000)]
+    nested = []
+    for i in range(150):
+        nested = [i, 'level', nested]
+    blobs = ['x' * (64 * 1024)] * 8
+    return [('records', records), ('nested', nested), ('blobs', blobs)]
+
+
+
+def benchmark(name, graph, iterations, chunkSize):
+    proto = Collector()
+    proto.makeConnection(Sequence())
+    proto._selectDialect("none")
+
+    size = 0
+    before = time.time()
+    for i in xrange(iterations):
+        proto.transport.pieces = []
+        proto.sendEncoded(jelly.jelly(graph))
+        data = ''.join(proto.transport.pieces)
+        size += len(data)
+        for offset in xrange(0, len(data), chunkSize):
+            proto.dataReceived(data[offset:offset + chunkSize])
+        jelly.unjelly(proto.expressions.pop())
+    elapsed = time.time() - before
+
+    print '%-8s %6d round trips/sec %8.1f MB/sec' % (
+        name, iterations / elapsed, size / elapsed / 1024 / 1024)
+
+
+
+def main(iterations=20, chunkSize=65536):
+    for name, graph in graphs():
+        benchmark(name, graph, iterations, chunkSize)
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
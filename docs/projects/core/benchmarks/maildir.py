@@ -0,0 +1,86 @@
+"""
+Best time to open a maildir mailbox and answer the POP3 STAT, LIST and UIDL
+commands for it, without an index, with a saved index, and with an index kept
+in memory.
+
+Usage: python maildir.py [messages ...]
+"""
+
+import os, sys, time, shutil, tempfile
+
+from twisted.mail import maildir
+
+
+def populate(path, count):
+    """
+    Create a maildir mailbox at C{path} with C{count} small messages, half in
+    I{cur/} and half in I{new/}.
+    """
+    maildir.initializeMaildir(path)
+    for i in xrange(count):
+        sub = ('cur', 'new')[i % 2]
+        name = '%d.M%dP1Q%d.benchmark' % (1000000000 + i, i, i)
+        messageFile = open(os.path.join(path, sub, name), 'w')
+        messageFile.write('Subject: %d\n\nbody\n' % (i,))
+        messageFile.close()
+
+
+
+def answer(mailbox):
+    """
+    Do what a POP3 server does for STAT, LIST and UIDL.
+    """
+    sizes = mailbox.listMessages()
+    sum(sizes)
+    for i in xrange(len(sizes)):
+        mailbox.getUidl(i)
+
+
+
+def timed(function):
+    start = time.time()
+    function()
+    return time.time() - start
+
+
+
+def main(counts=(10000, 100000, 1000000)):
+    for count in counts:
+        parent = tempfile.mkdtemp()
+        path = os.path.join(parent, 'mailbox')
+        try:
+            populate(path, count)
+            indexPath = os.path.join(path, maildir._MaildirIndex.fileName)
+
+            def unindexed():
+                if os.path.exists(indexPath):
+                    os.remove(indexPath)
+                answer(maildir.MaildirMailbox(path))
+
+            def saved():
+                answer(maildir.MaildirMailbox(path))
+
+            index = maildir._MaildirIndex(path)
+            index.refresh()
+            # Pretend the index is watched, as with an inotify notifier.
+            index._watched = True
+            def resident():
+                answer(maildir.MaildirMailbox(path, index))
+
+            # Let the subdirectories age, so that their modification time is
+            # trusted by the saved index.
+            time.sleep(1.1)
+            unindexed()
+            for name, function in [('no index', unindexed),
+                                   ('saved index', saved),
+                                   ('resident index', resident)]:
+                best = min([timed(function) for i in range(3)])
+                print "%8d messages, %-15s %9.1f ms" % (
+                    count, name, best * 1000)
+        finally:
+            shutil.rmtree(parent)
+
+
+
+if __name__ == '__main__':
+    main(map(int, sys.argv[1:]) or (10000, 100000, 1000000))
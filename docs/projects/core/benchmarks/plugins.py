@@ -0,0 +1,57 @@
+"""
+Start-up time of twistd, which discovers its subcommands with the plugin
+system: each scenario runs in a fresh interpreter, so that the import of the
+plugin modules is measured, and reports the time it took and the number of
+modules it imported.
+
+Usage: python plugins.py [iterations]
+"""
+
+import sys, time, subprocess
+
+
+SCENARIOS = [
+    ("twistd --help", """
+from twisted.scripts.twistd import ServerOptions
+config = ServerOptions()
+str(config)
+"""),
+    ("twistd web", """
+from twisted.scripts.twistd import ServerOptions
+config = ServerOptions()
+config.parseOptions(['web', '--port', 'tcp:0'])
+config.loadedPlugins[config.subCommand].makeService(config.subOptions)
+"""),
+    ]
+
+REPORT = """
+import sys
+sys.stdout.write('%d\\n' % (len(sys.modules),))
+"""
+
+
+def run(code):
+    """
+    Run C{code} in a new interpreter.
+
+    @return: the time it took, and the number of modules it imported.
+    """
+    start = time.time()
+    output = subprocess.check_output([sys.executable, "-c", code + REPORT])
+    return time.time() - start, int(output.splitlines()[-1])
+
+
+
+def main(iterations=10):
+    # Make sure the plugin cache is up to date before measuring.
+    run(SCENARIOS[0][1])
+    for name, code in SCENARIOS:
+        results = [run(code) for i in range(iterations)]
+        best = min([elapsed for (elapsed, modules) in results])
+        print "%-15s %6.1f ms, %d modules" % (
+            name, best * 1000, results[-1][1])
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
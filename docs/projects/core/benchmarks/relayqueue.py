@@ -0,0 +1,73 @@
+"""
+Time to pick the next batch of messages to relay for each destination domain
+from a relay queue, by reading the envelope of every waiting message as was
+done before the queue was indexed, and with the index of the queue.
+
+Usage: python relayqueue.py [messages] [domains]
+"""
+
+import sys, time, shutil, pickle, rfc822, tempfile
+
+from twisted.mail import relaymanager
+
+
+def populate(queue, count, domains):
+    """
+    Add C{count} messages to C{queue}, spread over C{domains} domains.
+    """
+    for i in xrange(count):
+        envelopeFile, message = queue.createNewMessage()
+        pickle.dump(['sender@example.com',
+                     'user%d@example%d.com' % (i, i % domains)], envelopeFile)
+        envelopeFile.close()
+        message.lineReceived('Subject: %d' % (i,))
+        message.eomReceived()
+
+
+
+def scanned(queue, limit):
+    batches = {}
+    for message in queue.getWaiting():
+        from_, to = queue.getEnvelope(message)
+        name, addr = rfc822.parseaddr(to)
+        domain = addr.split('@', 1)[1]
+        batch = batches.setdefault(domain, [])
+        if len(batch) < limit:
+            batch.append(message)
+    return batches
+
+
+
+def indexed(queue, limit):
+    batches = {}
+    for domain in queue.getWaitingDomains():
+        batches[domain] = queue.getWaitingFor(domain, limit)
+    return batches
+
+
+
+def timed(function, *args):
+    start = time.time()
+    function(*args)
+    return time.time() - start
+
+
+
+def main(count=20000, domains=100):
+    directory = tempfile.mkdtemp()
+    try:
+        queue = relaymanager.Queue(directory)
+        queue.noisy = False
+        populate(queue, count, domains)
+        for name, function in [('envelope scan', scanned),
+                               ('domain index', indexed)]:
+            best = min([timed(function, queue, 10) for i in range(3)])
+            print "%8d messages, %4d domains, %-15s %9.1f ms" % (
+                count, domains, name, best * 1000)
+    finally:
+        shutil.rmtree(directory)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,87 @@
+"""
+Time for an ESMTP server to receive a large message, sent with DATA to a
+message receiver which handles it line by line and to one which handles it in
+blocks, and sent with BDAT.
+
+Usage: python smtpdata.py [megabytes]
+"""
+
+import sys, time
+
+from zope.interface import implements
+
+from twisted.internet import defer
+from twisted.mail import smtp
+from twisted.test.proto_helpers import StringTransport
+
+
+class LineMessage(object):
+    implements(smtp.IMessage)
+
+    def lineReceived(self, line):
+        pass
+
+    def eomReceived(self):
+        return defer.succeed(None)
+
+    def connectionLost(self):
+        pass
+
+
+
+class ChunkedMessage(LineMessage):
+    implements(smtp.IChunkedMessage)
+
+    def dataReceived(self, data):
+        pass
+
+
+
+class Delivery(object):
+    def __init__(self, messageFactory):
+        self.messageFactory = messageFactory
+
+    def receivedHeader(self, helo, origin, recipients):
+        return None
+
+    def validateFrom(self, helo, origin):
+        return origin
+
+    def validateTo(self, user):
+        return self.messageFactory
+
+
+
+def receive(messageFactory, command, data, packet=65536):
+    server = smtp.ESMTP()
+    server.delivery = Delivery(messageFactory)
+    server.makeConnection(StringTransport())
+    server.dataReceived(
+        'EHLO example.com\r\nMAIL FROM:<alice@example.com>\r\n'
+        'RCPT TO:<bob@example.com>\r\n' + command)
+    start = time.time()
+    for i in xrange(0, len(data), packet):
+        server.dataReceived(data[i:i + packet])
+    elapsed = time.time() - start
+    server.connectionLost(None)
+    return elapsed
+
+
+
+def main(megabytes=20):
+    line = 'Lorem ipsum dolor sit amet, consectetur adipiscing elit.\r\n'
+    body = line * (megabytes * 2 ** 20 / len(line))
+    stuffed = body + '.\r\n'
+    chunked = 'BDAT %d LAST\r\n%s' % (len(body), body)
+    for name, factory, command, data in [
+        ('DATA, lines', LineMessage, 'DATA\r\n', stuffed),
+        ('DATA, blocks', ChunkedMessage, 'DATA\r\n', stuffed),
+        ('BDAT, blocks', ChunkedMessage, '', chunked)]:
+        elapsed = receive(factory, command, data)
+        print "%-15s %8.1f ms %8.1f MB/s" % (
+            name, elapsed * 1000, megabytes / elapsed)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
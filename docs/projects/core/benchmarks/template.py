@@ -0,0 +1,72 @@
+"""
+Time to render a mostly static page with a few slots and renderers, from the
+document of an XMLString loader as it is parsed and as it is compiled.
+
+Usage: python template.py [rows] [renders]
+"""
+
+import sys, time
+from StringIO import StringIO
+
+from twisted.web.template import (
+    Element, XMLString, TagLoader, renderer, flatten, tags)
+from twisted.web.template import _flatsaxParse
+
+
+PAGE = """\
+<html xmlns:t="http://twistedmatrix.com/ns/twisted.web.template/0.1">
+<head><title><t:slot name="title" /></title>
+<link rel="stylesheet" href="/style.css" /></head>
+<body>
+<div class="header"><h1><t:slot name="title" /></h1>
+<ul class="menu"><li><a href="/">Home</a></li><li><a href="/about">About</a>
+</li><li><a href="/contact">Contact &amp; support</a></li></ul></div>
+%s
+<table t:render="rows"><tr><td><t:slot name="key" /></td>
+<td class="value"><t:slot name="value" /></td></tr></table>
+<div class="footer"><p>Copyright &#169; Example &lt;example@example.com&gt;
+</p></div>
+</body>
+</html>
+"""
+
+PARAGRAPH = ("<p class=\"text\">Lorem ipsum dolor sit amet, <em>consectetur"
+             "</em> adipiscing elit, sed do eiusmod tempor incididunt ut labore"
+             " et <a href=\"/more\">dolore</a> magna aliqua.</p>\n")
+
+
+
+class Page(Element):
+    def __init__(self, loader, rows):
+        Element.__init__(self, loader)
+        self.rowCount = rows
+
+
+    @renderer
+    def rows(self, request, tag):
+        for i in xrange(self.rowCount):
+            yield tag.clone().fillSlots(key=str(i), value=u'value %d' % (i,))
+
+
+
+def render(loader, rows, renders):
+    start = time.time()
+    for i in xrange(renders):
+        root = tags.transparent(Page(loader, rows)).fillSlots(title=u'Page')
+        flatten(None, root, StringIO().write)
+    return time.time() - start
+
+
+
+def main(rows=10, renders=1000):
+    source = PAGE % (PARAGRAPH * 40,)
+    for name, loader in [
+        ('parsed', TagLoader(tags.transparent(_flatsaxParse(StringIO(source))))),
+        ('compiled', XMLString(source))]:
+        elapsed = render(loader, rows, renders)
+        print "%-10s %8.1f ms per render" % (name, elapsed * 1000 / renders)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,99 @@
+"""
+Time to insert, cancel and reset many idle timeouts, and to run a reactor's
+delayed calls while most of them are reset by activity before they expire,
+with the default heap scheduler and with a timer wheel.
+
+Usage: python timerchurn.py [timers] [rounds]
+"""
+
+import sys, time, random
+
+from twisted.internet.selectreactor import SelectReactor
+from twisted.internet.timerwheel import TimerWheel
+
+
+TIMEOUT = 60.0
+
+
+
+class Clock(object):
+    now = 1000.0
+
+    def seconds(self):
+        return self.now
+
+
+
+def buildReactor(scheduler):
+    reactor = SelectReactor()
+    clock = Clock()
+    reactor.seconds = clock.seconds
+    if scheduler is not None:
+        reactor.installScheduler(scheduler)
+    return reactor, clock
+
+
+
+def timed(f, *args):
+    start = time.time()
+    f(*args)
+    return time.time() - start
+
+
+
+def insert(reactor, timers, calls):
+    for i in xrange(timers):
+        calls.append(reactor.callLater(
+                TIMEOUT + random.random(), lambda: None))
+
+
+def resetSooner(reactor, calls):
+    # Shorter timeouts have to be moved in the scheduler at once.
+    for call in calls:
+        call.reset(TIMEOUT / 2 + random.random())
+
+
+def cancel(reactor, calls):
+    for call in calls:
+        call.cancel()
+
+
+def churn(reactor, clock, calls, rounds):
+    # Time passes in steps of a tenth of a second.  At each step a tenth of
+    # the connections see some activity and push their timeout back, and one
+    # in a hundred is closed and replaced by a new connection.
+    timers = len(calls)
+    for i in xrange(rounds):
+        clock.now += 0.1
+        for j in xrange(timers // 10):
+            calls[random.randrange(timers)].reset(TIMEOUT)
+        for j in xrange(timers // 100):
+            k = random.randrange(timers)
+            calls[k].cancel()
+            calls[k] = reactor.callLater(TIMEOUT, lambda: None)
+        reactor.runUntilCurrent()
+        reactor.timeout()
+
+
+
+def main(timers=10000, rounds=50):
+    print "%-10s %10s %10s %10s %12s" % (
+        '', 'insert', 'reset', 'cancel', 'churn')
+    for name, scheduler in [('heap', None), ('wheel', TimerWheel())]:
+        random.seed(0)
+        reactor, clock = buildReactor(scheduler)
+        calls = []
+        inserted = timed(insert, reactor, timers, calls)
+        reset = timed(resetSooner, reactor, calls)
+        cancelled = timed(cancel, reactor, calls)
+        del calls[:]
+        insert(reactor, timers, calls)
+        churned = timed(churn, reactor, clock, calls, rounds)
+        print "%-10s %7.2f us %7.2f us %7.2f us %9.1f ms" % (
+            name, inserted * 1e6 / timers, reset * 1e6 / timers,
+            cancelled * 1e6 / timers, churned * 1000 / rounds)
+
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -616,7 +616,9 @@ class ServerOptions(usage.Options, ReactorSelectionMixin):
 
 
     def subCommands(self):
-        plugins = self._getPlugins(service.IServiceMaker)
+        # Listing the plugins only needs their names and descriptions, which
+        # lazy plugins take from the plugin cache without importing anything.
+        plugins = self._getPlugins(service.IServiceMaker, lazy=True)
         self.loadedPlugins = {}
         for plug in sorted(plugins, key=attrgetter('tapname')):
             self.loadedPlugins[plug.tapname] = plug
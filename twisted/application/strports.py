@@ -93,9 +93,17 @@ def listen(description, factory, default=None):
 
     See the documentation of the C{parse} function for description
     of the semantics of the arguments.
+
+    @raise ValueError: If the description asks for C{reuseport}, which only
+        the endpoints returned by
+        L{twisted.internet.endpoints.serverFromString} support.
     """
     from twisted.internet import reactor
     name, args, kw = parse(description, factory, default)
+    if kw.get('reusePort'):
+        raise ValueError(
+            "reuseport is not supported by strports.listen; use "
+            "twisted.internet.endpoints.serverFromString instead")
     return getattr(reactor, 'listen'+name)(*args, **kw)
 
 
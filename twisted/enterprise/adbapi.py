@@ -8,8 +8,12 @@ An asynchronous mapping to U{DB-API 2.0<http://www.python.org/topics/database/Da
 
 import sys
 
-from twisted.internet import threads
+from zope.interface import implementer
+
+from twisted.internet import threads, defer
+from twisted.internet.interfaces import IReadDescriptor, IWriteDescriptor
 from twisted.python import reflect, log
+from twisted.python._lru import LRUDict
 from twisted.python.deprecate import deprecated
 from twisted.python.versions import Version
 
@@ -23,6 +27,14 @@ class ConnectionLost(Exception):
 
 
 
+class ConnectionClosed(Exception):
+    """
+    This exception means that a statement was not run, or did not complete,
+    because the connection pool was closed.
+    """
+
+
+
 class Connection(object):
     """
     A wrapper for a DB-API connection instance.
@@ -125,6 +137,130 @@ class Transaction:
         return getattr(self._cursor, name)
 
 
+def _pollingStates(dbapi):
+    """
+    Find the states reported by the C{poll} method of asynchronous connections
+    of a DB-API module, as in psycopg2.
+
+    @param dbapi: A DB-API module.
+
+    @return: A 3-tuple of the C{POLL_OK}, C{POLL_READ} and C{POLL_WRITE}
+        constants of C{dbapi} or its C{extensions} module, or C{None} if it
+        has none.
+    """
+    for module in [dbapi, getattr(dbapi, 'extensions', None)]:
+        try:
+            return (module.POLL_OK, module.POLL_READ, module.POLL_WRITE)
+        except AttributeError:
+            pass
+    return None
+
+
+
+@implementer(IReadDescriptor, IWriteDescriptor)
+class _Poller(object):
+    """
+    Wait for an asynchronous DB-API connection to finish connecting or
+    running a query, by calling its C{poll} method whenever the reactor finds
+    its descriptor ready.
+
+    @ivar _connection: The connection, which has C{fileno} and C{poll}
+        methods.
+
+    @ivar _states: The 3-tuple of states C{poll} reports, as returned by
+        L{_pollingStates}.
+
+    @ivar _waitingFor: C{'read'} or C{'write'} if the descriptor has been
+        added to the reactor as a reader or a writer, or C{None}.
+    """
+    _waitingFor = None
+
+    def __init__(self, reactor, connection, states):
+        self._reactor = reactor
+        self._connection = connection
+        self._states = states
+        self._deferred = defer.Deferred()
+
+
+    def wait(self):
+        """
+        Poll the connection until it is ready.
+
+        @return: A L{Deferred} firing with C{None} once the connection reports
+            that it is ready, or failing with the exception C{poll} raised.
+        """
+        self._poll()
+        return self._deferred
+
+
+    def fail(self, reason):
+        """
+        Stop polling the connection, if it is not ready yet, and fail the
+        L{Deferred} returned by L{wait}.
+
+        @param reason: The exception or L{Failure} to fail with.
+        """
+        if not self._deferred.called:
+            self._stop()
+            self._deferred.errback(reason)
+
+
+    def _poll(self):
+        ok, read, write = self._states
+        try:
+            state = self._connection.poll()
+        except:
+            self._stop()
+            self._deferred.errback()
+            return
+        if state == ok:
+            self._stop()
+            self._deferred.callback(None)
+        elif state == read:
+            if self._waitingFor != 'read':
+                self._stop()
+                self._reactor.addReader(self)
+                self._waitingFor = 'read'
+        elif state == write:
+            if self._waitingFor != 'write':
+                self._stop()
+                self._reactor.addWriter(self)
+                self._waitingFor = 'write'
+        else:
+            self._stop()
+            self._deferred.errback(
+                ValueError("Unexpected poll state %r" % (state,)))
+
+
+    def _stop(self):
+        if self._waitingFor == 'read':
+            self._reactor.removeReader(self)
+        elif self._waitingFor == 'write':
+            self._reactor.removeWriter(self)
+        self._waitingFor = None
+
+
+    def doRead(self):
+        self._poll()
+
+    doWrite = doRead
+
+
+    def fileno(self):
+        return self._connection.fileno()
+
+
+    def connectionLost(self, reason):
+        if self._waitingFor is not None:
+            self._waitingFor = None
+            self._deferred.errback(reason)
+
+
+    def logPrefix(self):
+        return 'adbapi'
+
+
+
 class ConnectionPool:
     """
     Represent a pool of connections to a DB-API 2.0 compliant database.
@@ -143,9 +279,29 @@ class ConnectionPool:
     @ivar _reactor: The reactor which will be used to schedule startup and
         shutdown events.
     @type _reactor: L{IReactorCore} provider
+
+    @ivar _statements: A C{dict} mapping thread ids to the statement cache
+        for the connection of that thread: an L{LRUDict} mapping SQL
+        statements to a 2-tuple of the statement first seen and a cursor
+        which last executed it, least recently used first.
+
+    @ivar _pollingStates: The states reported by asynchronous connections,
+        as returned by L{_pollingStates}, if the pool runs queries
+        asynchronously, or C{None}.
+
+    @ivar _idle: Asynchronous connections which are not in use.
+
+    @ivar _asyncConnections: The number of asynchronous connections open or
+        being opened.
+
+    @ivar _waiting: L{Deferred}s waiting for an asynchronous connection.
+
+    @ivar _pollers: The L{_Poller}s waiting for asynchronous connections to
+        connect or to run a statement.
     """
 
-    CP_ARGS = "min max name noisy openfun reconnect good_sql".split()
+    CP_ARGS = ("min max name noisy openfun reconnect good_sql "
+               "maxqueued statement_cache asynchronous".split())
 
     noisy = False # if true, generate informational log messages
     min = 3 # minimum number of connections in pool
@@ -154,6 +310,9 @@ class ConnectionPool:
     openfun = None # A function to call on new connections
     reconnect = False # reconnect when connections fail
     good_sql = 'select 1' # a query which should always succeed
+    maxqueued = 0 # maximum number of queued operations, 0 for no limit
+    statement_cache = 0 # statements to keep prepared per connection
+    asynchronous = False # use asynchronous connections if supported
 
     running = False # true when the pool is operating
     connectionFactory = Connection
@@ -162,6 +321,8 @@ class ConnectionPool:
     # Initialize this to None so it's available in close() even if start()
     # never runs.
     shutdownID = None
+    _pollingStates = None
+    _asyncConnections = 0
 
     def __init__(self, dbapiName, *connargs, **connkw):
         """Create a new ConnectionPool.
@@ -194,6 +355,26 @@ class ConnectionPool:
         @param cp_good_sql: an sql query which should always succeed and change
                             no state (default 'select 1')
 
+        @param cp_maxqueued: the largest number of operations which may wait
+            for a connection; once it is reached, operations fail with
+            L{twisted.python.threadpool.ThreadPoolFull} (default 0, for no
+            limit)
+
+        @param cp_statement_cache: the number of statements to keep prepared
+            for each connection (default 0).  L{runQuery}, L{runOperation}
+            and L{runBatch} execute statements in the cache with the cursor
+            which last executed them and the same statement object, which
+            DB-API 2.0 allows modules to use to skip preparing them again.
+
+        @param cp_asynchronous: run L{runQuery} and L{runOperation} on
+            asynchronous connections driven by the reactor rather than by
+            threads, if the module supports them as psycopg2 does: with
+            connections which have C{fileno} and C{poll} methods, and
+            C{POLL_OK}, C{POLL_READ} and C{POLL_WRITE} constants (default
+            False).  Any arguments needed to make connections asynchronous
+            must be given too.  C{cp_openfun} is not called for these
+            connections, and other operations still use threads.
+
         @param cp_reactor: use this reactor instead of the global reactor
             (added in Twisted 10.2).
         @type cp_reactor: L{IReactorCore} provider
@@ -226,13 +407,24 @@ class ConnectionPool:
         self.max = max(self.min, self.max)
 
         self.connections = {}  # all connections, hashed on thread id
+        self._statements = {}
+
+        self._idle = []
+        self._waiting = []
+        self._pollers = set()
+        if self.asynchronous:
+            self._pollingStates = _pollingStates(self.dbapi)
+            if self._pollingStates is None:
+                log.msg('%s does not support asynchronous connections; '
+                        'using threads.' % (dbapiName,))
 
         # these are optional so import them here
         from twisted.python import threadpool
         import thread
 
         self.threadID = thread.get_ident
-        self.threadpool = threadpool.ThreadPool(self.min, self.max)
+        self.threadpool = threadpool.ThreadPool(self.min, self.max,
+                                                maxQueued=self.maxqueued)
         self.startID = self._reactor.callWhenRunning(self._start)
 
 
@@ -349,6 +541,11 @@ class ConnectionPool:
         @return: a Deferred which will fire the return value of a DB-API
         cursor's 'fetchall' method, or a Failure.
         """
+        if self._pollingStates is not None:
+            return self._runPolled(True, *args, **kw)
+        if self.statement_cache:
+            return self.runWithConnection(
+                self._runStatement, 'execute', True, *args, **kw)
         return self.runInteraction(self._runQuery, *args, **kw)
 
 
@@ -368,12 +565,45 @@ class ConnectionPool:
 
         return: a Deferred which will fire None or a Failure.
         """
+        if self._pollingStates is not None:
+            return self._runPolled(False, *args, **kw)
+        if self.statement_cache:
+            return self.runWithConnection(
+                self._runStatement, 'execute', False, *args, **kw)
         return self.runInteraction(self._runOperation, *args, **kw)
 
 
+    def runBatch(self, operation, seqOfParameters):
+        """
+        Execute an SQL statement once for each of a sequence of parameters,
+        in one transaction, and return None.
+
+        This uses the DB-API cursor's C{executemany} method, which may be
+        much faster than executing the statement for each of them.  If it
+        raises an exception, the transaction will be rolled back and a
+        Failure returned.
+
+        @param operation: The SQL statement.
+
+        @param seqOfParameters: A sequence of the parameters to execute the
+            statement with, each as would be passed to the cursor's
+            C{execute} method.
+
+        @return: a Deferred which will fire None or a Failure.
+        """
+        if self.statement_cache:
+            return self.runWithConnection(
+                self._runStatement, 'executemany', False, operation,
+                seqOfParameters)
+        return self.runInteraction(self._runBatch, operation, seqOfParameters)
+
+
     def close(self):
         """
         Close all pool connections and shutdown the pool.
+
+        Statements waiting for an asynchronous connection, or running on one,
+        fail with L{ConnectionClosed}.
         """
         if self.shutdownID:
             self._reactor.removeSystemEventTrigger(self.shutdownID)
@@ -389,9 +619,22 @@ class ConnectionPool:
         self.shutdownID = None
         self.threadpool.stop()
         self.running = False
+        self._statements.clear()
         for conn in self.connections.values():
             self._close(conn)
         self.connections.clear()
+        # Statements waiting for an asynchronous connection, or for one to
+        # connect or to run them, fail, and the connections they were using
+        # are closed.
+        waiting, self._waiting = self._waiting, []
+        for d in waiting:
+            d.errback(ConnectionClosed())
+        for poller in list(self._pollers):
+            poller.fail(ConnectionClosed())
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            self._asyncConnections -= 1
+            self._close(conn)
 
     def connect(self):
         """Return a database connection when one becomes available.
@@ -428,6 +671,7 @@ class ConnectionPool:
         if conn is not self.connections.get(tid):
             raise Exception("wrong connection for thread")
         if conn is not None:
+            self._statements.pop(tid, None)
             self._close(conn)
             del self.connections[tid]
 
@@ -465,6 +709,157 @@ class ConnectionPool:
     def _runOperation(self, trans, *args, **kw):
         trans.execute(*args, **kw)
 
+
+    def _runBatch(self, trans, operation, seqOfParameters):
+        trans.executemany(operation, seqOfParameters)
+
+
+    def _runStatement(self, conn, method, fetch, operation, *args, **kw):
+        """
+        Run a statement with the cursor which last ran it on this thread's
+        connection, if it is still in the statement cache.
+
+        @param conn: The L{Connection} being used.
+
+        @param method: The name of the cursor method to call, C{'execute'} or
+            C{'executemany'}.
+
+        @param fetch: Whether to fetch and return the results.
+
+        @param operation: The SQL statement.
+        """
+        tid = self.threadID()
+        cache = self._statements.get(tid)
+        if cache is None:
+            cache = self._statements[tid] = LRUDict()
+        entry = cache.get(operation)
+        if entry is None:
+            entry = cache[operation] = (operation, conn.cursor())
+        else:
+            cache.touch(operation)
+        if len(cache) > self.statement_cache:
+            evicted = cache.popOldest()[1][1]
+            try:
+                evicted.close()
+            except:
+                log.err(None, "Cursor close failed")
+        operation, cursor = entry
+        getattr(cursor, method)(operation, *args, **kw)
+        if fetch:
+            return cursor.fetchall()
+
+
+    def _getAsyncConnection(self):
+        """
+        Get an asynchronous connection: an idle one, a new one if fewer than
+        C{max} are open, or else the next to be released.
+
+        @return: A L{Deferred} firing with the connection.
+        """
+        if self._idle:
+            return defer.succeed(self._idle.pop())
+        if self._asyncConnections >= self.max:
+            d = defer.Deferred()
+            self._waiting.append(d)
+            return d
+        self._asyncConnections += 1
+        if self.noisy:
+            log.msg('adbapi connecting asynchronously: %s' % (
+                    self.dbapiName,))
+        try:
+            conn = self.dbapi.connect(*self.connargs, **self.connkw)
+        except:
+            self._asyncConnections -= 1
+            return defer.fail()
+        d = self._poll(conn)
+        def connected(ignored):
+            return conn
+        def failed(reason):
+            self._discardAsyncConnection(conn)
+            return reason
+        return d.addCallbacks(connected, failed)
+
+
+    def _poll(self, conn):
+        """
+        Wait for an asynchronous connection to be ready, until the pool is
+        closed.
+
+        @return: A L{Deferred} as returned by L{_Poller.wait}.
+        """
+        poller = _Poller(self._reactor, conn, self._pollingStates)
+        self._pollers.add(poller)
+        def finished(result):
+            self._pollers.discard(poller)
+            return result
+        return poller.wait().addBoth(finished)
+
+
+    def _releaseAsyncConnection(self, conn):
+        """
+        Give an asynchronous connection to the next request waiting for one,
+        or keep it until one is made.
+        """
+        if self._waiting:
+            self._waiting.pop(0).callback(conn)
+        else:
+            self._idle.append(conn)
+
+
+    def _discardAsyncConnection(self, conn):
+        """
+        Close an asynchronous connection which may no longer be usable, and
+        open another for the next request waiting for one.
+        """
+        self._asyncConnections -= 1
+        self._close(conn)
+        if self._waiting:
+            self._getAsyncConnection().chainDeferred(self._waiting.pop(0))
+
+
+    def _runPolled(self, fetch, *args, **kw):
+        """
+        Run a statement on an asynchronous connection.
+
+        @param fetch: Whether to fetch and return the results.
+        """
+        def execute(conn):
+            def run(cursor):
+                cursor.execute(*args, **kw)
+                d = self._poll(conn)
+                def done(ignored):
+                    if fetch:
+                        result = cursor.fetchall()
+                    else:
+                        result = None
+                    cursor.close()
+                    return result
+                return d.addCallback(done)
+            def release(result):
+                self._releaseAsyncConnection(conn)
+                return result
+            def discard(reason):
+                # The connection may be in any state; don't reuse it.
+                self._discardAsyncConnection(conn)
+                return reason
+            d = defer.maybeDeferred(conn.cursor)
+            d.addCallback(run)
+            return d.addCallbacks(release, discard)
+        return self._getAsyncConnection().addCallback(execute)
+
+    def stats(self):
+        """
+        Describe the load on the pool.
+
+        @return: The statistics of the pool's threadpool, as returned by
+            L{twisted.python.threadpool.ThreadPool.stats}, and the number of
+            C{connections} open.
+        """
+        stats = self.threadpool.stats()
+        stats['connections'] = len(self.connections)
+        return stats
+
+
     def __getstate__(self):
         return {'dbapiName': self.dbapiName,
                 'min': self.min,
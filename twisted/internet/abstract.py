@@ -8,6 +8,7 @@ Support for generic select()able objects.
 
 from __future__ import division, absolute_import
 
+from collections import deque
 from socket import AF_INET6, inet_pton, error
 
 from zope.interface import implementer
@@ -175,6 +176,10 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
 
     SEND_LIMIT = 128*1024
 
+    # Subclasses which can write several buffers with one system call set
+    # this to the largest number of buffers to pass to _writeSomeVectors.
+    _maxVectors = 0
+
     def __init__(self, reactor=None):
         """
         @param reactor: An L{IReactorFDSet} provider which this descriptor will
@@ -184,7 +189,7 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         if not reactor:
             from twisted.internet import reactor
         self.reactor = reactor
-        self._tempDataBuffer = [] # will be added to dataBuffer in doWrite
+        self._tempDataBuffer = deque() # will be added to dataBuffer in doWrite
         self._tempDataLen = 0
 
 
@@ -221,6 +226,27 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
                                   reflect.qual(self.__class__))
 
 
+    def _writeSomeVectors(self, vectors, offset):
+        """
+        Write as much as possible of the given buffers, immediately.
+
+        Subclasses which set C{_maxVectors} must override this to write the
+        buffers with a single system call, such as writev(2).
+
+        @param vectors: Up to C{_maxVectors} C{bytes} to write, in order.
+        @type vectors: C{list}
+
+        @param offset: The number of bytes at the start of C{vectors[0]}
+            which must be skipped.
+        @type offset: C{int}
+
+        @return: The number of bytes written, or an exception if the
+            connection was lost, as for L{writeSomeData}.
+        """
+        raise NotImplementedError("%s does not implement _writeSomeVectors" %
+                                  reflect.qual(self.__class__))
+
+
     def doRead(self):
         """
         Called when data is available for reading.
@@ -231,6 +257,51 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
         raise NotImplementedError("%s does not implement doRead" %
                                   reflect.qual(self.__class__))
 
+
+    def _doWriteVectors(self):
+        """
+        Write as much buffered data as possible using L{_writeSomeVectors},
+        without joining the buffered strings together.
+
+        C{dataBuffer} holds the string currently being written and
+        C{_tempDataBuffer} the strings queued after it; partially written
+        strings are tracked with C{offset}.
+
+        @return: C{None} on success, otherwise the failure returned by
+            L{_writeSomeVectors}.
+        """
+        temp = self._tempDataBuffer
+        if self.offset == len(self.dataBuffer):
+            if not temp:
+                return None
+            self.dataBuffer = temp.popleft()
+            self._tempDataLen -= len(self.dataBuffer)
+            self.offset = 0
+
+        # Collect at most _maxVectors strings, stopping once SEND_LIMIT bytes
+        # have been gathered.
+        vectors = [self.dataBuffer]
+        size = len(self.dataBuffer) - self.offset
+        for data in temp:
+            if size >= self.SEND_LIMIT or len(vectors) >= self._maxVectors:
+                break
+            vectors.append(data)
+            size += len(data)
+
+        l = self._writeSomeVectors(vectors, self.offset)
+        # See doWrite for negative integers.
+        if isinstance(l, Exception) or l < 0:
+            return l
+
+        # Discard everything which was written.
+        l += self.offset
+        while temp and l >= len(self.dataBuffer):
+            l -= len(self.dataBuffer)
+            self.dataBuffer = temp.popleft()
+            self._tempDataLen -= len(self.dataBuffer)
+        self.offset = l
+
+
     def doWrite(self):
         """
         Called when data can be written.
@@ -240,28 +311,35 @@ class FileDescriptor(_ConsumerMixin, _LogOwner):
 
         @see: L{twisted.internet.interfaces.IWriteDescriptor.doWrite}.
         """
-        if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
-            # If there is currently less than SEND_LIMIT bytes left to send
-            # in the string, extend it with the array data.
-            self.dataBuffer = _concatenate(
-                self.dataBuffer, self.offset, self._tempDataBuffer)
-            self.offset = 0
-            self._tempDataBuffer = []
-            self._tempDataLen = 0
-
-        # Send as much data as you can.
-        if self.offset:
-            l = self.writeSomeData(lazyByteSlice(self.dataBuffer, self.offset))
+        if self._maxVectors:
+            result = self._doWriteVectors()
+            if result is not None:
+                return result
         else:
-            l = self.writeSomeData(self.dataBuffer)
-
-        # There is no writeSomeData implementation in Twisted which returns
-        # < 0, but the documentation for writeSomeData used to claim negative
-        # integers meant connection lost.  Keep supporting this here,
-        # although it may be worth deprecating and removing at some point.
-        if isinstance(l, Exception) or l < 0:
-            return l
-        self.offset += l
+            if len(self.dataBuffer) - self.offset < self.SEND_LIMIT:
+                # If there is currently less than SEND_LIMIT bytes left to
+                # send in the string, extend it with the array data.
+                self.dataBuffer = _concatenate(
+                    self.dataBuffer, self.offset, self._tempDataBuffer)
+                self.offset = 0
+                self._tempDataBuffer = deque()
+                self._tempDataLen = 0
+
+            # Send as much data as you can.
+            if self.offset:
+                l = self.writeSomeData(
+                    lazyByteSlice(self.dataBuffer, self.offset))
+            else:
+                l = self.writeSomeData(self.dataBuffer)
+
+            # There is no writeSomeData implementation in Twisted which
+            # returns < 0, but the documentation for writeSomeData used to
+            # claim negative integers meant connection lost.  Keep supporting
+            # this here, although it may be worth deprecating and removing at
+            # some point.
+            if isinstance(l, Exception) or l < 0:
+                return l
+            self.offset += l
         # If there is nothing left to send,
         if self.offset == len(self.dataBuffer) and not self._tempDataLen:
             self.dataBuffer = b""
@@ -209,6 +209,137 @@ class DelayedCall:
 
 
 
+class _DelayedCallHeap(object):
+    """
+    The default scheduler for a reactor's L{DelayedCall}s, keeping them in a
+    binary heap ordered by the time at which they are to run.
+
+    Cancelled calls are left in the heap and skipped when they reach the top;
+    the heap is rebuilt once they make up more than half of it.
+
+    @ivar _pending: The heap of calls which will be run.
+    @ivar _new: Calls added since the last time the heap was examined.  They
+        are only pushed onto the heap when it is next needed.
+    @ivar _cancellations: The number of cancelled calls still in C{_pending}
+        or C{_new}.
+    """
+
+    def __init__(self):
+        self._pending = []
+        self._new = []
+        self._cancellations = 0
+
+
+    def add(self, call):
+        """
+        Schedule a new call.
+
+        @param call: The L{DelayedCall} to schedule.
+        """
+        self._new.append(call)
+
+
+    def cancel(self, call):
+        """
+        Note that a scheduled call is about to be cancelled.
+
+        @param call: The L{DelayedCall} being cancelled.
+        """
+        self._cancellations += 1
+
+
+    def moveSooner(self, call):
+        """
+        Reposition a call whose C{time} has been moved earlier.
+
+        @param call: The L{DelayedCall} which was reset.
+        """
+        # Linear time find: slow.
+        heap = self._pending
+        try:
+            pos = heap.index(call)
+
+            # Move elt up the heap until it rests at the right place.
+            elt = heap[pos]
+            while pos != 0:
+                parent = (pos-1) // 2
+                if heap[parent] <= elt:
+                    break
+                # move parent down
+                heap[pos] = heap[parent]
+                pos = parent
+            heap[pos] = elt
+        except ValueError:
+            # element was not found in heap - oh well...
+            pass
+
+
+    def getDelayedCalls(self):
+        """
+        @return: A C{list} of all the calls which have been neither run nor
+            cancelled, in no particular order.
+        """
+        return [x for x in (self._pending + self._new) if not x.cancelled]
+
+
+    def nextTime(self):
+        """
+        @return: The time at which the earliest scheduled call is to be run,
+            or C{None} if there are no scheduled calls.
+        """
+        # insert new delayed calls to make sure to include them in timeout value
+        self._insertNew()
+        if not self._pending:
+            return None
+        return self._pending[0].time
+
+
+    def iterDue(self, now):
+        """
+        Remove and yield the calls which should have been run by C{now}, in the
+        order in which they were scheduled to run.
+
+        Calls which are cancelled or rescheduled while this iterator is being
+        consumed are handled correctly; calls added while it is being consumed
+        are not yielded.
+
+        @param now: The current time, in seconds since the epoch.
+        """
+        # insert new delayed calls now
+        self._insertNew()
+
+        heap = self._pending
+        while heap and (heap[0].time <= now):
+            call = heappop(heap)
+            if call.cancelled:
+                self._cancellations -= 1
+                continue
+
+            if call.delayed_time > 0:
+                call.activate_delay()
+                heappush(heap, call)
+                continue
+
+            yield call
+
+        if (self._cancellations > 50 and
+             self._cancellations > len(self._pending) >> 1):
+            self._cancellations = 0
+            self._pending = [x for x in self._pending if not x.cancelled]
+            heapify(self._pending)
+
+
+    def _insertNew(self):
+        for call in self._new:
+            if call.cancelled:
+                self._cancellations -= 1
+            else:
+                call.activate_delay()
+                heappush(self._pending, call)
+        self._new = []
+
+
+
 @implementer(IResolverSimple)
 class ThreadedResolver(object):
     """
@@ -474,9 +605,7 @@ class ReactorBase(object):
     def __init__(self):
         self.threadCallQueue = []
         self._eventTriggers = {}
-        self._pendingTimedCalls = []
-        self._newTimedCalls = []
-        self._cancellations = 0
+        self._timedCalls = _DelayedCallHeap()
         self.running = False
         self._started = False
         self._justStopped = False
@@ -709,31 +838,34 @@ class ReactorBase(object):
                            self._cancelCallLater,
                            self._moveCallLaterSooner,
                            seconds=self.seconds)
-        self._newTimedCalls.append(tple)
+        self._timedCalls.add(tple)
         return tple
 
     def _moveCallLaterSooner(self, tple):
-        # Linear time find: slow.
-        heap = self._pendingTimedCalls
-        try:
-            pos = heap.index(tple)
-
-            # Move elt up the heap until it rests at the right place.
-            elt = heap[pos]
-            while pos != 0:
-                parent = (pos-1) // 2
-                if heap[parent] <= elt:
-                    break
-                # move parent down
-                heap[pos] = heap[parent]
-                pos = parent
-            heap[pos] = elt
-        except ValueError:
-            # element was not found in heap - oh well...
-            pass
+        self._timedCalls.moveSooner(tple)
 
     def _cancelCallLater(self, tple):
-        self._cancellations+=1
+        self._timedCalls.cancel(tple)
+
+
+    def installScheduler(self, scheduler):
+        """
+        Set the object which keeps track of this reactor's outstanding
+        L{DelayedCall}s.
+
+        Any calls which are still pending are moved to the new scheduler.
+
+        @param scheduler: An object with the same methods as
+            L{_DelayedCallHeap}, for example a
+            L{twisted.internet.timerwheel.TimerWheel}.
+
+        @return: The previously installed scheduler.
+        """
+        oldScheduler = self._timedCalls
+        for call in oldScheduler.getDelayedCalls():
+            scheduler.add(call)
+        self._timedCalls = scheduler
+        return oldScheduler
 
 
     def getDelayedCalls(self):
@@ -741,16 +873,7 @@ class ReactorBase(object):
         They are returned in no particular order.
         This method is not efficient -- it is really only meant for
         test cases."""
-        return [x for x in (self._pendingTimedCalls + self._newTimedCalls) if not x.cancelled]
-
-    def _insertNewDelayedCalls(self):
-        for call in self._newTimedCalls:
-            if call.cancelled:
-                self._cancellations-=1
-            else:
-                call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
-        self._newTimedCalls = []
+        return self._timedCalls.getDelayedCalls()
 
 
     def timeout(self):
@@ -762,13 +885,11 @@ class ReactorBase(object):
         @return: The maximum number of seconds the reactor may sleep.
         @rtype: L{float}
         """
-        # insert new delayed calls to make sure to include them in timeout value
-        self._insertNewDelayedCalls()
-
-        if not self._pendingTimedCalls:
+        nextTime = self._timedCalls.nextTime()
+        if nextTime is None:
             return None
 
-        delay = self._pendingTimedCalls[0].time - self.seconds()
+        delay = nextTime - self.seconds()
 
         # Pick a somewhat arbitrary maximum possible value for the timeout.
         # This value is 2 ** 31 / 1000, which is the number of seconds which can
@@ -804,21 +925,7 @@ class ReactorBase(object):
             if self.threadCallQueue:
                 self.wakeUp()
 
-        # insert new delayed calls now
-        self._insertNewDelayedCalls()
-
-        now = self.seconds()
-        while self._pendingTimedCalls and (self._pendingTimedCalls[0].time <= now):
-            call = heappop(self._pendingTimedCalls)
-            if call.cancelled:
-                self._cancellations-=1
-                continue
-
-            if call.delayed_time > 0:
-                call.activate_delay()
-                heappush(self._pendingTimedCalls, call)
-                continue
-
+        for call in self._timedCalls.iterDue(self.seconds()):
             try:
                 call.called = 1
                 call.func(*call.args, **call.kw)
@@ -833,14 +940,6 @@ class ReactorBase(object):
                     e += "\n"
                     log.msg(e)
 
-
-        if (self._cancellations > 50 and
-             self._cancellations > len(self._pendingTimedCalls) >> 1):
-            self._cancellations = 0
-            self._pendingTimedCalls = [x for x in self._pendingTimedCalls
-                                       if not x.cancelled]
-            heapify(self._pendingTimedCalls)
-
         if self._justStopped:
             self._justStopped = False
             self.fireSystemEvent("shutdown")
@@ -14,6 +14,9 @@ Maintainer: Glyph Lefkowitz
 @var _CONTINUE: A marker left in L{Deferred.callbacks} to indicate a Deferred
     chain.  Always accompanied by a Deferred instance in the args tuple pointing
     at the Deferred which is chained to the Deferred which has this marker.
+
+@var _NO_ARGS: The arguments and keywords recorded in L{Deferred.callbacks}
+    for a callback or errback which has none.
 """
 
 from __future__ import division, absolute_import
@@ -180,10 +183,11 @@ def getDebugging():
 # See module docstring.
 _NO_RESULT = object()
 _CONTINUE = object()
+_NO_ARGS = None
 
 
 
-class Deferred:
+class Deferred(object):
     """
     This is a callback which will be put off until later.
 
@@ -225,24 +229,24 @@ class Deferred:
 
     @ivar _chainedTo: If this Deferred is waiting for the result of another
         Deferred, this is a reference to the other Deferred.  Otherwise, C{None}.
-    """
 
-    called = False
-    paused = 0
-    _debugInfo = None
-    _suppressAlreadyCalled = False
+    @ivar callbacks: The callbacks and errbacks which have not run yet, as a
+        C{list} of 6-tuples of a callback, its positional arguments and its
+        keyword arguments followed by an errback, its positional arguments and
+        its keyword arguments.  Missing arguments are given as C{None}.
+    """
 
-    # Are we currently running a user-installed callback?  Meant to prevent
-    # recursive running of callbacks when a reentrant call to add a callback is
-    # used.
-    _runningCallbacks = False
+    # Many Deferreds are created and thrown away, so keep the attributes every
+    # one has in slots.  Any others still go in a __dict__, which is only
+    # created when one is set.
+    __slots__ = ('callbacks', 'called', 'paused', 'result', '_canceller',
+                 '_debugInfo', '_suppressAlreadyCalled', '_runningCallbacks',
+                 '_chainedTo', '__dict__', '__weakref__')
 
     # Keep this class attribute for now, for compatibility with code that
     # sets it directly.
     debug = False
 
-    _chainedTo = None
-
     def __init__(self, canceller=None):
         """
         Initialize a L{Deferred}.
@@ -268,10 +272,20 @@ class Deferred:
             return result is ignored.
         """
         self.callbacks = []
+        self.called = False
+        self.paused = 0
         self._canceller = canceller
+        self._suppressAlreadyCalled = False
+        # Are we currently running a user-installed callback?  Meant to
+        # prevent recursive running of callbacks when a reentrant call to add a
+        # callback is used.
+        self._runningCallbacks = False
+        self._chainedTo = None
         if self.debug:
             self._debugInfo = DebugInfo()
             self._debugInfo.creator = traceback.format_stack()[:-1]
+        else:
+            self._debugInfo = None
 
 
     def addCallbacks(self, callback, errback=None,
@@ -287,23 +301,33 @@ class Deferred:
         """
         assert callable(callback)
         assert errback == None or callable(errback)
-        cbs = ((callback, callbackArgs, callbackKeywords),
-               (errback or (passthru), errbackArgs, errbackKeywords))
-        self.callbacks.append(cbs)
+        self.callbacks.append(
+            (callback, callbackArgs or _NO_ARGS, callbackKeywords or _NO_ARGS,
+             errback or passthru, errbackArgs or _NO_ARGS,
+             errbackKeywords or _NO_ARGS))
 
         if self.called:
             self._runCallbacks()
         return self
 
 
+    # The convenience methods below are used far more than addCallbacks, so
+    # they add to the callbacks list themselves.
+
     def addCallback(self, callback, *args, **kw):
         """
         Convenience method for adding just a callback.
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(callback, callbackArgs=args,
-                                 callbackKeywords=kw)
+        assert callable(callback)
+        self.callbacks.append(
+            (callback, args or _NO_ARGS, kw or _NO_ARGS,
+             passthru, _NO_ARGS, _NO_ARGS))
+
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def addErrback(self, errback, *args, **kw):
@@ -312,9 +336,14 @@ class Deferred:
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(passthru, errback,
-                                 errbackArgs=args,
-                                 errbackKeywords=kw)
+        assert callable(errback)
+        self.callbacks.append(
+            (passthru, _NO_ARGS, _NO_ARGS,
+             errback, args or _NO_ARGS, kw or _NO_ARGS))
+
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def addBoth(self, callback, *args, **kw):
@@ -324,9 +353,14 @@ class Deferred:
 
         See L{addCallbacks}.
         """
-        return self.addCallbacks(callback, callback,
-                                 callbackArgs=args, errbackArgs=args,
-                                 callbackKeywords=kw, errbackKeywords=kw)
+        assert callable(callback)
+        args = args or _NO_ARGS
+        kw = kw or _NO_ARGS
+        self.callbacks.append((callback, args, kw, callback, args, kw))
+
+        if self.called:
+            self._runCallbacks()
+        return self
 
 
     def chainDeferred(self, d):
@@ -487,16 +521,44 @@ class Deferred:
             self._debugInfo.invoker = traceback.format_stack()[:-2]
         self.called = True
         self.result = result
-        self._runCallbacks()
+        if (self.callbacks or self._chainedTo is not None
+            or isinstance(result, failure.Failure)):
+            self._runCallbacks()
+        # Otherwise there is nothing to run, and nothing to record for
+        # unhandled error reporting.
 
 
     def _continuation(self):
         """
-        Build a tuple of callback and errback with L{_continue} to be used by
-        L{_addContinue} and L{_removeContinue} on another Deferred.
+        Build a tuple of callback and errback with L{_CONTINUE} to be added to
+        the callbacks of another Deferred which this one is waiting for.
+        """
+        return (_CONTINUE, (self,), _NO_ARGS, _CONTINUE, (self,), _NO_ARGS)
+
+
+    def _hasResult(self):
+        """
+        Determine whether a callback added to this L{Deferred} now would be
+        called at once.
+
+        @rtype: C{bool}
         """
-        return ((_CONTINUE, (self,), None),
-                (_CONTINUE, (self,), None))
+        return (self.called and not self.paused and not self.callbacks
+                and not self._runningCallbacks)
+
+
+    def _replaceResult(self, result):
+        """
+        Set the result of this L{Deferred}, as returned by a callback which
+        has been called without being added to it.  This must only be done when
+        L{_hasResult} is true.
+
+        @param result: The new result, which must not be a L{Deferred}.
+        """
+        self.result = result
+        if (self._debugInfo is not None
+            and not isinstance(result, failure.Failure)):
+            self._debugInfo.failResult = None
 
 
     def _runCallbacks(self):
@@ -549,10 +611,10 @@ class Deferred:
             current._chainedTo = None
             while current.callbacks:
                 item = current.callbacks.pop(0)
-                callback, args, kw = item[
-                    isinstance(current.result, failure.Failure)]
-                args = args or ()
-                kw = kw or {}
+                if isinstance(current.result, failure.Failure):
+                    callback, args, kw = item[3], item[4], item[5]
+                else:
+                    callback, args, kw = item[0], item[1], item[2]
 
                 # Avoid recursion if we can.
                 if callback is _CONTINUE:
@@ -574,7 +636,11 @@ class Deferred:
                 try:
                     current._runningCallbacks = True
                     try:
-                        current.result = callback(current.result, *args, **kw)
+                        if args is _NO_ARGS and kw is _NO_ARGS:
+                            current.result = callback(current.result)
+                        else:
+                            current.result = callback(
+                                current.result, *(args or ()), **(kw or {}))
                         if current.result is current:
                             warnAboutFunction(
                                 callback,
@@ -817,9 +883,19 @@ class DeferredList(Deferred):
 
         index = 0
         for deferred in self._deferredList:
-            deferred.addCallbacks(self._cbDeferred, self._cbDeferred,
-                                  callbackArgs=(index,SUCCESS),
-                                  errbackArgs=(index,FAILURE))
+            if deferred._hasResult():
+                # Save adding callbacks which would only be called at once.
+                result = deferred.result
+                if isinstance(result, failure.Failure):
+                    succeeded = FAILURE
+                else:
+                    succeeded = SUCCESS
+                deferred._replaceResult(
+                    self._cbDeferred(result, index, succeeded))
+            else:
+                deferred.addCallbacks(self._cbDeferred, self._cbDeferred,
+                                      callbackArgs=(index,SUCCESS),
+                                      errbackArgs=(index,FAILURE))
             index = index + 1
 
 
@@ -1086,8 +1162,7 @@ def _inlineCallbacks(result, g, deferred):
     # loop and the waiting variable solve that by manually unfolding the
     # recursion.
 
-    waiting = [True, # waiting for result?
-               None] # result
+    waiting = None
 
     while 1:
         try:
@@ -1147,6 +1222,19 @@ def _inlineCallbacks(result, g, deferred):
 
         if isinstance(result, Deferred):
             # a deferred was yielded, get the result.
+            if result._hasResult():
+                # It already has one, so take it directly.  Like the result
+                # of a callback added to it, the Deferred is left with a
+                # result of None.
+                r = result.result
+                result._replaceResult(None)
+                result = r
+                continue
+
+            if waiting is None:
+                waiting = [True, # waiting for result?
+                           None] # result
+
             def gotResult(r):
                 if waiting[0]:
                     waiting[0] = False
@@ -14,9 +14,11 @@ parsed by the L{clientFromString} and L{serverFromString} functions.
 
 from __future__ import division, absolute_import
 
+import errno
 import os
 import re
 import socket
+import sys
 import warnings
 
 from socket import AF_INET6, AF_INET
@@ -66,6 +68,16 @@ __all3__ = ["TCP4ServerEndpoint", "TCP6ServerEndpoint",
             "connectProtocol", "HostnameEndpoint"]
 
 
+# The socket module of older Pythons does not define SO_REUSEPORT even where
+# the platform supports it.
+_SO_REUSEPORT = getattr(socket, "SO_REUSEPORT", None)
+if _SO_REUSEPORT is None:
+    if sys.platform.startswith("linux"):
+        _SO_REUSEPORT = 15
+    elif sys.platform.startswith(("darwin", "freebsd", "openbsd", "netbsd")):
+        _SO_REUSEPORT = 0x200
+
+
 class _WrappingProtocol(Protocol):
     """
     Wrap another protocol in order to notify my user when a connection has
@@ -433,9 +445,13 @@ class ProcessEndpoint(object):
 class _TCPServerEndpoint(object):
     """
     A TCP server endpoint interface
+
+    @ivar _addressFamily: The address family of the sockets this endpoint
+        listens with.
     """
+    _addressFamily = AF_INET
 
-    def __init__(self, reactor, port, backlog, interface):
+    def __init__(self, reactor, port, backlog, interface, reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -447,11 +463,18 @@ class _TCPServerEndpoint(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reusePort: Whether to set I{SO_REUSEPORT} on the listening
+            socket, so that several processes can each listen on the same
+            port and the kernel will share incoming connections among them.
+            If C{True}, C{reactor} must also provide L{IReactorSocket}.
+        @type reusePort: C{bool}
         """
         self._reactor = reactor
         self._port = port
         self._backlog = backlog
         self._interface = interface
+        self._reusePort = reusePort
 
 
     def listen(self, protocolFactory):
@@ -459,6 +482,8 @@ class _TCPServerEndpoint(object):
         Implement L{IStreamServerEndpoint.listen} to listen on a TCP
         socket
         """
+        if self._reusePort:
+            return defer.execute(self._listenReusingPort, protocolFactory)
         return defer.execute(self._reactor.listenTCP,
                              self._port,
                              protocolFactory,
@@ -466,12 +491,43 @@ class _TCPServerEndpoint(object):
                              interface=self._interface)
 
 
+    def _listenReusingPort(self, protocolFactory):
+        """
+        Create a listening socket with I{SO_REUSEPORT} set and give it to the
+        reactor with L{IReactorSocket.adoptStreamPort}.
+
+        @raise CannotListenError: If the socket cannot be bound, or the
+            platform does not support I{SO_REUSEPORT}.
+
+        @return: The L{IListeningPort} of the adopted socket.
+        """
+        skt = socket.socket(self._addressFamily, socket.SOCK_STREAM)
+        try:
+            try:
+                if _SO_REUSEPORT is None:
+                    raise socket.error(
+                        errno.ENOPROTOOPT, os.strerror(errno.ENOPROTOOPT))
+                skt.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+                skt.setsockopt(socket.SOL_SOCKET, _SO_REUSEPORT, 1)
+                skt.bind((self._interface, self._port))
+                skt.listen(self._backlog)
+            except socket.error as e:
+                raise error.CannotListenError(self._interface, self._port, e)
+            skt.setblocking(False)
+            return self._reactor.adoptStreamPort(
+                skt.fileno(), self._addressFamily, protocolFactory)
+        finally:
+            # The reactor listens with its own duplicate of the socket.
+            skt.close()
+
+
 
 class TCP4ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv4 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface=''):
+    def __init__(self, reactor, port, backlog=50, interface='',
+                 reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -483,8 +539,13 @@ class TCP4ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reusePort: Whether to share the port with other processes
+            using I{SO_REUSEPORT}.
+        @type reusePort: C{bool}
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reusePort)
 
 
 
@@ -492,7 +553,10 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
     """
     Implements TCP server endpoint with an IPv6 configuration
     """
-    def __init__(self, reactor, port, backlog=50, interface='::'):
+    _addressFamily = AF_INET6
+
+    def __init__(self, reactor, port, backlog=50, interface='::',
+                 reusePort=False):
         """
         @param reactor: An L{IReactorTCP} provider.
 
@@ -504,8 +568,13 @@ class TCP6ServerEndpoint(_TCPServerEndpoint):
 
         @param interface: The hostname to bind to, defaults to '' (all)
         @type interface: str
+
+        @param reusePort: Whether to share the port with other processes
+            using I{SO_REUSEPORT}.
+        @type reusePort: C{bool}
         """
-        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface)
+        _TCPServerEndpoint.__init__(self, reactor, port, backlog, interface,
+                                    reusePort)
 
 
 
@@ -1001,7 +1070,7 @@ class AdoptedStreamServerEndpoint(object):
 
 
 
-def _parseTCP(factory, port, interface="", backlog=50):
+def _parseTCP(factory, port, interface="", backlog=50, reuseport='0'):
     """
     Internal parser function for L{_parseServer} to convert the string
     arguments for a TCP(IPv4) stream endpoint into the structured arguments.
@@ -1019,12 +1088,20 @@ def _parseTCP(factory, port, interface="", backlog=50):
     @param backlog: the length of the listen queue
     @type backlog: C{str}
 
-    @return: a 2-tuple of (args, kwargs), describing  the parameters to
-        L{IReactorTCP.listenTCP} (or, modulo argument 2, the factory, arguments
-        to L{TCP4ServerEndpoint}.
+    @param reuseport: A string '0' or '1', mapping to False and True
+        respectively.  See the C{reusePort} argument to L{TCP4ServerEndpoint}.
+    @type reuseport: C{str}
+
+    @return: a 2-tuple of (args, kwargs), describing the parameters to
+        L{TCP4ServerEndpoint}, modulo argument 2, the factory.  Unless
+        C{reuseport} is true, which only L{TCP4ServerEndpoint} accepts and
+        which is only then included in kwargs, they are also the parameters
+        to L{IReactorTCP.listenTCP}.
     """
-    return (int(port), factory), {'interface': interface,
-                                  'backlog': int(backlog)}
+    kw = {'interface': interface, 'backlog': int(backlog)}
+    if int(reuseport):
+        kw['reusePort'] = True
+    return (int(port), factory), kw
 
 
 
@@ -1233,7 +1310,8 @@ class _TCP6ServerParser(object):
     """
     prefix = "tcp6"     # Used in _parseServer to identify the plugin with the endpoint type
 
-    def _parseServer(self, reactor, port, backlog=50, interface='::'):
+    def _parseServer(self, reactor, port, backlog=50, interface='::',
+                     reuseport='0'):
         """
         Internal parser function for L{_parseServer} to convert the string
         arguments into structured arguments for the L{TCP6ServerEndpoint}
@@ -1248,10 +1326,16 @@ class _TCP6ServerParser(object):
 
         @param interface: The hostname to bind to
         @type interface: str
+
+        @param reuseport: A string '0' or '1', mapping to False and True
+            respectively.  See the C{reusePort} argument to
+            L{TCP6ServerEndpoint}.
+        @type reuseport: C{str}
         """
         port = int(port)
         backlog = int(backlog)
-        return TCP6ServerEndpoint(reactor, port, backlog, interface)
+        return TCP6ServerEndpoint(reactor, port, backlog, interface,
+                                  bool(int(reuseport)))
 
 
     def parseStreamServer(self, reactor, *args, **kwargs):
@@ -1435,6 +1519,11 @@ def serverFromString(reactor, description):
 
         serverFromString(reactor, b"tcp:80:interface=127.0.0.1")
 
+    To let several processes listen on the same TCP port, with the kernel
+    sharing incoming connections among them, set C{reuseport}::
+
+        serverFromString(reactor, b"tcp:80:reuseport=1")
+
     SSL server endpoints may be specified with the 'ssl' prefix, and the
     private key and certificate files may be specified by the C{privateKey} and
     C{certKey} arguments::
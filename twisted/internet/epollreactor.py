@@ -9,19 +9,23 @@ listeners or connectors are added)::
 
     from twisted.internet import epollreactor
     epollreactor.install()
+
+To have connections read from in edge-triggered mode, pass
+C{edgeTriggered=True} to L{install}.
 """
 
 from __future__ import division, absolute_import
 
-from select import epoll, EPOLLHUP, EPOLLERR, EPOLLIN, EPOLLOUT
+from select import epoll, EPOLLHUP, EPOLLERR, EPOLLIN, EPOLLOUT, EPOLLET
 import errno
 
 from zope.interface import implementer
 
 from twisted.internet.interfaces import IReactorFDSet
 
-from twisted.python import log
+from twisted.python import log, context
 from twisted.internet import posixbase
+from twisted.internet.tcp import _WOULD_BLOCK
 
 
 
@@ -212,6 +216,29 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
     @ivar _continuousPolling: A L{_ContinuousPolling} instance, used to handle
         file descriptors (e.g. filesytem files) that are not supported by
         C{epoll(7)}.
+
+    @ivar _edgeTriggered: Whether descriptors which can be read from until
+        they would block (those of TCP and UNIX connections) are registered
+        in edge-triggered mode.  See L{__init__}.
+
+    @ivar _edgeTriggeredFDs: A set containing the integer file descriptors
+        registered in edge-triggered mode while only being read from.  When
+        one of these is also being written to it is registered in
+        level-triggered mode, since C{doWrite} does not write until the
+        descriptor would block.
+
+    @ivar _unfinished: A set containing edge-triggered file descriptors which
+        may still have data to read after L{maxReadsPerEvent} reads, and which
+        will be read from again on the next iteration.
+
+    @ivar maxReadsPerEvent: The largest number of times an edge-triggered
+        descriptor is read from for one event, so that a single busy
+        connection cannot keep the others waiting.
+
+    @ivar _maxEvents: The largest number of events to ask C{epoll_wait(2)} for
+        at once.  This grows when a whole batch of events is returned and
+        shrinks when batches are mostly empty, between L{_minimumEvents} and
+        the number of registered descriptors.
     """
 
     # Attributes for _PollLikeMixin
@@ -219,10 +246,20 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
     _POLL_IN = EPOLLIN
     _POLL_OUT = EPOLLOUT
 
-    def __init__(self):
+    maxReadsPerEvent = 16
+    _minimumEvents = 64
+
+    def __init__(self, edgeTriggered=False):
         """
         Initialize epoll object, file descriptor tracking dictionaries, and the
         base class.
+
+        @param edgeTriggered: If C{True}, register descriptors which support
+            it in edge-triggered mode: they are only reported when they become
+            readable, and are then read from until they would block.  This
+            avoids C{epoll_wait(2)} reporting the same descriptors again while
+            their data is still being handled.
+        @type edgeTriggered: C{bool}
         """
         # Create the poller we're going to use.  The 1024 here is just a hint
         # to the kernel, it is not a hard maximum.  After Linux 2.6.8, the size
@@ -232,6 +269,10 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         self._writes = set()
         self._selectables = {}
         self._continuousPolling = _ContinuousPolling(self)
+        self._edgeTriggered = edgeTriggered
+        self._edgeTriggeredFDs = set()
+        self._unfinished = set()
+        self._maxEvents = self._minimumEvents
         posixbase.PosixReactorBase.__init__(self)
 
 
@@ -254,7 +295,14 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
                 flags |= antievent
                 self._poller.modify(fd, flags)
             else:
+                edgeTriggered = (
+                    self._edgeTriggered and
+                    getattr(xer, "_readSome", None) is not None)
+                if edgeTriggered and flags == EPOLLIN:
+                    flags |= EPOLLET
                 self._poller.register(fd, flags)
+                if edgeTriggered:
+                    self._edgeTriggeredFDs.add(fd)
 
             # Update our own tracking state *only* after the epoll call has
             # succeeded.  Otherwise we may get out of sync.
@@ -313,12 +361,16 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
         if fd in primary:
             if fd in other:
                 flags = antievent
+                if flags == EPOLLIN and fd in self._edgeTriggeredFDs:
+                    flags |= EPOLLET
                 # See comment above modify call in _add.
                 self._poller.modify(fd, flags)
             else:
                 del selectables[fd]
                 # See comment above _control call in _add.
                 self._poller.unregister(fd)
+                self._edgeTriggeredFDs.discard(fd)
+                self._unfinished.discard(fd)
             primary.remove(fd)
 
 
@@ -364,19 +416,44 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
                 self._continuousPolling.getWriters())
 
 
+    def _doRead(self, selectable, fd):
+        """
+        Handle a read event for C{selectable}, reading from an edge-triggered
+        descriptor until it would block, reading is stopped, the connection is
+        lost or L{maxReadsPerEvent} reads have been made.
+
+        @return: The reason the connection was lost, or C{None}.
+        """
+        if fd not in self._edgeTriggeredFDs:
+            return selectable.doRead()
+        readSome = selectable._readSome
+        reads = self._reads
+        for i in range(self.maxReadsPerEvent):
+            why = readSome()
+            if why is _WOULD_BLOCK:
+                return None
+            if why or fd not in reads:
+                return why
+        # There may be more to read, but no new event will say so.
+        self._unfinished.add(fd)
+
+
     def doPoll(self, timeout):
         """
         Poll the poller for new events.
         """
-        if timeout is None:
+        if self._unfinished:
+            # Don't wait if there is still data to read.
+            timeout = 0
+        elif timeout is None:
             timeout = -1  # Wait indefinitely.
 
+        maxEvents = self._maxEvents
         try:
-            # Limit the number of events to the number of io objects we're
-            # currently tracking (because that's maybe a good heuristic) and
+            # Limit the number of events to a batch size adjusted below and
             # the amount of time we block to the value specified by our
             # caller.
-            l = self._poller.poll(timeout, len(self._selectables))
+            l = self._poller.poll(timeout, maxEvents)
         except IOError as err:
             if err.errno == errno.EINTR:
                 return
@@ -386,23 +463,62 @@ class EPollReactor(posixbase.PosixReactorBase, posixbase._PollLikeMixin):
             # loudly.
             raise
 
+        # Ask for more events next time if this batch was full, and fewer if
+        # it was mostly empty, so that memory for a batch large enough for
+        # every registered descriptor isn't allocated on each iteration.
+        if len(l) == maxEvents:
+            self._maxEvents = max(min(maxEvents * 2, len(self._selectables)),
+                                  self._minimumEvents)
+        elif len(l) < maxEvents // 4:
+            self._maxEvents = max(maxEvents // 2, self._minimumEvents)
+
+        if self._unfinished:
+            unfinished = self._unfinished
+            self._unfinished = set()
+            unfinished.difference_update([fd for (fd, event) in l])
+            l.extend([(fd, EPOLLIN) for fd in unfinished if fd in self._reads])
+
+        # Each descriptor is handled with its log prefix as the logging
+        # system, as log.callWithLogger would do, but the current logging
+        # context is only looked up once for the whole batch.
+        logContext = context.get(log.ILogContext)
+        call = context.call
         _drdw = self._doReadOrWrite
+        selectables = self._selectables
         for fd, event in l:
             try:
-                selectable = self._selectables[fd]
+                selectable = selectables[fd]
             except KeyError:
-                pass
-            else:
-                log.callWithLogger(selectable, _drdw, selectable, fd, event)
+                continue
+            try:
+                prefix = selectable.logPrefix()
+            except KeyboardInterrupt:
+                raise
+            except:
+                prefix = '(buggy logPrefix method)'
+                log.err(system=prefix)
+            newContext = logContext.copy()
+            newContext["system"] = prefix
+            try:
+                call({log.ILogContext: newContext},
+                     _drdw, selectable, fd, event)
+            except KeyboardInterrupt:
+                raise
+            except:
+                log.err(system=prefix)
 
     doIteration = doPoll
 
 
-def install():
+def install(edgeTriggered=False):
     """
     Install the epoll() reactor.
+
+    @param edgeTriggered: Whether to read from connections in edge-triggered
+        mode.  See L{EPollReactor.__init__}.
+    @type edgeTriggered: C{bool}
     """
-    p = EPollReactor()
+    p = EPollReactor(edgeTriggered)
     from twisted.internet.main import installReactor
     installReactor(p)
 
@@ -256,6 +256,11 @@ class INotify(FileDescriptor, object):
             try:
                 iwp = self._watchpoints[wd]
             except KeyError:
+                if mask & IN_Q_OVERFLOW:
+                    # The overflow is not reported for any watch in
+                    # particular: the events of any of them may be lost.
+                    for iwp in self._watchpoints.values():
+                        iwp._notify(iwp.path, mask)
                 continue
 
             path = iwp.path
@@ -341,7 +346,9 @@ class INotify(FileDescriptor, object):
         @param callbacks: A list of callbacks that should be called
                           when an event happens in the given path.
                           The callback should accept 3 arguments:
-                          (ignored, filepath, mask)
+                          (ignored, filepath, mask).  They are also
+                          called with the watched path and
+                          C{IN_Q_OVERFLOW} if events were lost.
         @type callbacks: C{list} of callables
 
         @param recursive: Also add all the subdirectories in this path
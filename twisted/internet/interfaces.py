@@ -1827,6 +1827,44 @@ class IProtocol(Interface):
         """
 
 
+
+class IBufferedProtocol(IProtocol):
+    """
+    A protocol which supplies its own buffer for received data.
+
+    Transports which support this receive bytes directly into the buffer
+    returned by L{getBuffer} and then call L{bufferUpdated}, so no new C{bytes}
+    object is created for each read.  Other transports (for example those
+    encrypting with TLS) still call L{IProtocol.dataReceived}, which should
+    copy the data into the buffer and parse it the same way.
+    """
+
+    def getBuffer(sizeHint):
+        """
+        Get a buffer into which the transport can receive data.
+
+        @param sizeHint: The number of bytes the transport would like to
+            receive; the buffer may be smaller or larger than this.
+        @type sizeHint: C{int}
+
+        @return: A writable buffer of at least one byte, such as a
+            C{bytearray} or a C{memoryview} of one.  The protocol must not
+            resize the underlying object until L{bufferUpdated} is called.
+        """
+
+
+    def bufferUpdated(nbytes):
+        """
+        Called after the transport has received data into the buffer
+        returned by the last call to L{getBuffer}.
+
+        @param nbytes: The number of bytes written to the start of the
+            buffer.
+        @type nbytes: C{int}
+        """
+
+
+
 class IProcessProtocol(Interface):
     """
     Interface for process-related event handlers.
@@ -2106,6 +2144,45 @@ class ITCPTransport(ITransport):
 
 
 
+class ISendFileTransport(ITransport):
+    """
+    A transport which can send the contents of a file, using sendfile(2) where
+    the platform supports it so that the data is not copied into user space.
+    """
+
+    def sendFile(fileObject, offset=0, count=None):
+        """
+        Send part of a file over this transport.
+
+        The file contents are sent after any data already written to the
+        transport.  While the file is being sent the transport acts as though
+        a producer is registered with it: no other producer may be registered,
+        and C{loseConnection} will not close the connection until the file has
+        been sent.
+
+        @param fileObject: The file to send.  If it has no usable C{fileno},
+            or the platform does not support sendfile(2), its contents are
+            read and written in the usual way instead.
+
+        @param offset: The position in the file at which to start sending.
+        @type offset: C{int}
+
+        @param count: The number of bytes to send, or C{None} to send
+            everything up to the end of the file.
+        @type count: C{int} or C{NoneType}
+
+        @raise RuntimeError: If a producer is already registered with the
+            transport, or if the transport is encrypting data with TLS.
+
+        @return: A L{Deferred} which fires with the number of bytes sent once
+            they have all been handed to the operating system, or which fails
+            if the connection is lost first.  Fewer than C{count} bytes are
+            sent if the end of the file is reached.
+        @rtype: L{Deferred}
+        """
+
+
+
 class IUNIXTransport(ITransport):
     """
     Transport for stream-oriented unix domain connections.
@@ -611,7 +611,7 @@ class _PollLikeMixin(object):
                 else:
                     if event & self._POLL_IN:
                         # Handle a read event.
-                        why = selectable.doRead()
+                        why = self._doRead(selectable, fd)
                         inRead = True
                     if not why and event & self._POLL_OUT:
                         # Handle a write event, as long as doRead didn't
@@ -627,6 +627,15 @@ class _PollLikeMixin(object):
             self._disconnectSelectable(selectable, why, inRead)
 
 
+    def _doRead(self, selectable, fd):
+        """
+        Handle a read event for C{selectable}, whose descriptor is C{fd}.
+
+        @return: The result of C{selectable.doRead}.
+        """
+        return selectable.doRead()
+
+
 
 if tls is not None or ssl is not None:
     classImplements(PosixReactorBase, IReactorSSL)
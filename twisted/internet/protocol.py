@@ -546,6 +546,51 @@ class Protocol(BaseProtocol):
         """
 
 
+@implementer(interfaces.IBufferedProtocol)
+class BufferedProtocol(Protocol):
+    """
+    Base class for protocols which receive data into a buffer of their own.
+
+    Subclasses implement L{getBuffer} and L{bufferUpdated}.  Transports which
+    support L{interfaces.IBufferedProtocol} read straight into the buffer;
+    for any other transport, L{dataReceived} copies the received bytes into
+    it.
+    """
+
+    def getBuffer(self, sizeHint):
+        """
+        Return a writable buffer for received data.
+
+        @see: L{interfaces.IBufferedProtocol.getBuffer}
+        """
+        raise NotImplementedError(self.getBuffer)
+
+
+    def bufferUpdated(self, nbytes):
+        """
+        Handle C{nbytes} bytes received at the start of the buffer last
+        returned by L{getBuffer}.
+
+        @see: L{interfaces.IBufferedProtocol.bufferUpdated}
+        """
+        raise NotImplementedError(self.bufferUpdated)
+
+
+    def dataReceived(self, data):
+        """
+        Copy C{data} into buffers obtained from L{getBuffer}.
+        """
+        offset = 0
+        while offset < len(data):
+            view = memoryview(self.getBuffer(len(data) - offset))
+            count = min(len(view), len(data) - offset)
+            view[:count] = data[offset:offset + count]
+            del view
+            offset += count
+            self.bufferUpdated(count)
+
+
+
 @implementer(interfaces.IConsumer)
 class ProtocolToConsumerAdapter(components.Adapter):
 
@@ -843,6 +888,6 @@ class FileWrapper:
 
 
 __all__ = ["Factory", "ClientFactory", "ReconnectingClientFactory", "connectionDone",
-           "Protocol", "ProcessProtocol", "FileWrapper", "ServerFactory",
+           "Protocol", "BufferedProtocol", "ProcessProtocol", "FileWrapper", "ServerFactory",
            "AbstractDatagramProtocol", "DatagramProtocol", "ConnectedDatagramProtocol",
            "ClientCreator"]
@@ -23,6 +23,17 @@ from twisted.python.compat import _PY3, lazyByteSlice
 from twisted.python.runtime import platformType
 from twisted.python import versions, deprecate
 
+try:
+    from twisted.python._sendfile import sendfile as _sendfile
+except ImportError:
+    _sendfile = None
+
+try:
+    from twisted.python._writev import writev as _writev, IOV_MAX as _IOV_MAX
+except ImportError:
+    _writev = None
+    _IOV_MAX = 0
+
 try:
     # Try to get the memory BIO based startTLS implementation, available since
     # pyOpenSSL 0.10
@@ -63,6 +74,8 @@ if platformType == 'win32':
     ENOMEM = object()
     EAGAIN = EWOULDBLOCK
     from errno import WSAECONNRESET as ECONNABORTED
+    # sendfile(2) is never used on Windows.
+    ENOSYS = object()
 
     from twisted.python.win32 import formatError as strerror
 else:
@@ -81,6 +94,7 @@ else:
     from errno import ENOMEM
     from errno import EAGAIN
     from errno import ECONNABORTED
+    from errno import ENOSYS
 
     from os import strerror
 
@@ -89,6 +103,7 @@ from errno import errorcode
 
 # Twisted Imports
 from twisted.internet import base, address, fdesc
+from twisted.internet.defer import Deferred
 from twisted.internet.task import deferLater
 from twisted.python import log, failure, reflect
 from twisted.python.util import untilConcludes
@@ -106,6 +121,10 @@ else:
     _portNameType = types.StringTypes
 
 
+# Returned by Connection._readSome when there is nothing to read.
+_WOULD_BLOCK = object()
+
+
 
 class _SocketCloser(object):
     _socketShutdownMethod = 'shutdown'
@@ -163,7 +182,130 @@ class _AbortingMixin(object):
 
 
 
-@implementer(interfaces.ITCPTransport, interfaces.ISystemHandle)
+@implementer(interfaces.IPullProducer)
+class _FileSender(object):
+    """
+    A pull producer, registered with a L{Connection} by
+    L{Connection.sendFile}, which sends part of a file over the connection.
+
+    Whenever the connection's write buffer is empty, as much of the file as
+    the socket will accept is handed to sendfile(2).  If sendfile(2) is not
+    available, or does not work with the file, the file is read and written to
+    the connection a chunk at a time instead.
+
+    @ivar transport: The L{Connection} the file is being sent over.
+    @ivar fileObject: The file being sent.
+    @ivar offset: The position in the file of the next byte to send.
+    @ivar remaining: The number of bytes left to send, or C{None} to send
+        everything up to the end of the file.
+    @ivar sent: The number of bytes sent so far.
+    @ivar deferred: The L{Deferred} returned by L{Connection.sendFile}, or
+        C{None} once it has fired.
+    @ivar _sendfile: The sendfile(2) implementation to use, or C{None} to copy
+        the file through user space.
+    """
+    bufferSize = abstract.FileDescriptor.bufferSize
+
+    def __init__(self, transport, fileObject, offset, count):
+        self.transport = transport
+        self.fileObject = fileObject
+        self.offset = offset
+        self.remaining = count
+        self.sent = 0
+        self.deferred = Deferred()
+        self._sendfile = _sendfile
+        try:
+            self._fileno = fileObject.fileno()
+        except (AttributeError, IOError, OSError, ValueError):
+            self._sendfile = None
+
+
+    def resumeProducing(self):
+        """
+        Send more of the file, if everything written to the transport before
+        it has been flushed.
+        """
+        transport = self.transport
+        if (len(transport.dataBuffer) - transport.offset or
+                transport._tempDataLen):
+            # The transport will resume us again once this is written.
+            return
+        if self._sendfile is not None:
+            self._sendSome()
+        else:
+            self._copySome()
+
+
+    def stopProducing(self):
+        """
+        The connection was lost before the whole file was sent.
+        """
+        if self.deferred is not None:
+            d, self.deferred = self.deferred, None
+            d.errback(failure.Failure(error.ConnectionLost(
+                "Connection lost before the file was sent.")))
+
+
+    def _sendSome(self):
+        count = self.remaining
+        if count is None:
+            count = 2 ** 30
+        try:
+            sent = untilConcludes(
+                self._sendfile, self.transport.fileno(), self._fileno,
+                self.offset, count)
+        except (IOError, OSError) as e:
+            if e.errno in (EAGAIN, EWOULDBLOCK):
+                self.transport.startWriting()
+            elif e.errno in (EINVAL, ENOSYS):
+                # This kind of file can't be sent with sendfile(2).
+                self._sendfile = None
+                self._copySome()
+            else:
+                self._failed(failure.Failure())
+            return
+        if self._advance(sent):
+            self.transport.startWriting()
+
+
+    def _copySome(self):
+        count = self.bufferSize
+        if self.remaining is not None:
+            count = min(count, self.remaining)
+        self.fileObject.seek(self.offset)
+        data = self.fileObject.read(count)
+        self.transport.write(data)
+        self._advance(len(data))
+
+
+    def _advance(self, sent):
+        """
+        Account for C{sent} more bytes having been sent.
+
+        @return: C{True} if there is more to send, C{False} if the whole file
+            (or everything up to its end) has now been sent.
+        """
+        self.offset += sent
+        self.sent += sent
+        if self.remaining is not None:
+            self.remaining -= sent
+        if sent and self.remaining != 0:
+            return True
+        self.transport.unregisterProducer()
+        d, self.deferred = self.deferred, None
+        d.callback(self.sent)
+        return False
+
+
+    def _failed(self, reason):
+        self.transport.unregisterProducer()
+        d, self.deferred = self.deferred, None
+        d.errback(reason)
+
+
+
+@implementer(interfaces.ITCPTransport, interfaces.ISystemHandle,
+             interfaces.ISendFileTransport)
 class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                  _AbortingMixin):
     """
@@ -190,6 +332,24 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         return self.socket
 
 
+    def sendFile(self, fileObject, offset=0, count=None):
+        """
+        Send part of a file over this connection, using sendfile(2) if the
+        platform supports it.
+
+        @see: L{twisted.internet.interfaces.ISendFileTransport.sendFile}
+        """
+        if self.TLS:
+            raise RuntimeError(
+                "Cannot send a file directly over a TLS connection.")
+        sender = _FileSender(self, fileObject, offset, count)
+        # Registering the sender may complete the transfer at once, after
+        # which it no longer refers to its Deferred.
+        d = sender.deferred
+        self.registerProducer(sender, False)
+        return d
+
+
     def doRead(self):
         """Calls self.protocol.dataReceived with all available data.
 
@@ -197,18 +357,61 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
         calls self.dataReceived(data) to process it.  If the connection is not
         lost through an error in the physical recv(), this function will return
         the result of the dataReceived call.
+
+        If the protocol provides L{interfaces.IBufferedProtocol}, the data is
+        read directly into the protocol's buffer instead.
+        """
+        why = self._readSome()
+        if why is not _WOULD_BLOCK:
+            return why
+
+
+    def _readSome(self):
         """
+        Read once from the socket and deliver the data, as L{doRead} does.
+
+        Reactors which are only told when a socket becomes readable, rather
+        than whenever it is, call this until it reports that the socket has
+        no more data.
+
+        @return: C{_WOULD_BLOCK} if there was no data to read, otherwise the
+            result of L{doRead}.
+        """
+        if interfaces.IBufferedProtocol.providedBy(self.protocol):
+            return self._readIntoProtocol()
         try:
             data = self.socket.recv(self.bufferSize)
         except socket.error as se:
             if se.args[0] == EWOULDBLOCK:
-                return
+                return _WOULD_BLOCK
             else:
                 return main.CONNECTION_LOST
 
         return self._dataReceived(data)
 
 
+    def _readIntoProtocol(self):
+        """
+        Read up to C{self.bufferSize} bytes into the buffer of an
+        L{interfaces.IBufferedProtocol} provider and tell it how many were
+        read.
+        """
+        protocol = self.protocol
+        buf = protocol.getBuffer(self.bufferSize)
+        try:
+            count = self.socket.recv_into(buf)
+        except socket.error as se:
+            if se.args[0] == EWOULDBLOCK:
+                return _WOULD_BLOCK
+            else:
+                return main.CONNECTION_LOST
+        finally:
+            del buf
+        if not count:
+            return main.CONNECTION_DONE
+        protocol.bufferUpdated(count)
+
+
     def _dataReceived(self, data):
         if not data:
             return main.CONNECTION_DONE
@@ -246,6 +449,27 @@ class Connection(_TLSConnectionMixin, abstract.FileDescriptor, _SocketCloser,
                 return main.CONNECTION_LOST
 
 
+    # Write buffered data with writev(2) where it is available, rather than
+    # joining it into a single string first.
+    _maxVectors = _IOV_MAX
+
+    def _writeSomeVectors(self, vectors, offset):
+        """
+        Write as much as possible of the given strings to this TCP connection
+        with one writev(2) call.
+
+        @see: L{abstract.FileDescriptor._writeSomeVectors}
+        """
+        try:
+            return untilConcludes(
+                _writev, self.socket.fileno(), vectors, offset)
+        except (OSError, socket.error) as se:
+            if se.args[0] in (EWOULDBLOCK, ENOBUFS):
+                return 0
+            else:
+                return main.CONNECTION_LOST
+
+
     def _closeWriteConnection(self):
         try:
             getattr(self.socket, self._socketShutdownMethod)(1)
@@ -542,6 +766,8 @@ class BaseClient(_BaseBaseClient, _TLSClientMixin, Connection):
         """
         self.doWrite = self.doConnect
         self.doRead = self.doConnect
+        # Keep reactors from reading from the socket until it is connected.
+        self._readSome = None
         if not hasattr(self, "connector"):
             # this happens when connection failed but doConnect
             # was scheduled via a callLater in self._finishInit
@@ -581,6 +807,7 @@ class BaseClient(_BaseBaseClient, _TLSClientMixin, Connection):
         # that the socket is connected.
         del self.doWrite
         del self.doRead
+        del self._readSome
         # we first stop and then start, to reset any references to the old doRead
         self.stopReading()
         self.stopWriting()
@@ -10,7 +10,8 @@ from __future__ import division, absolute_import
 
 from twisted.trial.unittest import SynchronousTestCase
 
-from twisted.internet.abstract import isIPv6Address
+from twisted.internet.abstract import isIPv6Address, FileDescriptor
+from twisted.internet.error import ConnectionLost
 
 class IPv6AddressTests(SynchronousTestCase):
     """
@@ -56,3 +57,161 @@ class IPv6AddressTests(SynchronousTestCase):
         self.assertFalse(isIPv6Address("%eth0"))
         self.assertFalse(isIPv6Address(":%eth0"))
         self.assertFalse(isIPv6Address("hello%eth0"))
+
+
+
+class FakeFDSetReactor(object):
+    """
+    A fake reactor which records the descriptors which want to write.
+    """
+    def __init__(self):
+        self.writers = set()
+
+
+    def addWriter(self, writer):
+        self.writers.add(writer)
+
+
+    def removeWriter(self, writer):
+        self.writers.discard(writer)
+
+
+
+class VectorDescriptor(FileDescriptor):
+    """
+    A L{FileDescriptor} which writes several buffers at once, accepting a
+    limited number of bytes each time.
+
+    @ivar calls: A C{list} of the arguments passed to L{_writeSomeVectors}.
+    @ivar written: The C{bytes} written so far.
+    @ivar accept: The largest number of bytes to accept for each write, or
+        an exception to return instead.
+    """
+    connected = True
+    _maxVectors = 3
+    accept = 1000
+
+    def __init__(self):
+        FileDescriptor.__init__(self, FakeFDSetReactor())
+        self.calls = []
+        self.written = b""
+
+
+    def _writeSomeVectors(self, vectors, offset):
+        self.calls.append((list(vectors), offset))
+        if isinstance(self.accept, Exception):
+            return self.accept
+        data = b"".join(vectors)[offset:offset + self.accept]
+        self.written += data
+        return len(data)
+
+
+
+class VectoredWriteTests(SynchronousTestCase):
+    """
+    Tests for L{FileDescriptor.doWrite} when the descriptor writes buffered
+    data with L{FileDescriptor._writeSomeVectors}.
+    """
+    def setUp(self):
+        self.descriptor = VectorDescriptor()
+
+
+    def test_notJoined(self):
+        """
+        The strings passed to C{write} and C{writeSequence} are passed to
+        C{_writeSomeVectors} themselves, rather than joined together.
+        """
+        first, second, third = b"abc", b"def", b"ghi"
+        self.descriptor.write(first)
+        self.descriptor.writeSequence([second, third])
+        self.descriptor.doWrite()
+        [(vectors, offset)] = self.descriptor.calls
+        self.assertEqual(offset, 0)
+        self.assertEqual(len(vectors), 3)
+        self.assertIdentical(vectors[0], first)
+        self.assertIdentical(vectors[1], second)
+        self.assertIdentical(vectors[2], third)
+        self.assertEqual(self.descriptor.written, b"abcdefghi")
+        self.assertEqual(self.descriptor.reactor.writers, set())
+
+
+    def test_maxVectors(self):
+        """
+        No more than C{_maxVectors} strings are passed to C{_writeSomeVectors}
+        at once, and the rest are written by the following calls.
+        """
+        self.descriptor.writeSequence([b"a", b"b", b"c", b"d", b"e"])
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.written, b"abc")
+        self.assertEqual(self.descriptor.reactor.writers,
+                         set([self.descriptor]))
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.written, b"abcde")
+        self.assertEqual(
+            [vectors for (vectors, offset) in self.descriptor.calls],
+            [[b"a", b"b", b"c"], [b"d", b"e"]])
+        self.assertEqual(self.descriptor.reactor.writers, set())
+
+
+    def test_partialWrites(self):
+        """
+        When only some of the data is written, the next call to
+        C{_writeSomeVectors} starts with the partially written string and the
+        offset of the first byte not yet written in it.
+        """
+        self.descriptor.accept = 4
+        self.descriptor.writeSequence([b"abc", b"defgh", b"ij"])
+        self.descriptor.doWrite()
+        self.descriptor.doWrite()
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.calls, [
+                ([b"abc", b"defgh", b"ij"], 0),
+                ([b"defgh", b"ij"], 1),
+                ([b"ij"], 0)])
+        self.assertEqual(self.descriptor.written, b"abcdefghij")
+        self.assertEqual(self.descriptor.reactor.writers, set())
+
+
+    def test_writeAfterPartialWrite(self):
+        """
+        Data written while a string is partially written is sent after it.
+        """
+        self.descriptor.accept = 2
+        self.descriptor.write(b"abc")
+        self.descriptor.doWrite()
+        self.descriptor.write(b"de")
+        self.descriptor.accept = 1000
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.calls[-1], ([b"abc", b"de"], 2))
+        self.assertEqual(self.descriptor.written, b"abcde")
+
+
+    def test_sendLimit(self):
+        """
+        Once C{SEND_LIMIT} bytes have been gathered, no more strings are
+        passed to C{_writeSomeVectors}.
+        """
+        self.descriptor.SEND_LIMIT = 4
+        self.descriptor.writeSequence([b"ab", b"cd", b"ef"])
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.calls, [([b"ab", b"cd"], 0)])
+
+
+    def test_connectionLost(self):
+        """
+        An exception returned by C{_writeSomeVectors} is returned by
+        C{doWrite}.
+        """
+        self.descriptor.accept = ConnectionLost()
+        self.descriptor.write(b"abc")
+        self.assertIdentical(self.descriptor.doWrite(),
+                             self.descriptor.accept)
+
+
+    def test_nothingToWrite(self):
+        """
+        C{doWrite} does not call C{_writeSomeVectors} when there is no data
+        to write.
+        """
+        self.descriptor.doWrite()
+        self.assertEqual(self.descriptor.calls, [])
@@ -1437,6 +1437,70 @@ class TCP6EndpointNameResolutionTestCase(ClientEndpointTestCaseMixin,
 
 
 
+class TCPServerEndpointReusePortTests(unittest.TestCase):
+    """
+    Tests for the C{reusePort} argument to L{endpoints.TCP4ServerEndpoint}.
+    """
+    if endpoints._SO_REUSEPORT is None:
+        skip = "SO_REUSEPORT is not supported on this platform."
+
+    def listen(self, port, reusePort):
+        """
+        Listen on C{port} of the loopback interface with the global reactor.
+
+        @return: A L{Deferred} firing with the L{IListeningPort}.
+        """
+        endpoint = endpoints.TCP4ServerEndpoint(
+            reactor, port, interface="127.0.0.1", reusePort=reusePort)
+        d = endpoint.listen(protocol.Factory())
+        def listening(port):
+            self.addCleanup(port.stopListening)
+            return port
+        d.addCallback(listening)
+        return d
+
+
+    def test_sharedPort(self):
+        """
+        Two endpoints created with C{reusePort=True} can listen on the same
+        port at once.
+        """
+        d = self.listen(0, True)
+        def firstListening(first):
+            portNumber = first.getHost().port
+            d = self.listen(portNumber, True)
+            d.addCallback(
+                lambda second: self.assertEqual(
+                    second.getHost().port, portNumber))
+            return d
+        d.addCallback(firstListening)
+        return d
+
+
+    def test_notShared(self):
+        """
+        If the second endpoint does not set C{reusePort}, listening on a port
+        in use fails with L{error.CannotListenError}.
+        """
+        d = self.listen(0, True)
+        def firstListening(first):
+            d = self.listen(first.getHost().port, False)
+            return self.assertFailure(d, error.CannotListenError)
+        d.addCallback(firstListening)
+        return d
+
+
+    def test_unsupported(self):
+        """
+        If the platform does not support I{SO_REUSEPORT}, listening fails with
+        L{error.CannotListenError}.
+        """
+        self.patch(endpoints, "_SO_REUSEPORT", None)
+        return self.assertFailure(
+            self.listen(0, True), error.CannotListenError)
+
+
+
 class RaisingMemoryReactorWithClock(RaisingMemoryReactor, Clock):
     """
     An extention of L{RaisingMemoryReactor} with L{task.Clock}.
@@ -2241,6 +2305,20 @@ class ParserTestCase(unittest.TestCase):
             ('TCP', (80, self.f), {'interface': '', 'backlog': 6}))
 
 
+    def test_reuseportTCP(self):
+        """
+        TCP port descriptions parse their 'reuseport' argument as a boolean,
+        which is only included in the result if it is true.
+        """
+        self.assertEqual(
+            self.parse('tcp:80:reuseport=1', self.f),
+            ('TCP', (80, self.f),
+             {'interface': '', 'backlog': 50, 'reusePort': True}))
+        self.assertEqual(
+            self.parse('tcp:80:reuseport=0', self.f),
+            ('TCP', (80, self.f), {'interface': '', 'backlog': 50}))
+
+
     def test_simpleUNIX(self):
         """
         L{endpoints._parseServer} returns a C{'UNIX'} port description with
@@ -2345,6 +2423,18 @@ class ServerStringTests(unittest.TestCase):
         self.assertEqual(server._port, 1234)
         self.assertEqual(server._backlog, 12)
         self.assertEqual(server._interface, b"10.0.0.1")
+        self.assertFalse(server._reusePort)
+
+
+    def test_tcpReusePort(self):
+        """
+        When passed a TCP strports description with C{reuseport=1},
+        L{endpoints.serverFromString} returns a L{TCP4ServerEndpoint} which
+        sets I{SO_REUSEPORT}.
+        """
+        server = endpoints.serverFromString(
+            object(), b"tcp:1234:reuseport=1")
+        self.assertTrue(server._reusePort)
 
 
     def test_ssl(self):
@@ -3130,6 +3220,17 @@ class TCP6ServerEndpointPluginTests(unittest.TestCase):
         self.assertEqual(ep._port, 8080)
         self.assertEqual(ep._backlog, 12)
         self.assertEqual(ep._interface, b'::1')
+        self.assertFalse(ep._reusePort)
+
+
+    def test_reusePort(self):
+        """
+        L{serverFromString} returns a L{TCP6ServerEndpoint} which sets
+        I{SO_REUSEPORT} if the description includes C{reuseport=1}.
+        """
+        ep = endpoints.serverFromString(
+            MemoryReactor(), b"tcp6:8080:reuseport=1")
+        self.assertTrue(ep._reusePort)
 
 
 
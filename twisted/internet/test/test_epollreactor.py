@@ -7,13 +7,18 @@ Tests for L{twisted.internet.epollreactor}.
 
 from __future__ import division, absolute_import
 
+import errno
+import socket
+
 from twisted.trial.unittest import TestCase
 try:
-    from twisted.internet.epollreactor import _ContinuousPolling
+    from twisted.internet.epollreactor import _ContinuousPolling, EPollReactor
 except ImportError:
-    _ContinuousPolling = None
+    _ContinuousPolling = EPollReactor = None
 from twisted.internet.task import Clock
 from twisted.internet.error import ConnectionDone
+from twisted.internet.tcp import _WOULD_BLOCK
+from twisted.python import log, context
 
 
 
@@ -246,3 +251,262 @@ class ContinuousPollingTests(TestCase):
 
     if _ContinuousPolling is None:
         skip = "epoll not supported in this environment."
+
+
+
+class SocketReader(object):
+    """
+    Reads from one end of a socket pair, as if it were a C{tcp.Connection}.
+
+    @ivar received: A C{list} of the C{bytes} read by each call to
+        C{_readSome}.
+
+    @ivar systems: A C{list} of the logging system in effect for each read.
+    """
+
+    def __init__(self, reactor, bufferSize=1024, prefix="reader"):
+        self.reactor = reactor
+        self.bufferSize = bufferSize
+        self.prefix = prefix
+        self.received = []
+        self.systems = []
+        self.socket, self.peer = socket.socketpair()
+        self.socket.setblocking(False)
+
+
+    def close(self):
+        self.socket.close()
+        self.peer.close()
+
+
+    def fileno(self):
+        return self.socket.fileno()
+
+
+    def logPrefix(self):
+        return self.prefix
+
+
+    def doRead(self):
+        why = self._readSome()
+        if why is not _WOULD_BLOCK:
+            return why
+
+
+    def _readSome(self):
+        self.systems.append(context.get(log.ILogContext)["system"])
+        try:
+            data = self.socket.recv(self.bufferSize)
+        except socket.error as e:
+            if e.args[0] == errno.EAGAIN:
+                return _WOULD_BLOCK
+            raise
+        self.received.append(data)
+
+
+    def doWrite(self):
+        pass
+
+
+    def connectionLost(self, reason):
+        pass
+
+
+
+class EPollReactorTests(TestCase):
+    """
+    Tests for L{EPollReactor}'s edge-triggered mode, dispatch of events and
+    batching of C{epoll_wait(2)} calls.
+    """
+    if EPollReactor is None:
+        skip = "epoll not supported in this environment."
+
+    def buildReactor(self, edgeTriggered=True):
+        """
+        Create an L{EPollReactor} which is cleaned up after the test.
+        """
+        reactor = EPollReactor(edgeTriggered)
+        def cleanup():
+            reactor.removeAll()
+            for reader in reactor._internalReaders:
+                reader.connectionLost(None)
+            reactor._poller.close()
+        self.addCleanup(cleanup)
+        return reactor
+
+
+    def buildReader(self, reactor, **kw):
+        """
+        Create a L{SocketReader} which is closed after the test.
+        """
+        reader = SocketReader(reactor, **kw)
+        self.addCleanup(reader.close)
+        return reader
+
+
+    def test_edgeTriggeredReadsUntilBlocked(self):
+        """
+        In edge-triggered mode, a descriptor with a C{_readSome} method is read
+        from until it would block, and is not reported again until more data
+        arrives.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor, bufferSize=4)
+        reactor.addReader(reader)
+        self.assertIn(reader.fileno(), reactor._edgeTriggeredFDs)
+        reader.peer.send(b"0123456789")
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"0123", b"4567", b"89"])
+        self.assertEqual(len(reader.systems), 4)
+        reactor.doPoll(0)
+        self.assertEqual(len(reader.systems), 4)
+        reader.peer.send(b"x")
+        reactor.doPoll(0)
+        self.assertEqual(reader.received[-1], b"x")
+
+
+    def test_levelTriggered(self):
+        """
+        By default, descriptors are read from once per event.
+        """
+        reactor = self.buildReactor(edgeTriggered=False)
+        reader = self.buildReader(reactor, bufferSize=4)
+        reactor.addReader(reader)
+        self.assertEqual(reactor._edgeTriggeredFDs, set())
+        reader.peer.send(b"012345")
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"0123"])
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"0123", b"45"])
+
+
+    def test_edgeTriggeredOnlyWithReadSome(self):
+        """
+        Descriptors without a C{_readSome} method are not registered in
+        edge-triggered mode.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor)
+        reader._readSome = None
+        reactor.addReader(reader)
+        self.assertEqual(reactor._edgeTriggeredFDs, set())
+
+
+    def test_maxReadsPerEvent(self):
+        """
+        An edge-triggered descriptor is read from at most
+        L{EPollReactor.maxReadsPerEvent} times for each event, and the rest of
+        its data is read on following iterations without waiting.
+        """
+        reactor = self.buildReactor()
+        reactor.maxReadsPerEvent = 2
+        reader = self.buildReader(reactor, bufferSize=1)
+        reactor.addReader(reader)
+        reader.peer.send(b"abcde")
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"a", b"b"])
+        self.assertEqual(reactor._unfinished, set([reader.fileno()]))
+        # The reactor doesn't block while data is left.
+        reactor.doPoll(None)
+        self.assertEqual(reader.received, [b"a", b"b", b"c", b"d"])
+        reactor.doPoll(None)
+        self.assertEqual(reader.received, [b"a", b"b", b"c", b"d", b"e"])
+        self.assertEqual(reactor._unfinished, set())
+
+
+    def test_stopReading(self):
+        """
+        An edge-triggered descriptor is not read from again once reading from
+        it is stopped, and its remaining data is reported when it is resumed.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor, bufferSize=1)
+        readSome = reader._readSome
+        def pausingReadSome():
+            reactor.removeReader(reader)
+            return readSome()
+        reader._readSome = pausingReadSome
+        reactor.addReader(reader)
+        reader.peer.send(b"ab")
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"a"])
+        reader._readSome = readSome
+        reactor.addReader(reader)
+        reactor.doPoll(0)
+        self.assertEqual(reader.received, [b"a", b"b"])
+
+
+    def test_writing(self):
+        """
+        An edge-triggered descriptor which is also being written to stays
+        registered for edge-triggered reads once writing stops.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor)
+        reactor.addReader(reader)
+        reactor.addWriter(reader)
+        reactor.removeWriter(reader)
+        self.assertIn(reader.fileno(), reactor._edgeTriggeredFDs)
+        reactor.removeReader(reader)
+        self.assertEqual(reactor._edgeTriggeredFDs, set())
+
+
+    def test_logPrefix(self):
+        """
+        Each descriptor is handled with its C{logPrefix} as the logging system,
+        whether or not that is the system already in effect.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor)
+        system = context.get(log.ILogContext)["system"]
+        other = self.buildReader(reactor, prefix=system)
+        reactor.addReader(reader)
+        reactor.addReader(other)
+        reader.peer.send(b"x")
+        other.peer.send(b"x")
+        reactor.doPoll(0)
+        self.assertEqual(reader.systems, ["reader", "reader"])
+        self.assertEqual(other.systems, [system, system])
+
+
+    def test_exceptionLogged(self):
+        """
+        An exception raised while handling an event is logged.
+        """
+        reactor = self.buildReactor()
+        reader = self.buildReader(reactor)
+        def logPrefix():
+            1 // 0
+        reader.logPrefix = logPrefix
+        reactor.addReader(reader)
+        reader.peer.send(b"x")
+        reactor.doPoll(0)
+        self.assertEqual(len(self.flushLoggedErrors(ZeroDivisionError)), 1)
+        self.assertEqual(reader.systems, ["(buggy logPrefix method)"] * 2)
+
+
+    def test_batchSize(self):
+        """
+        The number of events asked for at once doubles when a batch is full,
+        up to the number of registered descriptors, and halves when fewer than
+        a quarter of it are returned, down to C{_minimumEvents}.
+        """
+        reactor = self.buildReactor()
+        reactor._minimumEvents = reactor._maxEvents = 2
+        writers = [self.buildReader(reactor) for i in range(10)]
+        for writer in writers:
+            reactor.addWriter(writer)
+        # Another descriptor is registered by the reactor itself.
+        self.assertEqual(len(reactor._selectables), 11)
+        sizes = []
+        for i in range(4):
+            reactor.doPoll(0)
+            sizes.append(reactor._maxEvents)
+        self.assertEqual(sizes, [4, 8, 11, 11])
+        for writer in writers:
+            reactor.removeWriter(writer)
+        sizes = []
+        for i in range(4):
+            reactor.doPoll(0)
+            sizes.append(reactor._maxEvents)
+        self.assertEqual(sizes, [5, 2, 2, 2])
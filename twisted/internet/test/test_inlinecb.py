@@ -11,8 +11,11 @@ well.
 
 from __future__ import division, absolute_import
 
+import gc
+
 from twisted.trial.unittest import TestCase
-from twisted.internet.defer import Deferred, returnValue, inlineCallbacks
+from twisted.internet.defer import (
+    Deferred, returnValue, inlineCallbacks, succeed, fail)
 
 class NonLocalExitTests(TestCase):
     """
@@ -88,3 +91,70 @@ class NonLocalExitTests(TestCase):
         self.assertMistakenMethodWarning(results)
 
 
+
+class FiredDeferredTests(TestCase):
+    """
+    Tests for yielding L{Deferred}s which already have a result from a
+    generator decorated with L{inlineCallbacks}.
+    """
+
+    def test_result(self):
+        """
+        The result of a L{Deferred} which has already fired is sent into the
+        generator, and the L{Deferred} is left with a result of C{None}.
+        """
+        yielded = succeed(1)
+        @inlineCallbacks
+        def f():
+            result = yield yielded
+            returnValue(result + 1)
+        self.assertEqual(self.successResultOf(f()), 2)
+        self.assertEqual(yielded.callbacks, [])
+        self.assertIdentical(self.successResultOf(yielded), None)
+
+
+    def test_failure(self):
+        """
+        The exception of a L{Deferred} which has already failed is raised in
+        the generator, and no unhandled error is reported for the L{Deferred}.
+        """
+        @inlineCallbacks
+        def f():
+            try:
+                yield fail(ZeroDivisionError())
+            except ZeroDivisionError:
+                returnValue("caught")
+        self.assertEqual(self.successResultOf(f()), "caught")
+        gc.collect()
+        self.assertEqual(self.flushLoggedErrors(ZeroDivisionError), [])
+
+
+    def test_paused(self):
+        """
+        A L{Deferred} which has a result but is paused is waited for until it
+        is unpaused.
+        """
+        yielded = succeed(1)
+        yielded.pause()
+        @inlineCallbacks
+        def f():
+            result = yield yielded
+            returnValue(result)
+        d = f()
+        self.assertNoResult(d)
+        yielded.unpause()
+        self.assertEqual(self.successResultOf(d), 1)
+
+
+    def test_many(self):
+        """
+        Yielding many L{Deferred}s which have already fired does not exhaust
+        the stack.
+        """
+        @inlineCallbacks
+        def f():
+            total = 0
+            for i in range(5000):
+                total += yield succeed(1)
+            returnValue(total)
+        self.assertEqual(self.successResultOf(f()), 5000)
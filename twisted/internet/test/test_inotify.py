@@ -5,6 +5,8 @@
 Tests for the inotify wrapper in L{twisted.internet.inotify}.
 """
 
+import struct
+
 from twisted.internet import defer, reactor
 from twisted.python import filepath, runtime
 from twisted.trial import unittest
@@ -310,6 +312,27 @@ class TestINotify(unittest.TestCase):
         self.assertFalse(self.inotify._isWatched(self.dirname))
 
 
+    def test_queueOverflow(self):
+        """
+        When the inotify queue overflows, the callbacks of every watch point
+        are called with its path and C{IN_Q_OVERFLOW}, since the events of
+        any of them may have been lost.
+        """
+        subdir = self.dirname.child('test')
+        subdir.createDirectory()
+        notified = []
+        def callback(ignored, path, mask):
+            notified.append((path, mask))
+        self.inotify.watch(self.dirname, callbacks=[callback])
+        self.inotify.watch(subdir, callbacks=[callback])
+        self.inotify._doRead(
+            struct.pack("=LLLL", 0xffffffff, inotify.IN_Q_OVERFLOW, 0, 0))
+        self.assertEqual(
+            sorted(notified),
+            sorted([(self.dirname, inotify.IN_Q_OVERFLOW),
+                    (subdir, inotify.IN_Q_OVERFLOW)]))
+
+
     def test_humanReadableMask(self):
         """
         L{inotify.humaReadableMask} translates all the possible event
@@ -12,10 +12,11 @@ from zope.interface import implementer
 
 from twisted.python.failure import Failure
 from twisted.internet.interfaces import (
-    IProtocol, ILoggingContext, IProtocolFactory, IConsumer)
+    IProtocol, IBufferedProtocol, ILoggingContext, IProtocolFactory,
+    IConsumer)
 from twisted.internet.defer import CancelledError
 from twisted.internet.protocol import (
-    Protocol, ClientCreator, Factory, ProtocolToConsumerAdapter,
+    Protocol, BufferedProtocol, ClientCreator, Factory, ProtocolToConsumerAdapter,
     ConsumerToProtocolAdapter)
 from twisted.trial.unittest import TestCase
 from twisted.test.proto_helpers import MemoryReactorClock, StringTransport
@@ -339,6 +340,47 @@ class ProtocolTests(TestCase):
 
 
 
+class BufferedProtocolTests(TestCase):
+    """
+    Tests for L{twisted.internet.protocol.BufferedProtocol}.
+    """
+    def test_interfaces(self):
+        """
+        L{BufferedProtocol} instances provide L{IBufferedProtocol}.
+        """
+        self.assertTrue(verifyObject(IBufferedProtocol, BufferedProtocol()))
+
+
+    def test_notImplemented(self):
+        """
+        L{BufferedProtocol.getBuffer} and L{BufferedProtocol.bufferUpdated}
+        raise L{NotImplementedError} unless overridden.
+        """
+        proto = BufferedProtocol()
+        self.assertRaises(NotImplementedError, proto.getBuffer, 10)
+        self.assertRaises(NotImplementedError, proto.bufferUpdated, 10)
+
+
+    def test_dataReceived(self):
+        """
+        L{BufferedProtocol.dataReceived} copies the data it is given into as
+        many buffers from C{getBuffer} as are needed to hold it, calling
+        C{bufferUpdated} after filling each one.
+        """
+        received = []
+        class SmallBuffers(BufferedProtocol):
+            def getBuffer(self, sizeHint):
+                self.buffer = bytearray(3)
+                return self.buffer
+
+            def bufferUpdated(self, nbytes):
+                received.append(bytes(self.buffer[:nbytes]))
+
+        SmallBuffers().dataReceived(b'abcdefgh')
+        self.assertEqual(received, [b'abc', b'def', b'gh'])
+
+
+
 class FactoryTests(TestCase):
     """
     Tests for L{protocol.Factory}.
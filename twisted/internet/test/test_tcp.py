@@ -13,6 +13,7 @@ __metaclass__ = type
 import errno
 import socket
 
+from io import BytesIO
 from functools import wraps
 
 from zope.interface import implementer
@@ -34,12 +35,14 @@ from twisted.internet.test.reactormixins import (
     ReactorBuilder, needsRunningReactor)
 from twisted.internet.interfaces import (
     ILoggingContext, IConnector, IReactorFDSet, IReactorSocket, IReactorTCP,
-    IResolverSimple, ITLSTransport)
+    IResolverSimple, ITLSTransport, ISendFileTransport)
+from twisted.internet import main
 from twisted.internet.address import IPv4Address, IPv6Address
 from twisted.internet.defer import (
     Deferred, DeferredList, maybeDeferred, gatherResults, succeed, fail)
 from twisted.internet.endpoints import TCP4ServerEndpoint, TCP4ClientEndpoint
-from twisted.internet.protocol import ServerFactory, ClientFactory, Protocol
+from twisted.internet.protocol import (
+    ServerFactory, ClientFactory, Protocol, BufferedProtocol)
 from twisted.internet.interfaces import (
     IPushProducer, IPullProducer, IHalfCloseableProtocol)
 from twisted.internet.tcp import Connection, Server, _resolveIPv6
@@ -133,6 +136,16 @@ class FakeSocket(object):
     def recv(self, size):
         return self.data
 
+    def recv_into(self, buffer):
+        """
+        Copy as much of C{self.data} as fits into C{buffer}.
+
+        @return: The number of bytes copied.
+        """
+        count = min(len(buffer), len(self.data))
+        buffer[:count] = self.data[:count]
+        return count
+
     def send(self, bytes):
         """
         I{Send} all of C{bytes} by accumulating it into C{self.sendBuffer}.
@@ -352,6 +365,45 @@ class TCPConnectionTests(TestCase):
         self.assertEqual(len(warnings), 1)
 
 
+    def test_doReadIntoBuffer(self):
+        """
+        When the protocol provides L{IBufferedProtocol},
+        L{Connection.doRead} receives into the buffer returned by the
+        protocol's C{getBuffer} method and passes the number of bytes received
+        to its C{bufferUpdated} method, without calling C{dataReceived}.
+        """
+        received = []
+        class Buffered(BufferedProtocol):
+            buffer = bytearray(100)
+
+            def getBuffer(self, sizeHint):
+                received.append(sizeHint)
+                return self.buffer
+
+            def bufferUpdated(self, nbytes):
+                received.append(bytes(self.buffer[:nbytes]))
+
+            def dataReceived(self, data):
+                received.append(data)
+
+        conn = Connection(FakeSocket(b"someData"), Buffered())
+        self.assertEqual(conn.doRead(), None)
+        self.assertEqual(received, [conn.bufferSize, b"someData"])
+
+
+    def test_doReadIntoBufferConnectionDone(self):
+        """
+        L{Connection.doRead} returns L{main.CONNECTION_DONE} when nothing is
+        received into the buffer of an L{IBufferedProtocol} provider.
+        """
+        class Buffered(BufferedProtocol):
+            def getBuffer(self, sizeHint):
+                return bytearray(sizeHint)
+
+        conn = Connection(FakeSocket(b""), Buffered())
+        self.assertIdentical(conn.doRead(), main.CONNECTION_DONE)
+
+
     def test_noTLSBeforeStartTLS(self):
         """
         The C{TLS} attribute of a L{Connection} instance is C{False} before
@@ -1523,6 +1575,43 @@ class TCPConnectionTestsBuilder(ReactorBuilder):
             self, ListenerProtocol(), Client(), TCPCreator())
 
 
+    def test_bufferedProtocol(self):
+        """
+        All of the bytes sent to a protocol providing L{IBufferedProtocol} are
+        received into the buffers it supplies, and, except on IOCP, none are
+        passed to its C{dataReceived} method.
+        """
+        message = b'x' * 100000
+
+        class Receiver(ConnectableProtocol, BufferedProtocol):
+            received = b''
+            dataReceivedCalled = False
+
+            def getBuffer(self, sizeHint):
+                self.buffer = bytearray(1000)
+                return self.buffer
+
+            def bufferUpdated(self, nbytes):
+                self.received += bytes(self.buffer[:nbytes])
+                if len(self.received) == len(message):
+                    self.transport.loseConnection()
+
+            def dataReceived(self, data):
+                self.dataReceivedCalled = True
+                BufferedProtocol.dataReceived(self, data)
+
+        class Sender(ConnectableProtocol):
+            def connectionMade(self):
+                self.transport.write(message)
+
+        server = Receiver()
+        runProtocolsWithReactor(self, server, Sender(), TCPCreator())
+        self.assertEqual(server.received, message)
+        if IReactorFDSet.providedBy(server.reactor):
+            # IOCP does not support IBufferedProtocol.
+            self.assertFalse(server.dataReceivedCalled)
+
+
 
 class WriteSequenceTestsMixin(object):
     """
@@ -2413,6 +2502,125 @@ globals().update(AbortConnectionTestCase.makeTestCaseClasses())
 
 
 
+class FileSendingServer(ConnectableProtocol):
+    """
+    Write a prefix and then part of a file with C{sendFile}, and then
+    disconnect.
+
+    @ivar result: The result of the L{Deferred} returned by C{sendFile}.
+    @ivar prefix: The bytes written before the file.
+    """
+    result = None
+
+    def __init__(self, fileObject, offset, count, prefix=b"prefix:"):
+        self.fileObject = fileObject
+        self.offset = offset
+        self.count = count
+        self.prefix = prefix
+
+
+    def connectionMade(self):
+        if self.prefix:
+            self.transport.write(self.prefix)
+        d = self.transport.sendFile(self.fileObject, self.offset, self.count)
+        def sent(result):
+            self.result = result
+            self.transport.loseConnection()
+        d.addBoth(sent)
+
+
+
+class AccumulatingClient(ConnectableProtocol):
+    """
+    Collect all the bytes received.
+    """
+    def connectionMade(self):
+        self.received = []
+
+
+    def dataReceived(self, data):
+        self.received.append(data)
+
+
+
+class SendFileTestsBuilder(ReactorBuilder):
+    """
+    Tests for L{ISendFileTransport.sendFile} on TCP connections.
+    """
+    requiredInterfaces = (IReactorTCP,)
+
+    def setUp(self):
+        self.content = b"".join(
+            [("%08d" % (i,)).encode("ascii") for i in range(40000)])
+        self.path = self.mktemp()
+        with open(self.path, "wb") as fileObject:
+            fileObject.write(self.content)
+
+
+    def sendFile(self, fileObject, offset=0, count=None, prefix=b"prefix:"):
+        """
+        Send part of C{fileObject} from a server to a client, after
+        C{prefix}, and return the bytes the client received and the result of
+        C{sendFile}.
+        """
+        server = FileSendingServer(fileObject, offset, count, prefix)
+        client = AccumulatingClient()
+        reactor = runProtocolsWithReactor(self, server, client, TCPCreator())
+        if not ISendFileTransport.providedBy(server.transport):
+            raise SkipTest("%s does not provide ISendFileTransport" % (
+                    reactor.__class__.__name__,))
+        return b"".join(client.received), server.result
+
+
+    def test_wholeFile(self):
+        """
+        With no C{count}, C{sendFile} sends the file from C{offset} to its end,
+        after anything already written, and fires with the number of bytes
+        sent.
+        """
+        with open(self.path, "rb") as fileObject:
+            received, result = self.sendFile(fileObject, 100)
+        self.assertEqual(received, b"prefix:" + self.content[100:])
+        self.assertEqual(result, len(self.content) - 100)
+
+
+    def test_range(self):
+        """
+        With a C{count}, C{sendFile} sends only that many bytes.
+        """
+        with open(self.path, "rb") as fileObject:
+            received, result = self.sendFile(fileObject, 10, 200000)
+        self.assertEqual(received, b"prefix:" + self.content[10:200010])
+        self.assertEqual(result, 200000)
+
+
+    def test_completedImmediately(self):
+        """
+        When nothing is waiting to be written and the whole range can be sent
+        at once, the transfer is over by the time C{sendFile} returns, and
+        the L{Deferred} it returns has already fired with the number of bytes
+        sent.
+        """
+        with open(self.path, "rb") as fileObject:
+            received, result = self.sendFile(fileObject, 0, 100, prefix=b"")
+        self.assertEqual(received, self.content[:100])
+        self.assertEqual(result, 100)
+
+
+    def test_noFileno(self):
+        """
+        A file object without a file descriptor is sent by reading and writing
+        its contents.
+        """
+        fileObject = BytesIO(self.content)
+        received, result = self.sendFile(fileObject, 5, 100000)
+        self.assertEqual(received, b"prefix:" + self.content[5:100005])
+        self.assertEqual(result, 100000)
+
+globals().update(SendFileTestsBuilder.makeTestCaseClasses())
+
+
+
 class SimpleUtilityTestCase(TestCase):
     """
     Simple, direct tests for helpers within L{twisted.internet.tcp}.
@@ -0,0 +1,253 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.internet.timerwheel}.
+"""
+
+from __future__ import division, absolute_import
+
+import random
+
+from twisted.trial.unittest import SynchronousTestCase
+from twisted.internet.base import DelayedCall, ReactorBase, _DelayedCallHeap
+from twisted.internet.timerwheel import TimerWheel
+
+
+
+class FakeClock(object):
+    """
+    A settable time source.
+    """
+    def __init__(self, now=1000.0):
+        self.now = now
+
+
+    def seconds(self):
+        return self.now
+
+
+
+class ClockReactor(ReactorBase):
+    """
+    A L{ReactorBase} which takes its time from a L{FakeClock} and has no
+    waker.
+    """
+    def __init__(self, clock):
+        self.seconds = clock.seconds
+        ReactorBase.__init__(self)
+
+
+    def installWaker(self):
+        pass
+
+
+
+class TimerWheelTests(SynchronousTestCase):
+    """
+    Tests for L{TimerWheel} used directly.
+    """
+    def setUp(self):
+        self.clock = FakeClock()
+        self.wheel = TimerWheel(resolution=0.01, slotBits=2, levels=3)
+
+
+    def schedule(self, delay, scheduler=None):
+        """
+        Create a L{DelayedCall} C{delay} seconds from now and add it to
+        C{scheduler}, or C{self.wheel} if not given.
+        """
+        if scheduler is None:
+            scheduler = self.wheel
+        call = DelayedCall(self.clock.now + delay, lambda: None, (), {},
+                           scheduler.cancel, scheduler.moveSooner,
+                           self.clock.seconds)
+        scheduler.add(call)
+        return call
+
+
+    def runUntil(self, when, scheduler=None):
+        """
+        Advance the clock to C{when} and return the calls which are due.
+        """
+        if scheduler is None:
+            scheduler = self.wheel
+        self.clock.now = when
+        due = []
+        for call in scheduler.iterDue(when):
+            call.called = 1
+            due.append(call)
+        return due
+
+
+    def test_empty(self):
+        """
+        An empty wheel has no next time and no due calls.
+        """
+        self.assertEqual(self.wheel.nextTime(), None)
+        self.assertEqual(self.runUntil(2000), [])
+        self.assertEqual(self.wheel.getDelayedCalls(), [])
+
+
+    def test_notEarly(self):
+        """
+        A call is not yielded before its time, even when that time is within
+        the current tick.
+        """
+        call = self.schedule(0.001)
+        self.assertEqual(self.runUntil(1000.0005), [])
+        self.assertEqual(self.runUntil(1000.001), [call])
+        self.assertEqual(len(self.wheel), 0)
+
+
+    def test_order(self):
+        """
+        Due calls are yielded in the order of their scheduled times, across
+        every level of the wheel.
+        """
+        delays = [5, 0.3, 0, 700, 0.05, 31, 2, 1e6]
+        calls = [self.schedule(delay) for delay in delays]
+        expected = sorted(calls, key=lambda call: call.time)
+        self.assertEqual(self.wheel.nextTime(), 1000.0)
+        self.assertEqual(self.runUntil(1000 + 1e6), expected)
+
+
+    def test_nextTime(self):
+        """
+        L{TimerWheel.nextTime} is the time of the earliest call, wherever it
+        is in the wheel.
+        """
+        self.schedule(100)
+        call = self.schedule(3.5)
+        self.schedule(1e9)
+        self.assertEqual(self.wheel.nextTime(), call.time)
+        self.assertEqual(self.runUntil(call.time), [call])
+        self.assertEqual(self.wheel.nextTime(), 1100.0)
+
+
+    def test_cancel(self):
+        """
+        A cancelled call is removed from the wheel immediately and never
+        yielded.
+        """
+        call = self.schedule(1)
+        call.cancel()
+        self.assertEqual(len(self.wheel), 0)
+        self.assertEqual(self.wheel.getDelayedCalls(), [])
+        self.assertEqual(self.runUntil(1002), [])
+
+
+    def test_resetLater(self):
+        """
+        A call reset to a later time is yielded at the later time only.
+        """
+        call = self.schedule(1)
+        call.reset(10)
+        self.assertEqual(self.runUntil(1005), [])
+        self.assertEqual(self.runUntil(1010), [call])
+
+
+    def test_resetSooner(self):
+        """
+        A call reset to an earlier time is yielded at the earlier time.
+        """
+        call = self.schedule(100)
+        call.reset(1)
+        self.assertEqual(self.wheel.nextTime(), 1001.0)
+        self.assertEqual(self.runUntil(1001), [call])
+
+
+    def test_cancelledWhileIterating(self):
+        """
+        A due call cancelled by an earlier due call is not yielded.
+        """
+        first = self.schedule(1)
+        second = self.schedule(2)
+        due = []
+        for call in self.wheel.iterDue(1003):
+            due.append(call)
+            if second.active():
+                second.cancel()
+        self.assertEqual(due, [first])
+
+
+    def test_matchesHeap(self):
+        """
+        Given the same random sequence of operations, L{TimerWheel} yields
+        the same calls at the same times as the default heap scheduler.
+        """
+        rand = random.Random(4321)
+        heap = _DelayedCallHeap()
+        pairs = []
+        for step in range(500):
+            action = rand.random()
+            live = [pair for pair in pairs if pair[0].active()]
+            if action < 0.5 or not live:
+                delay = rand.choice([0, 0.001, 0.2, 3, 70, 4000])
+                delay *= rand.random()
+                pairs.append((self.schedule(delay),
+                              self.schedule(delay, heap)))
+            elif action < 0.6:
+                for call in rand.choice(live):
+                    call.cancel()
+            elif action < 0.8:
+                delay = rand.random() * rand.choice([0.1, 10, 1000])
+                for call in rand.choice(live):
+                    call.reset(delay)
+            else:
+                when = self.clock.now + rand.random() * rand.choice([0.1, 60])
+                fromWheel = self.runUntil(when)
+                fromHeap = self.runUntil(when, heap)
+                index = dict((heapCall, i) for (i, (ignored, heapCall))
+                             in enumerate(pairs))
+                self.assertEqual(
+                    sorted(id(pairs[index[call]][0]) for call in fromHeap),
+                    sorted(id(call) for call in fromWheel))
+                self.assertEqual(len(self.wheel.getDelayedCalls()),
+                                 len(heap.getDelayedCalls()))
+
+
+
+class InstallSchedulerTests(SynchronousTestCase):
+    """
+    Tests for L{ReactorBase.installScheduler}.
+    """
+    def setUp(self):
+        self.clock = FakeClock()
+        self.reactor = ClockReactor(self.clock)
+
+
+    def test_movesPendingCalls(self):
+        """
+        Calls pending when a new scheduler is installed are moved to it, and
+        the old scheduler is returned.
+        """
+        calls = []
+        pending = self.reactor.callLater(5, calls.append, 1)
+        cancelled = self.reactor.callLater(1, calls.append, 2)
+        cancelled.cancel()
+        wheel = TimerWheel()
+        old = self.reactor.installScheduler(wheel)
+        self.assertIsInstance(old, _DelayedCallHeap)
+        self.assertEqual(wheel.getDelayedCalls(), [pending])
+        self.assertEqual(self.reactor.getDelayedCalls(), [pending])
+
+
+    def test_runUntilCurrent(self):
+        """
+        With a L{TimerWheel} installed, the reactor runs calls when they are
+        due and reports the time of the next call from C{timeout}.
+        """
+        self.reactor.installScheduler(TimerWheel())
+        calls = []
+        self.reactor.callLater(2, calls.append, "later")
+        self.reactor.callLater(1, calls.append, "sooner")
+        self.assertEqual(self.reactor.timeout(), 1)
+        self.clock.now += 1.5
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, ["sooner"])
+        self.assertEqual(self.reactor.timeout(), 0.5)
+        self.clock.now += 1
+        self.reactor.runUntilCurrent()
+        self.assertEqual(calls, ["sooner", "later"])
+        self.assertEqual(self.reactor.timeout(), None)
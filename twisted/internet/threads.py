@@ -16,6 +16,7 @@ else:
     import queue as Queue
 
 from twisted.python import failure
+from twisted.python.threadpool import ThreadPoolFull
 from twisted.internet import defer
 
 
@@ -40,7 +41,8 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
 
     @return: A Deferred which fires a callback with the result of f, or an
         errback with a L{twisted.python.failure.Failure} if f throws an
-        exception.
+        exception, or with L{ThreadPoolFull} if the threadpool's queue is
+        full.
     """
     d = defer.Deferred()
 
@@ -50,7 +52,10 @@ def deferToThreadPool(reactor, threadpool, f, *args, **kwargs):
         else:
             reactor.callFromThread(d.errback, result)
 
-    threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
+    try:
+        threadpool.callInThreadWithCallback(onResult, f, *args, **kwargs)
+    except ThreadPoolFull:
+        return defer.fail()
 
     return d
 
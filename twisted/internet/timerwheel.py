@@ -0,0 +1,280 @@
+# -*- test-case-name: twisted.internet.test.test_timerwheel -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+A hierarchical timing wheel for scheduling a reactor's delayed calls.
+
+The default reactor scheduler keeps L{DelayedCall<twisted.internet.base.DelayedCall>}s
+in a binary heap, so scheduling a call costs O(log n) and cancelled calls
+linger until the heap is rebuilt.  Applications holding very many timers which
+are frequently reset or cancelled (idle timeouts, for example) can instead
+install a L{TimerWheel}, for which adding, cancelling and resetting a call are
+all constant time operations::
+
+    from twisted.internet import reactor
+    from twisted.internet.timerwheel import TimerWheel
+    reactor.installScheduler(TimerWheel())
+"""
+
+from __future__ import division, absolute_import
+
+from heapq import heapify, heappop, heappush
+from operator import attrgetter
+
+
+_getTime = attrgetter("time")
+
+
+
+class TimerWheel(object):
+    """
+    A hierarchical timing wheel.
+
+    Time is divided into ticks of C{resolution} seconds.  The wheel has
+    C{levels} levels of C{2 ** slotBits} slots each; a slot on level I{n}
+    spans C{2 ** (slotBits * n)} ticks.  A call is placed on the lowest level
+    whose slots distinguish its tick from the current one, and moves down a
+    level each time the wheel turns onto its slot, so every call is touched
+    at most C{levels} times before it is run.  Calls too distant to fit on any
+    level are kept in an overflow bucket.
+
+    Calls are always run no earlier than their scheduled time; the resolution
+    only affects how much work the wheel does, not when calls run.
+
+    @ivar _tick: The last tick for which calls have been moved into
+        C{_ready}, or C{None} if the wheel has not been used yet.
+    @ivar _ready: A C{set} of calls whose tick has been reached.
+    @ivar _wheels: A C{list} of C{levels} lists of slots, each slot being a
+        C{set} of calls, followed by a one slot list for the overflow bucket.
+    @ivar _counts: The number of calls on each level of C{_wheels}.
+    @ivar _locations: A C{dict} mapping every call held by the wheel to the
+        level (C{-1} for C{_ready}) and C{set} holding it.
+    """
+
+    def __init__(self, resolution=0.01, slotBits=8, levels=4):
+        """
+        @param resolution: The length of one tick, in seconds.
+        @type resolution: C{float}
+
+        @param slotBits: The base two logarithm of the number of slots on
+            each level.
+        @type slotBits: C{int}
+
+        @param levels: The number of levels in the wheel.
+        @type levels: C{int}
+        """
+        self.resolution = resolution
+        self._bits = slotBits
+        self._mask = (1 << slotBits) - 1
+        self._levels = levels
+        self._tick = None
+        self._ready = set()
+        self._wheels = [[set() for i in range(1 << slotBits)]
+                        for level in range(levels)]
+        self._wheels.append([set()])
+        self._counts = [0] * (levels + 1)
+        self._locations = {}
+
+
+    def __len__(self):
+        return len(self._locations)
+
+
+    def _toTick(self, when):
+        return int(when // self.resolution)
+
+
+    def _place(self, call):
+        """
+        Put C{call} in the slot appropriate for its time relative to the
+        current tick.
+        """
+        tick = self._toTick(call.time)
+        if self._tick is None:
+            self._tick = self._toTick(call.seconds())
+        if tick <= self._tick:
+            level = -1
+            bucket = self._ready
+        else:
+            # The level is given by the highest bits in which the ticks
+            # differ.
+            level = 0
+            differ = (tick ^ self._tick) >> self._bits
+            while differ and level < self._levels:
+                differ >>= self._bits
+                level += 1
+            if level >= self._levels:
+                level = self._levels
+                bucket = self._wheels[level][0]
+            else:
+                bucket = self._wheels[level][
+                    (tick >> (self._bits * level)) & self._mask]
+            self._counts[level] += 1
+        bucket.add(call)
+        self._locations[call] = (level, bucket)
+
+
+    def _remove(self, call):
+        """
+        Stop tracking C{call}, if it is tracked.
+        """
+        location = self._locations.pop(call, None)
+        if location is not None:
+            level, bucket = location
+            bucket.discard(call)
+            if level >= 0:
+                self._counts[level] -= 1
+
+
+    def _cascade(self, level, bucket):
+        """
+        Re-place every call in a slot which the wheel has just turned onto.
+        """
+        calls = list(bucket)
+        bucket.clear()
+        self._counts[level] -= len(calls)
+        for call in calls:
+            if call.delayed_time > 0:
+                call.activate_delay()
+            self._place(call)
+
+
+    def _advance(self, target):
+        """
+        Turn the wheel forward to tick C{target}, moving every call with a
+        tick no later than C{target} into C{_ready}.
+
+        Runs of empty slots are skipped a whole level at a time, so this does
+        not take time proportional to the number of ticks elapsed.
+        """
+        bits = self._bits
+        mask = self._mask
+        wheels = self._wheels
+        counts = self._counts
+        while self._tick < target:
+            for level, count in enumerate(counts):
+                if count:
+                    break
+            else:
+                self._tick = target
+                return
+            span = 1 << (bits * level)
+            tick = (self._tick // span + 1) * span
+            if level == self._levels:
+                # Only distant calls are left; go straight to the block
+                # holding the earliest of them.
+                earliest = self._toTick(min(map(_getTime, wheels[level][0])))
+                tick = max(tick, earliest // span * span)
+            if tick > target:
+                self._tick = target
+                return
+            self._tick = tick
+
+            # Find the highest level whose slot boundary has been reached,
+            # then move calls down from there, highest level first.
+            level = self._levels
+            while level and tick % (1 << (bits * level)):
+                level -= 1
+            if level == self._levels:
+                self._cascade(level, wheels[level][0])
+                level -= 1
+            for level in range(level, -1, -1):
+                self._cascade(
+                    level, wheels[level][(tick >> (bits * level)) & mask])
+
+
+    def add(self, call):
+        """
+        Schedule a new call.
+
+        @param call: The L{DelayedCall<twisted.internet.base.DelayedCall>} to
+            schedule.
+        """
+        self._place(call)
+
+
+    def cancel(self, call):
+        """
+        Forget a call which is about to be cancelled.
+
+        @param call: The L{DelayedCall<twisted.internet.base.DelayedCall>}
+            being cancelled.
+        """
+        self._remove(call)
+
+
+    def moveSooner(self, call):
+        """
+        Reposition a call whose C{time} has been moved earlier.
+
+        @param call: The L{DelayedCall<twisted.internet.base.DelayedCall>}
+            which was reset.
+        """
+        self._remove(call)
+        self._place(call)
+
+
+    def getDelayedCalls(self):
+        """
+        @return: A C{list} of all the calls which have been neither run nor
+            cancelled, in no particular order.
+        """
+        return list(self._locations)
+
+
+    def nextTime(self):
+        """
+        @return: The time at which the earliest scheduled call is to be run,
+            or C{None} if there are no scheduled calls.
+        """
+        if self._ready:
+            return min(map(_getTime, self._ready))
+        mask = self._mask
+        for level, count in enumerate(self._counts):
+            if not count:
+                continue
+            slots = self._wheels[level]
+            if level == self._levels:
+                return min(map(_getTime, slots[0]))
+            start = (self._tick >> (self._bits * level)) & mask
+            for index in range(start + 1, mask + 1):
+                if slots[index]:
+                    return min(map(_getTime, slots[index]))
+        return None
+
+
+    def iterDue(self, now):
+        """
+        Remove and yield the calls which should have been run by C{now}, in the
+        order in which they were scheduled to run.
+
+        Calls which are cancelled or rescheduled while this iterator is being
+        consumed are handled correctly; calls added while it is being consumed
+        are not yielded.
+
+        @param now: The current time, in seconds since the epoch.
+        """
+        if self._tick is None:
+            return
+        self._advance(self._toTick(now))
+        ready = self._ready
+        if not ready:
+            return
+        due = [call for call in ready if call.time <= now]
+        heapify(due)
+        locations = self._locations
+        while due:
+            call = heappop(due)
+            if call not in ready:
+                # Cancelled, or moved, by one of the calls already run.
+                continue
+            ready.remove(call)
+            del locations[call]
+            if call.delayed_time > 0:
+                call.activate_delay()
+                self._place(call)
+                if call.time <= now:
+                    heappush(due, call)
+                continue
+            yield call
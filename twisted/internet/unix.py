@@ -22,6 +22,7 @@ if not hasattr(socket, 'AF_UNIX'):
 
 # Twisted imports
 from twisted.internet import main, base, tcp, udp, error, interfaces, protocol, address
+from twisted.internet import abstract
 from twisted.internet.error import CannotListenError
 from twisted.python.util import untilConcludes
 from twisted.python import lockfile, log, reflect, failure
@@ -146,22 +147,44 @@ class _SendmsgMixin(object):
             return result
 
 
-    def doRead(self):
+    def _writeSomeVectors(self, vectors, offset):
+        """
+        Send as much of C{vectors} as possible.  If there are file descriptors
+        to send along with them, join them into one string and send that with
+        L{writeSomeData} instead.
+        """
+        if self._sendmsgQueue:
+            return self.writeSomeData(
+                abstract._concatenate(vectors[0], offset, vectors[1:]))
+        return self._writeSomeDataBase._writeSomeVectors(
+            self, vectors, offset)
+
+
+    def _readSome(self):
         """
         Calls L{IFileDescriptorReceiver.fileDescriptorReceived} and
-        L{IProtocol.dataReceived} with all available data.
+        L{IProtocol.dataReceived} with all available data; this implements
+        C{doRead}.
 
         This reads up to C{self.bufferSize} bytes of data from its socket, then
         dispatches the data to protocol callbacks to be handled.  If the
         connection is not lost through an error in the underlying recvmsg(),
-        this function will return the result of the dataReceived call.
+        this function will return the result of the dataReceived call.  If
+        there is no data to read, it returns C{tcp._WOULD_BLOCK}.
+
+        An L{interfaces.IBufferedProtocol} provider which cannot receive file
+        descriptors has data read directly into its buffer instead, and any
+        file descriptors sent to it are discarded by the kernel.
         """
+        if (interfaces.IBufferedProtocol.providedBy(self.protocol) and
+            not interfaces.IFileDescriptorReceiver.providedBy(self.protocol)):
+            return self._readIntoProtocol()
         try:
             data, flags, ancillary = untilConcludes(
                 sendmsg.recv1msg, self.socket.fileno(), 0, self.bufferSize)
         except socket.error, se:
             if se.args[0] == EWOULDBLOCK:
-                return
+                return tcp._WOULD_BLOCK
             else:
                 return main.CONNECTION_LOST
 
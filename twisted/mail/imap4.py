@@ -1430,10 +1430,17 @@ class IMAP4Server(basic.LineReceiver, policies.TimeoutMixin):
 
     def do_SEARCH(self, tag, charset, query, uid=0):
         sm = ISearchableMailbox(self.mbox, None)
+        indexed = IIndexedMailbox(self.mbox, None)
         if sm is not None:
             maybeDeferred(sm.search, query, uid=uid
                           ).addCallback(self.__cbSearch, tag, self.mbox, uid
                           ).addErrback(self.__ebSearch, tag)
+        elif indexed is not None:
+            # The index gives UIDs itself when they are asked for.
+            maybeDeferred(indexed.getMessageIndex
+                          ).addCallback(lambda index: index.search(query, uid)
+                          ).addCallback(self.__cbSearch, tag, self.mbox, False
+                          ).addErrback(self.__ebSearch, tag)
         else:
             # that's not the ideal way to get all messages, there should be a
             # method on mailboxes that gives you all of them
@@ -1446,6 +1453,18 @@ class IMAP4Server(basic.LineReceiver, policies.TimeoutMixin):
 
     select_SEARCH = (do_SEARCH, opt_charset, arg_searchkeys)
 
+    def _getMessageIndex(self):
+        """
+        Get the index of the messages of the selected mailbox, if it has one.
+
+        @rtype: L{MessageIndex} or C{None}
+        """
+        indexed = IIndexedMailbox(self.mbox, None)
+        if indexed is None:
+            return None
+        return indexed.getMessageIndex()
+
+
     def __cbSearch(self, result, tag, mbox, uid):
         if uid:
             result = map(mbox.getUID, result)
@@ -1910,7 +1929,12 @@ class IMAP4Server(basic.LineReceiver, policies.TimeoutMixin):
     def spew_envelope(self, id, msg, _w=None, _f=None):
         if _w is None:
             _w = self.transport.write
-        _w('ENVELOPE ' + collapseNestedLists([getEnvelope(msg)]))
+        index = self._getMessageIndex()
+        if index is None:
+            envelope = getEnvelope(msg)
+        else:
+            envelope = index.getEnvelope(msg)
+        _w('ENVELOPE ' + collapseNestedLists([envelope]))
 
     def spew_flags(self, id, msg, _w=None, _f=None):
         if _w is None:
@@ -1978,8 +2002,20 @@ class IMAP4Server(basic.LineReceiver, policies.TimeoutMixin):
             _w = self.transport.write
         _w('UID ' + str(msg.getUID()))
 
+    def _getBodyStructure(self, msg, extended):
+        """
+        Get the BODY or BODYSTRUCTURE of a message of the selected mailbox,
+        from the index of the mailbox if it has one.
+        """
+        index = self._getMessageIndex()
+        if index is None:
+            return getBodyStructure(msg, extended)
+        return index.getBodyStructure(msg, extended)
+
+
     def spew_bodystructure(self, id, msg, _w=None, _f=None):
-        _w('BODYSTRUCTURE ' + collapseNestedLists([getBodyStructure(msg, True)]))
+        _w('BODYSTRUCTURE ' + collapseNestedLists(
+                [self._getBodyStructure(msg, True)]))
 
     def spew_body(self, part, id, msg, _w=None, _f=None):
         if _w is None:
@@ -2018,8 +2054,11 @@ class IMAP4Server(basic.LineReceiver, policies.TimeoutMixin):
                     return FileProducer(mf.open()).beginProducing(self.transport)
                 return MessageProducer(msg, None, self._scheduler).beginProducing(self.transport)
 
-        else:
+        elif part.part:
             _w('BODY ' + collapseNestedLists([getBodyStructure(msg)]))
+        else:
+            _w('BODY ' + collapseNestedLists(
+                    [self._getBodyStructure(msg, False)]))
 
     def spewMessage(self, id, msg, query, uid):
         wbuf = WriteBuffer(self.transport)
@@ -5309,6 +5348,341 @@ def getBodyStructure(msg, extended=False):
 
 
 
+class MessageIndex(object):
+    """
+    The searchable properties of the messages of a mailbox, stored by property
+    rather than by message, so that a SEARCH is evaluated as operations on
+    sets of UIDs instead of by calling methods of every message.
+
+    The ENVELOPE and BODYSTRUCTURE of indexed messages are also kept once
+    computed, the contents of a message with a given UID never changing.
+
+    A mailbox providing L{IIndexedMailbox} maintains its index with L{add},
+    L{remove} and L{setFlags} as its messages are added, expunged and
+    flagged.
+
+    @type headerFields: C{tuple} of C{str}
+    @cvar headerFields: The names of the headers kept for searching.  Other
+        headers are searched by retrieving them from the messages.
+
+    @ivar _uids: The UIDs of the messages, in sequence number order.
+    @ivar _messages: The messages, by UID.
+    @ivar _flags: The flags of each message, by UID.
+    @ivar _flagged: The UIDs of the messages with each flag, by flag.
+    @ivar _sizes: The size of each message, by UID.
+    @ivar _internalDates: The parsed internal date of each message, by UID.
+    @ivar _sentDates: The parsed I{Date} header of each message, by UID.
+    @ivar _headers: The lowercased value of each header of C{headerFields}
+        for each message, by header name and UID.
+    @ivar _structures: The ENVELOPE and BODYSTRUCTURE of messages, by kind
+        and UID.
+    """
+    headerFields = ('bcc', 'cc', 'from', 'subject', 'to')
+
+    # Criteria which are a test of a single flag, and whether the flag must be
+    # set or not.
+    _flagCriteria = {
+        'ANSWERED': ('\\Answered', True),
+        'DELETED': ('\\Deleted', True),
+        'DRAFT': ('\\Draft', True),
+        'FLAGGED': ('\\Flagged', True),
+        'RECENT': ('\\Recent', True),
+        'SEEN': ('\\Seen', True),
+        'OLD': ('\\Recent', False),
+        'UNANSWERED': ('\\Answered', False),
+        'UNDELETED': ('\\Deleted', False),
+        'UNDRAFT': ('\\Draft', False),
+        'UNFLAGGED': ('\\Flagged', False),
+        'UNSEEN': ('\\Seen', False),
+        }
+
+    def __init__(self):
+        self._uids = []
+        self._messages = {}
+        self._flags = {}
+        self._flagged = {}
+        self._sizes = {}
+        self._internalDates = {}
+        self._sentDates = {}
+        self._headers = dict([(name, {}) for name in self.headerFields])
+        self._structures = {}
+
+
+    def __len__(self):
+        return len(self._uids)
+
+
+    def add(self, message):
+        """
+        Index a message, after the messages already indexed.
+
+        @type message: L{IMessage} provider
+        @param message: The message, whose UID must not be indexed already.
+        """
+        uid = message.getUID()
+        self._uids.append(uid)
+        self._messages[uid] = message
+        self.setFlags(uid, message.getFlags())
+        self._sizes[uid] = message.getSize()
+        self._internalDates[uid] = rfc822.parsedate(message.getInternalDate())
+        headers = message.getHeaders(False, 'date', *self.headerFields)
+        self._sentDates[uid] = rfc822.parsedate(headers.get('date', ''))
+        for name in self.headerFields:
+            self._headers[name][uid] = headers.get(name, '').lower()
+
+
+    def remove(self, uid):
+        """
+        Remove a message from the index.
+
+        @type uid: C{int}
+        @param uid: The UID of the message.
+        """
+        self._uids.remove(uid)
+        self.setFlags(uid, ())
+        for column in ([self._messages, self._flags, self._sizes,
+                        self._internalDates, self._sentDates] +
+                       self._headers.values() + self._structures.values()):
+            column.pop(uid, None)
+
+
+    def setFlags(self, uid, flags):
+        """
+        Change the flags of an indexed message.
+
+        @type uid: C{int}
+        @param uid: The UID of the message.
+
+        @type flags: iterable of C{str}
+        @param flags: All the flags of the message.
+        """
+        for flag in self._flags.get(uid, ()):
+            self._flagged[flag].discard(uid)
+        self._flags[uid] = flags = list(flags)
+        for flag in flags:
+            self._flagged.setdefault(flag, set()).add(uid)
+
+
+    def _structure(self, kind, message, compute):
+        """
+        Get a structure of a message, computing it unless it is kept.
+        """
+        uid = message.getUID()
+        if uid not in self._messages:
+            return compute(message)
+        structures = self._structures.setdefault(kind, {})
+        structure = structures.get(uid)
+        if structure is None:
+            structure = structures[uid] = compute(message)
+        return structure
+
+
+    def getEnvelope(self, message):
+        """
+        Get the ENVELOPE of a message, as L{getEnvelope} does, computing it
+        only once for indexed messages.
+
+        @type message: L{IMessage} provider
+        """
+        return self._structure('envelope', message, getEnvelope)
+
+
+    def getBodyStructure(self, message, extended=False):
+        """
+        Get the BODY or BODYSTRUCTURE of a message, as L{getBodyStructure}
+        does, computing it only once for indexed messages.
+
+        @type message: L{IMessage} provider
+
+        @type extended: C{bool}
+        @param extended: Whether to include extension data, as in
+            BODYSTRUCTURE.
+        """
+        return self._structure(
+            ('bodystructure', extended), message,
+            lambda message: getBodyStructure(message, extended))
+
+
+    def search(self, query, uid=False):
+        """
+        Find the messages matching a search query.
+
+        @type query: C{list}
+        @param query: The parsed search criteria, as given to
+            L{ISearchableMailbox.search}.
+
+        @type uid: C{bool}
+        @param uid: Whether to return UIDs rather than sequence numbers.
+
+        @rtype: C{list} of C{int}
+        @return: The sequence numbers or the UIDs of the matching messages, in
+            ascending order.
+
+        @raise IllegalQueryError: If the query is not valid.
+        """
+        matching = self._filter(copy.deepcopy(query))
+        if uid:
+            return [u for u in self._uids if u in matching]
+        return [i for (i, u) in enumerate(self._uids, 1) if u in matching]
+
+
+    def _filter(self, query):
+        """
+        Pop search terms from C{query} until there are none left.
+
+        @return: The C{set} of the UIDs of the messages matching all of them.
+        """
+        matching = set(self._uids)
+        while query:
+            matching &= self._step(query)
+        return matching
+
+
+    def _step(self, query):
+        """
+        Pop one search term from C{query}, which may be more than one element.
+
+        @return: The C{set} of the UIDs of the messages matching it.
+        """
+        q = query.pop(0)
+        if isinstance(q, list):
+            return self._filter(q)
+        c = q.upper()
+        if not c[:1].isalpha():
+            # A message sequence set.
+            messageSet = parseIdList(c, len(self._uids))
+            return set([u for (i, u) in enumerate(self._uids, 1)
+                        if i in messageSet])
+        if c in self._flagCriteria:
+            flag, present = self._flagCriteria[c]
+            flagged = self._flagged.get(flag, set())
+            if present:
+                return flagged.copy()
+            return set(self._uids) - flagged
+        if c.lower() in self._headers:
+            return self._headerContains(c.lower(), query.pop(0))
+        f = getattr(self, '_search_' + c, None)
+        if f is None:
+            raise IllegalQueryError("Invalid search command %s" % c)
+        return f(query)
+
+
+    def _headerContains(self, name, value):
+        """
+        Get the UIDs of the messages with a header containing C{value},
+        ignoring case.
+        """
+        value = value.lower()
+        column = self._headers.get(name)
+        if column is None:
+            column = dict([
+                (u, message.getHeaders(False, name).get(name, '').lower())
+                for (u, message) in self._messages.iteritems()])
+        return set([u for (u, header) in column.iteritems()
+                    if value in header])
+
+
+    def _bodyContains(self, value):
+        """
+        Get the UIDs of the messages with a body containing C{value}, ignoring
+        case.
+        """
+        value = value.lower()
+        return set([u for (u, message) in self._messages.iteritems()
+                    if text.strFile(value, message.getBodyFile(), False)])
+
+
+    def _dated(self, column, test):
+        """
+        Get the UIDs of the messages with a date in C{column} passing C{test}.
+        """
+        return set([u for (u, date) in column.iteritems() if test(date)])
+
+
+    def _search_ALL(self, query):
+        return set(self._uids)
+
+
+    def _search_NEW(self, query):
+        return self._flagged.get('\\Recent', set()) - self._flagged.get(
+            '\\Seen', set())
+
+
+    def _search_KEYWORD(self, query):
+        # Like IMAP4Server.search_KEYWORD, keywords are not supported.
+        query.pop(0)
+        return set()
+
+    _search_UNKEYWORD = _search_KEYWORD
+
+
+    def _search_HEADER(self, query):
+        name = query.pop(0).lower()
+        return self._headerContains(name, query.pop(0))
+
+
+    def _search_BODY(self, query):
+        return self._bodyContains(query.pop(0))
+
+    # Like IMAP4Server.search_TEXT, headers are not searched.
+    _search_TEXT = _search_BODY
+
+
+    def _search_LARGER(self, query):
+        size = int(query.pop(0))
+        return set([u for (u, s) in self._sizes.iteritems() if s > size])
+
+
+    def _search_SMALLER(self, query):
+        size = int(query.pop(0))
+        return set([u for (u, s) in self._sizes.iteritems() if s < size])
+
+
+    def _search_BEFORE(self, query):
+        date = parseTime(query.pop(0))
+        return self._dated(self._internalDates, lambda d: d < date)
+
+
+    def _search_ON(self, query):
+        date = parseTime(query.pop(0))
+        return self._dated(self._internalDates, lambda d: d == date)
+
+
+    def _search_SINCE(self, query):
+        date = parseTime(query.pop(0))
+        return self._dated(self._internalDates, lambda d: d > date)
+
+
+    def _search_SENTBEFORE(self, query):
+        date = parseTime(query.pop(0))
+        return self._dated(self._sentDates, lambda d: d < date)
+
+
+    def _search_SENTON(self, query):
+        date = parseTime(query.pop(0))[:3]
+        return self._dated(
+            self._sentDates, lambda d: d is not None and d[:3] == date)
+
+
+    def _search_SENTSINCE(self, query):
+        date = parseTime(query.pop(0))
+        return self._dated(self._sentDates, lambda d: d > date)
+
+
+    def _search_NOT(self, query):
+        return set(self._uids) - self._step(query)
+
+
+    def _search_OR(self, query):
+        return self._step(query) | self._step(query)
+
+
+    def _search_UID(self, query):
+        messageSet = parseIdList(query.pop(0), self._uids and max(self._uids))
+        return set([u for u in self._uids if u in messageSet])
+
+
+
 class IMessagePart(Interface):
     def getHeaders(negate, *names):
         """Retrieve a group of message headers.
@@ -5410,6 +5784,21 @@ class ISearchableMailbox(Interface):
         @raise IllegalQueryError: Raised when query is not valid.
         """
 
+class IIndexedMailbox(Interface):
+    """
+    A mailbox with a L{MessageIndex} of its messages, which the server uses to
+    evaluate SEARCH commands and to avoid computing the ENVELOPE and
+    BODYSTRUCTURE of messages again for each FETCH.
+    """
+    def getMessageIndex():
+        """
+        Get the index of the messages of this mailbox.
+
+        @rtype: L{MessageIndex}
+        @return: An index of all the messages of the mailbox, in the order of
+            their sequence numbers, with their current flags.
+        """
+
 class IMessageCopier(Interface):
     def copy(messageObject):
         """Copy the given message object into this mailbox.
@@ -5690,26 +6079,40 @@ class MessageProducer:
         @type msg: L{IMessage}
 
         @param buffer: A buffer to hold the message in.  If None, I will
-            use a L{tempfile.TemporaryFile}.
+            use a L{tempfile.TemporaryFile} if there is no consumer, and
+            otherwise produce the message from the body files of its parts
+            without copying them first, unless one of them cannot seek.
         @type buffer: file-like
         """
         self.msg = msg
-        if buffer is None:
-            buffer = tempfile.TemporaryFile()
         self.buffer = buffer
         if scheduler is None:
             scheduler = iterateInReactor
         self.scheduler = scheduler
-        self.write = self.buffer.write
+        if buffer is not None:
+            self.write = buffer.write
 
     def beginProducing(self, consumer):
         self.consumer = consumer
+        if consumer is not None and self.buffer is None:
+            return self.scheduler(self._stream())
+        if self.buffer is None:
+            self.buffer = tempfile.TemporaryFile()
+            self.write = self.buffer.write
         return self.scheduler(self._produce())
 
-    def _produce(self):
-        headers = self.msg.getHeaders(True)
+    def _getHeaders(self, msg):
+        """
+        Get the headers of a message, and the boundary between its parts if
+        it is multipart, adding one to its headers if it has none.
+
+        @type msg: L{IMessagePart}
+
+        @rtype: 2-C{tuple} of (0) C{dict}, (1) C{str} or C{None}
+        """
+        headers = msg.getHeaders(True)
         boundary = None
-        if self.msg.isMultipart():
+        if msg.isMultipart():
             content = headers.get('content-type')
             parts = [x.split('=', 1) for x in content.split(';')[1:]]
             parts = dict([(k.lower().strip(), v) for (k, v) in parts])
@@ -5721,7 +6124,63 @@ class MessageProducer:
             else:
                 if boundary.startswith('"') and boundary.endswith('"'):
                     boundary = boundary[1:-1]
+        return headers, boundary
+
+    def _getPieces(self, msg):
+        """
+        Get the pieces a message is made of: strings for headers and
+        boundaries, and the body files of its parts.
+
+        @type msg: L{IMessagePart}
 
+        @rtype: C{list} of C{str} or file-like
+        """
+        headers, boundary = self._getHeaders(msg)
+        pieces = [_formatHeaders(headers), '\r\n']
+        if msg.isMultipart():
+            for p in subparts(msg):
+                pieces.append('\r\n--%s\r\n' % (boundary,))
+                pieces.extend(self._getPieces(p))
+            pieces.append('\r\n--%s--\r\n' % (boundary,))
+        else:
+            pieces.append(msg.getBodyFile())
+        return pieces
+
+    def _stream(self):
+        pieces = self._getPieces(self.msg)
+        for piece in pieces:
+            if not isinstance(piece, str) and not (
+                    hasattr(piece, 'seek') and hasattr(piece, 'tell')):
+                break
+        else:
+            yield _PiecesProducer(pieces
+                ).beginProducing(self.consumer
+                ).addCallback(lambda _: self
+                )
+            return
+
+        # The size of a body file which cannot seek is only known once it is
+        # read: copy the message to a buffer first.
+        self.buffer = tempfile.TemporaryFile()
+        for piece in pieces:
+            if isinstance(piece, str):
+                self.buffer.write(piece)
+                continue
+            while True:
+                b = piece.read(self.CHUNK_SIZE)
+                if b:
+                    self.buffer.write(b)
+                    yield None
+                else:
+                    break
+        self.buffer.seek(0, 0)
+        yield FileProducer(self.buffer
+            ).beginProducing(self.consumer
+            ).addCallback(lambda _: self
+            )
+
+    def _produce(self):
+        headers, boundary = self._getHeaders(self.msg)
         self.write(_formatHeaders(headers))
         self.write('\r\n')
         if self.msg.isMultipart():
@@ -6106,6 +6565,36 @@ class FileProducer:
         self.f.seek(b, 0)
         return e - b
 
+class _PiecesProducer(FileProducer):
+    """
+    Produce a literal made of strings and of the contents of files, reading
+    the files as the literal is produced.
+
+    @ivar pieces: The strings and files not produced yet.
+    """
+    def __init__(self, pieces):
+        self.pieces = [
+            isinstance(piece, str) and StringIO.StringIO(piece) or piece
+            for piece in pieces]
+        self.f = self
+
+    def read(self, size):
+        while self.pieces:
+            b = self.pieces[0].read(size)
+            if b:
+                return b
+            del self.pieces[0]
+        return ''
+
+    def _size(self):
+        size = 0
+        for f in self.pieces:
+            b = f.tell()
+            f.seek(0, 2)
+            size += f.tell() - b
+            f.seek(b, 0)
+        return size
+
 def parseTime(s):
     # XXX - This may require localization :(
     months = [
@@ -6235,6 +6724,7 @@ __all__ = [
     'IMailboxListener', 'IClientAuthentication', 'IAccount', 'IMailbox',
     'INamespacePresenter', 'ICloseableMailbox', 'IMailboxInfo',
     'IMessage', 'IMessageCopier', 'IMessageFile', 'ISearchableMailbox',
+    'IIndexedMailbox',
 
     # Exceptions
     'IMAP4Exception', 'IllegalClientResponse', 'IllegalOperation',
@@ -6252,6 +6742,6 @@ __all__ = [
     'Query', 'Not', 'Or',
 
     # Miscellaneous
-    'MemoryAccount',
+    'MemoryAccount', 'MessageIndex',
     'statusRequestHelper',
 ]
@@ -19,7 +19,8 @@ from twisted.mail import protocols, smtp
 
 # System imports
 import os
-from zope.interface import implements, Interface
+import inspect
+from zope.interface import implements, alsoProvides, Interface
 
 
 class DomainWithDefaultDict:
@@ -494,10 +495,35 @@ class BounceDomain:
 
 
 
+def _receivesBlocks(messageClass):
+    """
+    Determine whether instances of a message class can be given the content
+    of a message in blocks.  This is not the case if the class overrides
+    C{lineReceived} without overriding C{dataReceived} as well, since the
+    content would then bypass its C{lineReceived}.
+
+    @type messageClass: L{FileMessage} or a subclass of it
+    @param messageClass: The class of a message receiver.
+
+    @rtype: L{bool}
+    """
+    for cls in inspect.getmro(messageClass):
+        if 'dataReceived' in vars(cls):
+            return True
+        if 'lineReceived' in vars(cls):
+            return False
+    return False
+
+
+
 class FileMessage:
     """
     A message receiver which delivers a message to a file.
 
+    Instances also provide L{smtp.IChunkedMessage}, and so receive the content
+    of a message in blocks, unless their class overrides C{lineReceived}
+    without overriding C{dataReceived}.
+
     @ivar fp: See L{__init__}.
     @ivar name: See L{__init__}.
     @ivar finalName: See L{__init__}.
@@ -520,6 +546,8 @@ class FileMessage:
         self.fp = fp
         self.name = name
         self.finalName = finalName
+        if _receivesBlocks(self.__class__):
+            alsoProvides(self, smtp.IChunkedMessage)
 
 
     def lineReceived(self, line):
@@ -532,6 +560,16 @@ class FileMessage:
         self.fp.write(line+'\n')
 
 
+    def dataReceived(self, data):
+        """
+        Write received content to the file.
+
+        @type data: L{bytes}
+        @param data: Content of the message.
+        """
+        self.fp.write(data)
+
+
     def eomReceived(self):
         """
         At the end of message, rename the file holding the message to its
@@ -9,6 +9,7 @@ Maildir-style mailbox support.
 
 import os
 import stat
+import time
 import socket
 from hashlib import md5
 
@@ -24,6 +25,7 @@ from twisted.mail import smtp
 from twisted.protocols import basic
 from twisted.persisted import dirdbm
 from twisted.python import log, failure
+from twisted.python.filepath import FilePath
 from twisted.mail import mail
 from twisted.internet import interfaces, defer, reactor
 from twisted.cred import portal, credentials, checkers
@@ -149,6 +151,17 @@ class MaildirMessage(mail.FileMessage):
         self.size += len(line)+1
 
 
+    def dataReceived(self, data):
+        """
+        Write content of the message to the file.
+
+        @type data: L{bytes}
+        @param data: Content of the message.
+        """
+        mail.FileMessage.dataReceived(self, data)
+        self.size += len(data)
+
+
     def eomReceived(self):
         """
         At the end of message, rename the file holding the message to its final
@@ -495,6 +508,284 @@ class _MaildirMailboxAppendMessageTask:
 
 
 
+class _MaildirIndex(object):
+    """
+    The messages of a maildir mailbox with their size and unique identifier,
+    saved in the mailbox directory and updated incrementally.
+
+    A subdirectory is only listed again when its modification time changed
+    since it was last listed, and then only the messages which appeared are
+    examined.  The modification time of a directory is not trusted when it is
+    within a second of the listing, as later changes in that second would not
+    change it.
+
+    When watched with L{watch}, the index is kept current from the inotify
+    events of the subdirectories, without listing them again.  If events are
+    lost because the inotify queue overflowed, the subdirectories are listed
+    again at the next refresh.  If a watch is lost, the index is no longer
+    watched and the subdirectories are listed again when they change.
+
+    @type path: L{bytes}
+    @ivar path: The mailbox directory.
+
+    @type changed: L{bool}
+    @ivar changed: Whether the index differs from the saved one.
+
+    @type _messages: L{dict} mapping L{bytes} to L{dict} mapping L{bytes} to
+        2-L{tuple} of (0) L{int}, (1) L{bytes}
+    @ivar _messages: The size and unique identifier of each message, by
+        subdirectory and file name.
+
+    @type _checked: L{dict} mapping L{bytes} to 2-L{tuple} of (0) L{float},
+        (1) L{float}
+    @ivar _checked: The modification time of each subdirectory when it was
+        last listed, and the time of the listing.
+
+    @type _sorted: 3-L{tuple} or L{NoneType <types.NoneType>}
+    @ivar _sorted: The result of L{messages}, until the index changes.
+
+    @type _watched: L{bool}
+    @ivar _watched: Whether the index is kept current by inotify events.
+    """
+    fileName = 'twisted-maildir-index'
+    _version = '1'
+    _subdirectories = ('cur', 'new')
+
+    def __init__(self, path):
+        """
+        Load the index saved in C{path}, if any.
+
+        @type path: L{bytes}
+        @param path: The mailbox directory.
+        """
+        self.path = path
+        self.changed = False
+        self._messages = dict([(sub, {}) for sub in self._subdirectories])
+        self._checked = {}
+        self._sorted = None
+        self._watched = False
+        self._load()
+
+
+    def _load(self):
+        """
+        Read the saved index, ignoring it if it is missing or invalid.
+        """
+        try:
+            indexFile = open(os.path.join(self.path, self.fileName), 'rb')
+        except IOError:
+            return
+        try:
+            if indexFile.readline().split() != [self.fileName, self._version]:
+                return
+            checked = {}
+            for sub in self._subdirectories:
+                name, mtime, listed = indexFile.readline().split()
+                if name != sub:
+                    return
+                checked[sub] = (float(mtime), float(listed))
+            messages = dict([(sub, {}) for sub in self._subdirectories])
+            for line in indexFile:
+                sub, name, size, uidl = line.rstrip('\n').split('\t')
+                # The index is not trusted to name files outside of the
+                # subdirectories, nor to give identifiers which could not
+                # have been generated for them.
+                if not self._isMessageName(name) or not uidl.isalnum():
+                    return
+                messages[sub][name] = (int(size), uidl)
+        except (ValueError, KeyError):
+            return
+        finally:
+            indexFile.close()
+        self._messages = messages
+        self._checked = checked
+
+
+    def _isMessageName(self, name):
+        """
+        Determine whether C{name} is the plain name of a file which may be a
+        message in a subdirectory of the mailbox.
+
+        @type name: L{bytes}
+        @param name: A file name read from the saved index.
+
+        @rtype: L{bool}
+        """
+        if not name or name.startswith('.') or '\0' in name:
+            return False
+        for separator in (os.sep, os.altsep, '/'):
+            if separator and separator in name:
+                return False
+        return True
+
+
+    def save(self):
+        """
+        Save the index if it changed.  Failing to write it is logged and
+        otherwise ignored, the index being rebuilt as needed.
+        """
+        if not self.changed:
+            return
+        tmpName = os.path.join(self.path, 'tmp', _generateMaildirName())
+        try:
+            indexFile = open(tmpName, 'wb')
+            try:
+                lines = ['%s %s\n' % (self.fileName, self._version)]
+                for sub in self._subdirectories:
+                    # A subdirectory never listed is saved as never checked.
+                    mtime, listed = self._checked.get(sub, (-1.0, -1.0))
+                    lines.append('%s %r %r\n' % (sub, mtime, listed))
+                indexFile.writelines(lines)
+                for sub in self._subdirectories:
+                    indexFile.writelines([
+                        '%s\t%s\t%d\t%s\n' % (sub, name, size, uidl)
+                        for (name, (size, uidl))
+                        in self._messages[sub].iteritems()])
+            finally:
+                indexFile.close()
+            os.rename(tmpName, os.path.join(self.path, self.fileName))
+        except (IOError, OSError):
+            log.err(None, "Unable to save the index of %s" % (self.path,))
+        else:
+            self.changed = False
+
+
+    def refresh(self):
+        """
+        List again the subdirectories which may have changed since they were
+        last listed.
+        """
+        for sub in self._subdirectories:
+            checked = self._checked.get(sub)
+            if checked is not None and self._watched:
+                continue
+            directory = os.path.join(self.path, sub)
+            mtime = os.stat(directory).st_mtime
+            if (checked is not None and checked[0] == mtime and
+                mtime < checked[1] - 1):
+                continue
+            self._list(sub, directory, mtime)
+
+
+    def _list(self, sub, directory, mtime):
+        """
+        List a subdirectory, examining the messages not in the index.
+        """
+        listed = time.time()
+        known = self._messages[sub]
+        current = {}
+        added = False
+        for name in os.listdir(directory):
+            entry = known.get(name)
+            if entry is None:
+                try:
+                    size = os.stat(os.path.join(directory, name)).st_size
+                except OSError:
+                    # Removed since it was listed.
+                    continue
+                entry = (size, md5(name).hexdigest())
+                added = True
+            current[name] = entry
+        if added or len(current) != len(known):
+            self._messages[sub] = current
+            self._sorted = None
+            self.changed = True
+        if self._checked.get(sub, (None,))[0] != mtime:
+            self.changed = True
+        self._checked[sub] = (mtime, listed)
+
+
+    def messages(self):
+        """
+        Return the messages of the mailbox.
+
+        The same objects are returned until the index changes, and are not
+        modified afterwards: they must not be modified by the caller either.
+
+        @rtype: 3-L{tuple} of (0) L{list} of L{bytes}, (1) L{dict} mapping
+            L{bytes} to L{int}, (2) L{dict} mapping L{bytes} to L{bytes}
+        @return: The full path names of the messages sorted by file name,
+            and their sizes and unique identifiers by full path name.
+        """
+        if self._sorted is None:
+            entries = []
+            sizes = {}
+            uidls = {}
+            for sub in self._subdirectories:
+                prefix = os.path.join(self.path, sub, '')
+                for (name, (size, uidl)) in self._messages[sub].iteritems():
+                    path = prefix + name
+                    entries.append((name, path))
+                    sizes[path] = size
+                    uidls[path] = uidl
+            entries.sort()
+            self._sorted = ([path for (name, path) in entries], sizes, uidls)
+        return self._sorted
+
+
+    def watch(self, notifier):
+        """
+        Keep the index current from the inotify events of the
+        subdirectories.
+
+        @type notifier: L{INotify <twisted.internet.inotify.INotify>}
+        @param notifier: The notifier to watch the subdirectories with.
+        """
+        from twisted.internet import inotify
+        mask = (inotify.IN_CREATE | inotify.IN_DELETE |
+                inotify.IN_MOVED_FROM | inotify.IN_MOVED_TO |
+                inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF)
+        for sub in self._subdirectories:
+            notifier.watch(FilePath(os.path.join(self.path, sub)), mask,
+                           callbacks=[self._notified])
+        self.refresh()
+        self._watched = True
+
+
+    def _notified(self, ignored, filePath, mask):
+        """
+        Update the index for an inotify event of a subdirectory.
+        """
+        from twisted.internet import inotify
+        if not self._watched:
+            return
+        if mask & inotify.IN_Q_OVERFLOW:
+            # Events were dropped: list every subdirectory again.
+            self._checked.clear()
+            return
+        if mask & (inotify.IN_DELETE_SELF | inotify.IN_MOVE_SELF |
+                   inotify.IN_UNMOUNT | inotify.IN_IGNORED):
+            # A subdirectory is no longer watched: stop relying on the events
+            # of either, and list them again.
+            self._watched = False
+            self._checked.clear()
+            return
+        sub = filePath.parent().basename()
+        messages = self._messages.get(sub)
+        if messages is None:
+            return
+        name = filePath.basename()
+        if mask & (inotify.IN_DELETE | inotify.IN_MOVED_FROM):
+            if messages.pop(name, None) is None:
+                return
+        elif mask & inotify.IN_MOVED_TO:
+            try:
+                size = filePath.getsize()
+            except OSError:
+                return
+            messages[name] = (size, md5(name).hexdigest())
+        elif mask & inotify.IN_CREATE:
+            # Written in place rather than moved from tmp/: it may not be
+            # complete yet, so list the directory again at the next refresh.
+            self._checked.pop(sub, None)
+            return
+        else:
+            return
+        self._sorted = None
+        self.changed = True
+
+
+
 class MaildirMailbox(pop3.Mailbox):
     """
     A maildir-backed mailbox.
@@ -513,23 +804,50 @@ class MaildirMailbox(pop3.Mailbox):
     @type deleted: A mapping of the information about a file before it was
         deleted to the full path name of the deleted file in the I{.Trash/}
         subfolder.
+
+    @type _sizes: L{dict} mapping L{bytes} to L{int}
+    @ivar _sizes: The size of each message, by full path name, from the
+        index.
+
+    @type _uidls: L{dict} mapping L{bytes} to L{bytes}
+    @ivar _uidls: The unique identifier of each message, by full path name,
+        from the index.
     """
     AppendFactory = _MaildirMailboxAppendMessageTask
 
-    def __init__(self, path):
+    def __init__(self, path, index=None):
         """
         @type path: L{bytes}
         @param path: The directory name for a maildir mailbox.
+
+        @type index: L{_MaildirIndex} or L{NoneType <types.NoneType>}
+        @param index: The index of the mailbox, if already loaded.  By
+            default, the index saved in the mailbox directory is used.
         """
         self.path = path
-        self.list = []
         self.deleted = {}
         initializeMaildir(path)
-        for name in ('cur', 'new'):
-            for file in os.listdir(os.path.join(path, name)):
-                self.list.append((file, os.path.join(path, name, file)))
-        self.list.sort()
-        self.list = [e[1] for e in self.list]
+        if index is None:
+            index = _MaildirIndex(path)
+        index.refresh()
+        index.save()
+        paths, self._sizes, self._uidls = index.messages()
+        self.list = list(paths)
+
+
+    def _size(self, messagePath):
+        """
+        Get the size of a message, from the index if it is there.
+
+        @type messagePath: L{bytes}
+        @param messagePath: The full path name of a message.
+
+        @rtype: L{int}
+        """
+        size = self._sizes.get(messagePath)
+        if size is None:
+            size = os.stat(messagePath)[stat.ST_SIZE]
+        return size
 
 
     def listMessages(self, i=None):
@@ -553,11 +871,11 @@ class MaildirMailbox(pop3.Mailbox):
             ret = []
             for mess in self.list:
                 if mess:
-                    ret.append(os.stat(mess)[stat.ST_SIZE])
+                    ret.append(self._size(mess))
                 else:
                     ret.append(0)
             return ret
-        return self.list[i] and os.stat(self.list[i])[stat.ST_SIZE] or 0
+        return self.list[i] and self._size(self.list[i]) or 0
 
 
     def getMessage(self, i):
@@ -590,9 +908,11 @@ class MaildirMailbox(pop3.Mailbox):
         @raise IndexError: When the index does not correspond to a message in
             the mailbox.
         """
-        # Returning the actual filename is a mistake.  Hash it.
-        base = os.path.basename(self.list[i])
-        return md5(base).hexdigest()
+        uidl = self._uidls.get(self.list[i])
+        if uidl is None:
+            # Returning the actual filename is a mistake.  Hash it.
+            uidl = md5(os.path.basename(self.list[i])).hexdigest()
+        return uidl
 
 
     def deleteMessage(self, i):
@@ -779,8 +1099,18 @@ class MaildirDirdbmDomain(AbstractMaildirDomain):
 
     @type dbm: L{DirDBM <dirdbm.DirDBM>}
     @ivar dbm: The authentication database for the domain.
+
+    @type notifier: L{INotify <twisted.internet.inotify.INotify>} or
+        L{NoneType <types.NoneType>}
+    @ivar notifier: If set, the indexes of the mailboxes are kept in memory
+        once loaded, and current with this notifier, instead of being read
+        from the mailbox directories at each login.
+
+    @type _indexes: L{dict} mapping L{bytes} to L{_MaildirIndex}
+    @ivar _indexes: The indexes kept in memory, by mailbox directory.
     """
     portal = None
+    notifier = None
     _credcheckers = None
 
     def __init__(self, service, root, postmaster=0):
@@ -802,6 +1132,7 @@ class MaildirDirdbmDomain(AbstractMaildirDomain):
             os.makedirs(dbm)
         self.dbm = dirdbm.open(dbm)
         self.postmaster = postmaster
+        self._indexes = {}
 
 
     def userDirectory(self, name):
@@ -855,6 +1186,28 @@ class MaildirDirdbmDomain(AbstractMaildirDomain):
         return self._credcheckers
 
 
+    def _mailboxIndex(self, avatarId):
+        """
+        Get the index of a user's mailbox kept in memory, if there is a
+        C{notifier} to keep it current.
+
+        @type avatarId: L{bytes}
+        @param avatarId: A username.
+
+        @rtype: L{_MaildirIndex} or L{NoneType <types.NoneType>}
+        """
+        if self.notifier is None:
+            return None
+        path = os.path.join(self.root, avatarId)
+        index = self._indexes.get(path)
+        if index is None:
+            initializeMaildir(path)
+            index = _MaildirIndex(path)
+            index.watch(self.notifier)
+            self._indexes[path] = index
+        return index
+
+
     def requestAvatar(self, avatarId, mind, *interfaces):
         """
         Get the mailbox for an authenticated user.
@@ -889,7 +1242,8 @@ class MaildirDirdbmDomain(AbstractMaildirDomain):
         if avatarId == checkers.ANONYMOUS:
             mbox = StringListMailbox([INTERNAL_ERROR])
         else:
-            mbox = MaildirMailbox(os.path.join(self.root, avatarId))
+            mbox = MaildirMailbox(os.path.join(self.root, avatarId),
+                                  self._mailboxIndex(avatarId))
 
         return (
             pop3.IMailbox,
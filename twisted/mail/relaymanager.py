@@ -14,6 +14,7 @@ the recipient and sends on the message.
 import rfc822
 import os
 import time
+import itertools
 
 try:
     import cPickle as pickle
@@ -24,8 +25,9 @@ from twisted.python import log
 from twisted.python.failure import Failure
 from twisted.mail import relay
 from twisted.mail import bounce
+from twisted.mail.mail import FileMessage
 from twisted.internet import protocol
-from twisted.internet.defer import Deferred, DeferredList
+from twisted.internet.defer import Deferred, DeferredList, succeed
 from twisted.internet.error import DNSLookupError
 from twisted.mail import smtp
 from twisted.application import internet
@@ -56,6 +58,21 @@ class ManagedRelayerMixin:
         del self.names[0]
 
 
+    def getMailFrom(self):
+        """
+        Get the origination address of the next message, first asking the
+        manager for more messages to relay over this connection when all
+        those given have been sent.
+
+        @rtype: L{bytes} or L{NoneType <types.NoneType>}
+        @return: The origination address of the next message or C{None} if
+            there are no more messages to relay.
+        """
+        if not self.messages:
+            self.loadMessages(self.manager.getMoreMessages(self.factory))
+        return relay.RelayerMixin.getMailFrom(self)
+
+
     def connectionLost(self, reason):
         """called when connection is broken
 
@@ -266,10 +283,62 @@ class ESMTPManagedRelayerFactory(SMTPManagedRelayerFactory):
 
 
 
+class _QueuedMessage(FileMessage):
+    """
+    A message receiver which delivers a message to a file in a relay queue
+    and adds the message to the queue once it has been fully received.
+
+    @ivar queue: See L{__init__}.
+    @ivar message: See L{__init__}.
+    """
+    def __init__(self, fp, name, finalName, queue, message):
+        """
+        @type fp: file-like object
+        @param fp: The file in which to store the message while it is being
+            received.
+
+        @type name: L{bytes}
+        @param name: The full path name of the temporary file.
+
+        @type finalName: L{bytes}
+        @param finalName: The full path name that should be given to the file
+            holding the message after it has been fully received.
+
+        @type queue: L{Queue}
+        @param queue: The queue of the message.
+
+        @type message: L{bytes}
+        @param message: The base filename of the message.
+        """
+        FileMessage.__init__(self, fp, name, finalName)
+        self.queue = queue
+        self.message = message
+
+
+    def eomReceived(self):
+        """
+        At the end of message, rename the file holding the message to its
+        final name and add the message to the queue.
+
+        @rtype: L{Deferred} which successfully results in L{bytes}
+        @return: A deferred which returns the final name of the file.
+        """
+        d = FileMessage.eomReceived(self)
+        self.queue.addMessage(self.message)
+        return d
+
+
+
 class Queue:
     """
     A queue for messages to be relayed.
 
+    The messages of the queue are indexed by the domain of their destination
+    when they are added, so that they can be relayed by domain without reading
+    their envelopes again.  Messages created with L{createNewMessage} are
+    added when they have been received, and L{readDirectory} only needs to be
+    called to find messages put in the directory by other means.
+
     @ivar directory: See L{__init__}
 
     @type n: L{int}
@@ -285,6 +354,20 @@ class Queue:
     @type noisy: L{bool}
     @ivar noisy: A flag which determines whether informational log messages
         will be generated (C{True}) or not (C{False}).
+
+    @type _domains: L{dict} mapping L{bytes} to L{bytes} or L{NoneType
+        <types.NoneType>}
+    @ivar _domains: The destination domain of each message, or C{None} for
+        messages with an invalid destination, by base filename.
+
+    @type _waitingByDomain: L{dict} mapping L{bytes} or L{NoneType
+        <types.NoneType>} to L{dict} of L{bytes}
+    @ivar _waitingByDomain: The base filenames of messages waiting to be
+        relayed, by destination domain.
+
+    @type _queued: L{dict} mapping L{bytes} to L{float}
+    @ivar _queued: The time at which each message was queued, by base
+        filename.
     """
     noisy = True
 
@@ -307,6 +390,9 @@ class Queue:
         self.n = 0
         self.waiting = {}
         self.relayed = {}
+        self._domains = {}
+        self._waitingByDomain = {}
+        self._queued = {}
         self.readDirectory()
 
 
@@ -365,6 +451,54 @@ class Queue:
         return len(self.waiting) > 0
 
 
+    def getWaitingDomains(self):
+        """
+        Return the destination domains of messages waiting to be relayed.
+
+        @rtype: L{list} of L{bytes} or L{NoneType <types.NoneType>}
+        @return: The destination domains of the messages waiting to be
+            relayed, including C{None} if some have an invalid destination.
+        """
+        return self._waitingByDomain.keys()
+
+
+    def getWaitingFor(self, domain, limit=None):
+        """
+        Return the base filenames of messages waiting to be relayed to a
+        domain.
+
+        @type domain: L{bytes} or L{NoneType <types.NoneType>}
+        @param domain: A destination domain, or C{None} for the messages
+            with an invalid destination.
+
+        @type limit: L{int} or L{NoneType <types.NoneType>}
+        @param limit: The maximum number of base filenames to return, or
+            C{None} for all of them.
+
+        @rtype: L{list} of L{bytes}
+        @return: The base filenames of messages waiting to be relayed to the
+            domain.
+        """
+        messages = self._waitingByDomain.get(domain, {})
+        if limit is None:
+            return messages.keys()
+        return list(itertools.islice(messages, limit))
+
+
+    def getQueuedTime(self, message):
+        """
+        Return the time at which a message was queued.
+
+        @type message: L{bytes}
+        @param message: The base filename of a message.
+
+        @rtype: L{float}
+        @return: The time at which the message was queued, in seconds since
+            the epoch.
+        """
+        return self._queued[message]
+
+
     def getRelayed(self):
         """
         Return the base filenames of messages in the process of being relayed.
@@ -384,6 +518,7 @@ class Queue:
         @param message: The base filename of a message.
         """
         del self.waiting[message]
+        self._setNotWaiting(message)
         self.relayed[message] = 1
 
 
@@ -396,18 +531,70 @@ class Queue:
         """
         del self.relayed[message]
         self.waiting[message] = 1
+        self._setWaitingByDomain(message)
+
+
+    def _setWaitingByDomain(self, message):
+        """
+        Add a message to the messages waiting to be relayed to its
+        destination domain.
+
+        @type message: L{bytes}
+        @param message: The base filename of a message.
+        """
+        domain = self._domains[message]
+        self._waitingByDomain.setdefault(domain, {})[message] = 1
+
+
+    def _setNotWaiting(self, message):
+        """
+        Remove a message from the messages waiting to be relayed to its
+        destination domain.
+
+        @type message: L{bytes}
+        @param message: The base filename of a message.
+        """
+        domain = self._domains[message]
+        messages = self._waitingByDomain[domain]
+        del messages[message]
+        if not messages:
+            del self._waitingByDomain[domain]
+
+
+    def _getDomain(self, message):
+        """
+        Read the destination domain of a message from its envelope.
+
+        @type message: L{bytes}
+        @param message: The base filename of a message.
+
+        @rtype: L{bytes} or L{NoneType <types.NoneType>}
+        @return: The destination domain of the message, or C{None} if its
+            destination is invalid.
+        """
+        from_, to = self.getEnvelope(message)
+        name, addr = rfc822.parseaddr(str(to))
+        parts = addr.split('@', 1)
+        if len(parts) != 2:
+            log.msg("Illegal message destination: " + str(to))
+            return None
+        return parts[1]
 
 
     def addMessage(self, message):
         """
         Mark a message as waiting to be relayed unless it is in the process of
-        being relayed.
+        being relayed or already waiting.
 
         @type message: L{bytes}
         @param message: The base filename of a message.
         """
-        if message not in self.relayed:
+        if message not in self.relayed and message not in self.waiting:
+            self._domains[message] = self._getDomain(message)
+            self._queued[message] = os.path.getmtime(
+                self.getPath(message) + '-D')
             self.waiting[message] = 1
+            self._setWaitingByDomain(message)
             if self.noisy:
                 log.msg('Set ' + message + ' waiting')
 
@@ -423,6 +610,8 @@ class Queue:
         os.remove(self.getPath(message) + '-D')
         os.remove(self.getPath(message) + '-H')
         del self.relayed[message]
+        del self._domains[message]
+        del self._queued[message]
 
 
     def getPath(self, message):
@@ -480,9 +669,8 @@ class Queue:
         finalFilename = os.path.join(self.directory, fname + '-D')
         messageFile = open(tempFilename, 'wb')
 
-        from twisted.mail.mail import FileMessage
-        return headerFile, FileMessage(messageFile, tempFilename,
-                                       finalFilename)
+        return headerFile, _QueuedMessage(messageFile, tempFilename,
+                                          finalFilename, self, fname)
 
 
 
@@ -503,6 +691,7 @@ class _AttemptManager(object):
     def _finish(self, relay, message):
         self.manager.managed[relay].remove(os.path.basename(message))
         self.manager.queue.done(message)
+        self.manager._relayed(relay)
 
 
     def notifySuccess(self, relay, message):
@@ -512,6 +701,7 @@ class _AttemptManager(object):
         """
         if self.manager.queue.noisy:
             log.msg("success sending %s, removing from queue" % message)
+        self.manager._succeeded(relay)
         self._finish(relay, message)
 
 
@@ -534,9 +724,25 @@ class _AttemptManager(object):
         for line in bounceMessage.splitlines():
             outgoingMessage.lineReceived(line)
         outgoingMessage.eomReceived()
+        self.manager.failedCount += 1
         self._finish(relay, self.manager.queue.getPath(message))
 
 
+    def getMoreMessages(self, relay):
+        """
+        Give a relay more messages to send over its connection.
+
+        @type relay: L{SMTPManagedRelayerFactory}
+        @param relay: The factory of a relay which sent all the messages it
+            was given.
+
+        @rtype: L{list} of L{bytes}
+        @return: The base pathnames of the messages the relay is now
+            responsible for, if any.
+        """
+        return self.manager._getMoreMessages(relay)
+
+
     def notifyDone(self, relay):
         """A relaying SMTP client is disconnected.
 
@@ -551,6 +757,7 @@ class _AttemptManager(object):
             del self.manager.managed[relay]
         except KeyError:
             pass
+        self.manager._relayDone(relay)
         notifications = self._completionDeferreds
         self._completionDeferreds = None
         for d in notifications:
@@ -572,12 +779,7 @@ class _AttemptManager(object):
         if self.manager.queue.noisy:
             log.msg("Backing off on delivery of " + str(msgs))
 
-        def setWaiting(queue, messages):
-            map(queue.setWaiting, messages)
-
-        from twisted.internet import reactor
-        reactor.callLater(30, setWaiting, self.manager.queue, msgs)
-        del self.manager.managed[relay]
+        self.manager._backOff(relay)
 
 
 
@@ -625,6 +827,62 @@ class SmartHostSMTPRelayingManager:
         L{bytes}
     @ivar managed: A mapping of factory for a managed relayer to
         filenames of messages the managed relayer is responsible for.
+
+    @type maxConnectionsPerDomain: L{int}
+    @ivar maxConnectionsPerDomain: The maximum number of concurrent
+        connections to the mail exchange of a single domain.
+
+    @type maxMessagesPerSession: L{int}
+    @ivar maxMessagesPerSession: The number of messages after which a
+        relayer is given no more messages to send over its connection, so
+        that connections to busy domains are eventually released to others.
+
+    @type rescanInterval: L{int} or L{NoneType <types.NoneType>}
+    @ivar rescanInterval: The period in seconds between scans of the
+        directory of the queue for messages which were not added to it with
+        L{Queue.createNewMessage}, or C{None} to only scan it once.
+
+    @type backoffBase: L{int}
+    @ivar backoffBase: The period in seconds during which no relaying is
+        attempted to a domain after a first failure to reach its mail
+        exchange.  The period doubles with each consecutive failure.
+
+    @type backoffMaximum: L{int}
+    @ivar backoffMaximum: The maximum period in seconds during which no
+        relaying is attempted to a domain after failures to reach its mail
+        exchange.
+
+    @type clock: L{IReactorTime <twisted.internet.interfaces.IReactorTime>}
+        provider or L{NoneType <types.NoneType>}
+    @ivar clock: A reactor used for timing, or C{None} to use the global
+        reactor.
+
+    @type relayedCount: L{int}
+    @ivar relayedCount: The number of messages relayed.
+
+    @type failedCount: L{int}
+    @ivar failedCount: The number of messages which could not be relayed and
+        were bounced.
+
+    @type _domains: L{dict} mapping L{SMTPManagedRelayerFactory} to L{bytes}
+    @ivar _domains: The domain each managed relayer relays messages to.
+
+    @type _sessions: L{dict} mapping L{SMTPManagedRelayerFactory} to L{int}
+    @ivar _sessions: The number of messages each managed relayer sent or
+        failed to send.
+
+    @type _backoffs: L{dict} mapping L{bytes} to 2-L{tuple} of (0) L{int},
+        (1) L{float}
+    @ivar _backoffs: The number of consecutive failures to reach the mail
+        exchange of a domain, and the time until which no relaying is
+        attempted to it, by domain.
+
+    @type _started: L{float} or L{NoneType <types.NoneType>}
+    @ivar _started: The time at which the state was first checked.
+
+    @type _scanned: L{float} or L{NoneType <types.NoneType>}
+    @ivar _scanned: The time at which the directory of the queue was last
+        scanned.
     """
     factory = SMTPManagedRelayerFactory
 
@@ -632,6 +890,17 @@ class SmartHostSMTPRelayingManager:
 
     mxcalc = None
 
+    maxConnectionsPerDomain = 2
+    maxMessagesPerSession = 1000
+    rescanInterval = 5 * 60
+    backoffBase = 30
+    backoffMaximum = 60 * 60
+    clock = None
+
+    # Volatile state, not persisted.
+    _volatile = ('managed', 'relayedCount', 'failedCount', '_domains',
+                 '_sessions', '_backoffs', '_started', '_scanned')
+
     def __init__(self, queue, maxConnections=2, maxMessagesPerConnection=10):
         """
         Initialize a smart host.
@@ -652,10 +921,24 @@ class SmartHostSMTPRelayingManager:
         """
         self.maxConnections = maxConnections
         self.maxMessagesPerConnection = maxMessagesPerConnection
-        self.managed = {}  # SMTP clients we're managing
         self.queue = queue
         self.fArgs = ()
         self.fKwArgs = {}
+        self._init()
+
+
+    def _init(self):
+        """
+        Initialize volatile state.
+        """
+        self.managed = {}  # SMTP clients we're managing
+        self.relayedCount = 0
+        self.failedCount = 0
+        self._domains = {}
+        self._sessions = {}
+        self._backoffs = {}
+        self._started = None
+        self._scanned = None
 
 
     def __getstate__(self):
@@ -666,7 +949,8 @@ class SmartHostSMTPRelayingManager:
         @return: The non-volatile state of the queue.
         """
         dct = self.__dict__.copy()
-        del dct['managed']
+        for name in self._volatile:
+            dct.pop(name, None)
         return dct
 
 
@@ -679,7 +963,20 @@ class SmartHostSMTPRelayingManager:
         @param state: The non-volatile state of the queue.
         """
         self.__dict__.update(state)
-        self.managed = {}
+        self._init()
+
+
+    def _getClock(self):
+        """
+        Get the reactor used for timing.
+
+        @rtype: L{IReactorTime <twisted.internet.interfaces.IReactorTime>}
+            provider
+        """
+        if self.clock is None:
+            from twisted.internet import reactor
+            return reactor
+        return self.clock
 
 
     def checkState(self):
@@ -692,7 +989,13 @@ class SmartHostSMTPRelayingManager:
             deferred which fires when all of the SMTP connections initiated by
             this call have disconnected.
         """
-        self.queue.readDirectory()
+        now = self._getClock().seconds()
+        if self._started is None:
+            self._started = now
+        if (self._scanned is None or (self.rescanInterval is not None and
+                now - self._scanned >= self.rescanInterval)):
+            self.queue.readDirectory()
+            self._scanned = now
         if (len(self.managed) >= self.maxConnections):
             return
         if not self.queue.hasWaiting():
@@ -702,44 +1005,197 @@ class SmartHostSMTPRelayingManager:
 
 
     def _checkStateMX(self):
-        nextMessages = self.queue.getWaiting()
-        nextMessages.reverse()
-
-        exchanges = {}
-        for msg in nextMessages:
-            from_, to = self.queue.getEnvelope(msg)
-            name, addr = rfc822.parseaddr(to)
-            parts = addr.split('@', 1)
-            if len(parts) != 2:
-                log.err("Illegal message destination: " + to)
-                continue
-            domain = parts[1]
-
-            self.queue.setRelaying(msg)
-            exchanges.setdefault(domain, []).append(self.queue.getPath(msg))
-            if len(exchanges) >= (self.maxConnections - len(self.managed)):
-                break
+        """
+        Launch relayers for the domains with waiting messages, as many as the
+        connection limits allow, skipping the domains whose mail exchange
+        could not be reached recently.
 
+        @rtype: L{DeferredList}
+        @return: A deferred which fires when all of the SMTP connections
+            initiated have disconnected.
+        """
         if self.mxcalc is None:
             self.mxcalc = MXCalculator()
 
+        now = self._getClock().seconds()
+        connections = {}
+        for domain in self._domains.itervalues():
+            connections[domain] = connections.get(domain, 0) + 1
+
         relays = []
-        for (domain, msgs) in exchanges.iteritems():
-            manager = _AttemptManager(self)
-            factory = self.factory(msgs, manager, *self.fArgs, **self.fKwArgs)
-            self.managed[factory] = map(os.path.basename, msgs)
-            relayAttemptDeferred = manager.getCompletionDeferred()
-            connectSetupDeferred = self.mxcalc.getMX(domain)
-            connectSetupDeferred.addCallback(lambda mx: str(mx.name))
-            connectSetupDeferred.addCallback(self._cbExchange, self.PORT,
-                factory)
-            connectSetupDeferred.addErrback(lambda err: (
-                relayAttemptDeferred.errback(err), err)[1])
-            connectSetupDeferred.addErrback(self._ebExchange, factory, domain)
-            relays.append(relayAttemptDeferred)
+        for domain in self.queue.getWaitingDomains():
+            if domain is None:
+                # Messages with an invalid destination.
+                continue
+            while (len(self.managed) < self.maxConnections and
+                   connections.get(domain, 0) < self.maxConnectionsPerDomain
+                   and self._backoffs.get(domain, (0, 0))[1] <= now):
+                msgs = self.queue.getWaitingFor(
+                    domain, self.maxMessagesPerConnection)
+                if not msgs:
+                    break
+                connections[domain] = connections.get(domain, 0) + 1
+                relays.append(self._relay(domain, msgs))
+            if len(self.managed) >= self.maxConnections:
+                break
         return DeferredList(relays)
 
 
+    def _relay(self, domain, msgs):
+        """
+        Launch a relayer for messages to a domain.
+
+        @type domain: L{bytes}
+        @param domain: The destination domain of the messages.
+
+        @type msgs: L{list} of L{bytes}
+        @param msgs: The base filenames of waiting messages.
+
+        @rtype: L{Deferred}
+        @return: A deferred which fires when the relayer has disconnected.
+        """
+        for msg in msgs:
+            self.queue.setRelaying(msg)
+        manager = _AttemptManager(self)
+        factory = self.factory(map(self.queue.getPath, msgs), manager,
+                               *self.fArgs, **self.fKwArgs)
+        self.managed[factory] = msgs
+        self._domains[factory] = domain
+        self._sessions[factory] = 0
+        relayAttemptDeferred = manager.getCompletionDeferred()
+        connectSetupDeferred = self.mxcalc.getMX(domain)
+        connectSetupDeferred.addCallback(lambda mx: str(mx.name))
+        connectSetupDeferred.addCallback(self._cbExchange, self.PORT,
+            factory)
+        connectSetupDeferred.addErrback(lambda err: (
+            relayAttemptDeferred.errback(err), err)[1])
+        connectSetupDeferred.addErrback(self._ebExchange, factory, domain)
+        return relayAttemptDeferred
+
+
+    def _getMoreMessages(self, factory):
+        """
+        Give a relayer more waiting messages to the domain it relays to,
+        unless it already sent L{maxMessagesPerSession} messages.
+
+        @type factory: L{SMTPManagedRelayerFactory}
+        @param factory: The factory of the relayer.
+
+        @rtype: L{list} of L{bytes}
+        @return: The base pathnames of the messages the relayer is now
+            responsible for.
+        """
+        domain = self._domains.get(factory)
+        if (domain is None or
+            self._sessions[factory] >= self.maxMessagesPerSession):
+            return []
+        msgs = self.queue.getWaitingFor(domain, self.maxMessagesPerConnection)
+        for msg in msgs:
+            self.queue.setRelaying(msg)
+        self.managed[factory].extend(msgs)
+        return map(self.queue.getPath, msgs)
+
+
+    def _relayed(self, factory):
+        """
+        Record that a relayer is done with a message.
+
+        @type factory: L{SMTPManagedRelayerFactory}
+        @param factory: The factory of the relayer.
+        """
+        if factory in self._sessions:
+            self._sessions[factory] += 1
+
+
+    def _succeeded(self, factory):
+        """
+        Record that a relayer relayed a message, and so that the mail
+        exchange of its domain can be reached.
+
+        @type factory: L{SMTPManagedRelayerFactory}
+        @param factory: The factory of the relayer.
+        """
+        self.relayedCount += 1
+        self._backoffs.pop(self._domains.get(factory), None)
+
+
+    def _relayDone(self, factory):
+        """
+        Forget a relayer which disconnected.
+
+        @type factory: L{SMTPManagedRelayerFactory}
+        @param factory: The factory of the relayer.
+        """
+        self._domains.pop(factory, None)
+        self._sessions.pop(factory, None)
+
+
+    def _backOff(self, factory):
+        """
+        Set the messages of a relayer which could not reach the mail exchange
+        of its domain waiting again, and attempt no relaying to the domain for
+        a period which doubles with each consecutive failure.
+
+        @type factory: L{SMTPManagedRelayerFactory}
+        @param factory: The factory of the relayer.
+        """
+        domain = self._domains.get(factory)
+        for msg in self.managed.pop(factory, ()):
+            self.queue.setWaiting(msg)
+        self._relayDone(factory)
+        failures = self._backoffs.get(domain, (0, 0))[0] + 1
+        delay = min(self.backoffBase * 2 ** (failures - 1),
+                    self.backoffMaximum)
+        self._backoffs[domain] = (
+            failures, self._getClock().seconds() + delay)
+
+
+    def metrics(self):
+        """
+        Report on the relaying of messages.
+
+        @rtype: L{dict} mapping L{bytes} to L{object}
+        @return: A mapping with the following keys:
+            - C{'relayed'}: the number of messages relayed;
+            - C{'failed'}: the number of messages bounced;
+            - C{'throughput'}: the number of messages relayed per second
+              since the state was first checked;
+            - C{'waiting'}: the number of messages waiting to be relayed;
+            - C{'relaying'}: the number of messages being relayed;
+            - C{'oldest'}: the time in seconds since the oldest waiting
+              message was queued, or C{0} if none are waiting;
+            - C{'connections'}: the number of relayers by domain;
+            - C{'backedOff'}: the domains to which no relaying is attempted
+              at the moment, with the time in seconds until it will be
+              again.
+        """
+        now = self._getClock().seconds()
+        throughput = 0.0
+        if self._started is not None and now > self._started:
+            throughput = self.relayedCount / (now - self._started)
+        waiting = self.queue.getWaiting()
+        oldest = 0
+        if waiting:
+            oldest = now - min(map(self.queue.getQueuedTime, waiting))
+        connections = {}
+        for domain in self._domains.itervalues():
+            connections[domain] = connections.get(domain, 0) + 1
+        backedOff = dict([
+            (domain, until - now)
+            for (domain, (failures, until)) in self._backoffs.iteritems()
+            if until > now])
+        return {
+            'relayed': self.relayedCount,
+            'failed': self.failedCount,
+            'throughput': throughput,
+            'waiting': len(waiting),
+            'relaying': len(self.queue.getRelayed()),
+            'oldest': oldest,
+            'connections': connections,
+            'backedOff': backedOff,
+            }
+
+
     def _cbExchange(self, address, port, factory):
         """
         Initiate a connection with a mail exchange server.
@@ -780,13 +1236,7 @@ class SmartHostSMTPRelayingManager:
         """
         log.err('Error setting up managed relay factory for ' + domain)
         log.err(failure)
-
-        def setWaiting(queue, messages):
-            map(queue.setWaiting, messages)
-
-        from twisted.internet import reactor
-        reactor.callLater(30, setWaiting, self.queue, self.managed[factory])
-        del self.managed[factory]
+        self._backOff(factory)
 
 
 
@@ -875,9 +1325,23 @@ class MXCalculator:
     @ivar fallbackToDomain: A flag indicating whether to attempt to use the
         hostname directly when no mail exchange can be found (C{True}) or
         not (C{False}).
+
+    @type maximumCacheTTL: L{int}
+    @ivar maximumCacheTTL: The maximum period in seconds for which the
+        results of a mail exchange lookup are kept, whatever the time to live
+        of its records.
+
+    @type _cache: L{dict} mapping L{bytes} to 2-L{tuple} of (0) L{float},
+        (1) 3-L{tuple} of (0) L{list} of L{RRHeader
+        <twisted.names.dns.RRHeader>}, (1) L{list} of L{RRHeader
+        <twisted.names.dns.RRHeader>}, (2) L{list} of L{RRHeader
+        <twisted.names.dns.RRHeader>}
+    @ivar _cache: The time at which they expire and the results of mail
+        exchange lookups, by domain name.
     """
     timeOutBadMX = 60 * 60  # One hour
     fallbackToDomain = True
+    maximumCacheTTL = 60 * 60  # One hour
 
     def __init__(self, resolver=None, clock=None):
         """
@@ -890,6 +1354,7 @@ class MXCalculator:
         @param clock: A reactor which will be used to schedule timeouts.
         """
         self.badMXs = {}
+        self._cache = {}
         if resolver is None:
             from twisted.names.client import createResolver
             resolver = createResolver()
@@ -939,7 +1404,7 @@ class MXCalculator:
         @return: A deferred which succeeds with the MX record for the mail
             exchange server for the domain or fails if none can be found.
         """
-        mailExchangeDeferred = self.resolver.lookupMailExchange(domain)
+        mailExchangeDeferred = self._lookupMailExchange(domain)
         mailExchangeDeferred.addCallback(self._filterRecords)
         mailExchangeDeferred.addCallback(
             self._cbMX, domain, maximumCanonicalChainLength)
@@ -947,6 +1412,41 @@ class MXCalculator:
         return mailExchangeDeferred
 
 
+    def _lookupMailExchange(self, domain):
+        """
+        Look up the mail exchange records of a domain, reusing the results of
+        a previous lookup until the time to live of its answers expires.
+
+        @type domain: L{bytes}
+        @param domain: A domain name.
+
+        @rtype: L{Deferred} which successfully fires with 3-L{tuple} of
+            (0) L{list} of L{RRHeader <twisted.names.dns.RRHeader>},
+            (1) L{list} of L{RRHeader <twisted.names.dns.RRHeader>},
+            (2) L{list} of L{RRHeader <twisted.names.dns.RRHeader>}
+        @return: A deferred which succeeds with the answer, authority and
+            additional resource records for the lookup.
+        """
+        now = self.clock.seconds()
+        try:
+            expires, records = self._cache[domain]
+        except KeyError:
+            pass
+        else:
+            if expires > now:
+                return succeed(records)
+            del self._cache[domain]
+
+        def cbLookup(records):
+            ttls = [answer.ttl for answer in records[0]]
+            if ttls:
+                ttl = min(min(ttls), self.maximumCacheTTL)
+                if ttl > 0:
+                    self._cache[domain] = (self.clock.seconds() + ttl, records)
+            return records
+        return self.resolver.lookupMailExchange(domain).addCallback(cbLookup)
+
+
     def _filterRecords(self, records):
         """
         Organize the records of a DNS response by record name.
@@ -342,7 +342,7 @@ def quoteaddr(addr):
     else:
         return '<%s>' % str(res[1])
 
-COMMAND, DATA, AUTH = 'COMMAND', 'DATA', 'AUTH'
+COMMAND, DATA, AUTH, BDAT = 'COMMAND', 'DATA', 'AUTH', 'BDAT'
 
 class AddressError(SMTPError):
     "Parse error in address"
@@ -498,6 +498,97 @@ class IMessage(Interface):
         semantics should be to discard the message
         """
 
+
+
+class IChunkedMessage(Interface):
+    """
+    Interface definition for messages that can be sent via SMTP and which
+    receive their content in blocks of bytes rather than line by line.
+    """
+
+    def dataReceived(data):
+        """
+        Handle more of the content of the message.
+
+        @type data: L{bytes}
+        @param data: Content of the message, without dot-stuffing and with
+            lines delimited by C{"\\n"}.  It does not necessarily end with a
+            complete line.
+        """
+
+    def eomReceived():
+        """
+        Handle the end of the message.
+
+        @rtype: L{Deferred}
+        @return: A deferred which fires with a string or fails with an error.
+        """
+
+    def connectionLost():
+        """
+        Handle the truncation of the message, by discarding it.
+        """
+
+
+
+class LineMessageAdapter(object):
+    """
+    An adapter which passes the content of a message received in blocks of
+    bytes line by line to an L{IMessage} provider.
+
+    @ivar message: See L{__init__}.
+
+    @type _buffer: L{bytes}
+    @ivar _buffer: The part of the last line received which is not
+        complete yet.
+    """
+    implements(IChunkedMessage)
+
+    def __init__(self, message):
+        """
+        @type message: L{IMessage} provider
+        @param message: The message to which lines are passed.
+        """
+        self.message = message
+        self._buffer = ''
+
+
+    def dataReceived(self, data):
+        """
+        Pass the complete lines of the data to the message.
+
+        @type data: L{bytes}
+        @param data: Content of the message.
+        """
+        lines = (self._buffer + data).split('\n')
+        self._buffer = lines.pop()
+        for line in lines:
+            self.message.lineReceived(line)
+
+
+    def eomReceived(self):
+        """
+        Pass the last line, if it is not complete, and the end of the message
+        to the message.
+
+        @rtype: L{Deferred}
+        @return: The result of L{IMessage.eomReceived}.
+        """
+        if self._buffer:
+            self.message.lineReceived(self._buffer)
+            self._buffer = ''
+        return self.message.eomReceived()
+
+
+    def connectionLost(self):
+        """
+        Pass the truncation of the message to the message.
+        """
+        self._buffer = ''
+        self.message.connectionLost()
+
+
+
 class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
     """
     SMTP server-side protocol.
@@ -527,6 +618,14 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
     # Cred cleanup function.
     _onLogout = None
 
+    # The result of the command being processed, if it is not available yet.
+    # Pipelined commands are not processed until it is, so that they are
+    # answered in order.
+    _pending = None
+
+    # Whether a message is being received with BDAT.
+    _chunking = False
+
     def __init__(self, delivery=None, deliveryFactory=None):
         self.mode = COMMAND
         self._from = None
@@ -563,6 +662,69 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
         self.sendLine('%3.3d %s' % (code,
                                     lastline and lastline[0] or ''))
 
+    def dataReceived(self, data):
+        """
+        Translate bytes into commands and, after I{DATA} and I{BDAT}, into
+        blocks of message content.  Commands pipelined after a command whose
+        result is not available yet are processed once it is.
+
+        @type data: L{bytes}
+        @param data: Bytes received from the client.
+        """
+        self._buffer += data
+        while self._buffer and self._pending is None:
+            if self.transport.disconnecting:
+                return
+            if self.mode is DATA:
+                self._buffer = self._messageBlockReceived(self._buffer)
+            elif self.mode is BDAT:
+                self._buffer = self._chunkReceived(self._buffer)
+            else:
+                lines = self._buffer.split(self.delimiter)
+                rest = lines.pop(-1)
+                for (i, line) in enumerate(lines):
+                    if self.transport.disconnecting:
+                        return
+                    if len(line) > self.MAX_LENGTH:
+                        self._buffer = rest
+                        return self.lineLengthExceeded(line)
+                    self.lineReceived(line)
+                    if (self._pending is not None or self.mode is DATA or
+                        self.mode is BDAT):
+                        rest = self.delimiter.join(lines[i + 1:] + [rest])
+                        break
+                else:
+                    self._buffer = rest
+                    if len(rest) > self.MAX_LENGTH:
+                        return self.lineLengthExceeded(rest)
+                    return
+                self._buffer = rest
+
+
+    def _waitFor(self, result):
+        """
+        Stop processing commands, and reading from the transport, until the
+        result of a command is available.  Input which has already been read
+        is kept until then, but no more is read, so that a client cannot make
+        the server buffer an unbounded pipeline.
+
+        @type result: L{Deferred}
+        @param result: The result of a command.
+        """
+        if result.called:
+            return
+        self._pending = result
+        self.transport.pauseProducing()
+
+        def resume(passthrough):
+            self._pending = None
+            if not self.transport.disconnecting:
+                self.transport.resumeProducing()
+                self.dataReceived('')
+            return passthrough
+        result.addBoth(resume)
+
+
     def lineReceived(self, line):
         self.resetTimeout()
         return getattr(self, 'state_' + self.mode)(line)
@@ -577,9 +739,11 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
         if parts:
             method = self.lookupMethod(parts[0]) or self.do_UNKNOWN
             if len(parts) == 2:
-                method(parts[1])
+                result = method(parts[1])
             else:
-                method('')
+                result = method('')
+            if isinstance(result, defer.Deferred):
+                self._waitFor(result)
         else:
             self.sendSyntaxError()
 
@@ -594,6 +758,7 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
             for message in self.__messages:
                 message.connectionLost()
             self.mode = COMMAND
+            self._dataBuffer = ''
             del self.__messages
         self.sendCode(500, 'Line too long')
 
@@ -630,7 +795,7 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
                          $''',re.I|re.X)
 
     def do_MAIL(self, rest):
-        if self._from:
+        if self._from or self._chunking:
             self.sendCode(503,"Only one sender per message, please")
             return
         # Clear old recipient list
@@ -648,6 +813,7 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
 
         validated = defer.maybeDeferred(self.validateFrom, self._helo, addr)
         validated.addCallbacks(self._cbFromValidate, self._ebFromValidate)
+        return validated
 
 
     def _cbFromValidate(self, from_, code=250, msg='Sender address accepted'):
@@ -690,6 +856,7 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
             self._ebToValidate,
             callbackArgs=(user,)
         )
+        return d
 
     def _cbToValidate(self, to, user=None, code=250, msg='Recipient address accepted'):
         if user is None:
@@ -719,7 +886,28 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
         if self._from is None or (not self._to):
             self.sendCode(503, 'Must have valid receiver and originator')
             return
+        error = self._beginMessage()
+        if error is not None:
+            self.sendCode(*error)
+            return
         self.mode = DATA
+        self._dataBuffer = ''
+        self.sendCode(354, 'Continue')
+
+
+    def _beginMessage(self):
+        """
+        Create the message receivers for the recipients of the current
+        transaction and pass them the I{Received} header.
+
+        Message receivers which only provide L{IMessage} are adapted to
+        L{IChunkedMessage} with L{LineMessageAdapter}.
+
+        @rtype: L{NoneType <types.NoneType>} or 2-L{tuple} of (0) L{int},
+            (1) L{bytes}
+        @return: C{None}, or the code and the message of the reply to send if
+            a message receiver could not be created.
+        """
         helo, origin = self._helo, self._from
         recipients = self._to
 
@@ -732,24 +920,23 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
             try:
                 msg = msgFunc()
                 rcvdhdr = self.receivedHeader(helo, origin, [user])
-                if rcvdhdr:
-                    msg.lineReceived(rcvdhdr)
+                if IChunkedMessage.providedBy(msg):
+                    if rcvdhdr:
+                        msg.dataReceived(rcvdhdr + '\n')
+                else:
+                    if rcvdhdr:
+                        msg.lineReceived(rcvdhdr)
+                    msg = LineMessageAdapter(msg)
                 msgs.append(msg)
             except SMTPServerError, e:
-                self.sendCode(e.code, e.resp)
-                self.mode = COMMAND
                 self._disconnect(msgs)
-                return
+                return (e.code, e.resp)
             except:
                 log.err()
-                self.sendCode(550, "Internal server error")
-                self.mode = COMMAND
                 self._disconnect(msgs)
-                return
+                return (550, "Internal server error")
         self.__messages = msgs
-
-        self.__inheader = self.__inbody = 0
-        self.sendCode(354, 'Continue')
+        self._firstLine = ''
 
         if self.noisy:
             fmt = 'Receiving message for delivery: from=%s to=%s'
@@ -760,7 +947,7 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
         # Ideally, if we (rather than the other side) lose the connection,
         # we should be able to tell the other side that we are going away.
         # RFC-2821 requires that we try.
-        if self.mode is DATA:
+        if self.mode is DATA or self._chunking:
             try:
                 for message in self.__messages:
                     try:
@@ -773,57 +960,202 @@ class SMTP(basic.LineOnlyReceiver, policies.TimeoutMixin):
         if self._onLogout:
             self._onLogout()
             self._onLogout = None
+        self._buffer = ''
         self.setTimeout(None)
 
     def do_RSET(self, rest):
         self._from = None
         self._to = []
+        if self._chunking:
+            self._chunking = False
+            self._disconnect(self.__messages)
+            del self.__messages
         self.sendCode(250, 'I remember nothing.')
 
     def dataLineReceived(self, line):
-        if line[:1] == '.':
-            if line == '.':
-                self.mode = COMMAND
-                if self.datafailed:
-                    self.sendCode(self.datafailed.code,
-                                  self.datafailed.resp)
-                    return
-                if not self.__messages:
-                    self._messageHandled("thrown away")
-                    return
-                defer.DeferredList([
-                    m.eomReceived() for m in self.__messages
-                ], consumeErrors=True).addCallback(self._messageHandled
-                                                   )
-                del self.__messages
-                return
-            line = line[1:]
+        """
+        Handle a line of a message sent with I{DATA}.
+
+        @type line: L{bytes}
+        @param line: A line, with dot-stuffing and without its delimiter.
+        """
+        rest = self._messageBlockReceived(line + self.delimiter)
+        if rest:
+            self.dataReceived(rest)
+    state_DATA = dataLineReceived
+
+
+    def _messageBlockReceived(self, data):
+        """
+        Handle a block of a message sent with I{DATA}, undoing the
+        dot-stuffing of all of its complete lines at once.
+
+        The last line of the block is kept until it is complete; it is an
+        error for it to be longer than C{MAX_LENGTH}.
+
+        @type data: L{bytes}
+        @param data: Bytes received from the client.
+
+        @rtype: L{bytes}
+        @return: The bytes received after the end of the message, if any.
+        """
+        # The block starts at the beginning of a line, as the bytes
+        # following the last line delimiter are kept in _dataBuffer.  A
+        # delimiter is prepended so that dots at the beginning of any line
+        # of it can be found by looking for delimiters followed by dots.
+        data = '\r\n' + self._dataBuffer + data
+        end = data.find('\r\n.\r\n')
+        if end == -1:
+            split = data.rfind('\r\n') + 2
+            self._dataBuffer = data[split:]
+        else:
+            split = end + 2
+            self._dataBuffer = ''
+        block = data[:split].replace('\r\n.', '\r\n')[2:]
+        if block:
+            self._messageData(block.replace('\r\n', '\n'), False)
+        if end == -1:
+            if len(self._dataBuffer) > self.MAX_LENGTH:
+                self.lineLengthExceeded(self._dataBuffer)
+            return ''
+        self._endOfMessage()
+        return data[end + 5:]
+
+
+    def _beginChunk(self, size, last):
+        """
+        Begin receiving a chunk of a message sent with I{BDAT}.
+
+        @type size: L{int}
+        @param size: The number of bytes in the chunk.
+
+        @type last: L{bool}
+        @param last: Whether the chunk is the last one of the message.
+        """
+        self._chunkSize = self._chunkRemaining = size
+        self._chunkLast = last
+        self._chunkError = None
+        if not self._chunking:
+            if self._from is None or (not self._to):
+                self._chunkError = (
+                    503, 'Must have valid receiver and originator')
+            else:
+                self._chunkError = self._beginMessage()
+                if self._chunkError is None:
+                    self._chunking = True
+                    self._carriageReturn = ''
+        self.mode = BDAT
+        if not size:
+            self._endChunk()
+
+
+    def _chunkReceived(self, data):
+        """
+        Handle bytes of a chunk of a message sent with I{BDAT}.
+
+        @type data: L{bytes}
+        @param data: Bytes received from the client.
+
+        @rtype: L{bytes}
+        @return: The bytes received after the end of the chunk, if any.
+        """
+        chunk = data[:self._chunkRemaining]
+        rest = data[self._chunkRemaining:]
+        self._chunkRemaining -= len(chunk)
+        if self._chunkError is None:
+            # Keep a trailing carriage return until it is known whether it
+            # is part of a line delimiter.
+            chunk = self._carriageReturn + chunk
+            if chunk[-1:] == '\r':
+                chunk = chunk[:-1]
+                self._carriageReturn = '\r'
+            else:
+                self._carriageReturn = ''
+            if chunk:
+                self._messageData(chunk.replace('\r\n', '\n'), False)
+        if not self._chunkRemaining:
+            self._endChunk()
+        return rest
 
+
+    def _endChunk(self):
+        """
+        Reply to a I{BDAT} command once its chunk has been received, and
+        handle the end of the message if it was the last chunk.
+        """
+        self.mode = COMMAND
+        if self._chunkError is not None:
+            self.sendCode(*self._chunkError)
+            return
+        if self.datafailed or self._chunkLast:
+            self._chunking = False
+            if self._carriageReturn:
+                self._messageData(self._carriageReturn, True)
+            self._endOfMessage()
+        else:
+            self.sendCode(250, '%d octets received' % (self._chunkSize,))
+
+
+    def _messageData(self, data, final):
+        """
+        Pass content of the current message to its receivers, separating the
+        generated I{Received} header from the content with an empty line if
+        the message has no header.
+
+        @type data: L{bytes}
+        @param data: Content of the message, without dot-stuffing and with
+            lines delimited by C{"\\n"}.
+
+        @type final: L{bool}
+        @param final: Whether the data is the end of the message.
+        """
         if self.datafailed:
             return
+        if self._firstLine is not None:
+            data = self._firstLine + data
+            end = data.find('\n')
+            if end == -1 and not final:
+                self._firstLine = data
+                return
+            self._firstLine = None
+            if end == -1:
+                line = data
+            else:
+                line = data[:end]
+            if line and ':' not in line:
+                data = '\n' + data
 
         try:
-            # Add a blank line between the generated Received:-header
-            # and the message body if the message comes in without any
-            # headers
-            if not self.__inheader and not self.__inbody:
-                if ':' in line:
-                    self.__inheader = 1
-                elif line:
-                    for message in self.__messages:
-                        message.lineReceived('')
-                    self.__inbody = 1
-
-            if not line:
-                self.__inbody = 1
-
             for message in self.__messages:
-                message.lineReceived(line)
+                message.dataReceived(data)
         except SMTPServerError, e:
             self.datafailed = e
             for message in self.__messages:
                 message.connectionLost()
-    state_DATA = dataLineReceived
+
+
+    def _endOfMessage(self):
+        """
+        Pass the end of the current message to its receivers and reply once
+        they have all handled it.
+        """
+        self.mode = COMMAND
+        if self._firstLine:
+            self._messageData('', True)
+        if self.datafailed:
+            del self.__messages
+            self.sendCode(self.datafailed.code,
+                          self.datafailed.resp)
+            return
+        if not self.__messages:
+            self._messageHandled("thrown away")
+            return
+        d = defer.DeferredList([
+            m.eomReceived() for m in self.__messages
+        ], consumeErrors=True).addCallback(self._messageHandled
+                                           )
+        del self.__messages
+        self._waitFor(d)
 
     def _messageHandled(self, resultList):
         failures = 0
@@ -999,6 +1331,9 @@ class SMTPClient(basic.LineReceiver, policies.TimeoutMixin):
     # None, perform no timeout checking.
     timeout = None
 
+    # Whether the next chunk of the message being sent starts a line.
+    _lineStart = True
+
     def __init__(self, identity, logsize=10):
         self.identity = identity or ''
         self.toAddressesResult = []
@@ -1123,6 +1458,7 @@ class SMTPClient(basic.LineReceiver, policies.TimeoutMixin):
             self.sendLine('RCPT TO:%s' % quoteaddr(self.lastAddress))
 
     def smtpState_data(self, code, resp):
+        self._lineStart = True
         s = basic.FileSender()
         d = s.beginFileTransfer(
             self.getMailData(), self.transport, self.transformChunk)
@@ -1156,7 +1492,11 @@ class SMTPClient(basic.LineReceiver, policies.TimeoutMixin):
         being made sending the message body, the client will not time out.
         """
         self.resetTimeout()
-        return chunk.replace('\n', '\r\n').replace('\r\n.', '\r\n..')
+        chunk = chunk.replace('\n', '\r\n').replace('\r\n.', '\r\n..')
+        if self._lineStart and chunk[:1] == '.':
+            chunk = '.' + chunk
+        self._lineStart = chunk[-1:] == '\n'
+        return chunk
 
     def finishedFileTransfer(self, lastsent):
         if lastsent != '\n':
@@ -1238,6 +1578,10 @@ class ESMTPClient(SMTPClient):
     # ClientContextFactory to use for STARTTLS
     context = None
 
+    # The ESMTP extensions offered by the server, as parsed by
+    # esmtpState_serverConfig.
+    _extensions = {}
+
     def __init__(self, secret, contextFactory=None, *args, **kw):
         SMTPClient.__init__(self, *args, **kw)
         self.authenticators = []
@@ -1344,6 +1688,7 @@ class ESMTPClient(SMTPClient):
             else:
                 items[e[0]] = None
 
+        self._extensions = items
         self.tryTLS(code, resp, items)
 
 
@@ -1496,6 +1841,178 @@ class ESMTPClient(SMTPClient):
             self._authResponse(self._authinfo, resp)
 
 
+    def smtpState_from(self, code, resp):
+        """
+        Begin a mail transaction.
+
+        If the server supports the I{PIPELINING} extension of RFC 2920, send
+        the I{MAIL}, I{RCPT} and, unless the server supports the I{CHUNKING}
+        extension of RFC 3030, I{DATA} commands without waiting for their
+        replies.
+        """
+        if 'PIPELINING' not in self._extensions:
+            return SMTPClient.smtpState_from(self, code, resp)
+
+        self._from = self.getMailFrom()
+        self._failresponse = self.smtpTransferFailed
+        if self._from is None:
+            # All messages have been sent, disconnect
+            self._disconnectFromServer()
+            return
+
+        recipients = list(self.getMailTo())
+        self.toAddressesResult = []
+        self.successAddresses = []
+        self._pipeline = [self._pipelinedFrom]
+        self.sendLine('MAIL FROM:%s' % quoteaddr(self._from))
+        for address in recipients:
+            self._pipeline.append(self._pipelinedTo(address))
+            self.sendLine('RCPT TO:%s' % quoteaddr(address))
+        self._dataReply = None
+        if recipients and 'CHUNKING' not in self._extensions:
+            self._pipeline.append(self._pipelinedData)
+            self.sendLine('DATA')
+        self._expected = xrange(0, 1000)
+        self._okresponse = self.esmtpState_pipelined
+
+
+    def esmtpState_pipelined(self, code, resp):
+        """
+        Handle the reply to a pipelined command and, once all of them have
+        been replied to, send the message if the transaction was accepted.
+        """
+        self._pipeline.pop(0)(code, resp)
+        if self._pipeline:
+            return
+
+        if self._dataReply is not None and self._dataReply[0] == 354:
+            if self._mailReply[0] == 250 and self.successAddresses:
+                return self.smtpState_data(*self._dataReply)
+            # The server accepted the message although the transaction
+            # failed.  End the message, and report the failure once it has
+            # been replied to.
+            self.sendLine('.')
+            self._dataReply = None
+            self._pipeline = [lambda code, resp: None]
+            return
+
+        if self._mailReply[0] != 250:
+            return self.smtpTransferFailed(*self._mailReply)
+        if not self.successAddresses:
+            if self.toAddressesResult:
+                code = self.toAddressesResult[-1][1]
+            return self.smtpState_msgSent(code, 'No recipients accepted')
+        if self._dataReply is not None:
+            return self.smtpTransferFailed(*self._dataReply)
+        return self.esmtpState_chunking(code, resp)
+
+
+    def _pipelinedFrom(self, code, resp):
+        """
+        Record the reply to a pipelined I{MAIL} command.
+        """
+        self._mailReply = (code, resp)
+
+
+    def _pipelinedTo(self, address):
+        """
+        Get a function which records the reply to a pipelined I{RCPT}
+        command.
+
+        @param address: The address of the recipient.
+        """
+        def recordReply(code, resp):
+            self.toAddressesResult.append((address, code, resp))
+            if code in SUCCESS:
+                self.successAddresses.append(address)
+        return recordReply
+
+
+    def _pipelinedData(self, code, resp):
+        """
+        Record the reply to a pipelined I{DATA} command.
+        """
+        self._dataReply = (code, resp)
+
+
+    def esmtpState_chunking(self, code, resp):
+        """
+        Send the message in chunks with I{BDAT} commands, without waiting for
+        their replies.
+        """
+        self._chunkFailure = None
+        self._pipeline = []
+        s = basic.FileSender()
+        d = s.beginFileTransfer(
+            self.getMailData(), self.transport, self.transformBDATChunk)
+        def ebTransfer(err):
+            self.sendError(err.value)
+        d.addCallbacks(self.finishedBDATTransfer, ebTransfer)
+        self._expected = xrange(0, 1000)
+        self._okresponse = self.esmtpState_chunkSent
+
+
+    def transformBDATChunk(self, chunk):
+        """
+        Perform the necessary local to network newline conversion and prefix
+        a chunk of the message with a I{BDAT} command.
+
+        This method also resets the idle timeout so that as long as process is
+        being made sending the message body, the client will not time out.
+        """
+        self.resetTimeout()
+        chunk = chunk.replace('\n', '\r\n')
+        return self._bdat(chunk, False) + chunk
+
+
+    def finishedBDATTransfer(self, lastsent):
+        """
+        Send the last chunk of the message, which ends its last line.
+        """
+        if lastsent != '\n':
+            chunk = '\r\n'
+        else:
+            chunk = ''
+        self.transport.write(self._bdat(chunk, True) + chunk)
+
+
+    def _bdat(self, chunk, last):
+        """
+        Format a I{BDAT} command and expect a reply to it.
+
+        @type chunk: L{bytes}
+        @param chunk: The chunk of the message the command is for.
+
+        @type last: L{bool}
+        @param last: Whether it is the last chunk of the message.
+
+        @rtype: L{bytes}
+        @return: The command, with its line delimiter.
+        """
+        line = 'BDAT %d' % (len(chunk),)
+        if last:
+            line += ' LAST'
+        if self.debug:
+            self.log.append('>>> ' + line)
+        self._pipeline.append(last)
+        return line + self.delimiter
+
+
+    def esmtpState_chunkSent(self, code, resp):
+        """
+        Handle the reply to a I{BDAT} command, and the result of the
+        transaction once the last one has been replied to.
+        """
+        last = self._pipeline.pop(0)
+        if code != 250 and self._chunkFailure is None:
+            self._chunkFailure = (code, resp)
+        if last:
+            if self._chunkFailure is not None:
+                code, resp = self._chunkFailure
+            return self.smtpState_msgSent(code, resp)
+
+
+
 
 class ESMTP(SMTP):
 
@@ -1524,7 +2041,9 @@ class ESMTP(SMTP):
 
 
     def extensions(self):
-        ext = {'AUTH': self.challengers.keys()}
+        ext = {'AUTH': self.challengers.keys(),
+               'PIPELINING': None,
+               'CHUNKING': None}
         if self.canStartTLS and not self.startedTLS:
             ext['STARTTLS'] = None
         return ext
@@ -1569,6 +2088,22 @@ class ESMTP(SMTP):
         else:
             self.sendCode(454, 'TLS not available')
 
+    def ext_BDAT(self, rest):
+        """
+        Receive a chunk of a message, as defined by RFC 3030.
+
+        @type rest: L{bytes}
+        @param rest: The size of the chunk, followed by C{"LAST"} if it is
+            the last chunk of the message.
+        """
+        parts = rest.split()
+        if (not 1 <= len(parts) <= 2 or not parts[0].isdigit() or
+            parts[1:] not in ([], ['LAST'])):
+            self.sendCode(501, 'Syntax error')
+            return
+        self._beginChunk(int(parts[0]), len(parts) == 2)
+
+
     def ext_AUTH(self, rest):
         if self.authenticated:
             self.sendCode(503, 'Already authenticated')
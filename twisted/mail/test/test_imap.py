@@ -283,6 +283,88 @@ class MessageProducerTestCase(unittest.TestCase):
         return d.addCallback(cbProduced)
 
 
+    def test_noCopy(self):
+        """
+        L{imap4.MessageProducer} produces the body files of the parts of a
+        message to its consumer without first copying them into a temporary
+        file.
+        """
+        def temporaryFile():
+            self.fail("Message copied to a temporary file")
+        self.patch(imap4.tempfile, 'TemporaryFile', temporaryFile)
+
+        headers = util.OrderedDict()
+        headers['content-type'] = 'multipart/mixed; boundary="xyz"'
+        innerHeaders = util.OrderedDict()
+        innerHeaders['content-type'] = 'text/plain'
+        msg = FakeyMessage(headers, (), None, '', 123, [
+            FakeyMessage(innerHeaders, (), None, 'first', None, None),
+            FakeyMessage(innerHeaders, (), None, 'second', None, None)])
+
+        c = BufferingConsumer()
+        d = imap4.MessageProducer(msg).beginProducing(c)
+
+        def cbProduced(result):
+            self.assertEqual(
+                ''.join(c.buffer),
+                '{145}\r\n'
+                'Content-Type: multipart/mixed; boundary="xyz"\r\n'
+                '\r\n'
+                '\r\n--xyz\r\n'
+                'Content-Type: text/plain\r\n'
+                '\r\n'
+                'first'
+                '\r\n--xyz\r\n'
+                'Content-Type: text/plain\r\n'
+                '\r\n'
+                'second'
+                '\r\n--xyz--\r\n')
+        return d.addCallback(cbProduced)
+
+
+    def test_unseekableBody(self):
+        """
+        If the body file of a part of a message cannot seek, so that its size
+        is not known before it is read, L{imap4.MessageProducer} copies the
+        message into a temporary file before producing it.
+        """
+        class UnseekableFile(object):
+            def __init__(self, data):
+                self.read = StringIO(data).read
+
+        class UnseekableMessage(FakeyMessage):
+            def getBodyFile(self):
+                return UnseekableFile(self._body)
+
+        innerHeaders = util.OrderedDict()
+        innerHeaders['content-type'] = 'text/plain'
+        headers = util.OrderedDict()
+        headers['content-type'] = 'multipart/mixed; boundary="xyz"'
+        msg = FakeyMessage(headers, (), None, '', 123, [
+            FakeyMessage(innerHeaders, (), None, 'first', None, None),
+            UnseekableMessage(innerHeaders, (), None, 'second', None, None)])
+
+        c = BufferingConsumer()
+        d = imap4.MessageProducer(msg).beginProducing(c)
+
+        def cbProduced(result):
+            self.assertEqual(
+                ''.join(c.buffer),
+                '{145}\r\n'
+                'Content-Type: multipart/mixed; boundary="xyz"\r\n'
+                '\r\n'
+                '\r\n--xyz\r\n'
+                'Content-Type: text/plain\r\n'
+                '\r\n'
+                'first'
+                '\r\n--xyz\r\n'
+                'Content-Type: text/plain\r\n'
+                '\r\n'
+                'second'
+                '\r\n--xyz--\r\n')
+        return d.addCallback(cbProduced)
+
+
 
 class IMAP4HelperTestCase(unittest.TestCase):
     """
@@ -4414,6 +4496,202 @@ class DefaultSearchTestCase(IMAP4HelperMixin, unittest.TestCase):
 
 
 
+class IndexedSearchTestCase(DefaultSearchTestCase):
+    """
+    Run the tests of L{DefaultSearchTestCase} against a mailbox providing
+    L{imap4.IIndexedMailbox}, whose messages the server searches through its
+    index.
+    """
+    implements(imap4.IIndexedMailbox)
+
+    def getMessageIndex(self):
+        """
+        Pretend to be an indexed mailbox.
+        """
+        index = imap4.MessageIndex()
+        for msg in self.msgObjs:
+            index.add(msg)
+        return index
+
+
+    def fetch(self, messages, uid):
+        """
+        The messages are only searched through the index.
+        """
+        self.fail("Messages fetched for searching")
+
+
+
+class MessageIndexTests(unittest.TestCase):
+    """
+    Tests for L{imap4.MessageIndex}.
+    """
+    def setUp(self):
+        self.msgObjs = [
+            FakeyMessage({'from': 'Alice <alice@example.com>',
+                          'subject': 'Lunch',
+                          'date': 'Mon, 13 Dec 2009 21:25:10 GMT',
+                          'x-mailer': 'Twisted'},
+                         ['\\Seen', '\\Answered'],
+                         'Mon, 14 Dec 2009 08:00:00 GMT', 'tuesday?', 10,
+                         None),
+            FakeyMessage({'from': 'bob@example.com',
+                          'subject': 'Re: lunch',
+                          'date': 'Tue, 15 Dec 2009 10:00:00 GMT'},
+                         ['\\Recent'], 'Tue, 15 Dec 2009 10:00:01 GMT',
+                         'sure, at noon', 20, None),
+            FakeyMessage({'from': 'carol@example.org',
+                          'subject': 'Minutes'},
+                         ['\\Recent', '\\Seen', '\\Flagged'],
+                         'Wed, 16 Dec 2009 09:00:00 GMT',
+                         'the minutes of the meeting', 30, None),
+            ]
+        self.index = imap4.MessageIndex()
+        for msg in self.msgObjs:
+            self.index.add(msg)
+
+
+    def search(self, query, uid=False):
+        """
+        Search the index with a query string.
+        """
+        return self.index.search(imap4.parseNestedParens(query), uid)
+
+
+    def test_flags(self):
+        """
+        Flag criteria match the messages with or without a flag.
+        """
+        self.assertEqual(self.search('SEEN'), [1, 3])
+        self.assertEqual(self.search('UNSEEN'), [2])
+        self.assertEqual(self.search('ANSWERED'), [1])
+        self.assertEqual(self.search('FLAGGED RECENT'), [3])
+        self.assertEqual(self.search('OLD'), [1])
+        self.assertEqual(self.search('NEW'), [2])
+        self.assertEqual(self.search('DELETED'), [])
+        self.assertEqual(self.search('UNDELETED'), [1, 2, 3])
+
+
+    def test_setFlags(self):
+        """
+        L{imap4.MessageIndex.setFlags} changes the flags matched by searches.
+        """
+        self.index.setFlags(20, ['\\Seen', '\\Deleted'])
+        self.assertEqual(self.search('UNSEEN'), [])
+        self.assertEqual(self.search('DELETED'), [2])
+        self.assertEqual(self.search('RECENT'), [3])
+
+
+    def test_headers(self):
+        """
+        Header criteria match the messages with a header containing a string,
+        ignoring case, whether or not the header is kept in the index.
+        """
+        self.assertEqual(self.search('FROM example.com'), [1, 2])
+        self.assertEqual(self.search('SUBJECT LUNCH'), [1, 2])
+        self.assertEqual(self.search('HEADER Subject minutes'), [3])
+        self.assertEqual(self.search('HEADER X-Mailer twisted'), [1])
+        self.assertEqual(self.search('TO alice'), [])
+
+
+    def test_body(self):
+        """
+        I{BODY} and I{TEXT} match the messages with a body containing a
+        string.
+        """
+        self.assertEqual(self.search('BODY noon'), [2])
+        self.assertEqual(self.search('TEXT MINUTES'), [3])
+
+
+    def test_dates(self):
+        """
+        Date criteria compare the internal date of messages, and the I{SENT}
+        ones their I{Date} header.
+        """
+        self.assertEqual(self.search('BEFORE 15-Dec-2009'), [1])
+        self.assertEqual(self.search('SINCE 15-Dec-2009'), [2, 3])
+        self.assertEqual(self.search('SENTON 13-Dec-2009'), [1])
+        self.assertEqual(self.search('SENTSINCE 14-Dec-2009'), [2])
+        self.assertEqual(self.search('SENTBEFORE 14-Dec-2009'), [1, 3])
+
+
+    def test_sizes(self):
+        """
+        I{LARGER} and I{SMALLER} compare the size of messages.
+        """
+        self.assertEqual(self.search('LARGER 10'), [2, 3])
+        self.assertEqual(self.search('SMALLER 13'), [1])
+
+
+    def test_combined(self):
+        """
+        Criteria are conjoined, and combined by I{OR}, I{NOT} and
+        parentheses.
+        """
+        self.assertEqual(self.search('OR FLAGGED ANSWERED'), [1, 3])
+        self.assertEqual(self.search('NOT (SEEN FROM alice)'), [2, 3])
+        self.assertEqual(self.search('2:* NOT UID 30'), [2])
+
+
+    def test_uid(self):
+        """
+        L{imap4.MessageIndex.search} returns UIDs instead of sequence numbers
+        when asked to.
+        """
+        self.assertEqual(self.search('SEEN', uid=True), [10, 30])
+        self.assertEqual(self.search('UID 15:*', uid=True), [20, 30])
+
+
+    def test_remove(self):
+        """
+        L{imap4.MessageIndex.remove} removes a message from the index,
+        renumbering the following messages.
+        """
+        self.index.remove(10)
+        self.assertEqual(len(self.index), 2)
+        self.assertEqual(self.search('RECENT'), [1, 2])
+        self.assertEqual(self.search('FROM example.com'), [1])
+
+
+    def test_invalid(self):
+        """
+        L{imap4.MessageIndex.search} raises L{imap4.IllegalQueryError} for an
+        unknown criterion.
+        """
+        self.assertRaises(imap4.IllegalQueryError, self.search, 'FOO')
+
+
+    def test_envelope(self):
+        """
+        L{imap4.MessageIndex.getEnvelope} computes the envelope of an indexed
+        message once.
+        """
+        msg = self.msgObjs[0]
+        envelope = self.index.getEnvelope(msg)
+        self.assertEqual(envelope, imap4.getEnvelope(msg))
+        msg.headers = {}
+        self.assertIdentical(self.index.getEnvelope(msg), envelope)
+
+        self.index.remove(10)
+        self.assertNotEqual(self.index.getEnvelope(msg), envelope)
+
+
+    def test_bodyStructure(self):
+        """
+        L{imap4.MessageIndex.getBodyStructure} computes the body structure of
+        an indexed message once, with or without extension data.
+        """
+        msg = self.msgObjs[1]
+        body = self.index.getBodyStructure(msg)
+        extended = self.index.getBodyStructure(msg, True)
+        self.assertEqual(body, imap4.getBodyStructure(msg))
+        self.assertEqual(extended, imap4.getBodyStructure(msg, True))
+        msg.headers = {'content-type': 'text/html'}
+        self.assertIdentical(self.index.getBodyStructure(msg), body)
+        self.assertIdentical(self.index.getBodyStructure(msg, True), extended)
+
+
+
 class FetchSearchStoreTestCase(unittest.TestCase, IMAP4HelperMixin):
     implements(imap4.ISearchableMailbox)
 
@@ -5022,3 +5300,46 @@ class IMAP4ServerFetchTestCase(unittest.TestCase):
         self.assertEqual(self.transport.value(), expected)
         self.transport.clear()
         self.server.connectionLost(error.ConnectionDone("Connection closed"))
+
+
+    def test_fetchFromIndex(self):
+        """
+        The ENVELOPE and BODYSTRUCTURE of the messages of a mailbox providing
+        L{imap4.IIndexedMailbox} are taken from its index.
+        """
+        msg = FakeyMessage({'subject': 'indexed'}, (), '', 'body', 10, None)
+        index = imap4.MessageIndex()
+        index.add(msg)
+        index.getEnvelope(msg)
+        index.getBodyStructure(msg, True)
+        msg.headers = {'subject': 'changed', 'content-type': 'text/html'}
+
+        class IndexedMailbox(object):
+            implements(imap4.IIndexedMailbox)
+
+            def getMessageIndex(self):
+                return index
+
+            def fetch(self, messages, uid):
+                return [(1, msg)]
+
+        def synchronous(iterator):
+            for _ in iterator:
+                pass
+            return defer.succeed(None)
+
+        self.server.connectionLost(error.ConnectionDone("Connection closed"))
+        server = imap4.IMAP4Server(scheduler=synchronous)
+        server.state = 'select'
+        server.mbox = IndexedMailbox()
+        server.makeConnection(self.transport)
+        self.addCleanup(
+            server.connectionLost, error.ConnectionDone("Connection closed"))
+        self.transport.clear()
+        server.dataReceived("0001 FETCH 1 (ENVELOPE BODYSTRUCTURE)\r\n")
+        self.assertEqual(
+            self.transport.value(),
+            '* 1 FETCH (ENVELOPE (NIL "indexed" ((NIL NIL NIL)) '
+            '((NIL NIL NIL)) NIL NIL NIL NIL NIL NIL) '
+            'BODYSTRUCTURE (NIL NIL NIL NIL NIL NIL 4 NIL NIL NIL NIL))\r\n'
+            '0001 OK FETCH completed\r\n')
@@ -573,6 +573,296 @@ class MaildirTestCase(unittest.TestCase):
 
 
 
+class StubNotifier(object):
+    """
+    A stand-in for L{twisted.internet.inotify.INotify} which records the
+    watched paths.
+
+    @ivar watched: A list of the paths, masks and callbacks passed to
+        L{watch}.
+    """
+    def __init__(self):
+        self.watched = []
+
+
+    def watch(self, path, mask, autoAdd=False, callbacks=None, recursive=False):
+        self.watched.append((path, mask, callbacks))
+
+
+
+class MaildirIndexTests(unittest.TestCase):
+    """
+    Tests for L{twisted.mail.maildir._MaildirIndex}.
+    """
+    def setUp(self):
+        self.d = self.mktemp()
+        mail.maildir.initializeMaildir(self.d)
+
+
+    def deliver(self, sub, contents):
+        """
+        Write a message into a subdirectory of the mailbox.
+
+        @return: The file name of the message.
+        """
+        name = mail.maildir._generateMaildirName()
+        fObj = open(os.path.join(self.d, sub, name), 'w')
+        fObj.write(contents)
+        fObj.close()
+        return name
+
+
+    def age(self):
+        """
+        Set the modification time of the subdirectories in the past, as when
+        nothing was delivered since well before the index was saved.
+        """
+        past = os.stat(self.d).st_mtime - 60
+        for sub in ('cur', 'new'):
+            os.utime(os.path.join(self.d, sub), (past, past))
+
+
+    def test_messages(self):
+        """
+        L{_MaildirIndex.messages} returns the path, size and unique
+        identifier of the messages of I{cur/} and I{new/}, sorted by file
+        name.
+        """
+        second = self.deliver('new', 'xx')
+        first = self.deliver('cur', 'x')
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        firstPath = os.path.join(self.d, 'cur', first)
+        secondPath = os.path.join(self.d, 'new', second)
+        self.assertEqual(index.messages(), (
+            [secondPath, firstPath],
+            {firstPath: 1, secondPath: 2},
+            {firstPath: md5(first).hexdigest(),
+             secondPath: md5(second).hexdigest()}))
+
+
+    def test_saved(self):
+        """
+        The index saved by L{_MaildirIndex.save} is loaded by a new
+        L{_MaildirIndex}, which does not list subdirectories which did not
+        change since they were listed.
+        """
+        self.deliver('new', 'xxx')
+        self.age()
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        self.assertTrue(index.changed)
+        index.save()
+        self.assertFalse(index.changed)
+
+        listed = []
+        self.patch(os, 'listdir', listed.append)
+        loaded = mail.maildir._MaildirIndex(self.d)
+        loaded.refresh()
+        self.assertEqual(listed, [])
+        self.assertEqual(loaded.messages(), index.messages())
+        self.assertFalse(loaded.changed)
+
+
+    def test_tampered(self):
+        """
+        A saved index naming a file which is not a plain file name of a
+        subdirectory, or with an identifier which could not have been
+        generated, is ignored and the subdirectories are listed again.
+        """
+        name = self.deliver('cur', 'x')
+        secret = os.path.join(os.path.dirname(os.path.abspath(self.d)),
+                              'secret')
+        open(secret, 'w').close()
+        self.age()
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        index.save()
+        indexPath = os.path.join(self.d, index.fileName)
+        saved = open(indexPath).read()
+
+        for entry in ['cur\t../../secret\t0\tx\n',
+                      'cur\t%s\t0\tx\n' % (secret,),
+                      'cur\t..\t0\tx\n',
+                      'cur\t.hidden\t0\tx\n',
+                      'new\tvalid\t0\tx\r\n']:
+            indexFile = open(indexPath, 'w')
+            indexFile.write(saved + entry)
+            indexFile.close()
+            loaded = mail.maildir._MaildirIndex(self.d)
+            loaded.refresh()
+            self.assertEqual(loaded.messages()[0],
+                             [os.path.join(self.d, 'cur', name)])
+            self.assertTrue(loaded.changed)
+
+
+    def test_recentModification(self):
+        """
+        A subdirectory modified within a second of being listed is listed
+        again, as later deliveries in the same second would not have changed
+        its modification time.
+        """
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        index.save()
+        name = self.deliver('new', 'x')
+        mtime = index._checked['new'][0]
+        os.utime(os.path.join(self.d, 'new'), (mtime, mtime))
+
+        loaded = mail.maildir._MaildirIndex(self.d)
+        loaded.refresh()
+        self.assertEqual(loaded.messages()[0],
+                         [os.path.join(self.d, 'new', name)])
+
+
+    def test_incremental(self):
+        """
+        When a subdirectory changed, only the messages which appeared in it
+        are examined, and the messages which disappeared from it are dropped.
+        """
+        kept = self.deliver('cur', 'x')
+        removed = self.deliver('cur', 'xx')
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        index.save()
+
+        os.remove(os.path.join(self.d, 'cur', removed))
+        added = self.deliver('cur', 'xxx')
+        os.utime(os.path.join(self.d, 'cur'), None)
+        examined = []
+        stat = os.stat
+        def recordingStat(path):
+            examined.append(os.path.basename(path))
+            return stat(path)
+        self.patch(os, 'stat', recordingStat)
+        index.refresh()
+
+        self.assertNotIn(kept, examined)
+        self.assertIn(added, examined)
+        keptPath = os.path.join(self.d, 'cur', kept)
+        addedPath = os.path.join(self.d, 'cur', added)
+        paths, sizes, uidls = index.messages()
+        self.assertEqual(paths, [keptPath, addedPath])
+        self.assertEqual(sizes, {keptPath: 1, addedPath: 3})
+
+
+    def test_invalid(self):
+        """
+        An invalid saved index is ignored and the mailbox listed again.
+        """
+        name = self.deliver('new', 'x')
+        fObj = open(os.path.join(self.d, 'twisted-maildir-index'), 'w')
+        fObj.write('twisted-maildir-index 1\ncur garbage\n')
+        fObj.close()
+        index = mail.maildir._MaildirIndex(self.d)
+        index.refresh()
+        self.assertEqual(index.messages()[0],
+                         [os.path.join(self.d, 'new', name)])
+
+
+    def test_watch(self):
+        """
+        A watched index is updated from the inotify events of I{cur/} and
+        I{new/} instead of listing them again.
+        """
+        from twisted.internet import inotify
+        notifier = StubNotifier()
+        index = mail.maildir._MaildirIndex(self.d)
+        index.watch(notifier)
+        self.assertEqual(
+            sorted([path.basename() for (path, mask, callbacks)
+                    in notifier.watched]),
+            ['cur', 'new'])
+
+        name = self.deliver('new', 'xx')
+        path = FilePath(self.d).child('new').child(name)
+        index._notified(None, path, inotify.IN_MOVED_TO)
+        self.patch(os, 'listdir', lambda path: self.fail("Listed " + path))
+        index.refresh()
+        messagePath = os.path.join(self.d, 'new', name)
+        self.assertEqual(
+            index.messages(),
+            ([messagePath], {messagePath: 2},
+             {messagePath: md5(name).hexdigest()}))
+
+        index._notified(None, path, inotify.IN_DELETE)
+        self.assertEqual(index.messages(), ([], {}, {}))
+        self.assertTrue(index.changed)
+
+
+    def test_watchCreated(self):
+        """
+        A message created in place rather than moved into a watched
+        subdirectory makes the next refresh list that subdirectory again, as
+        the message may not have been complete when it was created.
+        """
+        from twisted.internet import inotify
+        index = mail.maildir._MaildirIndex(self.d)
+        index.watch(StubNotifier())
+        name = self.deliver('new', 'xxx')
+        index._notified(
+            None, FilePath(self.d).child('new').child(name),
+            inotify.IN_CREATE)
+        index.refresh()
+        self.assertEqual(index.messages()[1],
+                         {os.path.join(self.d, 'new', name): 3})
+
+
+    def test_watchOverflow(self):
+        """
+        If inotify events were lost because its queue overflowed, the next
+        refresh of a watched index lists the subdirectories again.
+        """
+        from twisted.internet import inotify
+        index = mail.maildir._MaildirIndex(self.d)
+        index.watch(StubNotifier())
+        name = self.deliver('new', 'xx')
+        index._notified(
+            None, FilePath(self.d).child('new'), inotify.IN_Q_OVERFLOW)
+        index.refresh()
+        self.assertEqual(index.messages()[0],
+                         [os.path.join(self.d, 'new', name)])
+
+
+    def test_watchLost(self):
+        """
+        If the watch of a subdirectory is lost, the index is no longer kept
+        current from inotify events, and the subdirectories are listed again
+        at the next refresh.
+        """
+        from twisted.internet import inotify
+        index = mail.maildir._MaildirIndex(self.d)
+        index.watch(StubNotifier())
+        index._notified(
+            None, FilePath(self.d).child('cur'), inotify.IN_IGNORED)
+        self.assertFalse(index._watched)
+
+        name = self.deliver('new', 'xx')
+        path = FilePath(self.d).child('new').child(name)
+        index._notified(None, path, inotify.IN_DELETE)
+        index.refresh()
+        self.assertEqual(index.messages()[0],
+                         [os.path.join(self.d, 'new', name)])
+
+
+    def test_mailboxFromIndex(self):
+        """
+        L{MaildirMailbox.listMessages} and L{MaildirMailbox.getUidl} are
+        answered from the index, without examining the message files.
+        """
+        name = self.deliver('cur', 'xxxx')
+        mb = mail.maildir.MaildirMailbox(self.d)
+        self.assertTrue(
+            os.path.exists(os.path.join(self.d, 'twisted-maildir-index')))
+        def failingStat(path):
+            self.fail("Examined " + path)
+        self.patch(os, 'stat', failingStat)
+        self.assertEqual(mb.listMessages(), [4])
+        self.assertEqual(mb.listMessages(0), 4)
+        self.assertEqual(mb.getUidl(0), md5(name).hexdigest())
+
+
+
 class AbstractMaildirDomainTestCase(unittest.TestCase):
     """
     Tests for L{twisted.mail.maildir.AbstractMaildirDomain}.
@@ -661,6 +951,24 @@ class MaildirDirdbmDomainTestCase(unittest.TestCase):
         t[2]()
 
 
+    def test_requestAvatarWithNotifier(self):
+        """
+        When L{MaildirDirdbmDomain.notifier} is set, the index of a user's
+        mailbox is watched with it when first requested and reused by later
+        mailboxes of that user.
+        """
+        notifier = StubNotifier()
+        self.D.notifier = notifier
+        self.D.addUser('user', 'password')
+        first = self.D.requestAvatar('user', None, pop3.IMailbox)[1]
+        self.assertEqual(len(notifier.watched), 2)
+        second = self.D.requestAvatar('user', None, pop3.IMailbox)[1]
+        self.assertEqual(len(notifier.watched), 2)
+        self.assertEqual(first.list, second.list)
+        self.assertEqual(list(self.D._indexes),
+                         [os.path.join(self.P, 'user')])
+
+
     def test_requestAvatarId(self):
         """
         L{DirdbmDatabase.requestAvatarId} raises L{UnauthorizedLogin} if
@@ -1085,6 +1393,366 @@ class DirectoryQueueTestCase(unittest.TestCase):
                 ['header', i]
             )
 
+def queueMessage(queue, to, body='body'):
+    """
+    Add a message to a relay queue the way L{mail.relay.DomainQueuer} does.
+
+    @return: The base filename of the message.
+    """
+    envelopeFile, message = queue.createNewMessage()
+    name = os.path.basename(envelopeFile.name)[:-len('-H')]
+    pickle.dump(['sender@example.com', to], envelopeFile)
+    envelopeFile.close()
+    message.lineReceived(body)
+    message.eomReceived()
+    return name
+
+
+
+class QueueIndexTests(unittest.TestCase):
+    """
+    Tests for the index of waiting messages by destination domain of
+    L{mail.relaymanager.Queue}.
+    """
+    def setUp(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        self.queue = mail.relaymanager.Queue(directory)
+        self.queue.noisy = False
+
+
+    def test_createNewMessage(self):
+        """
+        A message created with L{Queue.createNewMessage} is waiting once it
+        has been received, without reading the directory of the queue.
+        """
+        envelopeFile, message = self.queue.createNewMessage()
+        name = os.path.basename(envelopeFile.name)[:-len('-H')]
+        pickle.dump(['sender@example.com', 'user@example.net'], envelopeFile)
+        envelopeFile.close()
+        message.lineReceived('body')
+        self.assertEqual(self.queue.getWaiting(), [])
+        message.eomReceived()
+        self.assertEqual(self.queue.getWaiting(), [name])
+        self.assertEqual(self.queue.getWaitingFor('example.net'), [name])
+
+
+    def test_waitingByDomain(self):
+        """
+        L{Queue.getWaitingDomains} returns the destination domains of the
+        waiting messages, and L{Queue.getWaitingFor} the messages waiting to
+        be relayed to one of them, up to a limit.
+        """
+        first = [queueMessage(self.queue, 'user%d@example.net' % (i,))
+                 for i in range(3)]
+        second = queueMessage(self.queue, 'User <user@example.org>')
+        self.assertEqual(sorted(self.queue.getWaitingDomains()),
+                         ['example.net', 'example.org'])
+        self.assertEqual(sorted(self.queue.getWaitingFor('example.net')),
+                         sorted(first))
+        self.assertEqual(self.queue.getWaitingFor('example.org'), [second])
+        self.assertEqual(len(self.queue.getWaitingFor('example.net', 2)), 2)
+        self.assertEqual(self.queue.getWaitingFor('example.com'), [])
+
+
+    def test_relaying(self):
+        """
+        Messages being relayed are not waiting for their domain, and are
+        again once they are set waiting.
+        """
+        first = queueMessage(self.queue, 'user@example.net')
+        second = queueMessage(self.queue, 'user@example.org')
+        self.queue.setRelaying(first)
+        self.assertEqual(self.queue.getWaitingDomains(), ['example.org'])
+        self.queue.setWaiting(first)
+        self.assertEqual(self.queue.getWaitingFor('example.net'), [first])
+        self.queue.setRelaying(second)
+        self.queue.done(second)
+        self.assertEqual(self.queue.getWaitingDomains(), ['example.net'])
+
+
+    def test_invalidDestination(self):
+        """
+        Messages with an invalid destination are waiting for the C{None}
+        domain.
+        """
+        name = queueMessage(self.queue, 'nobody')
+        self.assertEqual(self.queue.getWaitingDomains(), [None])
+        self.assertEqual(self.queue.getWaitingFor(None), [name])
+
+
+    def test_readDirectory(self):
+        """
+        L{Queue.readDirectory} indexes the messages of the directory of the
+        queue by destination domain, including those of a previous run.
+        """
+        name = queueMessage(self.queue, 'user@example.net')
+        queue = mail.relaymanager.Queue(self.queue.directory)
+        queue.noisy = False
+        self.assertEqual(queue.getWaitingFor('example.net'), [name])
+        queue.readDirectory()
+        self.assertEqual(queue.getWaitingFor('example.net'), [name])
+
+
+    def test_getQueuedTime(self):
+        """
+        L{Queue.getQueuedTime} returns the modification time of the file
+        holding the message.
+        """
+        name = queueMessage(self.queue, 'user@example.net')
+        os.utime(self.queue.getPath(name) + '-D', (1000, 1000))
+        queue = mail.relaymanager.Queue(self.queue.directory)
+        queue.noisy = False
+        self.assertEqual(queue.getQueuedTime(name), 1000)
+
+
+
+class StubMXCalculator(object):
+    """
+    A mail exchange calculator which answers with a mail exchange named after
+    the domain, unless the domain is listed in C{failing}.
+    """
+    def __init__(self):
+        self.failing = set()
+
+
+    def getMX(self, domain):
+        if domain in self.failing:
+            return defer.fail(DNSLookupError(domain))
+        return defer.succeed(Record_MX(0, 'mx.' + domain))
+
+
+
+class ConnectionRecordingManager(
+    mail.relaymanager.SmartHostSMTPRelayingManager):
+    """
+    A smart host which records the connections it would make, and the
+    relaying attempts it makes as two-tuples of their domain and the
+    L{Deferred} which fires when they are over.
+    """
+    def __init__(self, *args, **kwargs):
+        mail.relaymanager.SmartHostSMTPRelayingManager.__init__(
+            self, *args, **kwargs)
+        self.connections = []
+        self.attempts = []
+
+
+    def _relay(self, domain, msgs):
+        attempt = mail.relaymanager.SmartHostSMTPRelayingManager._relay(
+            self, domain, msgs)
+        self.attempts.append((domain, attempt))
+        return attempt
+
+
+    def _cbExchange(self, address, port, factory):
+        self.connections.append((address, factory))
+
+
+
+class SmartHostRelayingManagerTests(unittest.TestCase):
+    """
+    Tests for the scheduling of relayers by
+    L{mail.relaymanager.SmartHostSMTPRelayingManager}.
+    """
+    def setUp(self):
+        directory = self.mktemp()
+        os.mkdir(directory)
+        self.queue = mail.relaymanager.Queue(directory)
+        self.queue.noisy = False
+        self.clock = task.Clock()
+        self.manager = ConnectionRecordingManager(self.queue, 10, 2)
+        self.manager.clock = self.clock
+        self.manager.mxcalc = StubMXCalculator()
+        self.messages = {}
+        for domain in ['example.net', 'example.org', 'example.com']:
+            self.messages[domain] = [
+                queueMessage(self.queue, 'user%d@%s' % (i, domain))
+                for i in range(5)]
+
+
+    def connectionsByDomain(self):
+        """
+        Return the names of the mail exchanges to which connections were
+        made, with the number of connections made to each.
+        """
+        connections = {}
+        for (address, factory) in self.manager.connections:
+            connections[address] = connections.get(address, 0) + 1
+        return connections
+
+
+    def test_connectionsPerDomain(self):
+        """
+        At most C{maxConnectionsPerDomain} relayers are launched for a
+        domain, each with at most C{maxMessagesPerConnection} messages to it.
+        """
+        self.manager.checkState()
+        self.assertEqual(self.connectionsByDomain(), {
+                'mx.example.net': 2, 'mx.example.org': 2, 'mx.example.com': 2})
+        for (address, factory) in self.manager.connections:
+            domain = address[len('mx.'):]
+            messages = self.manager.managed[factory]
+            self.assertEqual(len(messages), 2)
+            for message in messages:
+                self.assertIn(message, self.messages[domain])
+        self.assertEqual(len(self.queue.getWaiting()), 3)
+
+
+    def test_maxConnections(self):
+        """
+        At most C{maxConnections} relayers are launched in all.
+        """
+        self.manager.maxConnections = 3
+        self.manager.checkState()
+        self.assertEqual(len(self.manager.connections), 3)
+        self.manager.checkState()
+        self.assertEqual(len(self.manager.connections), 3)
+
+
+    def test_getMoreMessages(self):
+        """
+        A relayer which sent the messages it was given is given more messages
+        to the same domain, until it sent C{maxMessagesPerSession} messages.
+        """
+        self.manager.maxConnectionsPerDomain = 1
+        self.manager.maxMessagesPerSession = 4
+        self.manager.checkState()
+        address, factory = self.manager.connections[0]
+        domain = address[len('mx.'):]
+        attempt = factory.manager
+        for message in factory.messages:
+            attempt.notifySuccess(factory, message)
+        more = attempt.getMoreMessages(factory)
+        self.assertEqual(len(more), 2)
+        for message in more:
+            self.assertIn(os.path.basename(message), self.messages[domain])
+            attempt.notifySuccess(factory, message)
+        self.assertEqual(attempt.getMoreMessages(factory), [])
+        self.assertEqual(len(self.queue.getWaitingFor(domain)), 1)
+
+
+    def test_directoryNotRescanned(self):
+        """
+        The directory of the queue is only read again after
+        C{rescanInterval} seconds.
+        """
+        reads = []
+        self.patch(self.queue, 'readDirectory', lambda: reads.append(None))
+        self.manager.checkState()
+        self.manager.checkState()
+        self.assertEqual(len(reads), 1)
+        self.clock.advance(self.manager.rescanInterval)
+        self.manager.checkState()
+        self.assertEqual(len(reads), 2)
+
+
+    def assertAttemptsFailed(self, domain, count):
+        """
+        Assert that C{count} relaying attempts to C{domain} were made since
+        the last call and that they failed because its mail exchange could
+        not be found, and consume their failures.
+        """
+        attempts = [attempt for (attemptDomain, attempt)
+                    in self.manager.attempts if attemptDomain == domain]
+        self.assertEqual(len(attempts), count)
+        for attempt in attempts:
+            self.failureResultOf(attempt, DNSLookupError)
+        del self.manager.attempts[:]
+        self.assertEqual(len(self.flushLoggedErrors(DNSLookupError)), count)
+
+
+    def test_backOff(self):
+        """
+        When the mail exchange of a domain cannot be reached, no relaying is
+        attempted to the domain for C{backoffBase} seconds, a period which
+        doubles with each consecutive failure.
+        """
+        self.manager.mxcalc.failing.add('example.net')
+        self.manager.checkState()
+        self.assertAttemptsFailed('example.net', 1)
+        self.assertEqual(len(self.queue.getWaitingFor('example.net')), 5)
+        del self.manager.connections[:]
+
+        self.clock.advance(self.manager.backoffBase - 1)
+        self.manager.checkState()
+        self.assertNotIn('mx.example.net', self.connectionsByDomain())
+        self.assertAttemptsFailed('example.net', 0)
+
+        self.clock.advance(1)
+        self.manager.checkState()
+        self.assertAttemptsFailed('example.net', 1)
+        self.assertEqual(
+            self.manager.metrics()['backedOff'],
+            {'example.net': self.manager.backoffBase * 2})
+
+
+    def test_backOffReset(self):
+        """
+        A domain is no longer backed off from once a message is relayed to
+        it.
+        """
+        self.manager.maxConnectionsPerDomain = 1
+        self.manager.checkState()
+        address, factory = self.manager.connections[0]
+        factory.manager.notifyNoConnection(factory)
+        domain = address[len('mx.'):]
+        self.assertEqual(self.manager.metrics()['backedOff'],
+                         {domain: self.manager.backoffBase})
+        self.clock.advance(self.manager.backoffBase)
+        self.manager.checkState()
+        address, factory = self.manager.connections[-1]
+        self.assertEqual(address, 'mx.' + domain)
+        factory.manager.notifySuccess(factory, factory.messages[0])
+        self.assertEqual(self.manager.metrics()['backedOff'], {})
+        self.assertEqual(self.manager._backoffs, {})
+
+
+    def test_metrics(self):
+        """
+        L{SmartHostSMTPRelayingManager.metrics} reports the number of
+        messages relayed and bounced, the throughput, the number of messages
+        waiting and being relayed, the age of the oldest waiting message and
+        the relayers by domain.
+        """
+        for messages in self.messages.values():
+            for message in messages:
+                os.utime(self.queue.getPath(message) + '-D', (100, 100))
+        self.queue = mail.relaymanager.Queue(self.queue.directory)
+        self.queue.noisy = False
+        self.manager.queue = self.queue
+        self.clock.advance(1000)
+        self.manager.maxConnectionsPerDomain = 1
+        self.manager.checkState()
+        address, factory = self.manager.connections[0]
+        factory.manager.notifySuccess(factory, factory.messages[0])
+        self.clock.advance(10)
+        metrics = self.manager.metrics()
+        self.assertEqual(metrics['relayed'], 1)
+        self.assertEqual(metrics['failed'], 0)
+        self.assertEqual(metrics['throughput'], 0.1)
+        self.assertEqual(metrics['waiting'], 9)
+        self.assertEqual(metrics['relaying'], 5)
+        self.assertEqual(metrics['oldest'], 910)
+        self.assertEqual(metrics['connections'], {
+                'example.net': 1, 'example.org': 1, 'example.com': 1})
+        self.assertEqual(metrics['backedOff'], {})
+
+
+    def test_volatileStateNotPersisted(self):
+        """
+        The relayers and counters of a smart host are not persisted.
+        """
+        self.manager.checkState()
+        state = self.manager.__getstate__()
+        for name in ['managed', 'relayedCount', '_domains', '_backoffs']:
+            self.assertNotIn(name, state)
+        manager = mail.relaymanager.SmartHostSMTPRelayingManager(self.queue)
+        manager.__setstate__(state)
+        self.assertEqual(manager.managed, {})
+        self.assertEqual(manager.relayedCount, 0)
+
+
+
 from twisted.names import server
 from twisted.names import client
 from twisted.names import common
@@ -1154,6 +1822,52 @@ class MXTestCase(unittest.TestCase):
             reactor)
 
 
+    def test_cachedLookup(self):
+        """
+        L{MXCalculator.getMX} reuses the results of a previous lookup for a
+        domain until the time to live of its answers expires.
+        """
+        self.auth.addresses['test.domain'] = ['the.email.test.domain']
+        d = self.mx.getMX('test.domain')
+
+        def cbFirst(mx):
+            self.auth.addresses['test.domain'] = ['another.test.domain']
+            return self.mx.getMX('test.domain')
+
+        def cbSecond(mx):
+            self.assertEqual(str(mx.name), 'the.email.test.domain')
+            self.clock.advance(60)
+            return self.mx.getMX('test.domain')
+
+        def cbExpired(mx):
+            self.assertEqual(str(mx.name), 'another.test.domain')
+        d.addCallback(cbFirst)
+        d.addCallback(cbSecond)
+        d.addCallback(cbExpired)
+        return d
+
+
+    def test_maximumCacheTTL(self):
+        """
+        The results of a lookup are not reused after C{maximumCacheTTL}
+        seconds, whatever the time to live of its answers.
+        """
+        self.mx.maximumCacheTTL = 10
+        self.auth.addresses['test.domain'] = ['the.email.test.domain']
+        d = self.mx.getMX('test.domain')
+
+        def cbFirst(mx):
+            self.auth.addresses['test.domain'] = ['another.test.domain']
+            self.clock.advance(10)
+            return self.mx.getMX('test.domain')
+
+        def cbExpired(mx):
+            self.assertEqual(str(mx.name), 'another.test.domain')
+        d.addCallback(cbFirst)
+        d.addCallback(cbExpired)
+        return d
+
+
     def testSimpleSuccess(self):
         self.auth.addresses['test.domain'] = ['the.email.test.domain']
         return self.mx.getMX('test.domain').addCallback(self._cbSimpleSuccess)
@@ -1339,9 +1339,9 @@ class ESMTPAuthenticationTestCase(unittest.TestCase):
             responseLines[0],
             "250-localhost Hello 127.0.0.1, nice to meet you")
         self.assertEqual(
-            responseLines[1],
-            "250 AUTH LOGIN")
-        self.assertEqual(len(responseLines), 2)
+            sorted([line[4:] for line in responseLines[1:]]),
+            ["AUTH LOGIN", "CHUNKING", "PIPELINING"])
+        self.assertTrue(responseLines[-1].startswith("250 "))
 
 
     def test_plainAuthentication(self):
@@ -1787,3 +1787,471 @@ class SendmailTestCase(unittest.TestCase):
         self.assertEqual(transport.disconnecting, True)
         failure = self.failureResultOf(d)
         failure.trap(defer.CancelledError)
+
+
+
+class ChunkRecordingMessage(object):
+    """
+    L{ChunkRecordingMessage} is an L{smtp.IChunkedMessage} which records the
+    content delivered to it.
+
+    @ivar chunks: The content delivered, in the chunks it was delivered in.
+    @ivar ended: Whether the end of the message was delivered.
+    @ivar lost: Whether the message was truncated.
+    @ivar eom: The L{Deferred} returned by C{eomReceived}.
+    """
+    implements(smtp.IChunkedMessage)
+
+    def __init__(self):
+        self.chunks = []
+        self.ended = self.lost = False
+        self.eom = defer.succeed("saved")
+
+
+    def dataReceived(self, data):
+        self.chunks.append(data)
+
+
+    def eomReceived(self):
+        self.ended = True
+        return self.eom
+
+
+    def connectionLost(self):
+        self.lost = True
+
+
+
+class ChunkRecordingDelivery(object):
+    """
+    L{ChunkRecordingDelivery} is an L{smtp.IMessageDelivery} which delivers
+    messages to L{ChunkRecordingMessage} instances, or to C{messageFactory}
+    if it is set.
+
+    @ivar messages: The messages delivered.
+    @ivar validateFromResult: The result of C{validateFrom}, or C{None} to
+        accept all senders immediately.
+    """
+    messageFactory = ChunkRecordingMessage
+    validateFromResult = None
+
+    def __init__(self):
+        self.messages = []
+
+
+    def receivedHeader(self, helo, origin, recipients):
+        return "Received: test"
+
+
+    def validateFrom(self, helo, origin):
+        if self.validateFromResult is not None:
+            return self.validateFromResult
+        return origin
+
+
+    def validateTo(self, user):
+        def createMessage():
+            message = self.messageFactory()
+            self.messages.append(message)
+            return message
+        return createMessage
+
+
+
+class PipeliningChunkingServerTests(unittest.TestCase):
+    """
+    Tests for the support of the I{PIPELINING} and I{CHUNKING} extensions and
+    for the delivery of messages in blocks by L{smtp.SMTP} and L{smtp.ESMTP}.
+    """
+    def setUp(self):
+        self.delivery = ChunkRecordingDelivery()
+        self.server = smtp.ESMTP()
+        self.server.delivery = self.delivery
+        self.transport = StringTransport()
+        self.server.makeConnection(self.transport)
+        self.server.dataReceived('EHLO example.com\r\n')
+        self.transport.clear()
+
+
+    def tearDown(self):
+        self.server.connectionLost(error.ConnectionDone())
+
+
+    def replies(self):
+        """
+        Return the codes of the replies sent since the last call.
+        """
+        codes = [int(line[:3]) for line in self.transport.value().splitlines()]
+        self.transport.clear()
+        return codes
+
+
+    def content(self, message):
+        return ''.join(message.chunks)
+
+
+    def test_pipelinedCommandsWaitForResults(self):
+        """
+        Commands pipelined after a command whose result is not available yet
+        are only processed, and replied to, once it is.
+        """
+        result = defer.Deferred()
+        self.delivery.validateFromResult = result
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\n'
+            'DATA\r\n'
+            'Subject: hello\r\n\r\nHi\r\n.\r\n')
+        self.assertEqual(self.replies(), [])
+        result.callback(smtp.Address('alice@example.com'))
+        self.assertEqual(self.replies(), [250, 250, 354, 250])
+        self.assertEqual(self.content(self.delivery.messages[0]),
+                         'Received: test\nSubject: hello\n\nHi\n')
+
+
+    def test_readingPausedWhileWaiting(self):
+        """
+        The server stops reading from its transport while the result of a
+        command is not available, and starts again once it is.
+        """
+        result = defer.Deferred()
+        self.delivery.validateFromResult = result
+        self.server.dataReceived('MAIL FROM:<alice@example.com>\r\n')
+        self.assertEqual(self.transport.producerState, 'paused')
+        result.callback(smtp.Address('alice@example.com'))
+        self.assertEqual(self.transport.producerState, 'producing')
+
+
+    def test_resultAfterDisconnect(self):
+        """
+        If the connection is being closed by the time the result of a command
+        is available, the server does not resume reading from it.
+        """
+        result = defer.Deferred()
+        self.delivery.validateFromResult = result
+        self.server.dataReceived('MAIL FROM:<alice@example.com>\r\n')
+        self.transport.loseConnection()
+        result.callback(smtp.Address('alice@example.com'))
+        self.assertEqual(self.transport.producerState, 'paused')
+
+
+    def test_pipelinedCommandsWaitForEndOfMessage(self):
+        """
+        Commands pipelined after the end of a message are only processed once
+        the message has been handled.
+        """
+        message = ChunkRecordingMessage()
+        message.eom = defer.Deferred()
+        self.delivery.messageFactory = lambda: message
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\n'
+            'DATA\r\n'
+            'Subject: hello\r\n.\r\n'
+            'QUIT\r\n')
+        self.assertEqual(self.replies(), [250, 250, 354])
+        message.eom.callback("saved")
+        self.assertEqual(self.replies(), [250, 221])
+
+
+    def test_dotUnstuffing(self):
+        """
+        The content of a message sent with I{DATA} is delivered without its
+        dot-stuffing and with lines delimited by C{"\\n"}, whether it is
+        received at once or a byte at a time.
+        """
+        data = ('Subject: dots\r\n\r\n..\r\n...leading\r\nmiddle.\r\n'
+                '\r\n..\r\n.\r\n')
+        expected = 'Received: test\nSubject: dots\n\n.\n..leading\nmiddle.\n\n.\n'
+        for chunks in [[data], list(data)]:
+            self.server.dataReceived(
+                'MAIL FROM:<alice@example.com>\r\n'
+                'RCPT TO:<bob@example.com>\r\nDATA\r\n')
+            for chunk in chunks:
+                self.server.dataReceived(chunk)
+            message = self.delivery.messages.pop()
+            self.assertTrue(message.ended)
+            self.assertEqual(self.content(message), expected)
+            self.assertEqual(self.replies(), [250, 250, 354, 250])
+
+
+    def test_lineMessageAdapter(self):
+        """
+        Message receivers which only provide L{smtp.IMessage} receive the
+        content of the message line by line.
+        """
+        lines = []
+        class LineMessage(object):
+            implements(smtp.IMessage)
+            def lineReceived(self, line):
+                lines.append(line)
+            def eomReceived(self):
+                return defer.succeed(None)
+        self.delivery.messageFactory = LineMessage
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\nDATA\r\n'
+            'Subject: lines\r\n\r\n..first\r\nsec')
+        self.server.dataReceived('ond\r\n.\r\n')
+        self.assertEqual(
+            lines,
+            ['Received: test', 'Subject: lines', '', '.first', 'second'])
+
+
+    def test_noHeader(self):
+        """
+        An empty line is delivered between the I{Received} header and the
+        content of a message which has no header.
+        """
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\nDATA\r\n'
+            'Just a body\r\n.\r\n')
+        self.assertEqual(self.content(self.delivery.messages[0]),
+                         'Received: test\n\nJust a body\n')
+
+
+    def test_chunking(self):
+        """
+        A message can be sent in chunks of bytes with I{BDAT}, in which line
+        delimiters are converted and dots are left alone, and the commands
+        can be pipelined.
+        """
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\n'
+            'BDAT 18\r\nSubject: chunks\r\n\r'
+            'BDAT 11 LAST\r\n\n.dots\r\n.\r\n'
+            'QUIT\r\n')
+        self.assertEqual(self.replies(), [250, 250, 250, 250, 221])
+        message = self.delivery.messages[0]
+        self.assertTrue(message.ended)
+        self.assertEqual(self.content(message),
+                         'Received: test\nSubject: chunks\n\n.dots\n.\n')
+
+
+    def test_chunkingByteAtATime(self):
+        """
+        A chunk can be received a byte at a time.
+        """
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\nBDAT 12 LAST\r\n')
+        for byte in 'Body\r\nline\r\n':
+            self.server.dataReceived(byte)
+        self.assertEqual(self.replies(), [250, 250, 250])
+        self.assertEqual(self.content(self.delivery.messages[0]),
+                         'Received: test\n\nBody\nline\n')
+
+
+    def test_chunkingWithoutTransaction(self):
+        """
+        A chunk sent without a sender and recipients is read and rejected.
+        """
+        self.server.dataReceived('BDAT 4\r\nRSETNOOP\r\n')
+        self.assertEqual(self.replies(), [503, 500])
+
+
+    def test_chunkingSyntaxError(self):
+        """
+        I{BDAT} without a valid size is rejected.
+        """
+        self.server.dataReceived('BDAT\r\nBDAT x\r\nBDAT 4 FIRST\r\n')
+        self.assertEqual(self.replies(), [501, 501, 501])
+
+
+    def test_resetChunking(self):
+        """
+        I{RSET} after a chunk discards the message.
+        """
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\nBDAT 4\r\nBodyRSET\r\n'
+            'MAIL FROM:<alice@example.com>\r\n')
+        self.assertEqual(self.replies(), [250, 250, 250, 250, 250])
+        self.assertTrue(self.delivery.messages[0].lost)
+
+
+    def test_fileMessage(self):
+        """
+        L{twisted.mail.mail.FileMessage} receives content in blocks.
+        """
+        from twisted.mail.mail import FileMessage
+        message = FileMessage(StringIO(), 'name', 'finalName')
+        self.assertTrue(smtp.IChunkedMessage.providedBy(message))
+
+
+    def test_fileMessageLineReceivedOverridden(self):
+        """
+        A subclass of L{twisted.mail.mail.FileMessage} which overrides
+        C{lineReceived} but not C{dataReceived} receives content line by line.
+        """
+        from twisted.mail.mail import FileMessage
+
+        class LineMessage(FileMessage):
+            def lineReceived(self, line):
+                self.lines.append(line)
+
+        name = self.mktemp()
+        message = LineMessage(open(name, 'w'), name, self.mktemp())
+        message.lines = []
+        self.assertFalse(smtp.IChunkedMessage.providedBy(message))
+        self.delivery.messageFactory = lambda: message
+        self.server.dataReceived(
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\n'
+            'DATA\r\nSubject: hello\r\n\r\nHi\r\n.\r\n')
+        self.assertEqual(self.replies(), [250, 250, 354, 250])
+        self.assertEqual(
+            message.lines, ['Received: test', 'Subject: hello', '', 'Hi'])
+
+
+
+class PipeliningChunkingClientTests(unittest.TestCase):
+    """
+    Tests for the use of the I{PIPELINING} and I{CHUNKING} extensions by
+    L{smtp.ESMTPClient}.
+    """
+    def setUp(self):
+        self.client = smtp.ESMTPClient(None, None, 'foo.baz')
+        self.client.getMailFrom = lambda: 'alice@example.com'
+        self.client.getMailTo = lambda: ['bob@example.com',
+                                         'carol@example.com']
+        self.client.getMailData = lambda: StringIO(
+            'Subject: hello\n\n.dot\n')
+        self.sent = []
+        self.addresses = []
+        self.client.sentMail = self.sentMail
+        self.transport = StringTransport()
+        self.client.makeConnection(self.transport)
+        self.client.dataReceived('220 hello\r\n')
+        self.transport.clear()
+
+
+    def sentMail(self, code, resp, numOk, addresses, log):
+        self.sent.append((code, resp, numOk))
+        self.addresses.append(addresses)
+
+
+    def sendMessage(self):
+        """
+        Let the client send the message, as the transport would.
+        """
+        while self.transport.producer is not None:
+            self.transport.producer.resumeProducing()
+
+
+    def test_pipelining(self):
+        """
+        The I{MAIL}, I{RCPT} and I{DATA} commands of a transaction are sent
+        without waiting for replies when the server supports I{PIPELINING}.
+        """
+        self.client.dataReceived('250-localhost\r\n250 PIPELINING\r\n')
+        self.assertEqual(
+            self.transport.value(),
+            'MAIL FROM:<alice@example.com>\r\n'
+            'RCPT TO:<bob@example.com>\r\n'
+            'RCPT TO:<carol@example.com>\r\n'
+            'DATA\r\n')
+        self.transport.clear()
+        self.client.dataReceived('250 ok\r\n550 no\r\n250 ok\r\n354 go\r\n')
+        self.sendMessage()
+        self.assertEqual(self.transport.value(),
+                         'Subject: hello\r\n\r\n..dot\r\n.\r\n')
+        self.client.dataReceived('250 delivered\r\n')
+        self.assertEqual(self.sent, [(250, 'delivered', 1)])
+        self.assertEqual(self.addresses,
+                         [[('bob@example.com', 550, 'no'),
+                           ('carol@example.com', 250, 'ok')]])
+
+
+    def test_pipeliningNoRecipients(self):
+        """
+        When no recipient is accepted and the server rejects I{DATA}, the
+        message is not sent.
+        """
+        self.client.dataReceived('250-localhost\r\n250 PIPELINING\r\n')
+        self.transport.clear()
+        self.client.dataReceived('250 ok\r\n550 no\r\n550 no\r\n503 none\r\n')
+        self.assertEqual(self.sent, [(550, 'No recipients accepted', 0)])
+        self.assertEqual(self.transport.value(), 'RSET\r\n')
+
+
+    def test_pipeliningSenderRejected(self):
+        """
+        When the sender is rejected, the transaction fails with the reply to
+        I{MAIL}, and the message is ended if the server accepted I{DATA}
+        anyway.
+        """
+        self.client.dataReceived('250-localhost\r\n250 PIPELINING\r\n')
+        self.transport.clear()
+        self.client.dataReceived('550 sender\r\n503 no\r\n503 no\r\n354 go\r\n')
+        self.assertEqual(self.transport.value(), '.\r\n')
+        self.transport.clear()
+        self.client.dataReceived('554 nothing\r\n')
+        self.assertEqual(self.sent, [(550, 'sender', 0)])
+        self.assertEqual(self.transport.value(), 'RSET\r\n')
+
+
+    def test_chunking(self):
+        """
+        When the server supports I{CHUNKING}, the message is sent in chunks
+        with pipelined I{BDAT} commands, without dot-stuffing.
+        """
+        self.client.dataReceived(
+            '250-localhost\r\n250-PIPELINING\r\n250 CHUNKING\r\n')
+        self.assertNotIn('DATA', self.transport.value())
+        self.transport.clear()
+        self.client.dataReceived('250 ok\r\n250 ok\r\n250 ok\r\n')
+        self.sendMessage()
+        self.assertEqual(
+            self.transport.value(),
+            'BDAT 24\r\nSubject: hello\r\n\r\n.dot\r\nBDAT 0 LAST\r\n')
+        self.client.dataReceived('250 24 octets\r\n250 delivered\r\n')
+        self.assertEqual(self.sent, [(250, 'delivered', 2)])
+
+
+    def test_chunkingFailure(self):
+        """
+        When a chunk is rejected, the transaction fails with its reply.
+        """
+        self.client.dataReceived(
+            '250-localhost\r\n250-PIPELINING\r\n250 CHUNKING\r\n')
+        self.client.dataReceived('250 ok\r\n250 ok\r\n250 ok\r\n')
+        self.sendMessage()
+        self.client.dataReceived('552 too big\r\n503 no transaction\r\n')
+        self.assertEqual(self.sent, [(552, 'too big', 2)])
+
+
+    def test_dotStuffingAcrossChunks(self):
+        """
+        A dot at the beginning of a chunk of the message is stuffed when the
+        previous chunk ended a line, or when it is the first chunk.
+        """
+        self.assertEqual(self.client.transformChunk('.first\n'),
+                         '..first\r\n')
+        self.assertEqual(self.client.transformChunk('.second'), '..second')
+        self.assertEqual(self.client.transformChunk('.third\n'), '.third\r\n')
+
+
+    def test_loopback(self):
+        """
+        L{smtp.ESMTPClient} sends messages to L{smtp.ESMTP} with pipelined
+        commands and chunks, which are delivered unchanged.
+        """
+        body = 'Subject: big\n\n' + '.line\n..\n\r\n' * 5000 + 'end'
+        delivery = ChunkRecordingDelivery()
+        server = smtp.ESMTP()
+        server.delivery = delivery
+        client = MyESMTPClient()
+        client._data = StringIO(body)
+        d = loopback.loopbackTCP(server, client)
+
+        def check(ignored):
+            self.assertEqual(len(delivery.messages), 1)
+            self.assertEqual(
+                ''.join(delivery.messages[0].chunks),
+                'Received: test\n' + body + '\n')
+            self.assertIn('>>> BDAT 2 LAST', client.log.str())
+        d.addCallback(check)
+        return d
@@ -61,31 +61,117 @@ def getSerial(filename = '/tmp/twisted-names.serial'):
 
 
 
-class FileAuthority(common.ResolverBase):
+def _internName(name):
     """
-    An Authority that is loaded from a file.
+    Lowercase a name for use as a key of C{records} and intern it, so that a
+    zone which mentions a name many times keeps one copy of it.
 
-    @ivar _ADDITIONAL_PROCESSING_TYPES: Record types for which additional
-        processing will be done.
-    @ivar _ADDRESS_TYPES: Record types which are useful for inclusion in the
+    @param name: A domain name.
+    @type name: C{str}
+
+    @rtype: C{str}
+    """
+    name = name.lower()
+    if isinstance(name, str):
+        name = intern(name)
+    return name
+
+
+
+class _AnswerIndex(object):
+    """
+    Responses for a zone, computed once per lowercased name and type and then
+    reused for every later query for that name and type.
+
+    @ivar soa: The zone's I{SOA}, as a two-tuple of its name and record.
+    @ivar records: The zone's records, a C{dict} mapping lowercased names to
+        C{list}s of records, which the answers here were computed from.
+    @ivar additionalTypes: Record types for which additional processing will be
+        done.
+    @ivar addressTypes: Record types which are useful for inclusion in the
         additional section generated during additional processing.
+
+    @ivar _answers: A C{dict} mapping C{(name, type)} to a three-tuple of
+        C{tuple}s of L{dns.RRHeader}s for the answer, authority and additional
+        sections, with C{name} as owner.  C{name} is a lowercased name in
+        C{records}, possibly a wildcard name which answers for many queried
+        names.  C{type} is C{None} for the response to every type which
+        C{name} has no records of, so that the number of responses kept is
+        bounded by the size of the zone whatever is queried.
+    @ivar _dependents: A C{dict} mapping a lowercased name to the set of
+        C{_answers} keys computed from that name's records.
+    @ivar _wildcards: The set of names which have a wildcard (C{*}) child in
+        C{records}.
+    @ivar _enclosers: The set of names in C{records} and all of their
+        ancestors, which is only kept when C{_wildcards} is not empty.
     """
-    # See https://twistedmatrix.com/trac/ticket/6650
-    _ADDITIONAL_PROCESSING_TYPES = (dns.CNAME, dns.MX, dns.NS)
-    _ADDRESS_TYPES = (dns.A, dns.AAAA)
+    def __init__(self, soa, records, additionalTypes, addressTypes):
+        self.soa = soa
+        self.records = records
+        self.additionalTypes = additionalTypes
+        self.addressTypes = addressTypes
+        self._soaName = soa[0].lower()
+        self._defaultTTL = max(soa[1].minimum, soa[1].expire)
+        self._answers = {}
+        self._dependents = {}
+        self._indexWildcards()
+
+
+    def _indexWildcards(self):
+        """
+        Find the wildcard names in C{records}.
+        """
+        self._wildcards = set([
+                name[2:] for name in self.records if name.startswith('*.')])
+        self._enclosers = set()
+        if self._wildcards:
+            for name in self.records:
+                labels = name.split('.')
+                for i in range(len(labels)):
+                    self._enclosers.add('.'.join(labels[i:]))
 
-    soa = None
-    records = None
 
-    def __init__(self, filename):
-        common.ResolverBase.__init__(self)
-        self.loadFile(filename)
-        self._cache = {}
+    def update(self, records):
+        """
+        Switch to a new version of the zone, forgetting only the answers
+        computed from names whose records changed.
+
+        @param records: The new records of the zone, in the same form as
+            C{records}.
+        """
+        old = self.records
+        self.records = records
+        changed = [
+            name for name in set(old).union(records)
+            if old.get(name) != records.get(name)]
+        stale = set()
+        for name in changed:
+            stale.update(self._dependents.pop(name, ()))
+        if set(old) != set(records):
+            # A wildcard may now apply to different names.
+            self._indexWildcards()
+        for key in stale:
+            self._answers.pop(key, None)
+
+
+    def _wildcardSource(self, name):
+        """
+        Find the wildcard name whose records answer for a name which is not
+        in C{records}.
 
+        @param name: A lowercased name in this zone which is not in
+            C{records}.
 
-    def __setstate__(self, state):
-        self.__dict__ = state
-#        print 'setstate ', self.soa
+        @return: The wildcard name, or C{None} if there is none for C{name}.
+        """
+        labels = name.split('.')
+        for i in range(1, len(labels)):
+            ancestor = '.'.join(labels[i:])
+            if ancestor in self._wildcards:
+                return '*.' + ancestor
+            if ancestor in self._enclosers or ancestor == self._soaName:
+                return None
+        return None
 
 
     def _additionalRecords(self, answer, authority, ttl):
@@ -110,15 +196,179 @@ class FileAuthority(common.ResolverBase):
             about the records in C{answer} and C{authority}.
         """
         for record in answer + authority:
-            if record.type in self._ADDITIONAL_PROCESSING_TYPES:
+            if record.type in self.additionalTypes:
                 name = record.payload.name.name
                 for rec in self.records.get(name.lower(), ()):
-                    if rec.TYPE in self._ADDRESS_TYPES:
+                    if rec.TYPE in self.addressTypes:
                         yield dns.RRHeader(
                             name, rec.TYPE, dns.IN,
                             rec.ttl or ttl, rec, auth=True)
 
 
+    def _compute(self, name, type, domain_records):
+        """
+        Compute the response to a query for a name which has records.
+
+        @param name: The lowercased name in C{records} which answers the
+            query, and which owns the records of the response.
+        @param type: The type of records being queried.
+        @param domain_records: The records answering for C{name}.
+
+        @return: A three-tuple of C{list}s of L{dns.RRHeader}s for the answer,
+            authority and additional sections.
+        """
+        cnames = []
+        results = []
+        authority = []
+        additional = []
+        default_ttl = self._defaultTTL
+
+        for record in domain_records:
+            if record.ttl is not None:
+                ttl = record.ttl
+            else:
+                ttl = default_ttl
+
+            if record.TYPE == dns.NS and name != self._soaName:
+                # NS record belong to a child zone: this is a referral.  As
+                # NS records are authoritative in the child zone, ours here
+                # are not.  RFC 2181, section 6.1.
+                authority.append(
+                    dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=False)
+                )
+            elif record.TYPE == type or type == dns.ALL_RECORDS:
+                results.append(
+                    dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
+                )
+            if record.TYPE == dns.CNAME:
+                cnames.append(
+                    dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
+                )
+        if not results:
+            results = cnames
+
+        # https://tools.ietf.org/html/rfc1034#section-4.3.2 - sort of.
+        # See https://twistedmatrix.com/trac/ticket/6732
+        additionalInformation = self._additionalRecords(
+            results, authority, default_ttl)
+        if cnames:
+            results.extend(additionalInformation)
+        else:
+            additional.extend(additionalInformation)
+
+        if not results and not authority:
+            # Empty response. Include SOA record to allow clients to cache
+            # this response.  RFC 1034, sections 3.7 and 4.3.4, and RFC 2181
+            # section 7.1.
+            authority.append(
+                dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
+                )
+        return results, authority, additional
+
+
+    def lookup(self, name, type):
+        """
+        Find the response to a query.
+
+        @param name: The name which is being queried.
+        @type name: C{str}
+
+        @param type: The type of records being queried.
+        @type type: C{int}
+
+        @return: C{None} if this zone has no records for C{name}, otherwise a
+            three-tuple of new C{list}s of L{dns.RRHeader}s for the answer,
+            authority and additional sections.  Records owned by the queried
+            name are owned by C{name} as given, whatever its case.
+        """
+        lowered = name.lower()
+        source = lowered
+        domain_records = self.records.get(lowered)
+        if (not domain_records and self._wildcards and
+                lowered not in self._enclosers):
+            source = self._wildcardSource(lowered)
+            if source is not None:
+                domain_records = self.records.get(source)
+        if not domain_records:
+            return None
+
+        key = (source, type)
+        sections = self._answers.get(key)
+        if sections is None:
+            if type != dns.ALL_RECORDS and not any(
+                    record.TYPE == type for record in domain_records):
+                # The response is the same for every type of which there are
+                # no records.
+                key = (source, None)
+                sections = self._answers.get(key)
+        if sections is None:
+            sections = tuple([
+                    tuple(section) for section in
+                    self._compute(source, type, domain_records)])
+            self._answers[key] = sections
+            dependencies = set([source])
+            for header in sections[0] + sections[1]:
+                if header.type in self.additionalTypes:
+                    dependencies.add(header.payload.name.name.lower())
+            for dependency in dependencies:
+                self._dependents.setdefault(dependency, set()).add(key)
+
+        if name == source:
+            return [list(section) for section in sections]
+        return [
+            [dns.RRHeader(name, h.type, h.cls, h.ttl, h.payload, h.auth)
+             if h.name.name == source else h
+             for h in section]
+            for section in sections]
+
+
+
+class FileAuthority(common.ResolverBase):
+    """
+    An Authority that is loaded from a file.
+
+    @ivar _ADDITIONAL_PROCESSING_TYPES: Record types for which additional
+        processing will be done.
+    @ivar _ADDRESS_TYPES: Record types which are useful for inclusion in the
+        additional section generated during additional processing.
+    @ivar _index: The L{_AnswerIndex} for the current C{soa} and C{records},
+        created by the first query after either of them is replaced.  Code
+        which changes C{records} in place after queries have been answered
+        must reset it to C{None}.
+    """
+    # See https://twistedmatrix.com/trac/ticket/6650
+    _ADDITIONAL_PROCESSING_TYPES = (dns.CNAME, dns.MX, dns.NS)
+    _ADDRESS_TYPES = (dns.A, dns.AAAA)
+
+    soa = None
+    records = None
+    _index = None
+
+    def __init__(self, filename):
+        common.ResolverBase.__init__(self)
+        self.loadFile(filename)
+
+
+    def __setstate__(self, state):
+        self.__dict__ = state
+#        print 'setstate ', self.soa
+
+
+    def _answerIndex(self):
+        """
+        Get the L{_AnswerIndex} for the current C{soa} and C{records}.
+
+        @rtype: L{_AnswerIndex}
+        """
+        index = self._index
+        if (index is None or index.soa is not self.soa or
+                index.records is not self.records):
+            index = self._index = _AnswerIndex(
+                self.soa, self.records, self._ADDITIONAL_PROCESSING_TYPES,
+                self._ADDRESS_TYPES)
+        return index
+
+
     def _lookup(self, name, cls, type, timeout = None):
         """
         Determine a response to a particular DNS query.
@@ -143,56 +393,9 @@ class FileAuthority(common.ResolverBase):
             I{additional} sections of a DNS response) or with a L{Failure} if
             there is a problem processing the query.
         """
-        cnames = []
-        results = []
-        authority = []
-        additional = []
-        default_ttl = max(self.soa[1].minimum, self.soa[1].expire)
-
-        domain_records = self.records.get(name.lower())
-
-        if domain_records:
-            for record in domain_records:
-                if record.ttl is not None:
-                    ttl = record.ttl
-                else:
-                    ttl = default_ttl
-
-                if record.TYPE == dns.NS and name.lower() != self.soa[0].lower():
-                    # NS record belong to a child zone: this is a referral.  As
-                    # NS records are authoritative in the child zone, ours here
-                    # are not.  RFC 2181, section 6.1.
-                    authority.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=False)
-                    )
-                elif record.TYPE == type or type == dns.ALL_RECORDS:
-                    results.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
-                    )
-                if record.TYPE == dns.CNAME:
-                    cnames.append(
-                        dns.RRHeader(name, record.TYPE, dns.IN, ttl, record, auth=True)
-                    )
-            if not results:
-                results = cnames
-
-            # https://tools.ietf.org/html/rfc1034#section-4.3.2 - sort of.
-            # See https://twistedmatrix.com/trac/ticket/6732
-            additionalInformation = self._additionalRecords(
-                results, authority, default_ttl)
-            if cnames:
-                results.extend(additionalInformation)
-            else:
-                additional.extend(additionalInformation)
-
-            if not results and not authority:
-                # Empty response. Include SOA record to allow clients to cache
-                # this response.  RFC 1034, sections 3.7 and 4.3.4, and RFC 2181
-                # section 7.1.
-                authority.append(
-                    dns.RRHeader(self.soa[0], dns.SOA, dns.IN, ttl, self.soa[1], auth=True)
-                    )
-            return defer.succeed((results, authority, additional))
+        sections = self._answerIndex().lookup(name, type)
+        if sections is not None:
+            return defer.succeed(tuple(sections))
         else:
             if dns._isSubdomainOf(name, self.soa[0]):
                 # We may be the authority and we didn't find it.
@@ -250,7 +453,7 @@ class PySourceAuthority(FileAuthority):
         for rr in l['zone']:
             if isinstance(rr[1], dns.Record_SOA):
                 self.soa = rr
-            self.records.setdefault(rr[0].lower(), []).append(rr[1])
+            self.records.setdefault(_internName(rr[0]), []).append(rr[1])
 
 
     def wrapRecord(self, type):
@@ -345,9 +548,8 @@ class BindAuthority(FileAuthority):
         if record:
             r = record(*rdata)
             r.ttl = ttl
-            self.records.setdefault(domain.lower(), []).append(r)
+            self.records.setdefault(_internName(domain), []).append(r)
 
-            print 'Adding IN Record', domain, ttl, r
             if type == 'SOA':
                 self.soa = (domain, r)
         else:
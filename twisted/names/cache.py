@@ -8,80 +8,201 @@ An in-memory caching resolver.
 
 from __future__ import division, absolute_import
 
+from heapq import heapify, heappush, heappop
+from itertools import count
+
 from twisted.names import dns, common
 from twisted.python import failure, log
+from twisted.python._lru import LRUDict
 from twisted.internet import defer
 
 
 
+def _negativeTTLs(authority):
+    """
+    Find the TTLs applying to a negative response, as described in RFC 2308
+    section 5: the smaller of the TTL of each SOA record in the authority
+    section and its I{minimum} field.
+
+    @param authority: The authority section of the response.
+    @type authority: C{list} of L{dns.RRHeader}
+
+    @rtype: C{list} of C{int}
+    """
+    return [min(r.ttl, r.payload.minimum)
+            for r in authority if r.type == dns.SOA]
+
+
+
 class CacheResolver(common.ResolverBase):
     """
     A resolver that serves records from a local, memory cache.
 
+    The cache holds at most C{maxEntries} entries, evicting the least recently
+    used one when it is full.  Entries expire when the smallest TTL among
+    their records has elapsed; a single timer removes them, and an entry found
+    to have expired by a lookup is removed then.
+
+    Negative responses are cached as described in RFC 2308: responses with no
+    answers (NODATA) for as long as the SOA record in their authority section
+    allows, and name errors (NXDOMAIN) when passed to L{cacheNegativeResult}.
+
+    @ivar cache: A L{LRUDict} mapping each cached L{dns.Query} to a
+        2-tuple of the time it was cached and either its 3-tuple of answer,
+        authority and additional records, or C{None} for a name error.  The
+        least recently used entry is first.
+
+    @ivar maxEntries: The largest number of entries to keep.
+    @type maxEntries: C{int}
+
+    @ivar hits: The number of lookups answered from the cache.
+    @type hits: C{int}
+
+    @ivar misses: The number of lookups which were not.
+    @type misses: C{int}
+
+    @ivar evictions: The number of entries removed to make room for others
+        before they expired.
+    @type evictions: C{int}
+
+    @ivar _expiresAt: A C{dict} mapping each cached query to the time at which
+        its entry expires.
+
+    @ivar _expiries: A heap of C{(expiresAt, serial, query)} tuples, ordering
+        cached queries by expiry time.  Tuples for queries which have since
+        been removed or cached again are left in place, and skipped when they
+        reach the top.
+
+    @ivar _views: A C{dict} mapping cached queries to a 2-tuple of a number
+        of whole seconds since the entry was cached and the records returned by
+        lookups then, with TTLs decremented accordingly.
+
+    @ivar _expiryCall: The L{IDelayedCall} which will next remove expired
+        entries, or C{None}.
+
     @ivar _reactor: A provider of L{interfaces.IReactorTime}.
     """
     cache = None
+    maxEntries = 10000
+    hits = misses = evictions = 0
+    _expiryCall = None
 
-    def __init__(self, cache=None, verbose=0, reactor=None):
+    def __init__(self, cache=None, verbose=0, reactor=None, maxEntries=None):
+        """
+        @param cache: A C{dict} mapping L{dns.Query} instances to 2-tuples of
+            the time at which they were cached and a 3-tuple of their records,
+            with which to populate the cache.
+
+        @param verbose: How much to log: C{1} to log cache hits, C{2} to also
+            log misses and additions.
+
+        @param reactor: A provider of L{interfaces.IReactorTime}, by default
+            the global reactor.
+
+        @param maxEntries: The largest number of entries to keep, or C{None}
+            for the default.
+        @type maxEntries: C{int}
+        """
         common.ResolverBase.__init__(self)
 
-        self.cache = {}
         self.verbose = verbose
-        self.cancel = {}
+        if maxEntries is not None:
+            self.maxEntries = maxEntries
         if reactor is None:
             from twisted.internet import reactor
         self._reactor = reactor
+        self._reset()
 
         if cache:
             for query, (seconds, payload) in cache.items():
                 self.cacheResult(query, payload, seconds)
 
 
+    def _reset(self):
+        """
+        Empty the cache and its indexes.
+        """
+        self.cache = LRUDict()
+        self._expiresAt = {}
+        self._expiries = []
+        self._serial = count()
+        self._views = {}
+
+
     def __setstate__(self, state):
         self.__dict__ = state
 
-        now = self._reactor.seconds()
-        for (k, (when, (ans, add, ns))) in self.cache.items():
-            diff = now - when
-            for rec in ans + add + ns:
-                if rec.ttl < diff:
-                    del self.cache[k]
-                    break
+        # Rebuild the indexes, dropping entries which expired while pickled.
+        entries = list(self.cache.items())
+        self._reset()
+        for query, (when, payload) in entries:
+            if payload is None:
+                # The TTLs of name errors are not kept, so drop them.
+                continue
+            self.cacheResult(query, payload, when)
+        if self._expiryCall is not None:
+            self._expiryCall.cancel()
+        self._expire()
 
 
     def __getstate__(self):
-        for c in self.cancel.values():
-            c.cancel()
-        self.cancel.clear()
-        return self.__dict__
+        if self._expiryCall is not None and self._expiryCall.active():
+            self._expiryCall.cancel()
+        self._expiryCall = None
+        state = self.__dict__.copy()
+        for name in ('_expiresAt', '_expiries', '_serial', '_views',
+                     '_expiryCall'):
+            state.pop(name, None)
+        return state
 
 
     def _lookup(self, name, cls, type, timeout):
         now = self._reactor.seconds()
         q = dns.Query(name, type, cls)
         try:
-            when, (ans, auth, add) = self.cache[q]
+            when, payload = self.cache[q]
         except KeyError:
-            if self.verbose > 1:
-                log.msg('Cache miss for ' + repr(name))
-            return defer.fail(failure.Failure(dns.DomainError(name)))
-        else:
-            if self.verbose:
-                log.msg('Cache hit for ' + repr(name))
-            diff = now - when
-
-            try:
-                result = (
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in ans],
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in auth],
-                    [dns.RRHeader(r.name.name, r.type, r.cls, r.ttl - diff,
-                                  r.payload) for r in add])
-            except ValueError:
-                return defer.fail(failure.Failure(dns.DomainError(name)))
-            else:
-                return defer.succeed(result)
+            return self._miss(name)
+
+        if now > self._expiresAt[q]:
+            self.clearEntry(q)
+            return self._miss(name)
+
+        if self.verbose:
+            log.msg('Cache hit for ' + repr(name))
+        self.hits += 1
+        # Mark the entry as the most recently used.
+        self.cache.touch(q)
+
+        if payload is None:
+            # A cached name error.  Report it as authoritative so that a
+            # resolver chain does not go on to ask other resolvers.
+            return defer.fail(failure.Failure(
+                    dns.AuthoritativeDomainError(name)))
+
+        # The records are only copied, with new TTLs, once per second.
+        elapsed = int(now - when)
+        view = self._views.get(q)
+        if view is None or view[0] != elapsed:
+            view = self._views[q] = (elapsed, tuple(
+                    [dns.RRHeader(r.name.name, r.type, r.cls,
+                                  r.ttl - elapsed, r.payload)
+                     for r in section]
+                    for section in payload))
+        ans, auth, add = view[1]
+        return defer.succeed((list(ans), list(auth), list(add)))
+
+
+    def _miss(self, name):
+        """
+        Count and log a cache miss.
+
+        @return: A L{Deferred} failing with L{dns.DomainError}.
+        """
+        if self.verbose > 1:
+            log.msg('Cache miss for ' + repr(name))
+        self.misses += 1
+        return defer.fail(failure.Failure(dns.DomainError(name)))
 
 
     def lookupAllRecords(self, name, timeout = None):
@@ -96,6 +217,8 @@ class CacheResolver(common.ResolverBase):
 
         @param payload: a 3-tuple of lists of L{dns.RRHeader} records, the
             matching result of the query (answers, authority and additional).
+            If there are no answers, the result is cached for no longer than
+            the SOA record in the authority section allows.
 
         @param cacheTime: The time (seconds since epoch) at which the entry is
             considered to have been added to the cache. If C{None} is given,
@@ -104,22 +227,126 @@ class CacheResolver(common.ResolverBase):
         if self.verbose > 1:
             log.msg('Adding %r to cache' % query)
 
-        self.cache[query] = (cacheTime or self._reactor.seconds(), payload)
+        ans, auth, add = payload
+        ttls = [r.ttl for r in list(ans) + list(auth) + list(add)]
+        if not ans:
+            ttls.extend(_negativeTTLs(auth))
+        self._add(query, cacheTime, payload, min(ttls) if ttls else 0)
+
+
+    def cacheNegativeResult(self, query, authority, cacheTime=None):
+        """
+        Cache a name error (NXDOMAIN) response.
+
+        As required by RFC 2308, the response is only cached if its authority
+        section includes an SOA record, for as long as that record allows.
+        Until then, lookups of C{query} fail with
+        L{dns.AuthoritativeDomainError}.
+
+        @param query: a L{dns.Query} instance.
+
+        @param authority: The authority section of the response, a C{list} of
+            L{dns.RRHeader} records.
+
+        @param cacheTime: The time (seconds since epoch) at which the entry is
+            considered to have been added to the cache. If C{None} is given,
+            the current time is used.
+        """
+        ttls = _negativeTTLs(authority)
+        if not ttls:
+            return
+        if self.verbose > 1:
+            log.msg('Adding name error for %r to cache' % query)
+        self._add(query, cacheTime, None, min(ttls))
+
+
+    def _add(self, query, cacheTime, payload, ttl):
+        """
+        Add an entry to the cache, evicting others if it is full.
+
+        @param query: The L{dns.Query} to cache the result of.
 
-        if query in self.cancel:
-            self.cancel[query].cancel()
+        @param cacheTime: The time at which the entry was cached, or C{None}
+            for the current time.
 
-        s = list(payload[0]) + list(payload[1]) + list(payload[2])
-        if s:
-            m = s[0].ttl
-            for r in s:
-                m = min(m, r.ttl)
+        @param payload: The records to cache, or C{None} for a name error.
+
+        @param ttl: The number of seconds after C{cacheTime} at which the
+            entry expires.
+        """
+        if cacheTime is None:
+            when = self._reactor.seconds()
+        else:
+            when = cacheTime
+        self.cache[query] = (when, payload)
+        self._views.pop(query, None)
+        expiresAt = self._expiresAt[query] = when + ttl
+        if len(self._expiries) > 2 * len(self.cache) + 64:
+            # Too many stale tuples have built up from entries cached
+            # repeatedly; start again without them.
+            self._expiries = [(t, next(self._serial), q)
+                              for (q, t) in self._expiresAt.items()]
+            heapify(self._expiries)
         else:
-            m = 0
+            heappush(self._expiries, (expiresAt, next(self._serial), query))
+
+        if len(self.cache) > self.maxEntries:
+            self._removeExpired()
+            while len(self.cache) > self.maxEntries:
+                evicted, _ = self.cache.popOldest()
+                del self._expiresAt[evicted]
+                self._views.pop(evicted, None)
+                self.evictions += 1
+        self._scheduleExpiry()
+
 
-        self.cancel[query] = self._reactor.callLater(m, self.clearEntry, query)
+    def _scheduleExpiry(self):
+        """
+        Make sure the earliest expiry time in the cache has a timer set for
+        it.
+        """
+        expiries = self._expiries
+        while expiries and (
+            self._expiresAt.get(expiries[0][2]) != expiries[0][0]):
+            heappop(expiries)
+        if not expiries:
+            return
+        delay = max(0, expiries[0][0] - self._reactor.seconds())
+        call = self._expiryCall
+        if call is None or not call.active():
+            self._expiryCall = self._reactor.callLater(
+                delay, self._expire)
+        elif call.getTime() > expiries[0][0]:
+            call.reset(delay)
+
+
+    def _removeExpired(self):
+        """
+        Remove every entry which has expired.
+        """
+        now = self._reactor.seconds()
+        expiries = self._expiries
+        while expiries and expiries[0][0] <= now:
+            expiresAt, serial, query = heappop(expiries)
+            if self._expiresAt.get(query) == expiresAt:
+                self.clearEntry(query)
+
+
+    def _expire(self):
+        """
+        Remove expired entries and set a timer for the next to expire.
+        """
+        self._expiryCall = None
+        self._removeExpired()
+        self._scheduleExpiry()
 
 
     def clearEntry(self, query):
+        """
+        Remove an entry from the cache.
+
+        @param query: The cached L{dns.Query}.
+        """
         del self.cache[query]
-        del self.cancel[query]
+        del self._expiresAt[query]
+        self._views.pop(query, None)
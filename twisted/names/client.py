@@ -18,6 +18,7 @@ better caching, respect timeouts
 
 import os
 import errno
+import random
 import warnings
 
 from zope.interface import moduleProvides
@@ -50,9 +51,48 @@ class Resolver(common.ResolverBase):
     @ivar _reactor: A provider of L{IReactorTCP}, L{IReactorUDP}, and
         L{IReactorTime} which will be used to set up network resources and
         track timeouts.
+
+    @ivar raceServers: The number of servers each UDP attempt is sent to at
+        once.  The first response is used; the responses to the other queries
+        are ignored when they arrive.  When every server in an attempt times
+        out, the next attempt goes to the next C{raceServers} servers.
+    @type raceServers: C{int}
+
+    @ivar adaptive: If C{True}, servers are tried in order of their smoothed
+        round trip times, as measured from earlier UDP queries, and the first
+        round of attempts waits for each server only as long as its round trip
+        time suggests (never longer than the first configured timeout).
+        Servers which time out have their round trip time doubled.
+    @type adaptive: C{bool}
+
+    @ivar udpPortPoolSize: If greater than C{0}, UDP queries are sent from a
+        pool of at most this many ports, each bound to a random port number,
+        instead of from a new port per query.
+    @type udpPortPoolSize: C{int}
+
+    @ivar udpPortQueries: The number of queries sent from a pooled UDP port
+        before it is replaced with one bound to a new random port number.
+    @type udpPortQueries: C{int}
+
+    @ivar _rtts: A C{dict} mapping server addresses to two-element C{list}s of
+        their smoothed round trip time and its mean deviation, in seconds, as
+        in RFC 6298.  Only kept when C{adaptive} is C{True}.
+
+    @ivar _udpPool: The L{dns.DNSDatagramProtocol} instances new queries may
+        be sent from when C{udpPortPoolSize} is greater than C{0}.
+
+    @ivar _udpPortState: A C{dict} mapping pooled L{dns.DNSDatagramProtocol}
+        instances, including retired ones which still have queries
+        outstanding, to two-element C{list}s of the number of queries sent
+        from them and the number of those still outstanding.
     """
     index = 0
     timeout = None
+    raceServers = 1
+    adaptive = False
+    udpPortPoolSize = 0
+    udpPortQueries = 100
+    _minimumTimeout = 0.1
 
     factory = None
     servers = None
@@ -119,6 +159,9 @@ class Resolver(common.ResolverBase):
         self.pending = []
 
         self._waiting = {}
+        self._rtts = {}
+        self._udpPool = []
+        self._udpPortState = {}
 
         self.maybeParseConfig()
 
@@ -127,6 +170,8 @@ class Resolver(common.ResolverBase):
         d = self.__dict__.copy()
         d['connections'] = []
         d['_parseCall'] = None
+        d['_udpPool'] = []
+        d['_udpPortState'] = {}
         return d
 
 
@@ -254,12 +299,17 @@ class Resolver(common.ResolverBase):
         issue a query to it using C{*args}, and arrange for it to be
         disconnected from its transport after the query completes.
 
+        If C{udpPortPoolSize} is greater than C{0}, the query is sent from a
+        pooled protocol instead; see L{_pooledQuery}.
+
         @param *args: Positional arguments to be passed to
             L{DNSDatagramProtocol.query}.
 
         @return: A L{Deferred} which will be called back with the result of the
             query.
         """
+        if self.udpPortPoolSize > 0:
+            return self._pooledQuery(*args)
         protocol = self._connectedProtocol()
         d = protocol.query(*args)
         def cbQueried(result):
@@ -269,6 +319,146 @@ class Resolver(common.ResolverBase):
         return d
 
 
+    def _pooledQuery(self, *args):
+        """
+        Issue a query from a randomly chosen protocol in C{_udpPool}, adding a
+        new one from L{_connectedProtocol} while the pool is not full.  A
+        protocol is taken out of the pool once C{udpPortQueries} queries have
+        been sent from it, and disconnected from its transport once they have
+        all completed.
+
+        @param *args: Positional arguments to be passed to
+            L{DNSDatagramProtocol.query}.
+
+        @return: A L{Deferred} which will be called back with the result of the
+            query.
+        """
+        pool = self._udpPool
+        if len(pool) < self.udpPortPoolSize:
+            protocol = self._connectedProtocol()
+            pool.append(protocol)
+            self._udpPortState[protocol] = [0, 0]
+        else:
+            protocol = random.choice(pool)
+        state = self._udpPortState[protocol]
+        state[0] += 1
+        state[1] += 1
+        if state[0] >= self.udpPortQueries:
+            pool.remove(protocol)
+
+        d = protocol.query(*args)
+        def cbQueried(result):
+            state[1] -= 1
+            if not state[1] and protocol not in pool:
+                del self._udpPortState[protocol]
+                protocol.transport.stopListening()
+            return result
+        d.addBoth(cbQueried)
+        return d
+
+
+    def _timedQuery(self, address, queries, timeout, id=None):
+        """
+        Issue a query with L{_query}, updating the round trip time kept for
+        C{address} in C{_rtts} from its outcome if C{adaptive} is C{True}.
+
+        @return: A L{Deferred} which will be called back with the result of the
+            query.
+        """
+        d = self._query(address, queries, timeout, id)
+        if not self.adaptive:
+            return d
+        started = self._reactor.seconds()
+        def cbAnswered(result):
+            rtt = self._reactor.seconds() - started
+            estimate = self._rtts.get(address)
+            if estimate is None:
+                self._rtts[address] = [rtt, rtt / 2]
+            else:
+                srtt, rttvar = estimate
+                estimate[1] = 0.75 * rttvar + 0.25 * abs(srtt - rtt)
+                estimate[0] = 0.875 * srtt + 0.125 * rtt
+            return result
+        def ebTimedOut(reason):
+            reason.trap(dns.DNSQueryTimeoutError)
+            estimate = self._rtts.setdefault(address, [timeout, 0])
+            estimate[0] = max(estimate[0] * 2, timeout)
+            return reason
+        d.addCallbacks(cbAnswered, ebTimedOut)
+        return d
+
+
+    def _attemptTimeout(self, address, timeout, adapt):
+        """
+        Choose how long to wait for a response from C{address}.
+
+        @param timeout: The remaining sequence of configured timeouts.
+
+        @param adapt: Whether the timeout may be derived from the round trip
+            time of C{address}.
+
+        @return: The number of seconds to wait.
+        """
+        estimate = self._rtts.get(address)
+        if not (adapt and self.adaptive) or estimate is None:
+            return timeout[0]
+        srtt, rttvar = estimate
+        return min(timeout[0], max(self._minimumTimeout, srtt + 4 * rttvar))
+
+
+    def _race(self, attempts):
+        """
+        Combine the L{Deferred}s of queries sent to several servers.
+
+        @param attempts: The L{Deferred}s of the queries.
+        @type attempts: C{list} of L{Deferred}
+
+        @return: A L{Deferred} which fires with the first result of any of
+            C{attempts} or, if they all fail, with the first failure.
+        """
+        result = defer.Deferred()
+        failures = []
+        def cbAnswered(message):
+            if not result.called:
+                result.callback(message)
+        def ebFailed(reason):
+            failures.append(reason)
+            if len(failures) == len(attempts) and not result.called:
+                result.errback(failures[0])
+        for d in attempts:
+            d.addCallbacks(cbAnswered, ebFailed)
+        return result
+
+
+    def _send(self, addressesLeft, addressesUsed, queries, timeout, adapt,
+              id=None):
+        """
+        Send one attempt of a UDP query to the next C{raceServers} of
+        C{addressesLeft}, moving them to C{addressesUsed}.
+
+        @param id: The message id to use, if the attempt goes to one server.
+
+        @return: A L{Deferred} which fires with the response to the query, or
+            with L{defer.TimeoutError} once all attempts have timed out.
+        """
+        count = max(1, min(self.raceServers, len(addressesLeft)))
+        attempts = []
+        for i in range(count):
+            address = addressesLeft.pop()
+            addressesUsed.append(address)
+            attempts.append(self._timedQuery(
+                address, queries,
+                self._attemptTimeout(address, timeout, adapt),
+                id if count == 1 else None))
+        if count == 1:
+            d = attempts[0]
+        else:
+            d = self._race(attempts)
+        d.addErrback(self._reissue, addressesLeft, addressesUsed, queries,
+                     timeout, adapt)
+        return d
+
+
     def queryUDP(self, queries, timeout = None):
         """
         Make a number of DNS queries via UDP.
@@ -291,17 +481,20 @@ class Resolver(common.ResolverBase):
         if not addresses:
             return defer.fail(IOError("No domain name servers available"))
 
+        if self.adaptive:
+            # Servers which have not answered yet sort first so that they
+            # get measured.
+            addresses.sort(key=lambda address: self._rtts.get(address, [0])[0])
+
         # Make sure we go through servers in the list in the order they were
         # specified.
         addresses.reverse()
 
-        used = addresses.pop()
-        d = self._query(used, queries, timeout[0])
-        d.addErrback(self._reissue, addresses, [used], queries, timeout)
-        return d
+        return self._send(addresses, [], queries, timeout, True)
 
 
-    def _reissue(self, reason, addressesLeft, addressesUsed, query, timeout):
+    def _reissue(self, reason, addressesLeft, addressesUsed, query, timeout,
+                 adapt):
         reason.trap(dns.DNSQueryTimeoutError)
 
         # If there are no servers left to be tried, adjust the timeout
@@ -312,6 +505,7 @@ class Resolver(common.ResolverBase):
             addressesLeft.reverse()
             addressesUsed = []
             timeout = timeout[1:]
+            adapt = False
 
         # If all timeout values have been used this query has failed.  Tell the
         # protocol we're giving up on it and return a terminal timeout failure
@@ -319,16 +513,11 @@ class Resolver(common.ResolverBase):
         if not timeout:
             return failure.Failure(defer.TimeoutError(query))
 
-        # Get an address to try.  Take it out of the list of addresses
-        # to try and put it ino the list of already tried addresses.
-        address = addressesLeft.pop()
-        addressesUsed.append(address)
-
-        # Issue a query to a server.  Use the current timeout.  Add this
-        # function as a timeout errback in case another retry is required.
-        d = self._query(address, query, timeout[0], reason.value.id)
-        d.addErrback(self._reissue, addressesLeft, addressesUsed, query, timeout)
-        return d
+        # Issue a query to the next server or servers.  Use the current
+        # timeout.  This function is added as a timeout errback in case
+        # another retry is required.
+        return self._send(addressesLeft, addressesUsed, query, timeout, adapt,
+                          reason.value.id)
 
 
     def queryTCP(self, queries, timeout = 10):
@@ -298,6 +298,86 @@ def readPrecisely(file, l):
     return buff
 
 
+
+# Precompiled formats for the fixed size parts of a message.
+_SHORT = struct.Struct('!H')
+_QUERY_FIELDS = struct.Struct('!HH')
+_RR_FIELDS = struct.Struct('!HHIH')
+_HEADER_FIELDS = struct.Struct('!H2B4H')
+
+
+
+class _MessageBuffer(BytesIO):
+    """
+    A L{BytesIO} over a complete encoded message which also keeps the message
+    so that names can be decoded from it by offset instead of one C{read} per
+    byte.
+
+    @ivar data: The encoded message.
+    @type data: C{bytes}
+
+    @ivar octets: The encoded message, indexable by integer octet values on
+        both Python 2 and Python 3.
+    @type octets: C{bytearray}
+    """
+    def __init__(self, data):
+        BytesIO.__init__(self, data)
+        self.data = data
+        self.octets = bytearray(data)
+
+
+
+def _decodeName(buffer, offset):
+    """
+    Decode a possibly compressed name from a message.
+
+    @param buffer: The message containing the name.
+    @type buffer: L{_MessageBuffer}
+
+    @param offset: The offset of the first length octet of the name.
+    @type offset: C{int}
+
+    @raise EOFError: Raised when the name runs past the end of the message.
+
+    @raise ValueError: Raised when the name contains a compression loop.
+
+    @return: A two-tuple of the name and the offset just past its encoding
+        (not past the labels a compression pointer referred to).
+    @rtype: C{tuple} of C{bytes} and C{int}
+    """
+    octets = buffer.octets
+    data = buffer.data
+    labels = []
+    visited = set()
+    end = None
+    try:
+        while 1:
+            l = octets[offset]
+            offset += 1
+            if l == 0:
+                break
+            if (l >> 6) == 3:
+                newOffset = (l & 63) << 8 | octets[offset]
+                offset += 1
+                if newOffset in visited:
+                    raise ValueError("Compression loop in encoded name")
+                visited.add(newOffset)
+                if end is None:
+                    end = offset
+                offset = newOffset
+                continue
+            label = data[offset:offset + l]
+            if len(label) < l:
+                raise EOFError
+            labels.append(label)
+            offset += l
+    except IndexError:
+        raise EOFError
+    if end is None:
+        end = offset
+    return b'.'.join(labels), end
+
+
 class IEncodable(Interface):
     """
     Interface for something which can be encoded to and decoded
@@ -399,7 +479,7 @@ class Charstr(object):
 
 
 @implementer(IEncodable)
-class Name:
+class Name(object):
     """
     A name in the domain name system, made up of multiple labels.  For example,
     I{twistedmatrix.com}.
@@ -407,6 +487,8 @@ class Name:
     @ivar name: A byte string giving the name.
     @type name: C{bytes}
     """
+    __slots__ = ('name',)
+
     def __init__(self, name=b''):
         if isinstance(name, unicode):
             name = name.encode('idna')
@@ -415,6 +497,14 @@ class Name:
         self.name = name
 
 
+    def __getstate__(self):
+        return self.name
+
+
+    def __setstate__(self, state):
+        self.name = state
+
+
     def encode(self, strio, compDict=None):
         """
         Encode this Name into the appropriate byte format.
@@ -429,14 +519,16 @@ class Name:
         of reducing the message size).
         """
         name = self.name
+        write = strio.write
         while name:
             if compDict is not None:
                 if name in compDict:
-                    strio.write(
-                        struct.pack("!H", 0xc000 | compDict[name]))
+                    write(_SHORT.pack(0xc000 | compDict[name]))
                     return
-                else:
-                    compDict[name] = strio.tell() + Message.headerSize
+                offset = strio.tell() + Message.headerSize
+                # Only the low 14 bits of a pointer hold the offset.
+                if offset < 0x4000:
+                    compDict[name] = offset
             ind = name.find(b'.')
             if ind > 0:
                 label, name = name[:ind], name[ind + 1:]
@@ -445,9 +537,8 @@ class Name:
                 label = name
                 name = None
                 ind = len(label)
-            strio.write(_ord2bytes(ind))
-            strio.write(label)
-        strio.write(b'\x00')
+            write(_ord2bytes(ind) + label)
+        write(b'\x00')
 
 
     def decode(self, strio, length=None):
@@ -464,6 +555,11 @@ class Name:
         @raise ValueError: Raised when the name cannot be decoded (for example,
             because it contains a loop).
         """
+        if isinstance(strio, _MessageBuffer):
+            self.name, end = _decodeName(strio, strio.tell())
+            strio.seek(end)
+            return
+
         visited = set()
         self.name = b''
         off = 0
@@ -515,7 +611,7 @@ class Name:
 
 @comparable
 @implementer(IEncodable)
-class Query:
+class Query(object):
     """
     Represent a single DNS query.
 
@@ -523,9 +619,7 @@ class Query:
     @ivar type: The query type.
     @ivar cls: The query class.
     """
-    name = None
-    type = None
-    cls = None
+    __slots__ = ('name', 'type', 'cls')
 
     def __init__(self, name=b'', type=A, cls=IN):
         """
@@ -543,15 +637,23 @@ class Query:
         self.cls = cls
 
 
+    def __getstate__(self):
+        return (self.name, self.type, self.cls)
+
+
+    def __setstate__(self, state):
+        self.name, self.type, self.cls = state
+
+
     def encode(self, strio, compDict=None):
         self.name.encode(strio, compDict)
-        strio.write(struct.pack("!HH", self.type, self.cls))
+        strio.write(_QUERY_FIELDS.pack(self.type, self.cls))
 
 
     def decode(self, strio, length = None):
         self.name.decode(strio)
         buff = readPrecisely(strio, 4)
-        self.type, self.cls = struct.unpack("!HH", buff)
+        self.type, self.cls = _QUERY_FIELDS.unpack(buff)
 
 
     def __hash__(self):
@@ -881,21 +983,20 @@ class RRHeader(tputil.FancyEqMixin):
 
     def encode(self, strio, compDict=None):
         self.name.encode(strio, compDict)
-        strio.write(struct.pack(self.fmt, self.type, self.cls, self.ttl, 0))
+        strio.write(_RR_FIELDS.pack(self.type, self.cls, self.ttl, 0))
         if self.payload:
             prefix = strio.tell()
             self.payload.encode(strio, compDict)
             aft = strio.tell()
             strio.seek(prefix - 2, 0)
-            strio.write(struct.pack('!H', aft - prefix))
+            strio.write(_SHORT.pack(aft - prefix))
             strio.seek(aft, 0)
 
 
     def decode(self, strio, length = None):
         self.name.decode(strio)
-        l = struct.calcsize(self.fmt)
-        buff = readPrecisely(strio, l)
-        r = struct.unpack(self.fmt, buff)
+        buff = readPrecisely(strio, _RR_FIELDS.size)
+        r = _RR_FIELDS.unpack(buff)
         self.type, self.cls, self.ttl, self.rdlength = r
 
 
@@ -2034,6 +2135,13 @@ class Message(tputil.FancyEqMixin):
         in C{answers} and C{authority}.
     @type additional: L{list} of L{RRHeader}
 
+    @ivar _encodedBody: The question and record sections of this message,
+        already encoded, or C{None}.  If not C{None}, L{encode} writes these
+        bytes instead of encoding C{queries}, C{answers}, C{authority} and
+        C{additional} again; the section counts in the header are still taken
+        from those lists, so they must describe the same records.
+    @type _encodedBody: C{bytes} or C{None}
+
     @ivar _flagNames: The names of attributes representing the flag header
         fields.
     @ivar _fieldNames: The names of attributes representing non-flag fixed
@@ -2054,6 +2162,8 @@ class Message(tputil.FancyEqMixin):
     # Question, answer, additional, and nameserver lists
     queries = answers = add = ns = None
 
+    _encodedBody = None
+
     def __init__(self, id=0, answer=0, opCode=0, recDes=0, recAv=0,
                        auth=0, rCode=OK, trunc=0, maxSize=512,
                        authenticData=0, checkingDisabled=0):
@@ -2170,18 +2280,26 @@ class Message(tputil.FancyEqMixin):
         self.queries.append(Query(name, type, cls))
 
 
-    def encode(self, strio):
+    def _encodeBody(self):
+        """
+        Encode the question and record sections of this message.
+
+        @return: The encoded sections, untruncated.
+        @rtype: C{bytes}
+        """
         compDict = {}
         body_tmp = BytesIO()
-        for q in self.queries:
-            q.encode(body_tmp, compDict)
-        for q in self.answers:
-            q.encode(body_tmp, compDict)
-        for q in self.authority:
-            q.encode(body_tmp, compDict)
-        for q in self.additional:
-            q.encode(body_tmp, compDict)
-        body = body_tmp.getvalue()
+        for section in (self.queries, self.answers, self.authority,
+                        self.additional):
+            for q in section:
+                q.encode(body_tmp, compDict)
+        return body_tmp.getvalue()
+
+
+    def encode(self, strio):
+        body = self._encodedBody
+        if body is None:
+            body = self._encodeBody()
         size = len(body) + self.headerSize
         if self.maxSize and size > self.maxSize:
             self.trunc = 1
@@ -2196,16 +2314,17 @@ class Message(tputil.FancyEqMixin):
                   | ((self.checkingDisabled & 1) << 4)
                   | (self.rCode & 0xf ) )
 
-        strio.write(struct.pack(self.headerFmt, self.id, byte3, byte4,
-                                len(self.queries), len(self.answers),
-                                len(self.authority), len(self.additional)))
+        strio.write(_HEADER_FIELDS.pack(self.id, byte3, byte4,
+                                        len(self.queries), len(self.answers),
+                                        len(self.authority),
+                                        len(self.additional)))
         strio.write(body)
 
 
     def decode(self, strio, length=None):
         self.maxSize = 0
         header = readPrecisely(strio, self.headerSize)
-        r = struct.unpack(self.headerFmt, header)
+        r = _HEADER_FIELDS.unpack(header)
         self.id, byte3, byte4, nqueries, nans, nns, nadd = r
         self.answer = ( byte3 >> 7 ) & 1
         self.opCode = ( byte3 >> 3 ) & 0xf
@@ -2236,13 +2355,14 @@ class Message(tputil.FancyEqMixin):
 
 
     def parseRecords(self, list, num, strio):
+        lookupRecordType = self.lookupRecordType
         for i in range(num):
             header = RRHeader(auth=self.auth)
             try:
                 header.decode(strio)
             except EOFError:
                 return
-            t = self.lookupRecordType(header.type)
+            t = lookupRecordType(header.type)
             if not t:
                 continue
             header.payload = t(ttl=header.ttl)
@@ -2300,7 +2420,7 @@ class Message(tputil.FancyEqMixin):
 
         @param str: L{bytes}
         """
-        strio = BytesIO(str)
+        strio = _MessageBuffer(str)
         self.decode(strio)
 
 
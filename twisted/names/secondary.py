@@ -9,7 +9,7 @@ from twisted.names import dns
 from twisted.names import common
 from twisted.names import client
 from twisted.names import resolve
-from twisted.names.authority import FileAuthority
+from twisted.names.authority import FileAuthority, _internName
 
 from twisted.python import log, failure
 from twisted.application import service
@@ -90,12 +90,18 @@ class SecondaryAuthority(common.ResolverBase):
 
     @ivar _reactor: The reactor to use to perform the zone transfers, or C{None}
         to use the global reactor.
+
+    @ivar _index: See L{FileAuthority._index}.  A zone transfer only forgets
+        the answers for names whose records it changed.
     """
 
     transferring = False
     soa = records = None
     _port = 53
     _reactor = None
+    _index = None
+    _ADDITIONAL_PROCESSING_TYPES = FileAuthority._ADDITIONAL_PROCESSING_TYPES
+    _ADDRESS_TYPES = FileAuthority._ADDRESS_TYPES
 
     def __init__(self, primaryIP, domain):
         common.ResolverBase.__init__(self)
@@ -153,15 +159,21 @@ class SecondaryAuthority(common.ResolverBase):
     #shouldn't we just subclass? :P
 
     lookupZone = FileAuthority.__dict__['lookupZone']
+    _answerIndex = FileAuthority.__dict__['_answerIndex']
 
     def _cbZone(self, zone):
         ans, _, _ = zone
-        self.records = r = {}
+        r = {}
         for rec in ans:
             if not self.soa and rec.type == dns.SOA:
                 self.soa = (str(rec.name).lower(), rec.payload)
             else:
-                r.setdefault(str(rec.name).lower(), []).append(rec.payload)
+                r.setdefault(_internName(str(rec.name)), []).append(rec.payload)
+        index = self._index
+        if (index is not None and index.soa is self.soa and
+                index.records is self.records):
+            index.update(r)
+        self.records = r
 
     def _ebZone(self, failure):
         log.msg("Updating %s from %s failed during zone transfer" % (self.domain, self.primary))
@@ -20,8 +20,26 @@ for resolvers to deal with.  Fix it.
 import time
 
 from twisted.internet import protocol
-from twisted.names import dns, resolve
+from twisted.names import dns, error, resolve
 from twisted.python import log
+from twisted.python._lru import LRUDict
+
+
+def _sameRecords(kept, records):
+    """
+    Determine whether two C{(answers, authority, additional)} tuples of record
+    sequences hold the very same record objects.
+
+    @rtype: L{bool}
+    """
+    for keptSection, section in zip(kept, records):
+        if len(keptSection) != len(section):
+            return False
+        for keptRecord, record in zip(keptSection, section):
+            if keptRecord is not record:
+                return False
+    return True
+
 
 
 class DNSServerFactory(protocol.ServerFactory):
@@ -31,8 +49,9 @@ class DNSServerFactory(protocol.ServerFactory):
 
     @ivar cache: A L{Cache<twisted.names.cache.Cache>} instance whose
         C{cacheResult} method is called when a response is received from one of
-        C{clients}. Defaults to L{None} if no caches are specified. See
-        C{caches} of L{__init__} for more details.
+        C{clients}, and whose C{cacheNegativeResult} method is called when one
+        of them reports a name error. Defaults to L{None} if no caches are
+        specified. See C{caches} of L{__init__} for more details.
     @type cache: L{Cache<twisted.names.cache.Cache} or L{None}
 
     @ivar canRecurse: A flag indicating whether this server is capable of
@@ -56,13 +75,27 @@ class DNSServerFactory(protocol.ServerFactory):
         L{dns.DNSProtocol}.
     @type protocol: L{IProtocolFactory} constructor
 
+    @ivar encodedResponseCacheSize: The largest number of encoded
+        authoritative responses to keep in C{_encodedResponses}.  C{0}
+        disables that cache.
+    @type encodedResponseCacheSize: L{int}
+
     @ivar _messageFactory: A response message constructor with an initializer
          signature matching L{dns.Message.__init__}.
     @type _messageFactory: C{callable}
+
+    @ivar _encodedResponses: Authoritative responses which have already been
+        encoded, keyed by the queried name (as sent by the client), type and
+        class.  Values are two-tuples of the C{(answers, authority,
+        additional)} tuple of record tuples and the encoded question and
+        record sections.  A response from C{resolver} which carries the very
+        same records is not encoded again.
+    @type _encodedResponses: L{LRUDict}
     """
 
     protocol = dns.DNSProtocol
     cache = None
+    encodedResponseCacheSize = 1000
     _messageFactory = dns.Message
 
 
@@ -100,6 +133,7 @@ class DNSServerFactory(protocol.ServerFactory):
         if caches:
             self.cache = caches[-1]
         self.connections = []
+        self._encodedResponses = LRUDict()
 
 
     def _verboseLog(self, *args, **kwargs):
@@ -298,6 +332,8 @@ class DNSServerFactory(protocol.ServerFactory):
         response = self._responseFromMessage(
             message=message, rCode=dns.OK,
             answers=ans, authority=auth, additional=add)
+        if response.auth and len(message.queries) == 1:
+            self._encodeAuthoritative(message.queries[0], response)
         self.sendReply(protocol, response, address)
 
         l = len(ans) + len(auth) + len(add)
@@ -309,6 +345,36 @@ class DNSServerFactory(protocol.ServerFactory):
             )
 
 
+    def _encodeAuthoritative(self, query, response):
+        """
+        Give an authoritative C{response} its encoded sections, reusing those
+        kept in C{_encodedResponses} when it carries the same records, and
+        keep them for later queries otherwise.
+
+        @param query: The only query in C{response}.
+        @type query: L{dns.Query}
+
+        @param response: The response about to be sent.
+        @type response: L{dns.Message}
+        """
+        if (not self.encodedResponseCacheSize or
+                not isinstance(response, dns.Message)):
+            return
+        key = (query.name.name, query.type, query.cls)
+        records = (tuple(response.answers), tuple(response.authority),
+                   tuple(response.additional))
+        entry = self._encodedResponses.get(key)
+        if entry is not None and _sameRecords(entry[0], records):
+            response._encodedBody = entry[1]
+            return
+
+        body = response._encodedBody = response._encodeBody()
+        self._encodedResponses.pop(key, None)
+        while len(self._encodedResponses) >= self.encodedResponseCacheSize:
+            self._encodedResponses.popOldest()
+        self._encodedResponses[key] = (records, body)
+
+
     def gotResolverError(self, failure, protocol, message, address):
         """
         A callback used by L{DNSServerFactory.handleQuery} for handling deferred
@@ -337,6 +403,13 @@ class DNSServerFactory(protocol.ServerFactory):
         """
         if failure.check(dns.DomainError, dns.AuthoritativeDomainError):
             rCode = dns.ENAME
+            # Remember name errors reported by another server, as RFC 2308
+            # recommends.
+            if self.cache and failure.check(error.DNSNameError):
+                reply = failure.value.args and failure.value.args[0]
+                if isinstance(reply, dns.Message):
+                    self.cache.cacheNegativeResult(
+                        message.queries[0], reply.authority)
         else:
             rCode = dns.ESERVER
             log.err(failure)
@@ -7,8 +7,6 @@ Tests for L{twisted.names.cache}.
 
 from __future__ import division, absolute_import
 
-import time
-
 from zope.interface.verify import verifyClass
 
 from twisted.trial import unittest
@@ -30,13 +28,35 @@ class Caching(unittest.TestCase):
 
 
     def test_lookup(self):
+        clock = task.Clock()
         c = cache.CacheResolver({
             dns.Query(name=b'example.com', type=dns.MX, cls=dns.IN):
-                (time.time(), ([], [], []))})
+                (clock.seconds(), ([], [], []))}, reactor=clock)
         return c.lookupMailExchange(b'example.com').addCallback(
             self.assertEqual, ([], [], []))
 
 
+    def test_emptyResultExpires(self):
+        """
+        A cached result with no records at all is not used once its TTL has
+        elapsed, even before expired entries are next removed.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(b"example.com", dns.MX, dns.IN)
+        c.cacheResult(query, ([], [], []))
+        self.assertEqual(
+            self.successResultOf(c.lookupMailExchange(b"example.com")),
+            ([], [], []))
+
+        # Move time on without running the timer which removes expired
+        # entries.
+        clock.rightNow += 1
+        self.failureResultOf(
+            c.lookupMailExchange(b"example.com"), dns.DomainError)
+        self.assertNotIn(query, c.cache)
+
+
     def test_constructorExpires(self):
         """
         Cache entries passed into L{cache.CacheResolver.__init__} get
@@ -142,3 +162,196 @@ class Caching(unittest.TestCase):
 
         return self.assertFailure(
             c.lookupAddress(b"example.com"), dns.DomainError)
+
+
+    def _records(self, ttl, name=b"example.com"):
+        """
+        Return a 3-tuple of sections holding one A record with TTL C{ttl}.
+        """
+        return ([dns.RRHeader(name, dns.A, dns.IN, ttl,
+                              dns.Record_A("127.0.0.1", ttl))], [], [])
+
+
+    def test_maxEntries(self):
+        """
+        When the cache holds C{maxEntries} entries, adding another evicts the
+        least recently used one.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock, maxEntries=2)
+        queries = [dns.Query(name, dns.A, dns.IN)
+                   for name in (b"a.example", b"b.example", b"c.example")]
+        c.cacheResult(queries[0], self._records(60, b"a.example"))
+        c.cacheResult(queries[1], self._records(60, b"b.example"))
+        # Using the first entry makes the second the least recently used.
+        c.lookupAddress(b"a.example")
+        c.cacheResult(queries[2], self._records(60, b"c.example"))
+
+        self.assertEqual(list(c.cache), [queries[0], queries[2]])
+        self.assertEqual(c.evictions, 1)
+        self.failureResultOf(c.lookupAddress(b"b.example"), dns.DomainError)
+
+
+    def test_expiredEntriesEvictedFirst(self):
+        """
+        When the cache is full, expired entries are removed before any which
+        have not expired are evicted.
+        """
+        clock = task.Clock()
+        clock.callLater = lambda *args, **kwargs: None
+        c = cache.CacheResolver(reactor=clock, maxEntries=2)
+        c.cacheResult(dns.Query(b"a.example", dns.A, dns.IN),
+                      self._records(60, b"a.example"))
+        c.cacheResult(dns.Query(b"b.example", dns.A, dns.IN),
+                      self._records(10, b"b.example"))
+        clock.advance(20)
+        c.cacheResult(dns.Query(b"c.example", dns.A, dns.IN),
+                      self._records(60, b"c.example"))
+
+        self.assertEqual(
+            list(c.cache), [dns.Query(b"a.example", dns.A, dns.IN),
+                            dns.Query(b"c.example", dns.A, dns.IN)])
+        self.assertEqual(c.evictions, 0)
+
+
+    def test_counters(self):
+        """
+        L{cache.CacheResolver.hits} and L{cache.CacheResolver.misses} count
+        the lookups which were and were not answered from the cache.
+        """
+        c = cache.CacheResolver(reactor=task.Clock())
+        c.cacheResult(dns.Query(b"example.com", dns.A, dns.IN),
+                      self._records(60))
+        c.lookupAddress(b"example.com")
+        c.lookupAddress(b"example.com")
+        self.failureResultOf(c.lookupAddress(b"example.org"), dns.DomainError)
+        self.assertEqual((c.hits, c.misses), (2, 1))
+
+
+    def test_singleTimer(self):
+        """
+        However many entries are cached, only one timer is used to expire
+        them, and each entry is removed once its TTL has elapsed.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        for ttl in (30, 10, 20):
+            name = b"example" + str(ttl).encode("ascii")
+            c.cacheResult(dns.Query(name, dns.A, dns.IN),
+                          self._records(ttl, name))
+        self.assertEqual(len(clock.getDelayedCalls()), 1)
+        self.assertEqual(clock.getDelayedCalls()[0].getTime(), 10)
+
+        clock.advance(10)
+        self.assertEqual(
+            sorted(query.name.name for query in c.cache),
+            [b"example20", b"example30"])
+        clock.advance(10)
+        self.assertEqual(
+            [query.name.name for query in c.cache], [b"example30"])
+        clock.advance(10)
+        self.assertEqual(len(c.cache), 0)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_recachedEntry(self):
+        """
+        An entry cached again expires according to its new TTL.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(b"example.com", dns.A, dns.IN)
+        c.cacheResult(query, self._records(10))
+        clock.advance(5)
+        c.cacheResult(query, self._records(10))
+        clock.advance(5)
+        self.assertIn(query, c.cache)
+        clock.advance(5)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_resultsAreCopies(self):
+        """
+        The lists of records returned by a lookup can be changed without
+        changing the records returned by later lookups.
+        """
+        c = cache.CacheResolver(reactor=task.Clock())
+        c.cacheResult(dns.Query(b"example.com", dns.A, dns.IN),
+                      self._records(60))
+        first = self.successResultOf(c.lookupAddress(b"example.com"))
+        first[0].append(None)
+        second = self.successResultOf(c.lookupAddress(b"example.com"))
+        self.assertEqual(len(second[0]), 1)
+
+
+    def test_noDataTTL(self):
+        """
+        A result with no answers is cached for no longer than the I{minimum}
+        field of the SOA record in its authority section, as required by RFC
+        2308.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(b"example.com", dns.MX, dns.IN)
+        soa = dns.RRHeader(b"example.com", dns.SOA, dns.IN, 300,
+                           dns.Record_SOA(minimum=60, ttl=300))
+        c.cacheResult(query, ([], [soa], []))
+
+        clock.advance(30)
+        result = self.successResultOf(c.lookupMailExchange(b"example.com"))
+        self.assertEqual(result[1][0].ttl, 270)
+        clock.advance(30)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_negativeResult(self):
+        """
+        Until the TTL given by the SOA record passed to
+        L{cache.CacheResolver.cacheNegativeResult} has elapsed, lookups of the
+        query fail with L{dns.AuthoritativeDomainError}.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        query = dns.Query(b"example.com", dns.A, dns.IN)
+        soa = dns.RRHeader(b"com", dns.SOA, dns.IN, 30,
+                           dns.Record_SOA(minimum=900, ttl=30))
+        c.cacheNegativeResult(query, [soa])
+
+        self.failureResultOf(
+            c.lookupAddress(b"example.com"), dns.AuthoritativeDomainError)
+        clock.advance(30)
+        self.failureResultOf(c.lookupAddress(b"example.com"), dns.DomainError)
+        self.assertNotIn(query, c.cache)
+
+
+    def test_negativeResultWithoutSOA(self):
+        """
+        A name error without an SOA record in its authority section is not
+        cached.
+        """
+        c = cache.CacheResolver(reactor=task.Clock())
+        c.cacheNegativeResult(dns.Query(b"example.com", dns.A, dns.IN), [])
+        self.assertEqual(len(c.cache), 0)
+
+
+    def test_state(self):
+        """
+        The state of a L{cache.CacheResolver} has no timers, and an instance
+        restored from it keeps the entries which have not expired and sets a
+        new timer for them.
+        """
+        clock = task.Clock()
+        c = cache.CacheResolver(reactor=clock)
+        c.cacheResult(dns.Query(b"a.example", dns.A, dns.IN),
+                      self._records(10, b"a.example"))
+        c.cacheResult(dns.Query(b"b.example", dns.A, dns.IN),
+                      self._records(60, b"b.example"))
+        state = c.__getstate__()
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+        clock.advance(20)
+        restored = cache.CacheResolver(reactor=clock)
+        restored.__setstate__(state)
+        self.assertEqual(
+            list(restored.cache), [dns.Query(b"b.example", dns.A, dns.IN)])
+        self.assertEqual(clock.getDelayedCalls()[0].getTime(), 60)
@@ -654,6 +654,172 @@ class ResolverTests(unittest.TestCase):
         return self.assertFailure(queryResult, ExpectedException)
 
 
+    def test_raceServers(self):
+        """
+        If C{raceServers} is greater than C{1}, L{client.Resolver.queryUDP}
+        sends each attempt to that many servers at once and uses the first
+        response.  If they all time out, the next attempt goes to the next
+        servers.
+        """
+        protocol = StubDNSDatagramProtocol()
+        servers = [object(), object(), object()]
+        resolver = client.Resolver(servers=servers)
+        resolver.raceServers = 2
+        resolver._connectedProtocol = lambda: protocol
+
+        queryResult = resolver.queryUDP(None)
+        self.assertEqual(
+            servers[:2], [query[0] for query in protocol.queries])
+        protocol.queries[0][-1].errback(DNSQueryTimeoutError(0))
+        self.assertNoResult(queryResult)
+        protocol.queries[1][-1].errback(DNSQueryTimeoutError(1))
+        self.assertEqual(3, len(protocol.queries))
+        self.assertIs(servers[2], protocol.queries[2][0])
+
+        expectedResult = object()
+        protocol.queries[2][-1].callback(expectedResult)
+        self.assertIs(expectedResult, self.successResultOf(queryResult))
+
+
+    def test_raceFirstResponse(self):
+        """
+        When C{raceServers} is greater than C{1}, the first response to any of
+        the queries of an attempt is the result, and later responses are
+        ignored.
+        """
+        protocol = StubDNSDatagramProtocol()
+        resolver = client.Resolver(servers=[object(), object()])
+        resolver.raceServers = 2
+        resolver._connectedProtocol = lambda: protocol
+
+        queryResult = resolver.queryUDP(None)
+        expectedResult = object()
+        protocol.queries[1][-1].callback(expectedResult)
+        protocol.queries[0][-1].callback(object())
+        self.assertIs(expectedResult, self.successResultOf(queryResult))
+
+
+    def _adaptiveResolver(self, servers):
+        """
+        Create an adaptive resolver using a L{Clock} and a single
+        L{StubDNSDatagramProtocol}.
+
+        @return: A three-tuple of the resolver, the clock and the protocol.
+        """
+        clock = Clock()
+        protocol = StubDNSDatagramProtocol()
+        resolver = client.Resolver(servers=servers, reactor=clock)
+        resolver.adaptive = True
+        resolver._connectedProtocol = lambda: protocol
+        return resolver, clock, protocol
+
+
+    def test_adaptiveServerOrder(self):
+        """
+        If C{adaptive} is C{True}, L{client.Resolver.queryUDP} tries servers
+        in order of their smoothed round trip time, with a first timeout
+        derived from it.
+        """
+        slow, fast = ('10.0.0.1', 53), ('10.0.0.2', 53)
+        resolver, clock, protocol = self._adaptiveResolver([slow, fast])
+
+        resolver.queryUDP(None)
+        clock.advance(0.5)
+        protocol.queries.pop()[-1].callback(dns.Message())
+        resolver.queryUDP(None)
+        clock.advance(0.25)
+        protocol.queries.pop()[-1].callback(dns.Message())
+
+        self.assertEqual([0.5, 0.25], resolver._rtts[slow])
+        self.assertEqual([0.25, 0.125], resolver._rtts[fast])
+        resolver.queryUDP(None)
+        self.assertEqual(fast, protocol.queries[-1][0])
+
+        resolver._rtts[fast] = [0.02, 0.01]
+        resolver.queryUDP(None)
+        address, queries, timeout, id, result = protocol.queries[-1]
+        self.assertEqual((fast, 0.1), (address, timeout))
+
+
+    def test_adaptiveTimeout(self):
+        """
+        If C{adaptive} is C{True}, a server which times out has its smoothed
+        round trip time doubled, and only the first round of attempts uses
+        timeouts derived from round trip times.
+        """
+        server = ('10.0.0.1', 53)
+        resolver, clock, protocol = self._adaptiveResolver([server])
+        resolver._rtts[server] = [0.2, 0.1]
+
+        resolver.queryUDP(None)
+        address, queries, timeout, id, result = protocol.queries[-1]
+        self.assertAlmostEqual(0.6, timeout)
+        result.errback(DNSQueryTimeoutError(id))
+
+        self.assertAlmostEqual(0.6, resolver._rtts[server][0])
+        address, queries, timeout, id, result = protocol.queries[-1]
+        self.assertEqual(3, timeout)
+
+
+    def _pooledResolver(self, size, queries):
+        """
+        Create a resolver with a UDP port pool whose protocols are
+        L{StubDNSDatagramProtocol}s.
+
+        @return: A two-tuple of the resolver and the C{list} of protocols it
+            has created.
+        """
+        protocols = []
+        def connectedProtocol():
+            protocols.append(StubDNSDatagramProtocol())
+            return protocols[-1]
+        resolver = client.Resolver(servers=[('example.com', 53)])
+        resolver.udpPortPoolSize = size
+        resolver.udpPortQueries = queries
+        resolver._connectedProtocol = connectedProtocol
+        return resolver, protocols
+
+
+    def test_udpPortPool(self):
+        """
+        If C{udpPortPoolSize} is greater than C{0}, UDP queries are sent from
+        at most that many protocols, which stay connected between queries.
+        """
+        resolver, protocols = self._pooledResolver(2, 100)
+        for i in range(6):
+            resolver.queryUDP(None)
+        self.assertEqual(2, len(protocols))
+        self.assertEqual(6, sum([len(p.queries) for p in protocols]))
+
+        for protocol in protocols:
+            for query in protocol.queries:
+                query[-1].callback(dns.Message())
+            self.assertFalse(protocol.transport.disconnected)
+        self.assertEqual(protocols, resolver._udpPool)
+
+
+    def test_udpPortRetired(self):
+        """
+        A pooled UDP protocol is replaced once C{udpPortQueries} queries have
+        been sent from it, and is disconnected once they have all completed.
+        """
+        resolver, protocols = self._pooledResolver(1, 2)
+        resolver.queryUDP(None)
+        resolver.queryUDP(None)
+        [retired] = protocols
+        self.assertEqual([], resolver._udpPool)
+
+        resolver.queryUDP(None)
+        self.assertEqual(2, len(protocols))
+        self.assertEqual([protocols[1]], resolver._udpPool)
+
+        retired.queries[0][-1].callback(dns.Message())
+        self.assertFalse(retired.transport.disconnected)
+        retired.queries[1][-1].callback(dns.Message())
+        self.assertTrue(retired.transport.disconnected)
+        self.assertEqual([protocols[1]], resolver._udpPortState.keys())
+
+
     def test_tcpDisconnectRemovesFromConnections(self):
         """
         When a TCP DNS protocol associated with a Resolver disconnects, it is
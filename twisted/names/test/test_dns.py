@@ -10,6 +10,7 @@ from __future__ import division, absolute_import
 
 from io import BytesIO
 
+import pickle
 import struct
 
 from zope.interface.verify import verifyClass
@@ -292,6 +293,77 @@ class NameTests(unittest.TestCase):
         self.assertRaises(ValueError, name.decode, stream)
 
 
+    def test_decodeFromMessageBuffer(self):
+        """
+        L{Name.decode} decodes compressed names from a L{dns._MessageBuffer}
+        by offset, leaving the stream position at the first byte after each
+        decoded name.
+        """
+        stream = dns._MessageBuffer(
+            b"x" * 20 +
+            b"\x01f\x03isi\x04arpa\x00"
+            b"\x03foo\xc0\x14"
+            b"\x03bar\xc0\x20")
+        stream.seek(20)
+        name = dns.Name()
+        name.decode(stream)
+        self.assertEqual((b"f.isi.arpa", 32), (name.name, stream.tell()))
+        name.decode(stream)
+        self.assertEqual((b"foo.f.isi.arpa", 38), (name.name, stream.tell()))
+        name.decode(stream)
+        self.assertEqual(
+            (b"bar.foo.f.isi.arpa", 44), (name.name, stream.tell()))
+
+
+    def test_rejectCompressionLoopFromMessageBuffer(self):
+        """
+        L{Name.decode} raises L{ValueError} if a L{dns._MessageBuffer} passed
+        to it includes a compression pointer which forms a loop.
+        """
+        name = dns.Name()
+        stream = dns._MessageBuffer(b"\x03foo\xc0\x00")
+        self.assertRaises(ValueError, name.decode, stream)
+
+
+    def test_truncatedFromMessageBuffer(self):
+        """
+        L{Name.decode} raises L{EOFError} if a name in a L{dns._MessageBuffer}
+        passed to it runs past the end of the message, either in a label or
+        in a compression pointer.
+        """
+        name = dns.Name()
+        self.assertRaises(
+            EOFError, name.decode, dns._MessageBuffer(b"\x07exam"))
+        self.assertRaises(
+            EOFError, name.decode, dns._MessageBuffer(b"\x03foo"))
+        self.assertRaises(
+            EOFError, name.decode, dns._MessageBuffer(b"\x03foo\xc0"))
+        self.assertRaises(
+            EOFError, name.decode, dns._MessageBuffer(b"\x03foo\xc0\x20"))
+
+
+    def test_encodeCompressionOffsetLimit(self):
+        """
+        L{Name.encode} does not add names written beyond the offsets a
+        compression pointer can express to the compression dictionary.
+        """
+        compression = {}
+        stream = BytesIO()
+        stream.write(b"x" * 0x4000)
+        dns.Name(b"example.com").encode(stream, compression)
+        self.assertEqual({}, compression)
+
+
+    def test_pickle(self):
+        """
+        L{Name} instances can be pickled with any protocol.
+        """
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            name = pickle.loads(
+                pickle.dumps(dns.Name(b"example.com"), protocol))
+            self.assertEqual(dns.Name(b"example.com"), name)
+
+
 
 class RoundtripDNSTestCase(unittest.TestCase):
     """
@@ -333,6 +405,18 @@ class RoundtripDNSTestCase(unittest.TestCase):
                     self.assertEqual(result.type, dnstype)
                     self.assertEqual(result.cls, dnscls)
 
+
+    def test_queryPickle(self):
+        """
+        L{dns.Query} instances can be pickled with any protocol.
+        """
+        for protocol in range(pickle.HIGHEST_PROTOCOL + 1):
+            query = pickle.loads(
+                pickle.dumps(dns.Query(b'example.com', dns.MX), protocol))
+            self.assertEqual(dns.Query(b'example.com', dns.MX), query)
+            self.assertEqual(dns.MX, query.type)
+
+
     def test_resourceRecordHeader(self):
         """
         L{dns.RRHeader.encode} encodes the record header's information and
@@ -866,6 +950,44 @@ class MessageTestCase(unittest.SynchronousTestCase):
         self.assertTrue(message.answers[0].auth)
 
 
+    def test_encodedBody(self):
+        """
+        L{Message.encode} writes C{_encodedBody}, if it is set, after a header
+        whose section counts are taken from the message's record lists.
+        """
+        original = dns.Message(id=1, answer=1)
+        original.addQuery(b'example.com', dns.A)
+        original.answers.append(dns.RRHeader(
+            b'example.com', payload=dns.Record_A('1.2.3.4')))
+
+        reply = dns.Message(id=2, answer=1)
+        reply.queries = original.queries
+        reply.answers = original.answers
+        reply._encodedBody = original._encodeBody()
+
+        original.id = 2
+        self.assertEqual(original.toStr(), reply.toStr())
+
+
+    def test_compressedNamesRoundtrip(self):
+        """
+        Names compressed against the question and earlier records decode to
+        the same records when a message is decoded from bytes.
+        """
+        message = dns.Message(answer=1)
+        message.addQuery(b'example.com', dns.MX)
+        message.answers.append(dns.RRHeader(
+            b'example.com', dns.MX,
+            payload=dns.Record_MX(10, b'mail.example.com', ttl=0)))
+        message.additional.append(dns.RRHeader(
+            b'mail.example.com', payload=dns.Record_A('1.2.3.4', ttl=0)))
+        decoded = dns.Message()
+        decoded.fromStr(message.toStr())
+        self.assertEqual(message.queries, decoded.queries)
+        self.assertEqual(message.answers, decoded.answers)
+        self.assertEqual(message.additional, decoded.additional)
+
+
 
 class MessageComparisonTests(ComparisonTestsMixin,
                              unittest.SynchronousTestCase):
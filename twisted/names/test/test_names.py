@@ -606,6 +606,141 @@ class AuthorityTests(unittest.TestCase):
         self._referralTest('lookupAllRecords')
 
 
+    def test_answersIndexed(self):
+        """
+        L{FileAuthority} computes the response for a name and type once and
+        then answers later queries for them with new lists of the same
+        records.
+        """
+        address = dns.Record_A('10.0.0.1')
+        authority = NoFileAuthority(
+            soa=(str(soa_record.mname), soa_record),
+            records={'www.test-domain.com': [address]})
+        first = self.successResultOf(
+            authority.lookupAddress('www.test-domain.com'))
+        second = self.successResultOf(
+            authority.lookupAddress('www.test-domain.com'))
+        self.assertEqual(first, second)
+        self.assertIsNot(first[0], second[0])
+        self.assertIs(first[0][0], second[0][0])
+        self.assertEqual(
+            [('www.test-domain.com', dns.A)], authority._index._answers.keys())
+
+
+    def test_queryNameCase(self):
+        """
+        Records owned by the queried name are owned by it as it was given,
+        whatever the case of an earlier query for the same name.
+        """
+        address = dns.Record_A('10.0.0.1')
+        authority = NoFileAuthority(
+            soa=(str(soa_record.mname), soa_record),
+            records={'www.test-domain.com': [address]})
+        self.successResultOf(authority.lookupAddress('www.test-domain.com'))
+        answers, _, _ = self.successResultOf(
+            authority.lookupAddress('WWW.test-domain.com'))
+        self.assertEqual(
+            [dns.RRHeader('WWW.test-domain.com', ttl=soa_record.expire,
+                          payload=address, auth=True)],
+            answers)
+
+
+    def test_recordsReplaced(self):
+        """
+        Replacing the C{records} of a L{FileAuthority} discards the responses
+        computed from the old records.
+        """
+        authority = NoFileAuthority(
+            soa=(str(soa_record.mname), soa_record),
+            records={'www.test-domain.com': [dns.Record_A('10.0.0.1')]})
+        self.successResultOf(authority.lookupAddress('www.test-domain.com'))
+        address = dns.Record_A('10.0.0.2')
+        authority.records = {'www.test-domain.com': [address]}
+        answers, _, _ = self.successResultOf(
+            authority.lookupAddress('www.test-domain.com'))
+        self.assertEqual([address], [a.payload for a in answers])
+
+
+    def _wildcardAuthority(self):
+        """
+        Create an authority for I{test-domain.com} with a wildcard I{A}
+        record, an I{MX} record and a name below an empty non-terminal.
+
+        @return: A two-tuple of the authority and the wildcard record.
+        """
+        wildcard = dns.Record_A('10.0.0.1')
+        authority = NoFileAuthority(
+            soa=(str(soa_record.mname), soa_record),
+            records={
+                str(soa_record.mname): [soa_record],
+                '*.test-domain.com': [wildcard],
+                'mail.test-domain.com': [dns.Record_MX(10, 'mx.example.com')],
+                'host.empty.test-domain.com': [dns.Record_A('10.0.0.2')],
+                })
+        return authority, wildcard
+
+
+    def test_wildcard(self):
+        """
+        A query for a name in the zone which has no records of its own is
+        answered from the closest wildcard, with the queried name as owner.
+        """
+        authority, wildcard = self._wildcardAuthority()
+        for name in ['foo.test-domain.com', 'bar.foo.test-domain.com']:
+            answers, _, _ = self.successResultOf(authority.lookupAddress(name))
+            self.assertEqual(
+                [dns.RRHeader(name, ttl=soa_record.expire, payload=wildcard,
+                              auth=True)],
+                answers)
+
+
+    def test_wildcardAnswersShared(self):
+        """
+        The response computed from a wildcard is kept once, however many names
+        it answers for.
+        """
+        authority, wildcard = self._wildcardAuthority()
+        for i in range(10):
+            self.successResultOf(
+                authority.lookupAddress('host%d.test-domain.com' % (i,)))
+        self.assertEqual(
+            [('*.test-domain.com', dns.A)], authority._index._answers.keys())
+
+
+    def test_missingTypesShared(self):
+        """
+        One response is kept for all the types of which a name has no records,
+        and each of them is answered with the name's I{CNAME}.
+        """
+        cname = dns.Record_CNAME('www.example.com')
+        authority = NoFileAuthority(
+            soa=(str(soa_record.mname), soa_record),
+            records={'alias.test-domain.com': [cname]})
+        for lookup in [authority.lookupAddress, authority.lookupMailExchange,
+                       authority.lookupText]:
+            answers, _, _ = self.successResultOf(
+                lookup('alias.test-domain.com'))
+            self.assertEqual([cname], [a.payload for a in answers])
+        self.assertEqual(
+            [('alias.test-domain.com', None)],
+            authority._index._answers.keys())
+
+
+    def test_wildcardNotForExistingNames(self):
+        """
+        Wildcards do not answer for names which have records of their own, nor
+        for names below the closest existing ancestor of the queried name if
+        that ancestor has no wildcard child.
+        """
+        authority, wildcard = self._wildcardAuthority()
+        answers, _, _ = self.successResultOf(
+            authority.lookupAddress('mail.test-domain.com'))
+        self.assertEqual([], answers)
+        for name in ['empty.test-domain.com', 'foo.empty.test-domain.com']:
+            self.failureResultOf(
+                authority.lookupAddress(name), dns.AuthoritativeDomainError)
+
+
 
 class AdditionalProcessingTests(unittest.TestCase):
     """
@@ -972,3 +1107,36 @@ class SecondaryAuthorityTests(unittest.TestCase):
 
         self.assertEqual(
             [dns.Query('example.com', dns.AXFR, dns.IN)], msg.queries)
+
+
+    def test_zoneTransferUpdatesIndex(self):
+        """
+        When a zone transfer replaces the records of a L{SecondaryAuthority},
+        only the responses computed from names whose records changed are
+        forgotten.
+        """
+        soa = ('example.com', dns.Record_SOA(
+                mname='ns.example.com', rname='root.example.com',
+                minimum=100, expire=100))
+        www = dns.Record_A('10.0.0.1')
+        mail = dns.Record_A('10.0.0.2')
+        secondary = SecondaryAuthority('192.168.1.1', 'example.com')
+        secondary.soa = soa
+        secondary.records = {
+            'www.example.com': [www], 'mail.example.com': [mail]}
+        self.successResultOf(secondary.lookupAddress('www.example.com'))
+        self.successResultOf(secondary.lookupAddress('mail.example.com'))
+        index = secondary._index
+
+        newMail = dns.Record_A('10.0.0.3')
+        secondary._cbZone(([
+                    dns.RRHeader('www.example.com', payload=www),
+                    dns.RRHeader('mail.example.com', payload=newMail)],
+                [], []))
+
+        self.assertIs(index, secondary._index)
+        self.assertEqual(
+            [('www.example.com', dns.A)], index._answers.keys())
+        answers, _, _ = self.successResultOf(
+            secondary.lookupAddress('mail.example.com'))
+        self.assertEqual([newMail], [a.payload for a in answers])
@@ -10,6 +10,7 @@ from zope.interface.verify import verifyClass
 from twisted.internet import defer
 from twisted.internet.interfaces import IProtocolFactory
 from twisted.names import dns, error, resolve, server
+from twisted.names.test.test_names import NoFileAuthority
 from twisted.python import failure, log
 from twisted.trial import unittest
 
@@ -123,6 +124,23 @@ class RaisingProtocol(object):
 
 
 
+class SectionsResolver(object):
+    """
+    A partial fake L{IResolver} answering every query with the sections
+    returned by a callable.
+    """
+    def __init__(self, getSections):
+        self.getSections = getSections
+
+
+    def query(self, query, timeout=None):
+        """
+        @return: A L{Deferred} which has fired with the current sections.
+        """
+        return defer.succeed(self.getSections())
+
+
+
 class NoopProtocol(object):
     """
     A partial fake L{dns.DNSProtocolMixin} with a noop L{writeMessage} method.
@@ -923,6 +941,200 @@ class DNSServerFactoryTests(unittest.TestCase):
         self.assertIs(additional, expectedAdditional)
 
 
+    def _authoritativeRecords(self):
+        """
+        Build authoritative records answering an I{A} query for
+        I{example.com}.
+
+        @return: A three-tuple of answer, authority and additional lists.
+        """
+        return (
+            [dns.RRHeader(b'example.com', ttl=60, auth=True,
+                          payload=dns.Record_A('1.2.3.4'))],
+            [dns.RRHeader(b'example.com', dns.NS, ttl=30, auth=True,
+                          payload=dns.Record_NS(b'ns.example.com'))],
+            [])
+
+
+    def test_gotResolverResponseEncodesAuthoritative(self):
+        """
+        L{server.DNSServerFactory.gotResolverResponse} encodes an
+        authoritative response and keeps it with its records, keyed by the
+        query name, type and class.
+        """
+        f = server.DNSServerFactory()
+        request = dns.Message()
+        request.addQuery(b'example.com', dns.A)
+        ans, auth, add = self._authoritativeRecords()
+        e = self.assertRaises(
+            RaisingProtocol.WriteMessageArguments,
+            f.gotResolverResponse, (ans, auth, add),
+            protocol=RaisingProtocol(), message=request, address=None)
+        (response,), kwargs = e.args
+
+        records, body = f._encodedResponses[(b'example.com', dns.A, dns.IN)]
+        self.assertEqual((tuple(ans), tuple(auth), tuple(add)), records)
+        self.assertIs(body, response._encodedBody)
+        self.assertEqual(body, response._encodeBody())
+
+
+    def test_gotResolverResponseNonAuthoritative(self):
+        """
+        L{server.DNSServerFactory.gotResolverResponse} does not keep
+        non-authoritative responses encoded.
+        """
+        f = NoResponseDNSServerFactory()
+        request = dns.Message()
+        request.addQuery(b'example.com', dns.A)
+        answers = [dns.RRHeader(b'example.com', ttl=60,
+                                payload=dns.Record_A('1.2.3.4'))]
+        f.gotResolverResponse(
+            (answers, [], []), protocol=NoopProtocol(), message=request,
+            address=None)
+        self.assertEqual({}, dict(f._encodedResponses))
+
+
+    def _handleQuery(self, factory, name):
+        """
+        Have C{factory} handle an I{A} query for C{name}.
+
+        @return: The response it writes.
+        @rtype: L{dns.Message}
+        """
+        written = []
+        class RecordingProtocol(object):
+            def writeMessage(self, message):
+                written.append(message)
+
+        request = dns.Message(id=6)
+        request.timeReceived = 1
+        request.addQuery(name, dns.A)
+        factory.handleQuery(request, RecordingProtocol(), None)
+        [response] = written
+        return response
+
+
+    def _decoded(self, response):
+        """
+        Decode the encoded form of C{response}.
+
+        @rtype: L{dns.Message}
+        """
+        decoded = dns.Message()
+        decoded.fromStr(response.toStr())
+        return decoded
+
+
+    def test_handleQueryEncodedResponse(self):
+        """
+        When the resolver answers a query with the same records as a kept
+        encoded response, L{server.DNSServerFactory.handleQuery} replies with
+        that encoded response, which is exactly what a freshly encoded one
+        would be.
+        """
+        sections = self._authoritativeRecords()
+        f = server.DNSServerFactory(authorities=[
+                SectionsResolver(lambda: sections)])
+        first = self._handleQuery(f, b'example.com')
+        response = self._handleQuery(f, b'example.com')
+        self.assertIs(first._encodedBody, response._encodedBody)
+
+        expected = dns.Message(id=6, answer=1, auth=1)
+        expected.queries = response.queries
+        (expected.answers, expected.authority,
+         expected.additional) = self._authoritativeRecords()
+        self.assertEqual(expected.toStr(), response.toStr())
+
+
+    def test_handleQueryChangedRecords(self):
+        """
+        When the resolver answers a query with other records than those of a
+        kept encoded response, L{server.DNSServerFactory.handleQuery} replies
+        with the new records and keeps them instead.
+        """
+        sections = [self._authoritativeRecords()]
+        f = server.DNSServerFactory(authorities=[
+                SectionsResolver(lambda: sections[0])])
+        self._handleQuery(f, b'example.com')
+        sections[0] = (
+            [dns.RRHeader(b'example.com', ttl=60, auth=True,
+                          payload=dns.Record_A('5.6.7.8'))], [], [])
+        response = self._handleQuery(f, b'example.com')
+        self.assertEqual(
+            '5.6.7.8',
+            self._decoded(response).answers[0].payload.dottedQuad())
+        records, body = f._encodedResponses[(b'example.com', dns.A, dns.IN)]
+        self.assertIs(sections[0][0][0], records[0][0])
+
+
+    def test_handleQueryAuthorityChanged(self):
+        """
+        Once the records of a L{FileAuthority} are replaced,
+        L{server.DNSServerFactory.handleQuery} answers with the new records
+        even though responses with the old ones were kept encoded.
+        """
+        soa = (b'example.com', dns.Record_SOA(
+                mname=b'ns1.example.com', rname=b'root.example.com',
+                serial=1, refresh=1, retry=1, expire=3600, minimum=3600))
+        zone = NoFileAuthority(soa, {
+                b'example.com': [soa[1], dns.Record_A('1.1.1.1', ttl=3600)]})
+        f = server.DNSServerFactory(authorities=[zone])
+        response = self._handleQuery(f, b'example.com')
+        self.assertEqual(
+            '1.1.1.1', response.answers[0].payload.dottedQuad())
+
+        zone.records = {
+            b'example.com': [soa[1], dns.Record_A('2.2.2.2', ttl=3600)]}
+        response = self._handleQuery(f, b'example.com')
+        self.assertEqual(
+            '2.2.2.2',
+            self._decoded(response).answers[0].payload.dottedQuad())
+
+
+    def test_encodedResponseCacheSize(self):
+        """
+        L{server.DNSServerFactory} keeps at most C{encodedResponseCacheSize}
+        encoded responses, dropping the oldest first.
+        """
+        f = server.DNSServerFactory()
+        f.encodedResponseCacheSize = 2
+        for name in [b'a.example.com', b'b.example.com', b'c.example.com']:
+            request = dns.Message()
+            request.timeReceived = 1
+            request.addQuery(name, dns.A)
+            f.gotResolverResponse(
+                self._authoritativeRecords(), protocol=NoopProtocol(),
+                message=request, address=None)
+        self.assertEqual(
+            [b'b.example.com', b'c.example.com'],
+            [key[0] for key in f._encodedResponses])
+
+
+    def test_gotResolverErrorCachesNameError(self):
+        """
+        L{server.DNSServerFactory.gotResolverError} passes the query and the
+        authority section of the response to the cache's
+        C{cacheNegativeResult} method if the failure is a
+        L{error.DNSNameError}.
+        """
+        cached = []
+        class NegativeCache(object):
+            def cacheNegativeResult(self, query, authority):
+                cached.append((query, authority))
+
+        f = NoResponseDNSServerFactory(caches=[NegativeCache()])
+        request = dns.Message()
+        request.addQuery(b'example.com')
+        reply = dns.Message(rCode=dns.ENAME)
+        reply.authority = [dns.RRHeader(b'com', dns.SOA, ttl=60,
+                                        payload=dns.Record_SOA())]
+
+        f.gotResolverError(failure.Failure(error.DNSNameError(reply)),
+                           protocol=NoopProtocol(), message=request,
+                           address=None)
+        self.assertEqual(cached, [(request.queries[0], reply.authority)])
+
+
     def test_gotResolverErrorCallsResponseFromMessage(self):
         """
         L{server.DNSServerFactory.gotResolverError} calls
@@ -12,8 +12,12 @@ Plugin system for Twisted.
 
 import os
 import sys
+import inspect
+from hashlib import md5
+from types import NoneType
 
-from zope.interface import Interface, providedBy
+from zope.interface import Interface, providedBy, implementer
+from zope.interface import directlyProvides
 
 def _determinePickleModule():
     """
@@ -46,14 +50,74 @@ class IPlugin(Interface):
 
 
 
+def _qualifiedName(interface):
+    """
+    Return the fully qualified name of C{interface}.
+
+    @rtype: C{str}
+    """
+    return interface.__module__ + '.' + interface.__name__
+
+
+
 class CachedPlugin(object):
-    def __init__(self, dropin, name, description, provided):
+    """
+    A plugin recorded in the plugin cache.
+
+    The interfaces the plugin provides are pickled by name, so that loading
+    the cache doesn't import the modules defining them; C{provided} imports
+    them when first used.
+
+    @ivar attributes: The public attributes of the plugin whose values are
+        plain data (strings, numbers, booleans and C{None}), which the lazy
+        plugins of L{getPlugins} give without importing the plugin module.
+    @type attributes: C{dict}
+
+    @ivar _providedNames: The fully qualified names of the interfaces in
+        C{provided}.
+    @type _providedNames: C{list} of C{str}
+
+    @ivar _extendedNames: The fully qualified names of all the interfaces
+        C{provided} are or extend.
+    @type _extendedNames: C{frozenset} of C{str}
+    """
+    attributes = {}
+    _provided = None
+
+    def __init__(self, dropin, name, description, provided, attributes=None):
         self.dropin = dropin
         self.name = name
         self.description = description
         self.provided = provided
+        if attributes is not None:
+            self.attributes = attributes
         self.dropin.plugins.append(self)
 
+    def _getProvided(self):
+        if self._provided is None:
+            self._provided = [namedAny(name) for name in self._providedNames]
+        return self._provided
+
+    def _setProvided(self, provided):
+        self._provided = provided
+        self._providedNames = [_qualifiedName(i) for i in provided]
+        self._extendedNames = frozenset([
+            _qualifiedName(base) for i in provided for base in i.__iro__])
+
+    provided = property(_getProvided, _setProvided)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_provided', None)
+        return state
+
+    def _providesByName(self, interface):
+        """
+        Check whether one of the interfaces C{provided} is or extends
+        C{interface}, without importing them.
+        """
+        return _qualifiedName(interface) in self._extendedNames
+
     def __repr__(self):
         return '<CachedPlugin %r/%r (provides %r)>' % (
             self.name, self.dropin.moduleName,
@@ -75,6 +139,68 @@ class CachedPlugin(object):
 
 
 
+@implementer(IPlugin)
+class _LazyPlugin(object):
+    """
+    Stand-in for a plugin returned by L{getPlugins}, which only imports the
+    plugin module when it needs an attribute not recorded in the cache.
+
+    It provides the interface it was looked up for, gives the attributes in
+    L{CachedPlugin.attributes} from the cache, and forwards anything else to
+    the plugin once loaded.
+
+    @ivar _cachedPlugin: The plugin in the cache.
+    @type _cachedPlugin: L{CachedPlugin}
+
+    @ivar _plugin: The plugin, once loaded.
+    """
+    _plugin = None
+
+    def __init__(self, cachedPlugin, interface):
+        object.__setattr__(self, '_cachedPlugin', cachedPlugin)
+        directlyProvides(self, interface)
+
+
+    def _load(self):
+        """
+        Import the plugin module, the first time only.
+
+        @return: The plugin.
+        """
+        if self._plugin is None:
+            object.__setattr__(self, '_plugin', self._cachedPlugin.load())
+        return self._plugin
+
+
+    def __getattr__(self, name):
+        if name == '__conform__':
+            # Adaptation goes through the provided interfaces.
+            raise AttributeError(name)
+        if self._plugin is None:
+            attributes = self._cachedPlugin.attributes
+            if name in attributes:
+                return attributes[name]
+        return getattr(self._load(), name)
+
+
+    def __setattr__(self, name, value):
+        if name.startswith('__'):
+            object.__setattr__(self, name, value)
+        else:
+            setattr(self._load(), name, value)
+
+
+    def __call__(self, *args, **kwargs):
+        return self._load()(*args, **kwargs)
+
+
+    def __repr__(self):
+        if self._plugin is None:
+            return '<lazy %r>' % (self._cachedPlugin,)
+        return repr(self._plugin)
+
+
+
 class CachedDropin(object):
     """
     A collection of L{CachedPlugin} instances from a particular module in a
@@ -99,6 +225,33 @@ class CachedDropin(object):
 
 
 
+_PLAIN_TYPES = (str, unicode, int, long, float, bool, NoneType)
+
+def _plainAttributes(plugin):
+    """
+    Find the public attributes of C{plugin} whose values are plain data,
+    without calling any descriptor (such as a property) along the way.
+
+    @return: A C{dict} mapping attribute names to their values.
+    """
+    if inspect.isclass(plugin):
+        namespaces = [vars(klass) for klass in inspect.getmro(plugin)]
+    else:
+        namespaces = [getattr(plugin, '__dict__', {})] + [
+            vars(klass) for klass in inspect.getmro(plugin.__class__)]
+    attributes = {}
+    for namespace in reversed(namespaces):
+        for name, value in namespace.items():
+            if name.startswith('_'):
+                continue
+            if type(value) in _PLAIN_TYPES:
+                attributes[name] = value
+            else:
+                attributes.pop(name, None)
+    return attributes
+
+
+
 def _generateCacheEntry(provider):
     dropin = CachedDropin(provider.__name__,
                           provider.__doc__)
@@ -106,9 +259,53 @@ def _generateCacheEntry(provider):
         plugin = IPlugin(v, None)
         if plugin is not None:
             # Instantiated for its side-effects.
-            CachedPlugin(dropin, k, v.__doc__, list(providedBy(plugin)))
+            CachedPlugin(dropin, k, v.__doc__, list(providedBy(plugin)),
+                         _plainAttributes(plugin))
     return dropin
 
+
+
+class _DropinCache(dict):
+    """
+    The content of a C{dropin.cache} file: a C{dict} mapping the names of the
+    plugin modules of a directory to their L{CachedDropin}.
+
+    @ivar directoryHash: The L{_directoryHash} of the plugin modules when the
+        cache was written.
+    @type directoryHash: C{str}
+
+    @ivar version: The version of the format of the cache; a cache in
+        another format is rebuilt.
+    @type version: C{int}
+    """
+    directoryHash = None
+    version = 1
+
+    def __getstate__(self):
+        return {'directoryHash': self.directoryHash,
+                'version': self.version}
+
+
+
+def _directoryHash(pluginModules):
+    """
+    Compute a digest of the names, sizes and modification times of some
+    plugin modules, which changes whenever one of them is added, removed or
+    modified.
+
+    @param pluginModules: The plugin modules of a directory.
+    @type pluginModules: C{list} of L{twisted.python.modules.PythonModule}
+
+    @rtype: C{str}
+    """
+    digest = md5()
+    for pluginModule in sorted(pluginModules, key=lambda m: m.name):
+        filePath = pluginModule.filePath
+        digest.update('%s %r %d\n' % (
+            pluginModule.name, filePath.getModificationTime(),
+            filePath.getsize()))
+    return digest.hexdigest()
+
 try:
     fromkeys = dict.fromkeys
 except AttributeError:
@@ -148,13 +345,24 @@ def getCache(module):
         bucket.append(plugmod)
     for pseudoPackagePath, bucket in buckets.iteritems():
         dropinPath = pseudoPackagePath.child('dropin.cache')
+        directoryHash = _directoryHash(bucket)
         try:
             lastCached = dropinPath.getModificationTime()
             dropinDotCache = pickle.load(dropinPath.open('r'))
         except:
-            dropinDotCache = {}
+            dropinDotCache = _DropinCache()
             lastCached = 0
-
+        else:
+            if (not isinstance(dropinDotCache, _DropinCache) or
+                dropinDotCache.__dict__.get('version') !=
+                    _DropinCache.version):
+                # A cache in another format: start again.
+                dropinDotCache = _DropinCache()
+            elif dropinDotCache.directoryHash == directoryHash:
+                allCachesCombined.update(dropinDotCache)
+                continue
+
+        dropinDotCache.directoryHash = directoryHash
         needsWrite = False
         existingKeys = {}
         for pluginModule in bucket:
@@ -178,7 +386,7 @@ def getCache(module):
                 needsWrite = True
         if needsWrite:
             try:
-                dropinPath.setContent(pickle.dumps(dropinDotCache))
+                dropinPath.setContent(pickle.dumps(dropinDotCache, 2))
             except OSError, e:
                 log.msg(
                     format=(
@@ -192,7 +400,7 @@ def getCache(module):
 
 
 
-def getPlugins(interface, package=None):
+def getPlugins(interface, package=None, lazy=False):
     """
     Retrieve all plugins implementing the given interface beneath the given module.
 
@@ -202,6 +410,13 @@ def getPlugins(interface, package=None):
     @param package: A package beneath which plugins are installed.  For
     most uses, the default value is correct.
 
+    @param lazy: If C{True}, the plugins are given as stand-ins which only
+    import their module when an attribute not recorded in the plugin cache
+    is used, instead of the plugins themselves.  Listing plugins by name and
+    description then imports nothing.  As adapting a plugin to C{interface}
+    requires importing it, only the plugins directly providing C{interface}
+    are given in this mode.
+
     @return: An iterator of plugins.
     """
     if package is None:
@@ -209,6 +424,10 @@ def getPlugins(interface, package=None):
     allDropins = getCache(package)
     for dropin in allDropins.itervalues():
         for plugin in dropin.plugins:
+            if lazy:
+                if plugin._providesByName(interface):
+                    yield _LazyPlugin(plugin, interface)
+                continue
             try:
                 adapted = interface(plugin, None)
             except:
@@ -176,7 +176,7 @@ __metaclass__ = type
 import types, warnings
 
 from cStringIO import StringIO
-from struct import pack
+from struct import pack, unpack_from
 import decimal, datetime
 from itertools import count
 
@@ -542,7 +542,7 @@ class AmpBox(dict):
         i = self.items()
         i.sort()
         L = []
-        w = L.append
+        w = L.extend
         for k, v in i:
             if type(k) == unicode:
                 raise TypeError("Unicode key not allowed: %r" % k)
@@ -553,10 +553,8 @@ class AmpBox(dict):
                 raise TooLong(True, True, k, None)
             if len(v) > MAX_VALUE_LENGTH:
                 raise TooLong(False, True, v, k)
-            for kv in k, v:
-                w(pack("!H", len(kv)))
-                w(kv)
-        w(pack("!H", 0))
+            w((pack("!H", len(k)), k, pack("!H", len(v)), v))
+        L.append('\x00\x00')
         return ''.join(L)
 
 
@@ -1377,6 +1375,66 @@ class Path(Unicode):
 
 
 
+class BigString(String):
+    """
+    Encode a string which may be longer than L{MAX_VALUE_LENGTH}.
+
+    On the wire, the value is split into chunks of at most
+    L{MAX_VALUE_LENGTH} bytes.  The first is sent under the argument's own
+    name and each of the rest under the name followed by a dot and the
+    number of the chunk, counting from 2: C{"data"}, C{"data.2"},
+    C{"data.3"}, and so on.  A value which fits in one chunk is sent exactly
+    as L{String} would send it.
+    """
+
+    def fromBox(self, name, strings, objects, proto):
+        """
+        Join the chunks of the value and decode it.
+        """
+        st = self.retrieve(strings, name, proto)
+        nk = _wireNameToPythonIdentifier(name)
+        if self.optional and st is None:
+            objects[nk] = None
+            return
+        chunks = [st]
+        for n in count(2):
+            chunk = strings.pop('%s.%d' % (name, n), None)
+            if chunk is None:
+                break
+            chunks.append(chunk)
+        objects[nk] = self.fromStringProto(''.join(chunks), proto)
+
+
+    def toBox(self, name, strings, objects, proto):
+        """
+        Encode the value and split it into chunks.
+        """
+        obj = self.retrieve(objects, _wireNameToPythonIdentifier(name), proto)
+        if self.optional and obj is None:
+            return
+        value = self.toStringProto(obj, proto)
+        strings[name] = value[:MAX_VALUE_LENGTH]
+        offsets = xrange(MAX_VALUE_LENGTH, len(value), MAX_VALUE_LENGTH)
+        for n, offset in enumerate(offsets, 2):
+            strings['%s.%d' % (name, n)] = value[offset:offset + MAX_VALUE_LENGTH]
+
+
+
+class BigUnicode(BigString):
+    """
+    Encode a unicode string, which may be longer than L{MAX_VALUE_LENGTH} once
+    encoded, as UTF-8 in the manner of L{BigString}.
+    """
+
+    def toString(self, inObject):
+        return BigString.toString(self, inObject.encode('utf-8'))
+
+
+    def fromString(self, inString):
+        return BigString.fromString(self, inString).decode('utf-8')
+
+
+
 class ListOf(Argument):
     """
     Encode and decode lists of instances of a single other argument type.
@@ -1463,15 +1521,14 @@ class AmpList(Argument):
 
     def fromStringProto(self, inString, proto):
         boxes = parseString(inString)
-        values = [_stringsToObjects(box, self.subargs, proto)
-                  for box in boxes]
-        return values
+        parse = _ArgumentSchema(self.subargs).stringsToObjects
+        return [parse(box, proto) for box in boxes]
 
 
     def toStringProto(self, inObject, proto):
-        return ''.join([_objectsToStrings(
-                    objects, self.subargs, Box(), proto
-                    ).serialize() for objects in inObject])
+        serialize = _ArgumentSchema(self.subargs).objectsToStrings
+        return ''.join([serialize(objects, Box(), proto).serialize()
+                        for objects in inObject])
 
 
 
@@ -1541,6 +1598,104 @@ class Descriptor(Integer):
 
 
 
+class _ArgumentSchema(object):
+    """
+    An argument list, as described in L{Command.arguments}, prepared for
+    converting boxes through it quickly.
+
+    The wire name of each argument is translated to a Python identifier once,
+    here, rather than on every conversion.  If every argument in the list
+    is an L{Argument} using the default C{fromBox}, C{toBox} and
+    C{retrieve}, boxes are converted by looking each argument up in turn,
+    without copying the box or dictionary being converted.  Otherwise,
+    conversion falls back to L{_stringsToObjects} and L{_objectsToStrings},
+    which call each argument's C{fromBox} or C{toBox}.
+
+    @ivar names: A C{frozenset} of the Python identifiers of the arguments.
+
+    @ivar _simple: A list of 4-tuples of the wire name, Python identifier,
+        optional flag and L{Argument} of each argument, if they all use the
+        default methods; otherwise C{None}.
+    """
+
+    def __init__(self, arglist):
+        self._arglist = arglist
+        self.names = frozenset([
+                _wireNameToPythonIdentifier(name) for (name, ignored)
+                in arglist])
+        simple = []
+        for name, argument in arglist:
+            if not _usesDefaultBoxMethods(argument):
+                self._simple = None
+                break
+            simple.append((name, _wireNameToPythonIdentifier(name),
+                           argument.optional, argument))
+        else:
+            self._simple = simple
+
+
+    def stringsToObjects(self, strings, proto):
+        """
+        Convert an AmpBox to a dictionary of python objects, as
+        L{_stringsToObjects} does.
+        """
+        if self._simple is None:
+            return _stringsToObjects(strings, self._arglist, proto)
+        get = strings.get
+        objects = {}
+        for name, pythonName, optional, argument in self._simple:
+            st = get(name)
+            if st is None:
+                if not optional:
+                    raise KeyError(name)
+                objects[pythonName] = None
+            else:
+                objects[pythonName] = argument.fromStringProto(st, proto)
+        return objects
+
+
+    def objectsToStrings(self, objects, strings, proto):
+        """
+        Convert a dictionary of python objects to an AmpBox, as
+        L{_objectsToStrings} does.
+        """
+        if self._simple is None:
+            return _objectsToStrings(objects, self._arglist, strings, proto)
+        get = objects.get
+        for name, pythonName, optional, argument in self._simple:
+            obj = get(pythonName)
+            if obj is None:
+                if optional:
+                    continue
+                if pythonName not in objects:
+                    raise KeyError(pythonName)
+            strings[name] = argument.toStringProto(obj, proto)
+        return strings
+
+
+
+def _usesDefaultBoxMethods(argument):
+    """
+    Determine whether an argument converts boxes with the C{fromBox}, C{toBox}
+    and C{retrieve} methods of L{Argument}, so that L{_ArgumentSchema} may do
+    the same work without calling them.
+
+    @param argument: An L{IArgumentType} provider.
+
+    @rtype: C{bool}
+    """
+    if not isinstance(argument, Argument):
+        return False
+    for methodName in ['fromBox', 'toBox', 'retrieve']:
+        if methodName in vars(argument):
+            return False
+        method = getattr(type(argument), methodName)
+        if method.im_func is not getattr(Argument, methodName).im_func:
+            return False
+    return True
+
+
+
 class Command:
     """
     Subclass me to specify an AMP Command.
@@ -1580,6 +1735,12 @@ class Command:
     method must always be a dictionary adhering to the contract specified by
     L{response}, because clients are always free to request a response if they
     want one.
+
+    @cvar _argumentSchema: An L{_ArgumentSchema} for L{arguments}, made when
+        the class is defined.
+
+    @cvar _responseSchema: An L{_ArgumentSchema} for L{response}, made when
+        the class is defined.
     """
 
     class __metaclass__(type):
@@ -1603,6 +1764,8 @@ class Command:
             for v, k in fatalErrors.iteritems():
                 reverseErrors[k] = v
                 er[v] = k
+            newtype._argumentSchema = _ArgumentSchema(newtype.arguments)
+            newtype._responseSchema = _ArgumentSchema(newtype.response)
             return newtype
 
     arguments = []
@@ -1657,7 +1820,8 @@ class Command:
             responseType = cls.responseType()
         except:
             return fail()
-        return _objectsToStrings(objects, cls.response, responseType, proto)
+        return cls._responseSchema.objectsToStrings(
+            objects, responseType, proto)
     makeResponse = classmethod(makeResponse)
 
 
@@ -1674,16 +1838,12 @@ class Command:
 
         @return: An instance of this L{Command}'s C{commandType}.
         """
-        allowedNames = set()
-        for (argName, ignored) in cls.arguments:
-            allowedNames.add(_wireNameToPythonIdentifier(argName))
-
+        schema = cls._argumentSchema
         for intendedArg in objects:
-            if intendedArg not in allowedNames:
+            if intendedArg not in schema.names:
                 raise InvalidSignature(
                     "%s is not a valid argument" % (intendedArg,))
-        return _objectsToStrings(objects, cls.arguments, cls.commandType(),
-                                 proto)
+        return schema.objectsToStrings(objects, cls.commandType(), proto)
     makeArguments = classmethod(makeArguments)
 
 
@@ -1699,7 +1859,7 @@ class Command:
         @return: A mapping of response-argument names to the parsed
         forms.
         """
-        return _stringsToObjects(box, cls.response, protocol)
+        return cls._responseSchema.stringsToObjects(box, protocol)
     parseResponse = classmethod(parseResponse)
 
 
@@ -1714,7 +1874,7 @@ class Command:
 
         @return: A mapping of argument names to the parsed forms.
         """
-        return _stringsToObjects(box, cls.arguments, protocol)
+        return cls._argumentSchema.stringsToObjects(box, protocol)
     parseArguments = classmethod(parseArguments)
 
 
@@ -2079,10 +2239,27 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
 
     @ivar boxReceiver: an L{IBoxReceiver} provider, whose L{ampBoxReceived}
     method will be invoked for each L{AmpBox} that is received.
+
+    @ivar coalesceBoxes: If true, plain L{AmpBox}es sent in the same reactor
+        iteration are written to the transport together, with one call to its
+        C{writeSequence} method, at the start of the next iteration.  Boxes of
+        other types, such as L{QuitBox}, are written at once, after any held
+        back before them.  Anything which acts on the transport directly, such
+        as calling C{loseConnection} on it, should call L{flushBoxes} first.
+
+    @ivar _pendingBoxes: The serialized boxes held back to be written
+        together, if L{coalesceBoxes} is true.
+
+    @ivar _flushCall: The L{IDelayedCall} which will write the pending boxes,
+        or C{None}.
     """
 
     implements(IBoxSender)
 
+    coalesceBoxes = False
+    _pendingBoxes = ()
+    _flushCall = None
+
     _justStartedTLS = False
     _startingTLSBuffer = None
     _locked = False
@@ -2116,6 +2293,7 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
         # new protocol: luckily it's keeping that in a handy (although
         # ostensibly internal) variable for us:
         newProtoData = self.recvd
+        self.flushBoxes()
         # We're quite possibly in the middle of a 'dataReceived' loop in
         # Int16StringReceiver: let's make sure that the next iteration, the
         # loop will break and not attempt to look at something that isn't a
@@ -2149,10 +2327,38 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
             raise ConnectionLost()
         if self._startingTLSBuffer is not None:
             self._startingTLSBuffer.append(box)
+        elif self.coalesceBoxes and type(box) is AmpBox:
+            if self._flushCall is None:
+                self._pendingBoxes = []
+                self._flushCall = self.callLater(0, self.flushBoxes)
+            self._pendingBoxes.append(box.serialize())
         else:
+            self.flushBoxes()
             self.transport.write(box.serialize())
 
 
+    def flushBoxes(self):
+        """
+        Write any boxes held back because L{coalesceBoxes} is set.
+        """
+        if self._flushCall is None:
+            return
+        if self._flushCall.active():
+            self._flushCall.cancel()
+        self._flushCall = None
+        pending = self._pendingBoxes
+        self._pendingBoxes = ()
+        self.transport.writeSequence(pending)
+
+
+    def callLater(self, period, func):
+        """
+        Wrapper around L{reactor.callLater} for test purpose.
+        """
+        from twisted.internet import reactor
+        return reactor.callLater(period, func)
+
+
     def makeConnection(self, transport):
         """
         Notify L{boxReceiver} that it is about to receive boxes from this
@@ -2175,13 +2381,80 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
         if self.innerProtocol is not None:
             self.innerProtocol.dataReceived(data)
             return
-        return Int16StringReceiver.dataReceived(self, data)
+        self._parseBoxes(data)
+
+
+    def _parseBoxes(self, data):
+        """
+        Parse keys and values from the data received so far, delivering each
+        complete box to L{boxReceiver}.
+
+        This does the work of L{Int16StringReceiver.dataReceived} and of the
+        C{proto_*} states together: length prefixes are read in place, by
+        offset, and the strings after them are sliced out directly as keys or
+        values.  L{_unprocessed} and L{_compatibilityOffset} are kept up to
+        date as L{Int16StringReceiver} keeps them, so C{recvd} still gives
+        the data which follows each box as it is delivered.
+        """
+        alldata = self._unprocessed + data
+        end = len(alldata)
+        offset = 0
+        box = self._currentBox
+        key = self._currentKey
+        self._unprocessed = alldata
+
+        while end - offset >= 2 and not self.paused:
+            length, = unpack_from("!H", alldata, offset)
+            if key is None and length > self._MAX_KEY_LENGTH:
+                self._currentBox = box
+                self._currentKey = key
+                self._compatibilityOffset = offset
+                self.lengthLimitExceeded(length)
+                return
+            start = offset + 2
+            stop = start + length
+            if stop > end:
+                break
+            offset = stop
+            if key is not None:
+                box[key] = alldata[start:stop]
+                key = None
+            elif length:
+                if box is None:
+                    box = AmpBox()
+                key = alldata[start:stop]
+            else:
+                if box is None:
+                    box = AmpBox()
+                self._currentBox = None
+                self._compatibilityOffset = offset
+                self.boxReceiver.ampBoxReceived(box)
+                box = None
+                # As in Int16StringReceiver, application code (such as
+                # _switchTo) may have replaced the buffer.
+                if 'recvd' in self.__dict__:
+                    alldata = self.__dict__.pop('recvd')
+                    self._unprocessed = alldata
+                    self._compatibilityOffset = offset = 0
+                    end = len(alldata)
+                    if not alldata:
+                        return
+
+        self._currentBox = box
+        self._currentKey = key
+        self._unprocessed = alldata[offset:]
+        self._compatibilityOffset = 0
 
 
     def connectionLost(self, reason):
         """
         The connection was lost; notify any nested protocol.
         """
+        if self._flushCall is not None:
+            if self._flushCall.active():
+                self._flushCall.cancel()
+            self._flushCall = None
+            self._pendingBoxes = ()
         if self.innerProtocol is not None:
             self.innerProtocol.connectionLost(reason)
             if self.innerProtocolClientFactory is not None:
@@ -2259,6 +2532,7 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
         probably want to subclass ProtocolSwitchCommand rather than calling
         this directly.
         """
+        self.flushBoxes()
         self._locked = True
 
 
@@ -2299,6 +2573,7 @@ class BinaryBoxProtocol(StatefulStringProtocol, Int16StringReceiver,
         @param verifyAuthorities: L{twisted.internet.ssl.Certificate} instances
         representing certificate authorities which will verify our peer.
         """
+        self.flushBoxes()
         self.hostCertificate = certificate
         self._justStartedTLS = True
         if verifyAuthorities is None:
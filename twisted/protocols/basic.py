@@ -11,7 +11,7 @@ from __future__ import absolute_import, division
 
 # System imports
 import re
-from struct import pack, unpack, calcsize
+from struct import pack, unpack, unpack_from, calcsize
 from io import BytesIO
 import math
 
@@ -841,6 +841,248 @@ class Int8StringReceiver(IntNStringReceiver):
 
 
 
+class _BufferedReceiver(protocol.BufferedProtocol, object):
+    """
+    Base class for receivers which parse data in place, in a buffer they own.
+
+    Transports supporting L{interfaces.IBufferedProtocol} receive directly
+    into C{_recvBuffer}, so bytes are only copied when a complete message is
+    delivered to application code.  Subclasses implement L{_parse}.
+
+    @ivar _recvBuffer: The receive buffer, or C{None} before any data has
+        been received.
+    @type _recvBuffer: C{bytearray}
+
+    @ivar _start: The offset in C{_recvBuffer} of the first byte which has
+        not been parsed yet.
+    @type _start: C{int}
+
+    @ivar _end: The offset in C{_recvBuffer} just past the last byte
+        received.
+    @type _end: C{int}
+
+    @ivar _busyReceiving: C{True} while L{_parse} is running, so that data
+        received from within a callback is only buffered and is parsed by the
+        outer call.
+    @type _busyReceiving: C{bool}
+    """
+    _recvBuffer = None
+    _start = 0
+    _end = 0
+    _busyReceiving = False
+    bufferSize = 2 ** 16
+
+    def getBuffer(self, sizeHint):
+        """
+        Return a view on the free space at the end of the receive buffer.
+
+        The buffer is kept at C{bufferSize} bytes, unparsed data being moved
+        to its front when more space is needed, and only grows while a single
+        message does not fit in it.
+        """
+        buf = self._recvBuffer
+        start, end = self._start, self._end
+        pending = end - start
+        if not pending:
+            start = end = 0
+            if buf is not None and len(buf) > self.bufferSize:
+                # Don't hold on to the memory used for an unusually large
+                # message.
+                buf = None
+        wanted = max(1, min(sizeHint, self.bufferSize - pending))
+        if buf is None:
+            buf = bytearray(self.bufferSize)
+        elif len(buf) - end < wanted:
+            if len(buf) - pending >= wanted:
+                buf[:pending] = buf[start:end]
+            else:
+                new = bytearray(len(buf) * 2)
+                new[:pending] = buf[start:end]
+                buf = new
+            start, end = 0, pending
+        self._recvBuffer = buf
+        self._start, self._end = start, end
+        return memoryview(buf)[end:]
+
+
+    def bufferUpdated(self, nbytes):
+        """
+        Account for C{nbytes} bytes received into the buffer last returned by
+        L{getBuffer} and parse them.
+        """
+        self._end += nbytes
+        self._parse()
+
+
+    def dataReceived(self, data):
+        """
+        Copy C{data} into the receive buffer and parse it.  Calling this with
+        no data parses anything left in the buffer, for example after
+        L{resumeProducing}.
+        """
+        offset = 0
+        while offset < len(data):
+            view = self.getBuffer(len(data) - offset)
+            count = min(len(view), len(data) - offset)
+            view[:count] = data[offset:offset + count]
+            del view
+            offset += count
+            self._end += count
+        return self._parse()
+
+
+    def _takeBuffered(self):
+        """
+        Empty the receive buffer.
+
+        @return: All of the unparsed data.
+        @rtype: C{bytes}
+        """
+        data = b''
+        if self._start < self._end:
+            data = bytes(self._recvBuffer[self._start:self._end])
+        self._start = self._end = 0
+        return data
+
+
+    def _parse(self):
+        """
+        Deliver every complete message in the receive buffer.  Override this.
+        """
+        raise NotImplementedError(self._parse)
+
+
+
+class BufferedLineReceiver(_BufferedReceiver, LineReceiver):
+    """
+    A L{LineReceiver} which finds lines in place in its receive buffer.
+
+    Transports supporting L{interfaces.IBufferedProtocol} read directly into
+    the buffer, so the only copy made of received data is that of each line
+    (or chunk of raw data) passed to L{lineReceived} (or
+    L{rawDataReceived}).  Any other transport calls L{dataReceived}, which
+    behaves as L{LineReceiver.dataReceived}.
+    """
+
+    def clearLineBuffer(self):
+        """
+        Clear buffered data.
+
+        @return: All of the cleared buffered data.
+        @rtype: C{bytes}
+        """
+        return self._takeBuffered()
+
+
+    def _parse(self):
+        """
+        Translate the bytes in the receive buffer into calls to
+        L{lineReceived} or L{rawDataReceived}, depending on mode.
+        """
+        if self._busyReceiving:
+            return
+
+        try:
+            self._busyReceiving = True
+            delimiter = self.delimiter
+            while self._start < self._end and not self.paused:
+                buf, start, end = self._recvBuffer, self._start, self._end
+                if self.line_mode:
+                    index = buf.find(delimiter, start, end)
+                    if index == -1:
+                        if end - start > self.MAX_LENGTH:
+                            return self.lineLengthExceeded(
+                                self._takeBuffered())
+                        return
+                    if index - start > self.MAX_LENGTH:
+                        return self.lineLengthExceeded(self._takeBuffered())
+                    line = bytes(buf[start:index])
+                    self._start = index + len(delimiter)
+                    why = self.lineReceived(line)
+                    if (why or self.transport and
+                        self.transport.disconnecting):
+                        return why
+                else:
+                    why = self.rawDataReceived(self._takeBuffered())
+                    if why:
+                        return why
+        finally:
+            self._busyReceiving = False
+
+
+
+class BufferedIntNStringReceiver(_BufferedReceiver, IntNStringReceiver):
+    """
+    An L{IntNStringReceiver} which parses strings in place in its receive
+    buffer.
+
+    Transports supporting L{interfaces.IBufferedProtocol} read directly into
+    the buffer, so the only copy made of received data is that of each string
+    passed to L{stringReceived}.  The deprecated C{recvd} attribute is not
+    supported.
+    """
+
+    def _parse(self):
+        """
+        Convert the int prefixed strings in the receive buffer into calls to
+        L{stringReceived}.
+        """
+        if self._busyReceiving:
+            return
+
+        try:
+            self._busyReceiving = True
+            prefixLength = self.prefixLength
+            fmt = self.structFormat
+            while (self._end - self._start >= prefixLength and
+                   not self.paused):
+                buf, start = self._recvBuffer, self._start
+                length, = unpack_from(fmt, buf, start)
+                if length > self.MAX_LENGTH:
+                    self.lengthLimitExceeded(length)
+                    return
+                messageStart = start + prefixLength
+                messageEnd = messageStart + length
+                if self._end < messageEnd:
+                    break
+                packet = bytes(buf[messageStart:messageEnd])
+                self._start = messageEnd
+                self.stringReceived(packet)
+        finally:
+            self._busyReceiving = False
+
+
+
+class BufferedInt32StringReceiver(BufferedIntNStringReceiver):
+    """
+    A L{BufferedIntNStringReceiver} for int32-prefixed strings, as received
+    by L{Int32StringReceiver}.
+    """
+    structFormat = "!I"
+    prefixLength = calcsize(structFormat)
+
+
+
+class BufferedInt16StringReceiver(BufferedIntNStringReceiver):
+    """
+    A L{BufferedIntNStringReceiver} for int16-prefixed strings, as received
+    by L{Int16StringReceiver}.
+    """
+    structFormat = "!H"
+    prefixLength = calcsize(structFormat)
+
+
+
+class BufferedInt8StringReceiver(BufferedIntNStringReceiver):
+    """
+    A L{BufferedIntNStringReceiver} for int8-prefixed strings, as received
+    by L{Int8StringReceiver}.
+    """
+    structFormat = "!B"
+    prefixLength = calcsize(structFormat)
+
+
+
 class StatefulStringProtocol:
     """
     A stateful string protocol.
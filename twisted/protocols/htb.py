@@ -20,7 +20,7 @@ shaper for the Linux kernel<http://luxik.cdi.cz/~devik/qos/htb/>}.
 # time.time.  time.time, it has been pointed out, can go backwards.  Is
 # the same true of os.times?
 from time import time
-from zope.interface import implements, Interface
+from zope.interface import implementer, Interface
 
 from twisted.protocols import pcp
 
@@ -39,6 +39,11 @@ class Bucket:
         of tokens per second. If the rate is C{None}, the bucket
         drains instantaneously.
     @type rate: C{int}
+
+    @ivar _refcount: The number of users of the bucket, and of child buckets
+        not yet removed by L{HierarchicalBucketFilter.sweep}.  A bucket in
+        use is not removed from its filter.
+    @type _refcount: C{int}
     """
 
     maxburst = None
@@ -57,6 +62,8 @@ class Bucket:
         """
         self.content = 0
         self.parentBucket = parentBucket
+        if parentBucket is not None:
+            parentBucket._refcount += 1
         self.lastDrip = time()
 
 
@@ -109,6 +116,38 @@ class Bucket:
         return self.content == 0
 
 
+    def charge(self, amount):
+        """
+        Charge tokens to the L{Bucket} and its C{parentBucket}, even if they
+        don't fit.
+
+        Unlike L{add}, which refuses the tokens exceeding C{maxburst}, this
+        accounts for traffic which has already happened: the buckets go into
+        debt, and the caller is told how long to wait for them to drain
+        back to their C{maxburst}.
+
+        @param amount: The number of tokens to charge; C{0} only computes
+            the current delay.
+        @type amount: C{int}
+
+        @returns: The delay in seconds before this L{Bucket} and its
+            C{parentBucket} are within their C{maxburst}, C{0} if they
+            already are.
+        @returntype: C{float}
+        """
+        self.drip()
+        if self.parentBucket is not None:
+            delay = self.parentBucket.charge(amount)
+        else:
+            delay = 0
+        if self.rate is not None:
+            self.content += amount
+            if self.maxburst is not None and self.content > self.maxburst:
+                delay = max(delay,
+                            (self.content - self.maxburst) / float(self.rate))
+        return delay
+
+
 class IBucketFilter(Interface):
     def getBucketFor(*somethings, **some_kw):
         """
@@ -117,6 +156,7 @@ class IBucketFilter(Interface):
         @returntype: L{Bucket}
         """
 
+@implementer(IBucketFilter)
 class HierarchicalBucketFilter:
     """
     Filter things into buckets that can be nested.
@@ -127,8 +167,6 @@ class HierarchicalBucketFilter:
     @type sweepInterval: C{int}
     """
 
-    implements(IBucketFilter)
-
     bucketFactory = Bucket
     sweepInterval = None
 
@@ -151,7 +189,7 @@ class HierarchicalBucketFilter:
             self.sweep()
 
         if self.parentFilter:
-            parentBucket = self.parentFilter.getBucketFor(self, *a, **kw)
+            parentBucket = self.parentFilter.getBucketFor(*a, **kw)
         else:
             parentBucket = None
 
@@ -175,12 +213,15 @@ class HierarchicalBucketFilter:
 
     def sweep(self):
         """
-        Remove empty buckets.
+        Remove empty buckets which are not in use, by a consumer or by a
+        child bucket.
         """
-        for key, bucket in self.buckets.items():
+        for key, bucket in list(self.buckets.items()):
             bucket_is_empty = bucket.drip()
             if (bucket._refcount == 0) and bucket_is_empty:
                 del self.buckets[key]
+                if bucket.parentBucket is not None:
+                    bucket.parentBucket._refcount -= 1
 
         self.lastSweep = time()
 
@@ -192,7 +233,7 @@ class FilterByHost(HierarchicalBucketFilter):
     sweepInterval = 60 * 20
 
     def getBucketKey(self, transport):
-        return transport.getPeer()[1]
+        return transport.getPeer().host
 
 
 class FilterByServer(HierarchicalBucketFilter):
@@ -202,7 +243,17 @@ class FilterByServer(HierarchicalBucketFilter):
     sweepInterval = None
 
     def getBucketKey(self, transport):
-        return transport.getHost()[2]
+        return transport.getHost().port
+
+
+class FilterByConnection(HierarchicalBucketFilter):
+    """
+    A Hierarchical Bucket filter with a L{Bucket} for each connection.
+    """
+    sweepInterval = 60
+
+    def getBucketKey(self, transport):
+        return transport
 
 
 class ShapedConsumer(pcp.ProducerConsumerProxy):
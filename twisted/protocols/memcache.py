@@ -21,16 +21,34 @@ To connect to a server, create a factory for L{MemCacheProtocol}::
 All the operations of the memcache protocol are present, but
 L{MemCacheProtocol.set} and L{MemCacheProtocol.get} are the more important.
 
+To spread keys over several servers, use L{MemCacheClient}, which manages the
+connections itself::
+
+    from twisted.protocols.memcache import MemCacheClient, DEFAULT_PORT
+    client = MemCacheClient([("cache1", DEFAULT_PORT),
+                             ("cache2", DEFAULT_PORT)])
+    d = client.get("mykey")
+
 See U{http://code.sixapart.com/svn/memcached/trunk/server/doc/protocol.txt} for
 more information about the protocol.
 """
 
+import struct
+from bisect import bisect
 from collections import deque
+from hashlib import md5
+try:
+    from collections import OrderedDict
+except ImportError:
+    from twisted.python.util import OrderedDict
 
 from twisted.protocols.basic import LineReceiver
 from twisted.protocols.policies import TimeoutMixin
-from twisted.internet.defer import Deferred, fail, TimeoutError
+from twisted.internet.defer import Deferred, fail, succeed, TimeoutError
+from twisted.internet.defer import gatherResults, FirstError
+from twisted.internet.protocol import ClientCreator
 from twisted.python import log
+from twisted.python.failure import Failure
 
 
 
@@ -747,6 +765,559 @@ class MemCacheProtocol(LineReceiver, TimeoutMixin):
         return cmdObj._deferred
 
 
+def _ketamaPoints(name, count):
+    """
+    Compute the points of the ketama continuum owned by a server.
+
+    @param name: the name of the server, as C{"host:port"}.
+    @type name: C{str}
+
+    @param count: the number of points to compute; it is rounded down to a
+        multiple of 4, as each MD5 digest gives 4 points.
+    @type count: C{int}
+
+    @return: the points, as unsigned 32 bits integers.
+    @rtype: C{list} of C{int}
+    """
+    points = []
+    for i in xrange(count // 4):
+        points.extend(
+            struct.unpack("<4I", md5("%s-%d" % (name, i)).digest()))
+    return points
+
+
+
+def _ketamaHash(key):
+    """
+    Compute the position of C{key} on the ketama continuum.
+
+    @type key: C{str}
+    @rtype: C{int}
+    """
+    return struct.unpack("<I", md5(key).digest()[:4])[0]
+
+
+
+def _gather(deferreds):
+    """
+    Gather the results of C{deferreds}, failing with the first error raised
+    instead of a L{FirstError} wrapping it.
+
+    @rtype: L{Deferred}
+    """
+    d = gatherResults(deferreds, consumeErrors=True)
+    d.addErrback(lambda reason: reason.trap(FirstError) and
+                 reason.value.subFailure)
+    return d
+
+
+
+class _MemCacheServer(object):
+    """
+    The connections of a L{MemCacheClient} to one memcached server.
+
+    @ivar name: the name of the server, as C{"host:port"}.
+    @type name: C{str}
+
+    @ivar connections: the connected protocols.
+    @type connections: C{list} of L{MemCacheProtocol}
+
+    @ivar connecting: the number of connection attempts in progress.
+    @type connecting: C{int}
+
+    @ivar waiting: the L{Deferred}s waiting for a connection to be made.
+    @type waiting: C{deque}
+
+    @ivar failures: the number of consecutive failed requests.
+    @type failures: C{int}
+
+    @ivar ejected: whether the server is currently out of the continuum.
+    @type ejected: C{bool}
+
+    @ivar requests: the number of commands sent to the server.
+    @ivar errors: the number of commands which failed.
+    @ivar hits: the number of keys found by C{get} commands.
+    @ivar misses: the number of keys not found by C{get} commands.
+    @ivar latency: the total time spent waiting for the commands to
+        complete, in seconds.
+
+    @ivar _gets: the keys to retrieve at the next flush, with the list of
+        L{Deferred}s waiting for each, indexed by C{withIdentifier}.
+    @type _gets: C{dict} of C{OrderedDict}
+
+    @ivar _flushCall: the delayed call which sends the pending C{get}s, if
+        any.
+    @ivar _restoreCall: the delayed call which brings back an ejected
+        server, if any.
+    """
+    _flushCall = None
+    _restoreCall = None
+
+    def __init__(self, client, host, port):
+        self.client = client
+        self.host = host
+        self.port = port
+        self.name = "%s:%d" % (host, port)
+        self.connections = []
+        self.connecting = 0
+        self.waiting = deque()
+        self.failures = 0
+        self.ejected = False
+        self.requests = self.errors = self.hits = self.misses = 0
+        self.latency = 0.0
+        self._gets = {False: OrderedDict(), True: OrderedDict()}
+
+
+    def connection(self):
+        """
+        Get a connection to the server, opening a new one when all the
+        existing ones are busy and the pool isn't full.
+
+        @return: a L{Deferred} firing with the least busy connected
+            L{MemCacheProtocol}.
+        """
+        connections = [proto for proto in self.connections
+                       if not proto._disconnected]
+        self.connections = connections
+        idle = None
+        for proto in connections:
+            if idle is None or len(proto._current) < len(idle._current):
+                idle = proto
+        if ((idle is None or idle._current) and
+            len(connections) + self.connecting <
+                self.client.connectionsPerServer):
+            self._connect()
+        if idle is not None:
+            return succeed(idle)
+        d = Deferred()
+        self.waiting.append(d)
+        return d
+
+
+    def _connect(self):
+        """
+        Open a new connection to the server.
+        """
+        self.connecting += 1
+        d = self.client._connect(self.host, self.port)
+        d.addCallbacks(self._connected, self._connectionFailed)
+
+
+    def _connected(self, proto):
+        """
+        Add a new connection to the pool and hand it to the waiting requests.
+        """
+        self.connecting -= 1
+        self.connections.append(proto)
+        waiting, self.waiting = self.waiting, deque()
+        for d in waiting:
+            d.callback(proto)
+
+
+    def _connectionFailed(self, reason):
+        """
+        Fail the waiting requests once no connection attempt is left.
+        """
+        self.connecting -= 1
+        if not self.connecting:
+            waiting, self.waiting = self.waiting, deque()
+            for d in waiting:
+                d.errback(reason)
+
+
+    def call(self, method, *args):
+        """
+        Call C{method} of a connection to the server, keeping track of its
+        latency and failures.
+
+        @return: a L{Deferred} firing with the result of the command.
+        """
+        self.requests += 1
+        started = self.client._reactor.seconds()
+        d = self.connection()
+        d.addCallback(lambda proto: getattr(proto, method)(*args))
+        d.addBoth(self._completed, started)
+        return d
+
+
+    def _completed(self, result, started):
+        """
+        Record the outcome of a command, ejecting the server after
+        C{failureLimit} consecutive failures other than protocol errors.
+        """
+        self.latency += self.client._reactor.seconds() - started
+        if isinstance(result, Failure):
+            self.errors += 1
+            if not result.check(ClientError, ServerError, NoSuchCommand):
+                self.failures += 1
+                if (self.failures >= self.client.failureLimit and
+                    not self.ejected):
+                    self._eject()
+        else:
+            self.failures = 0
+        return result
+
+
+    def _eject(self):
+        """
+        Remove the server from the continuum for C{retryDelay} seconds.
+        """
+        self.ejected = True
+        self.client._buildContinuum()
+        self._restoreCall = self.client._reactor.callLater(
+            self.client.retryDelay, self._restore)
+
+
+    def _restore(self):
+        """
+        Bring back an ejected server into the continuum.
+        """
+        self._restoreCall = None
+        self.ejected = False
+        self.failures = 0
+        self.client._buildContinuum()
+
+
+    def get(self, key, withIdentifier):
+        """
+        Queue C{key} to be retrieved by the next multi-key C{get} sent to the
+        server.
+
+        @return: a L{Deferred} firing with the same result as
+            L{MemCacheProtocol.get}.
+        """
+        d = Deferred()
+        self._gets[withIdentifier].setdefault(key, []).append(d)
+        if self._flushCall is None:
+            self._flushCall = self.client._reactor.callLater(0, self._flush)
+        return d
+
+
+    def _flush(self):
+        """
+        Send the queued keys, in batches of at most C{maxBatchSize} keys.
+        """
+        self._flushCall = None
+        batchSize = self.client.maxBatchSize
+        for withIdentifier in (False, True):
+            waiting = self._gets[withIdentifier]
+            if not waiting:
+                continue
+            self._gets[withIdentifier] = OrderedDict()
+            keys = waiting.keys()
+            for i in xrange(0, len(keys), batchSize):
+                batch = keys[i:i + batchSize]
+                d = self.call("getMultiple", batch, withIdentifier)
+                d.addCallbacks(self._gotValues, self._getFailed,
+                               (batch, waiting), None, (batch, waiting))
+
+
+    def _gotValues(self, values, keys, waiting):
+        """
+        Dispatch the values of a multi-key C{get} to the requests of each key.
+        """
+        for key in keys:
+            value = values[key]
+            if value[-1] is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            for d in waiting[key]:
+                d.callback(value)
+
+
+    def _getFailed(self, reason, keys, waiting):
+        """
+        Fail the requests of all the keys of a multi-key C{get}.
+        """
+        for key in keys:
+            for d in waiting[key]:
+                d.errback(reason)
+
+
+    def metrics(self):
+        """
+        Return the counters of the server.
+
+        @rtype: C{dict}
+        """
+        return {"requests": self.requests, "errors": self.errors,
+                "hits": self.hits, "misses": self.misses,
+                "latency": self.latency, "ejected": self.ejected}
+
+
+    def disconnect(self):
+        """
+        Cancel the pending calls, fail the queued C{get}s and close all the
+        connections.
+        """
+        for call in (self._flushCall, self._restoreCall):
+            if call is not None and call.active():
+                call.cancel()
+        self._flushCall = self._restoreCall = None
+        for withIdentifier in (False, True):
+            waiting = self._gets[withIdentifier]
+            self._gets[withIdentifier] = OrderedDict()
+            self._getFailed(Failure(RuntimeError("not connected")),
+                            waiting.keys(), waiting)
+        for proto in self.connections:
+            proto.transport.loseConnection()
+        self.connections = []
+
+
+
+class MemCacheClient(object):
+    """
+    Client for a set of memcached servers, each reached through a small pool
+    of L{MemCacheProtocol} connections.
+
+    Keys are mapped to servers with ketama consistent hashing, so that adding
+    or removing a server only moves the keys it owns. Calls to L{get} made
+    during the same reactor iteration are coalesced into one multi-key
+    C{get} per server. A server whose commands fail C{failureLimit} times in
+    a row is ejected from the continuum for C{retryDelay} seconds, its keys
+    going to the next servers meanwhile.
+
+    @ivar connectionsPerServer: the maximum number of connections opened to
+        each server.
+    @type connectionsPerServer: C{int}
+
+    @ivar failureLimit: the number of consecutive failures after which a
+        server is ejected.
+    @type failureLimit: C{int}
+
+    @ivar retryDelay: the time after which an ejected server is used again,
+        in seconds.
+    @type retryDelay: C{int}
+
+    @ivar maxBatchSize: the maximum number of keys sent in one C{get}.
+    @type maxBatchSize: C{int}
+
+    @ivar pointsPerServer: the number of points of each server on the
+        continuum.
+    @type pointsPerServer: C{int}
+
+    @ivar _servers: the servers, in the order given.
+    @type _servers: C{list} of L{_MemCacheServer}
+
+    @ivar _points: the sorted points of the continuum of the servers which
+        aren't ejected.
+    @type _points: C{list} of C{int}
+
+    @ivar _owners: the server owning each point of C{_points}.
+    @type _owners: C{list} of L{_MemCacheServer}
+    """
+    connectionsPerServer = 2
+    failureLimit = 3
+    retryDelay = 30
+    maxBatchSize = 100
+    pointsPerServer = 160
+
+    def __init__(self, servers, timeOut=60, reactor=None):
+        """
+        @param servers: the servers to use, as C{(host, port)} tuples.
+        @type servers: C{list}
+
+        @param timeOut: the timeout passed to each L{MemCacheProtocol}.
+        @type timeOut: C{int}
+
+        @param reactor: the reactor used to connect and schedule calls,
+            defaulting to the global one.
+        """
+        if reactor is None:
+            from twisted.internet import reactor
+        self._reactor = reactor
+        self.timeOut = timeOut
+        self._servers = [_MemCacheServer(self, host, port)
+                         for (host, port) in servers]
+        self._buildContinuum()
+
+
+    def _connect(self, host, port):
+        """
+        Open a connection to a server.
+
+        @return: a L{Deferred} firing with the connected L{MemCacheProtocol}.
+        """
+        return ClientCreator(self._reactor, MemCacheProtocol, self.timeOut
+            ).connectTCP(host, port)
+
+
+    def _buildContinuum(self):
+        """
+        Compute the continuum of the servers which aren't ejected.
+        """
+        points = []
+        for server in self._servers:
+            if not server.ejected:
+                points.extend([
+                    (point, server) for point in
+                    _ketamaPoints(server.name, self.pointsPerServer)])
+        points.sort(key=lambda (point, server): point)
+        self._points = [point for (point, server) in points]
+        self._owners = [server for (point, server) in points]
+
+
+    def _serverFor(self, key):
+        """
+        Find the server owning C{key}.
+
+        @return: the first server at or after the position of C{key} on the
+            continuum, or C{None} if all the servers are ejected.
+        @rtype: L{_MemCacheServer}
+        """
+        if not self._points:
+            return None
+        index = bisect(self._points, _ketamaHash(key))
+        if index == len(self._points):
+            index = 0
+        return self._owners[index]
+
+
+    def _call(self, key, method, *args):
+        """
+        Call C{method} with C{args} on a connection to the server owning
+        C{key}.
+        """
+        if not isinstance(key, str):
+            return fail(ClientError(
+                "Invalid type for key: %s, expecting a string" % (type(key),)))
+        server = self._serverFor(key)
+        if server is None:
+            return fail(RuntimeError("no server available"))
+        return server.call(method, key, *args)
+
+
+    def get(self, key, withIdentifier=False):
+        """
+        Get the given C{key} from the server owning it. The keys requested in
+        the same reactor iteration are retrieved with one command per server.
+
+        @see: L{MemCacheProtocol.get}
+        """
+        if not isinstance(key, str):
+            return fail(ClientError(
+                "Invalid type for key: %s, expecting a string" % (type(key),)))
+        if len(key) > MemCacheProtocol.MAX_KEY_LENGTH:
+            return fail(ClientError("Key too long"))
+        server = self._serverFor(key)
+        if server is None:
+            return fail(RuntimeError("no server available"))
+        return server.get(key, withIdentifier)
+
+
+    def getMultiple(self, keys, withIdentifier=False):
+        """
+        Get the given list of C{keys}, sending one command to each server
+        owning some of them.
+
+        @see: L{MemCacheProtocol.getMultiple}
+        """
+        keys = list(keys)
+        d = _gather([self.get(key, withIdentifier) for key in keys])
+        d.addCallback(lambda values: dict(zip(keys, values)))
+        return d
+
+
+    def set(self, key, val, flags=0, expireTime=0):
+        """
+        @see: L{MemCacheProtocol.set}
+        """
+        return self._call(key, "set", val, flags, expireTime)
+
+
+    def add(self, key, val, flags=0, expireTime=0):
+        """
+        @see: L{MemCacheProtocol.add}
+        """
+        return self._call(key, "add", val, flags, expireTime)
+
+
+    def replace(self, key, val, flags=0, expireTime=0):
+        """
+        @see: L{MemCacheProtocol.replace}
+        """
+        return self._call(key, "replace", val, flags, expireTime)
+
+
+    def checkAndSet(self, key, val, cas, flags=0, expireTime=0):
+        """
+        @see: L{MemCacheProtocol.checkAndSet}
+        """
+        return self._call(key, "checkAndSet", val, cas, flags, expireTime)
+
+
+    def append(self, key, val):
+        """
+        @see: L{MemCacheProtocol.append}
+        """
+        return self._call(key, "append", val)
+
+
+    def prepend(self, key, val):
+        """
+        @see: L{MemCacheProtocol.prepend}
+        """
+        return self._call(key, "prepend", val)
+
+
+    def increment(self, key, val=1):
+        """
+        @see: L{MemCacheProtocol.increment}
+        """
+        return self._call(key, "increment", val)
+
+
+    def decrement(self, key, val=1):
+        """
+        @see: L{MemCacheProtocol.decrement}
+        """
+        return self._call(key, "decrement", val)
+
+
+    def delete(self, key):
+        """
+        @see: L{MemCacheProtocol.delete}
+        """
+        return self._call(key, "delete")
+
+
+    def flushAll(self):
+        """
+        Flush all cached values of the servers which aren't ejected.
+
+        @return: a deferred that will be called back with C{True} when all
+            the servers have been flushed.
+        @rtype: L{Deferred}
+        """
+        d = _gather([server.call("flushAll")
+                     for server in self._servers if not server.ejected])
+        d.addCallback(lambda results: True)
+        return d
+
+
+    def metrics(self):
+        """
+        Return the counters of each server: the number of C{requests} and
+        C{errors}, the C{hits} and C{misses} of C{get}s, the total
+        C{latency} of the commands in seconds and whether the server is
+        C{ejected}.
+
+        @return: the counters, indexed by C{"host:port"}.
+        @rtype: C{dict} of C{dict}
+        """
+        return dict([(server.name, server.metrics())
+                     for server in self._servers])
+
+
+    def disconnect(self):
+        """
+        Close all the connections and cancel the pending calls.
+        """
+        for server in self._servers:
+            server.disconnect()
+
+
 
-__all__ = ["MemCacheProtocol", "DEFAULT_PORT", "NoSuchCommand", "ClientError",
-           "ServerError"]
+__all__ = ["MemCacheProtocol", "MemCacheClient", "DEFAULT_PORT",
+           "NoSuchCommand", "ClientError", "ServerError"]
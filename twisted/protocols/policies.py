@@ -189,28 +189,114 @@ class WrappingFactory(ClientFactory):
 class ThrottlingProtocol(ProtocolWrapper):
     """
     Protocol for L{ThrottlingFactory}.
+
+    @ivar _readBucket: the L{twisted.protocols.htb.Bucket} charged for the
+        data received, if the factory has a C{readFilter}.
+    @ivar _writeBucket: the L{twisted.protocols.htb.Bucket} charged for the
+        data written, if the factory has a C{writeFilter}.
+    @ivar _unthrottleReadsID: the delayed call resuming the reads throttled
+        by C{_readBucket}, if any.
+    @ivar _unthrottleWritesID: the delayed call resuming the writes
+        throttled by C{_writeBucket}, if any.
     """
+    producer = None
+    _readBucket = None
+    _writeBucket = None
+    _unthrottleReadsID = None
+    _unthrottleWritesID = None
+
+    def makeConnection(self, transport):
+        if self.factory.readFilter is not None:
+            self._readBucket = self.factory.readFilter.getBucketFor(transport)
+            self._readBucket._refcount += 1
+        if self.factory.writeFilter is not None:
+            self._writeBucket = self.factory.writeFilter.getBucketFor(
+                transport)
+            self._writeBucket._refcount += 1
+        ProtocolWrapper.makeConnection(self, transport)
+
 
     # wrap API for tracking bandwidth
 
     def write(self, data):
         self.factory.registerWritten(len(data))
         ProtocolWrapper.write(self, data)
+        if self._writeBucket is not None:
+            self._chargeWrites(len(data))
 
 
     def writeSequence(self, seq):
-        self.factory.registerWritten(sum(map(len, seq)))
+        length = sum(map(len, seq))
+        self.factory.registerWritten(length)
         ProtocolWrapper.writeSequence(self, seq)
+        if self._writeBucket is not None:
+            self._chargeWrites(length)
 
 
     def dataReceived(self, data):
         self.factory.registerRead(len(data))
+        if self._readBucket is not None:
+            self._chargeReads(len(data))
         ProtocolWrapper.dataReceived(self, data)
 
 
+    def _chargeReads(self, length):
+        """
+        Charge C{length} bytes to the read bucket, pausing the transport
+        until the bucket has drained if it went over its burst size.
+        """
+        delay = self._readBucket.charge(length)
+        if delay and self._unthrottleReadsID is None:
+            self.throttleReads()
+            self._unthrottleReadsID = self.factory.callLater(
+                delay, self._bucketUnthrottleReads)
+
+
+    def _bucketUnthrottleReads(self):
+        """
+        Resume reading, unless other connections sharing a parent bucket
+        filled it again meanwhile.
+        """
+        delay = self._readBucket.charge(0)
+        if delay:
+            self._unthrottleReadsID = self.factory.callLater(
+                delay, self._bucketUnthrottleReads)
+        else:
+            self._unthrottleReadsID = None
+            self.unthrottleReads()
+
+
+    def _chargeWrites(self, length):
+        """
+        Charge C{length} bytes to the write bucket, pausing the producer
+        until the bucket has drained if it went over its burst size.
+        """
+        delay = self._writeBucket.charge(length)
+        if delay and self._unthrottleWritesID is None:
+            self.throttleWrites()
+            self._unthrottleWritesID = self.factory.callLater(
+                delay, self._bucketUnthrottleWrites)
+
+
+    def _bucketUnthrottleWrites(self):
+        """
+        Resume the producer, unless other connections sharing a parent
+        bucket filled it again meanwhile.
+        """
+        delay = self._writeBucket.charge(0)
+        if delay:
+            self._unthrottleWritesID = self.factory.callLater(
+                delay, self._bucketUnthrottleWrites)
+        else:
+            self._unthrottleWritesID = None
+            self.unthrottleWrites()
+
+
     def registerProducer(self, producer, streaming):
         self.producer = producer
         ProtocolWrapper.registerProducer(self, producer, streaming)
+        if self._unthrottleWritesID is not None:
+            self.throttleWrites()
 
 
     def unregisterProducer(self):
@@ -227,15 +313,26 @@ class ThrottlingProtocol(ProtocolWrapper):
 
 
     def throttleWrites(self):
-        if hasattr(self, "producer"):
+        if self.producer is not None:
             self.producer.pauseProducing()
 
 
     def unthrottleWrites(self):
-        if hasattr(self, "producer"):
+        if self.producer is not None:
             self.producer.resumeProducing()
 
 
+    def connectionLost(self, reason):
+        for call in (self._unthrottleReadsID, self._unthrottleWritesID):
+            if call is not None:
+                call.cancel()
+        self._unthrottleReadsID = self._unthrottleWritesID = None
+        for bucket in (self._readBucket, self._writeBucket):
+            if bucket is not None:
+                bucket._refcount -= 1
+        ProtocolWrapper.connectionLost(self, reason)
+
+
 
 class ThrottlingFactory(WrappingFactory):
     """
@@ -243,17 +340,41 @@ class ThrottlingFactory(WrappingFactory):
 
     Write bandwidth will only be throttled if there is a producer
     registered.
+
+    C{readLimit} and C{writeLimit} cap the total bandwidth of all the
+    connections: the bytes are counted over each second, and all the
+    connections are paused together once a limit is exceeded.
+
+    C{readFilter} and C{writeFilter} instead shape each connection with the
+    L{twisted.protocols.htb.Bucket} their
+    L{twisted.protocols.htb.IBucketFilter} gives for its transport. Every
+    read or write is charged to the bucket and its parents (for
+    example a bucket per connection, nested in a bucket per peer, nested in
+    a global bucket), and only the connection which takes a bucket over
+    its burst size is paused, for exactly as long as the bucket takes to
+    drain.
+
+    @ivar readFilter: the filter giving the bucket of each connection for
+        the data received, or C{None}.
+    @type readFilter: L{twisted.protocols.htb.IBucketFilter}
+
+    @ivar writeFilter: the filter giving the bucket of each connection for
+        the data written, or C{None}.
+    @type writeFilter: L{twisted.protocols.htb.IBucketFilter}
     """
 
     protocol = ThrottlingProtocol
 
     def __init__(self, wrappedFactory, maxConnectionCount=sys.maxsize,
-                 readLimit=None, writeLimit=None):
+                 readLimit=None, writeLimit=None, readFilter=None,
+                 writeFilter=None):
         WrappingFactory.__init__(self, wrappedFactory)
         self.connectionCount = 0
         self.maxConnectionCount = maxConnectionCount
         self.readLimit = readLimit # max bytes we should read per second
         self.writeLimit = writeLimit # max bytes we should write per second
+        self.readFilter = readFilter
+        self.writeFilter = writeFilter
         self.readThisSecond = 0
         self.writtenThisSecond = 0
         self.unthrottleReadsID = None
@@ -17,7 +17,7 @@ from twisted.python.compat import _PY3, iterbytes
 from twisted.trial import unittest
 from twisted.protocols import basic
 from twisted.internet import protocol, error, task
-from twisted.internet.interfaces import IProducer
+from twisted.internet.interfaces import IProducer, IBufferedProtocol
 from twisted.test import proto_helpers
 
 _PY3NEWSTYLESKIP = "All classes are new style on Python 3."
@@ -1087,6 +1087,323 @@ class Int8TestCase(unittest.SynchronousTestCase, IntNTestCaseMixin, RecvdAttribu
 
 
 
+def receiveInto(proto, data):
+    """
+    Deliver C{data} to an L{IBufferedProtocol} provider the way a transport
+    reading directly into its buffer would.
+    """
+    while data:
+        view = proto.getBuffer(len(data))
+        count = min(len(view), len(data))
+        view[:count] = data[:count]
+        del view
+        proto.bufferUpdated(count)
+        data = data[count:]
+
+
+
+class BufferedLineTester(LineTester, basic.BufferedLineReceiver):
+    """
+    A L{LineTester} which parses lines in place.
+    """
+
+
+
+class BufferedLargeLineCatcher(ExcessivelyLargeLineCatcher,
+                               basic.BufferedLineReceiver):
+    """
+    An L{ExcessivelyLargeLineCatcher} which parses lines in place.
+    """
+
+
+
+class BufferedLineReceiverTests(unittest.SynchronousTestCase):
+    """
+    Tests for L{basic.BufferedLineReceiver}.
+    """
+
+    def getProtocol(self, clock=None):
+        """
+        Return a new L{BufferedLineTester} connected to a new
+        L{proto_helpers.StringTransport}.
+        """
+        proto = BufferedLineTester(clock)
+        proto.makeConnection(proto_helpers.StringTransport())
+        return proto
+
+
+    def test_interface(self):
+        """
+        L{basic.BufferedLineReceiver} provides L{IBufferedProtocol}.
+        """
+        self.assertTrue(verifyObject(IBufferedProtocol,
+                                     basic.BufferedLineReceiver()))
+
+
+    def test_buffer(self):
+        """
+        Lines and raw data passed to L{basic.BufferedLineReceiver.dataReceived}
+        in pieces of any size are delivered as by L{basic.LineReceiver}.
+        """
+        for packetSize in range(1, 10):
+            proto = self.getProtocol()
+            data = LineReceiverTestCase.buffer
+            for i in range(0, len(data), packetSize):
+                proto.dataReceived(data[i:i + packetSize])
+            self.assertEqual(LineReceiverTestCase.output, proto.received)
+
+
+    def test_bufferUpdated(self):
+        """
+        Data received directly into the buffer returned by
+        L{basic.BufferedLineReceiver.getBuffer} is parsed when
+        L{basic.BufferedLineReceiver.bufferUpdated} is called.
+        """
+        for packetSize in range(1, 10):
+            proto = self.getProtocol()
+            data = LineReceiverTestCase.buffer
+            for i in range(0, len(data), packetSize):
+                receiveInto(proto, data[i:i + packetSize])
+            self.assertEqual(LineReceiverTestCase.output, proto.received)
+
+
+    def test_bufferReused(self):
+        """
+        Once the data in it has been parsed, the receive buffer is reused for
+        the next read.
+        """
+        proto = self.getProtocol()
+        receiveInto(proto, b'hello\n')
+        buf = proto._recvBuffer
+        receiveInto(proto, b'world\n')
+        self.assertIs(buf, proto._recvBuffer)
+        self.assertEqual([b'hello', b'world'], proto.received)
+
+
+    def test_largeLine(self):
+        """
+        The receive buffer grows to hold a line longer than
+        L{basic.BufferedLineReceiver.bufferSize}, and is released once that
+        line has been delivered.
+        """
+        proto = self.getProtocol()
+        proto.bufferSize = 16
+        proto.MAX_LENGTH = 1000
+        line = b'x' * 100
+        for i in range(0, len(line), 7):
+            receiveInto(proto, line[i:i + 7])
+        receiveInto(proto, b'\n')
+        self.assertEqual([line], proto.received)
+        self.assertTrue(len(proto._recvBuffer) > proto.bufferSize)
+        receiveInto(proto, b'y\n')
+        self.assertEqual(proto.bufferSize, len(proto._recvBuffer))
+        self.assertEqual([line, b'y'], proto.received)
+
+
+    def test_pausing(self):
+        """
+        No lines are delivered while a L{basic.BufferedLineReceiver} is
+        paused, and buffered lines are delivered when it is resumed.
+        """
+        clock = task.Clock()
+        proto = self.getProtocol(clock)
+        receiveInto(proto, LineReceiverTestCase.pauseBuf)
+        self.assertEqual(LineReceiverTestCase.pauseOutput1, proto.received)
+        clock.advance(0)
+        self.assertEqual(LineReceiverTestCase.pauseOutput2, proto.received)
+
+
+    def test_rawPausing(self):
+        """
+        No raw data is delivered while a L{basic.BufferedLineReceiver} is
+        paused.
+        """
+        clock = task.Clock()
+        proto = self.getProtocol(clock)
+        proto.dataReceived(LineReceiverTestCase.rawpauseBuf)
+        self.assertEqual(LineReceiverTestCase.rawpauseOutput1, proto.received)
+        clock.advance(0)
+        self.assertEqual(LineReceiverTestCase.rawpauseOutput2, proto.received)
+
+
+    def test_reentrantDataReceived(self):
+        """
+        Data passed to L{basic.BufferedLineReceiver.dataReceived} by
+        C{lineReceived} is parsed after the current line has been handled.
+        """
+        class ReentrantReceiver(basic.BufferedLineReceiver):
+            def connectionMade(self):
+                self.lines = []
+
+            def lineReceived(self, line):
+                self.lines.append(line)
+                if line == b'first':
+                    self.dataReceived(b'injected\r\n')
+
+        proto = ReentrantReceiver()
+        proto.makeConnection(proto_helpers.StringTransport())
+        receiveInto(proto, b'first\r\nsecond\r\n')
+        self.assertEqual([b'first', b'second', b'injected'], proto.lines)
+
+
+    def test_clearLineBuffer(self):
+        """
+        L{basic.BufferedLineReceiver.clearLineBuffer} removes all buffered data
+        and returns it as C{bytes}.
+        """
+        class ClearingReceiver(basic.BufferedLineReceiver):
+            def lineReceived(self, line):
+                self.line = line
+                self.rest = self.clearLineBuffer()
+
+        proto = ClearingReceiver()
+        receiveInto(proto, b'foo\r\nbar\r\nbaz')
+        self.assertEqual(proto.line, b'foo')
+        self.assertEqual(proto.rest, b'bar\r\nbaz')
+        proto.dataReceived(b'quux\r\n')
+        self.assertEqual(proto.line, b'quux')
+        self.assertEqual(proto.rest, b'')
+
+
+    def test_longUnendedLine(self):
+        """
+        If more than C{MAX_LENGTH} bytes arrive without a delimiter, all of
+        them are passed to C{lineLengthExceeded}.
+        """
+        proto = BufferedLargeLineCatcher()
+        proto.MAX_LENGTH = 6
+        proto.makeConnection(proto_helpers.StringTransport())
+        excessive = b'x' * (proto.MAX_LENGTH * 2 + 2)
+        receiveInto(proto, b'x\r\n' + excessive)
+        self.assertEqual([excessive], proto.longLines)
+
+
+    def test_maximumLineLength(self):
+        """
+        L{basic.BufferedLineReceiver} disconnects the transport if it receives
+        a line longer than its C{MAX_LENGTH}.
+        """
+        proto = basic.BufferedLineReceiver()
+        transport = proto_helpers.StringTransport()
+        proto.makeConnection(transport)
+        receiveInto(proto, b'x' * (proto.MAX_LENGTH + 1) + b'\r\nr')
+        self.assertTrue(transport.disconnecting)
+
+
+
+class BufferedIntNTestCaseMixin(IntNTestCaseMixin):
+    """
+    Tests for L{basic.BufferedIntNStringReceiver} subclasses, in addition to
+    those run for L{basic.IntNStringReceiver}.
+    """
+
+    def test_interface(self):
+        """
+        The protocol provides L{IBufferedProtocol}.
+        """
+        self.assertTrue(verifyObject(IBufferedProtocol, self.getProtocol()))
+
+
+    def test_bufferUpdated(self):
+        """
+        Strings received directly into the buffer returned by C{getBuffer},
+        one byte at a time, are delivered to C{stringReceived}.
+        """
+        r = self.getProtocol()
+        for s in self.strings:
+            for c in iterbytes(struct.pack(r.structFormat, len(s)) + s):
+                receiveInto(r, c)
+        self.assertEqual(r.received, self.strings)
+
+
+    def test_manyStrings(self):
+        """
+        All of the strings received in a single read are delivered.
+        """
+        r = self.getProtocol()
+        receiveInto(r, b''.join(
+            struct.pack(r.structFormat, len(s)) + s for s in self.strings))
+        self.assertEqual(r.received, self.strings)
+
+
+    def test_pausing(self):
+        """
+        Strings are not delivered while the protocol is paused, and are
+        delivered when it is resumed.
+        """
+        r = self.getProtocol()
+        def stringReceived(receivedString):
+            r.received.append(receivedString)
+            r.pauseProducing()
+        r.stringReceived = stringReceived
+        receiveInto(r, b''.join(
+            struct.pack(r.structFormat, len(s)) + s for s in self.strings))
+        self.assertEqual(r.received, self.strings[:1])
+        r.resumeProducing()
+        self.assertEqual(r.received, self.strings)
+
+
+
+class TestBufferedInt32(TestMixin, basic.BufferedInt32StringReceiver):
+    """
+    A L{basic.BufferedInt32StringReceiver} storing received strings in an
+    array.
+    """
+
+
+
+class BufferedInt32TestCase(unittest.SynchronousTestCase,
+                            BufferedIntNTestCaseMixin):
+    """
+    Tests for L{basic.BufferedInt32StringReceiver}.
+    """
+    protocol = TestBufferedInt32
+    strings = [b"a", b"b" * 16]
+    illegalStrings = [b"\x10\x00\x00\x00aaaaaa"]
+    partialStrings = [b"\x00\x00\x00", b"hello there", b""]
+
+
+
+class TestBufferedInt16(TestMixin, basic.BufferedInt16StringReceiver):
+    """
+    A L{basic.BufferedInt16StringReceiver} storing received strings in an
+    array.
+    """
+
+
+
+class BufferedInt16TestCase(unittest.SynchronousTestCase,
+                            BufferedIntNTestCaseMixin):
+    """
+    Tests for L{basic.BufferedInt16StringReceiver}.
+    """
+    protocol = TestBufferedInt16
+    strings = [b"a", b"b" * 16]
+    illegalStrings = [b"\x10\x00aaaaaa"]
+    partialStrings = [b"\x00", b"hello there", b""]
+
+
+
+class TestBufferedInt8(TestMixin, basic.BufferedInt8StringReceiver):
+    """
+    A L{basic.BufferedInt8StringReceiver} storing received strings in an
+    array.
+    """
+
+
+
+class BufferedInt8TestCase(unittest.SynchronousTestCase,
+                           BufferedIntNTestCaseMixin):
+    """
+    Tests for L{basic.BufferedInt8StringReceiver}.
+    """
+    protocol = TestBufferedInt8
+    strings = [b"a", b"b" * 16]
+    illegalStrings = [b"\x00\x00aaaaaa"]
+    partialStrings = [b"\x08", b"dzadz", b""]
+
+
+
 class OnlyProducerTransport(object):
     # Transport which isn't really a transport, just looks like one to
     # someone not looking very hard.
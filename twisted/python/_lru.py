@@ -0,0 +1,170 @@
+# -*- test-case-name: twisted.python.test.test_lru -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+A mapping which keeps track of the order in which its keys were last used,
+for caches which evict their least recently used entries.
+
+Unlike C{collections.OrderedDict}, this is available on Python 2.6, and
+marking a key as used and removing the least recently used key are both
+constant time operations.
+"""
+
+from __future__ import division, absolute_import
+
+from collections import deque
+from itertools import count
+
+
+
+class LRUDict(object):
+    """
+    A mapping whose keys are ordered from the least to the most recently set
+    or L{touch}ed.
+
+    @ivar _items: A C{dict} mapping each key to a 2-tuple of the serial number
+        it was last used with and its value.
+
+    @ivar _order: A C{deque} of C{(serial, key)} 2-tuples, oldest first.
+        Tuples whose serial number is no longer that of their key, because it
+        has since been used again or removed, are left in place and skipped.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._order = deque()
+        self._serial = count()
+
+
+    def __getstate__(self):
+        return {'items': self.items()}
+
+
+    def __setstate__(self, state):
+        self.__init__()
+        for key, value in state['items']:
+            self[key] = value
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def __contains__(self, key):
+        return key in self._items
+
+
+    def __iter__(self):
+        for serial, key in list(self._order):
+            entry = self._items.get(key)
+            if entry is not None and entry[0] == serial:
+                yield key
+
+
+    def __getitem__(self, key):
+        return self._items[key][1]
+
+
+    def __setitem__(self, key, value):
+        self._use(key, value)
+
+
+    def __delitem__(self, key):
+        del self._items[key]
+        self._compact()
+
+
+    def get(self, key, default=None):
+        """
+        Get the value of a key, without marking it as used.
+
+        @param key: The key to look up.
+        @param default: The value to return if C{key} is missing.
+        """
+        entry = self._items.get(key)
+        if entry is None:
+            return default
+        return entry[1]
+
+
+    def pop(self, key, *default):
+        """
+        Remove a key and return its value.
+
+        @param key: The key to remove.
+        @param default: The value to return if C{key} is missing.  If it is
+            not given, L{KeyError} is raised instead.
+        """
+        try:
+            value = self._items.pop(key)[1]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        self._compact()
+        return value
+
+
+    def touch(self, key):
+        """
+        Mark a key as the most recently used.
+
+        @param key: A key of this mapping.
+        @raise KeyError: If C{key} is missing.
+        """
+        self._use(key, self._items[key][1])
+
+
+    def popOldest(self):
+        """
+        Remove the least recently used key.
+
+        @return: A 2-tuple of the key and its value.
+        @raise KeyError: If the mapping is empty.
+        """
+        items = self._items
+        order = self._order
+        while order:
+            serial, key = order.popleft()
+            entry = items.get(key)
+            if entry is not None and entry[0] == serial:
+                del items[key]
+                return key, entry[1]
+        raise KeyError("popOldest(): LRUDict is empty")
+
+
+    def items(self):
+        """
+        @return: A C{list} of the C{(key, value)} 2-tuples of this mapping,
+            least recently used first.
+        """
+        return [(key, self._items[key][1]) for key in self]
+
+
+    def clear(self):
+        """
+        Remove every key.
+        """
+        self._items.clear()
+        self._order.clear()
+
+
+    def _use(self, key, value):
+        """
+        Set the value of a key and mark it as the most recently used.
+        """
+        serial = next(self._serial)
+        self._items[key] = (serial, value)
+        self._order.append((serial, key))
+        self._compact()
+
+
+    def _compact(self):
+        """
+        Drop the stale tuples of C{_order} once they outnumber the keys.
+        """
+        if len(self._order) > 2 * len(self._items) + 64:
+            items = self._items
+            self._order = deque(sorted(
+                    (serial, key) for (key, (serial, value)) in items.items()))
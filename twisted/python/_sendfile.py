@@ -0,0 +1,78 @@
+# -*- test-case-name: twisted.python.test.test_sendfile -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Access to the sendfile(2) system call, which copies data from a file to a
+socket without passing it through user space.
+
+On Python 3 this is L{os.sendfile}.  On Python 2 it is available on Linux,
+through ctypes.  Importing this module raises L{ImportError} if neither is
+available.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+import sys
+
+__all__ = ["sendfile"]
+
+
+if getattr(os, "sendfile", None) is not None:
+    sendfile = os.sendfile
+else:
+    if not sys.platform.startswith("linux"):
+        raise ImportError("sendfile(2) is not supported on this platform.")
+
+    import ctypes
+    import ctypes.util
+
+    _name = ctypes.util.find_library("c")
+    if not _name:
+        raise ImportError("Can't find C library.")
+    _libc = ctypes.CDLL(_name, use_errno=True)
+
+    # Use the explicitly 64 bit version so that offsets into large files work
+    # on 32 bit platforms too.
+    _sendfile64 = getattr(_libc, "sendfile64", None)
+    if _sendfile64 is None:
+        raise ImportError("libc does not provide sendfile64.")
+    _sendfile64.argtypes = [
+        ctypes.c_int, ctypes.c_int, ctypes.POINTER(ctypes.c_int64),
+        ctypes.c_size_t]
+    _sendfile64.restype = ctypes.c_ssize_t
+
+
+    def sendfile(outFD, inFD, offset, count):
+        """
+        Copy up to C{count} bytes from C{inFD}, starting at C{offset}, to
+        C{outFD}.
+
+        This has the same signature and behavior as L{os.sendfile} on Linux.
+
+        @param outFD: The descriptor to write to, typically a socket.
+        @type outFD: C{int}
+
+        @param inFD: The descriptor of the file to read from.
+        @type inFD: C{int}
+
+        @param offset: The position in C{inFD} to start reading at.  The file
+            position of C{inFD} is not changed.
+        @type offset: C{int}
+
+        @param count: The maximum number of bytes to copy.
+        @type count: C{int}
+
+        @raise OSError: If the system call fails.
+
+        @return: The number of bytes copied, which is C{0} at the end of the
+            file.
+        @rtype: C{int}
+        """
+        position = ctypes.c_int64(offset)
+        result = _sendfile64(outFD, inFD, ctypes.byref(position), count)
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return result
@@ -0,0 +1,117 @@
+# -*- test-case-name: twisted.python.test.test_writev -*-
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Access to the writev(2) system call, which writes several buffers to a file
+descriptor at once without first copying them into a single string.
+
+On Python 3 this is L{os.writev}.  On Python 2 it is available on POSIX
+platforms, through ctypes.  Importing this module raises L{ImportError} if
+neither is available.
+"""
+
+from __future__ import division, absolute_import
+
+import os
+
+__all__ = ["writev", "IOV_MAX"]
+
+
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = -1
+if IOV_MAX <= 0:
+    # POSIX requires at least this many.
+    IOV_MAX = 16
+
+
+
+if getattr(os, "writev", None) is not None:
+    def writev(fd, buffers, offset=0):
+        """
+        Write C{buffers}, skipping the first C{offset} bytes of the first of
+        them, to C{fd}.
+
+        @param fd: The descriptor to write to.
+        @type fd: C{int}
+
+        @param buffers: The objects to write, at most L{IOV_MAX} of them.
+        @type buffers: C{list} of C{bytes} or other buffers
+
+        @param offset: The number of bytes at the start of C{buffers[0]}
+            which have already been written.
+        @type offset: C{int}
+
+        @raise OSError: If the system call fails.
+
+        @return: The number of bytes written.
+        @rtype: C{int}
+        """
+        if offset:
+            buffers = [memoryview(buffers[0])[offset:]] + buffers[1:]
+        return os.writev(fd, buffers)
+else:
+    if os.name != "posix":
+        raise ImportError("writev(2) is not supported on this platform.")
+
+    import ctypes
+    import ctypes.util
+
+    _name = ctypes.util.find_library("c")
+    if not _name:
+        raise ImportError("Can't find C library.")
+    _libc = ctypes.CDLL(_name, use_errno=True)
+
+    class _iovec(ctypes.Structure):
+        _fields_ = [("iov_base", ctypes.c_void_p),
+                    ("iov_len", ctypes.c_size_t)]
+
+    _writev = _libc.writev
+    _writev.argtypes = [ctypes.c_int, ctypes.POINTER(_iovec), ctypes.c_int]
+    _writev.restype = ctypes.c_ssize_t
+
+
+    def writev(fd, buffers, offset=0):
+        """
+        Write C{buffers}, skipping the first C{offset} bytes of the first of
+        them, to C{fd}.
+
+        This behaves as the Python 3 version, which uses L{os.writev}.  Only
+        C{bytes} are written without being copied.
+
+        @param fd: The descriptor to write to.
+        @type fd: C{int}
+
+        @param buffers: The objects to write, at most L{IOV_MAX} of them.
+        @type buffers: C{list} of C{bytes} or other buffers
+
+        @param offset: The number of bytes at the start of C{buffers[0]}
+            which have already been written.
+        @type offset: C{int}
+
+        @raise OSError: If the system call fails.
+
+        @return: The number of bytes written.
+        @rtype: C{int}
+        """
+        vectors = (_iovec * len(buffers))()
+        # Keep references to any copies made below until the call returns.
+        keep = []
+        for i, data in enumerate(buffers):
+            if not isinstance(data, bytes):
+                if isinstance(data, memoryview):
+                    data = data.tobytes()
+                else:
+                    data = bytes(data)
+                keep.append(data)
+            start = offset if i == 0 else 0
+            vectors[i].iov_base = ctypes.cast(
+                ctypes.c_char_p(data), ctypes.c_void_p).value + start
+            vectors[i].iov_len = len(data) - start
+        result = _writev(fd, vectors, len(buffers))
+        if result < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        return result
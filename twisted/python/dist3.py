@@ -64,6 +64,7 @@ modules = [
     "twisted.internet.test._posixifaces",
     "twisted.internet.test.reactormixins",
     "twisted.internet.threads",
+    "twisted.internet.timerwheel",
     "twisted.internet.udp",
     "twisted.internet.utils",
     "twisted.names",
@@ -79,6 +80,8 @@ modules = [
     "twisted.names._version",
     "twisted.protocols",
     "twisted.protocols.basic",
+    "twisted.protocols.htb",
+    "twisted.protocols.pcp",
     "twisted.protocols.policies",
     "twisted.protocols.test",
     "twisted.protocols.tls",
@@ -97,6 +100,7 @@ modules = [
     "twisted.python.randbytes",
     "twisted.python.reflect",
     "twisted.python.runtime",
+    "twisted.python._sendfile",
     "twisted.python.test",
     "twisted.python.test.deprecatedattributes",
     "twisted.python.test.modules_helpers",
@@ -104,6 +108,7 @@ modules = [
     "twisted.python.threadpool",
     "twisted.python.util",
     "twisted.python.versions",
+    "twisted.python._writev",
     "twisted.test",
     "twisted.test.proto_helpers",
     "twisted.test.iosim",
@@ -153,6 +158,7 @@ testModules = [
     "twisted.internet.test.test_sigchld",
     "twisted.internet.test.test_tcp",
     "twisted.internet.test.test_threads",
+    "twisted.internet.test.test_timerwheel",
     "twisted.internet.test.test_tls",
     "twisted.internet.test.test_udp",
     "twisted.internet.test.test_udp_internals",
@@ -169,8 +175,10 @@ testModules = [
     "twisted.python.test.test_deprecate",
     "twisted.python.test.test_dist3",
     "twisted.python.test.test_runtime",
+    "twisted.python.test.test_sendfile",
     "twisted.python.test.test_util",
     "twisted.python.test.test_versions",
+    "twisted.python.test.test_writev",
     "twisted.test.test_abstract",
     "twisted.test.test_compat",
     "twisted.test.test_context",
@@ -0,0 +1,143 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._lru}.
+"""
+
+from __future__ import division, absolute_import
+
+import pickle
+
+from twisted.trial.unittest import TestCase
+
+from twisted.python._lru import LRUDict
+
+
+
+class LRUDictTests(TestCase):
+    """
+    Tests for L{LRUDict}.
+    """
+    def test_empty(self):
+        """
+        A new L{LRUDict} has no keys, and L{LRUDict.popOldest} raises
+        L{KeyError}.
+        """
+        d = LRUDict()
+        self.assertEqual(len(d), 0)
+        self.assertEqual(list(d), [])
+        self.assertRaises(KeyError, d.popOldest)
+
+
+    def test_setOrder(self):
+        """
+        Keys are iterated in the order they were last set, and setting a key
+        again moves it last.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d['b'] = 2
+        d['c'] = 3
+        d['a'] = 4
+        self.assertEqual(list(d), ['b', 'c', 'a'])
+        self.assertEqual(d.items(), [('b', 2), ('c', 3), ('a', 4)])
+        self.assertEqual(len(d), 3)
+
+
+    def test_touch(self):
+        """
+        L{LRUDict.touch} moves a key last without changing its value, and
+        raises L{KeyError} for a missing key.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d['b'] = 2
+        d.touch('a')
+        self.assertEqual(d.items(), [('b', 2), ('a', 1)])
+        self.assertRaises(KeyError, d.touch, 'c')
+
+
+    def test_get(self):
+        """
+        L{LRUDict.get} and item access return the value of a key without
+        changing the order.
+        """
+        d = LRUDict()
+        d['a'] = None
+        d['b'] = 2
+        self.assertIdentical(d.get('a', 1), None)
+        self.assertEqual(d['b'], 2)
+        self.assertEqual(d.get('c', 3), 3)
+        self.assertRaises(KeyError, lambda: d['c'])
+        self.assertEqual(list(d), ['a', 'b'])
+
+
+    def test_remove(self):
+        """
+        L{LRUDict.pop} and C{del} remove a key.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d['b'] = 2
+        d['c'] = 3
+        self.assertEqual(d.pop('b'), 2)
+        del d['a']
+        self.assertEqual(d.pop('b', None), None)
+        self.assertRaises(KeyError, d.pop, 'b')
+        self.assertNotIn('a', d)
+        self.assertIn('c', d)
+        self.assertEqual(list(d), ['c'])
+
+
+    def test_popOldest(self):
+        """
+        L{LRUDict.popOldest} removes and returns the least recently used key
+        and its value, skipping keys which were since used again or removed.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d['b'] = 2
+        d['c'] = 3
+        d.touch('a')
+        del d['b']
+        self.assertEqual(d.popOldest(), ('c', 3))
+        self.assertEqual(d.popOldest(), ('a', 1))
+        self.assertRaises(KeyError, d.popOldest)
+
+
+    def test_compaction(self):
+        """
+        Using the same keys repeatedly does not keep growing the ordering
+        index, and keeps the order.
+        """
+        d = LRUDict()
+        for i in range(1000):
+            d[i % 3] = i
+        self.assertTrue(len(d._order) <= 2 * len(d) + 65)
+        self.assertEqual(d.items(), [(1, 997), (2, 998), (0, 999)])
+
+
+    def test_clear(self):
+        """
+        L{LRUDict.clear} removes every key.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d.clear()
+        self.assertEqual(len(d), 0)
+        self.assertEqual(list(d), [])
+
+
+    def test_pickle(self):
+        """
+        An L{LRUDict} can be pickled, and keeps its order.
+        """
+        d = LRUDict()
+        d['a'] = 1
+        d['b'] = 2
+        d.touch('a')
+        restored = pickle.loads(pickle.dumps(d))
+        self.assertEqual(restored.items(), [('b', 2), ('a', 1)])
+        restored['c'] = 3
+        self.assertEqual(list(restored), ['b', 'a', 'c'])
@@ -0,0 +1,70 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._sendfile}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import socket
+
+from twisted.trial.unittest import TestCase
+
+try:
+    from twisted.python._sendfile import sendfile
+except ImportError:
+    sendfile = None
+
+
+
+class SendfileTests(TestCase):
+    """
+    Tests for L{sendfile}.
+    """
+    if sendfile is None:
+        skip = "sendfile(2) is not available on this platform."
+
+    def setUp(self):
+        self.content = b"0123456789" * 100
+        path = self.mktemp()
+        with open(path, "wb") as fileObject:
+            fileObject.write(self.content)
+        self.fileObject = open(path, "rb")
+        self.addCleanup(self.fileObject.close)
+        self.reader, self.writer = socket.socketpair()
+        self.addCleanup(self.reader.close)
+        self.addCleanup(self.writer.close)
+
+
+    def test_sendsRange(self):
+        """
+        L{sendfile} copies C{count} bytes starting at C{offset} and returns the
+        number of bytes copied, without changing the file's position.
+        """
+        sent = sendfile(
+            self.writer.fileno(), self.fileObject.fileno(), 15, 100)
+        self.assertEqual(sent, 100)
+        self.assertEqual(self.reader.recv(1000), self.content[15:115])
+        self.assertEqual(self.fileObject.tell(), 0)
+
+
+    def test_endOfFile(self):
+        """
+        L{sendfile} returns C{0} when C{offset} is at the end of the file.
+        """
+        self.assertEqual(
+            sendfile(self.writer.fileno(), self.fileObject.fileno(),
+                     len(self.content), 10),
+            0)
+
+
+    def test_error(self):
+        """
+        L{sendfile} raises L{OSError} with the error code if the call fails,
+        for example because a descriptor is not open.
+        """
+        exc = self.assertRaises(
+            OSError, sendfile, self.writer.fileno(), 12345, 0, 10)
+        self.assertEqual(exc.errno, errno.EBADF)
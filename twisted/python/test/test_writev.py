@@ -0,0 +1,76 @@
+# Copyright (c) Twisted Matrix Laboratories.
+# See LICENSE for details.
+
+"""
+Tests for L{twisted.python._writev}.
+"""
+
+from __future__ import division, absolute_import
+
+import errno
+import os
+
+from twisted.trial.unittest import TestCase
+
+try:
+    from twisted.python._writev import writev, IOV_MAX
+except ImportError:
+    writev = None
+
+
+
+class WritevTests(TestCase):
+    """
+    Tests for L{writev}.
+    """
+    if writev is None:
+        skip = "writev(2) is not available on this platform."
+
+    def setUp(self):
+        self.reader, self.writer = os.pipe()
+        self.addCleanup(os.close, self.reader)
+        self.addCleanup(os.close, self.writer)
+
+
+    def test_iovMax(self):
+        """
+        L{IOV_MAX} is at least the minimum value allowed by POSIX.
+        """
+        self.assertTrue(IOV_MAX >= 16)
+
+
+    def test_writesAll(self):
+        """
+        L{writev} writes all of the given buffers, in order, and returns the
+        number of bytes written.
+        """
+        written = writev(self.writer, [b"abc", b"", b"defg", b"h"])
+        self.assertEqual(written, 8)
+        self.assertEqual(os.read(self.reader, 100), b"abcdefgh")
+
+
+    def test_offset(self):
+        """
+        L{writev} skips the first C{offset} bytes of the first buffer.
+        """
+        written = writev(self.writer, [b"abc", b"def"], 2)
+        self.assertEqual(written, 4)
+        self.assertEqual(os.read(self.reader, 100), b"cdef")
+
+
+    def test_otherBuffers(self):
+        """
+        L{writev} accepts objects other than C{bytes} supporting the buffer
+        interface.
+        """
+        written = writev(self.writer, [bytearray(b"abc"), memoryview(b"def")])
+        self.assertEqual(written, 6)
+        self.assertEqual(os.read(self.reader, 100), b"abcdef")
+
+
+    def test_error(self):
+        """
+        L{writev} raises L{OSError} with the error code if the call fails.
+        """
+        exc = self.assertRaises(OSError, writev, self.reader, [b"abc"])
+        self.assertEqual(exc.errno, errno.EBADF)
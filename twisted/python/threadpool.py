@@ -12,11 +12,13 @@ instead of creating a thread pool directly.
 from __future__ import division, absolute_import
 
 try:
-    from Queue import Queue
+    from Queue import PriorityQueue, Empty
 except ImportError:
-    from queue import Queue
+    from queue import PriorityQueue, Empty
 import contextlib
+import itertools
 import threading
+import time
 import copy
 
 from twisted.python import log, context, failure
@@ -24,6 +26,17 @@ from twisted.python import log, context, failure
 
 WorkerStop = object()
 
+# Workers are told to stop only once all queued work has been done.
+_STOP_PRIORITY = float("inf")
+
+
+
+class ThreadPoolFull(Exception):
+    """
+    Work was refused because the queue of a L{ThreadPool} already held as many
+    calls as its C{maxQueued} allows.
+    """
+
 
 class ThreadPool:
     """
@@ -34,37 +47,87 @@ class ThreadPool:
     a single thread, unless you make a subclass where L{stop} and
     L{_startSomeWorkers} are synchronized.
 
+    Calls are queued by priority, and in the order they were made within a
+    priority.  If C{maxQueued} is set, calls made while that many are waiting
+    for a worker raise L{ThreadPoolFull}, so that producers can be told to
+    back off instead of the queue growing without bound.  If C{idleTimeout}
+    is set, workers beyond the minimum exit after waiting that long for
+    work, so that the pool grows as soon as it is busy but only shrinks once
+    it has stayed quiet.
+
     @ivar started: Whether or not the thread pool is currently running.
     @type started: L{bool}
     @ivar threads: List of workers currently running in this thread pool.
     @type threads: L{list}
+
+    @ivar maxQueued: The largest number of calls which may wait for a worker,
+        or C{0} for no limit.
+    @type maxQueued: C{int}
+
+    @ivar idleTimeout: The number of seconds after which an idle worker
+        exits if there are more than the minimum, or C{None} to keep them.
+    @type idleTimeout: C{float}
+
+    @ivar completed: The number of calls which have been run.
+    @type completed: C{int}
+
+    @ivar rejected: The number of calls refused with L{ThreadPoolFull}.
+    @type rejected: C{int}
+
+    @ivar waitTime: The total number of seconds calls spent queued.
+    @type waitTime: C{float}
+
+    @ivar serviceTime: The total number of seconds spent running calls.
+    @type serviceTime: C{float}
     """
     min = 5
     max = 20
+    maxQueued = 0
+    idleTimeout = None
     joined = False
     started = False
     workers = 0
     name = None
+    completed = rejected = 0
+    waitTime = serviceTime = 0.0
 
     threadFactory = threading.Thread
     currentThread = staticmethod(threading.currentThread)
+    _now = staticmethod(time.time)
 
-    def __init__(self, minthreads=5, maxthreads=20, name=None):
+    def __init__(self, minthreads=5, maxthreads=20, name=None,
+                 maxQueued=0, idleTimeout=None):
         """
         Create a new threadpool.
 
         @param minthreads: minimum number of threads in the pool
         @param maxthreads: maximum number of threads in the pool
+        @param name: The name to give the threads of the pool.
+        @param maxQueued: The largest number of calls which may wait for a
+            worker, or C{0} for no limit.
+        @param idleTimeout: The number of seconds after which idle workers
+            beyond C{minthreads} exit, or C{None} to keep them.
         """
         assert minthreads >= 0, 'minimum is negative'
         assert minthreads <= maxthreads, 'minimum is greater than maximum'
-        self.q = Queue(0)
+        self.q = PriorityQueue(0)
         self.min = minthreads
         self.max = maxthreads
         self.name = name
+        self.maxQueued = maxQueued
+        self.idleTimeout = idleTimeout
         self.waiters = []
         self.threads = []
         self.working = []
+        self._serial = itertools.count()
+        # The number of calls in the queue, which unlike its size does not
+        # include WorkerStop.
+        self._queued = 0
+        # Guards the worker count, and the counters, which workers change.
+        # Calls are queued under it too, so that an idle worker cannot exit
+        # between the queueing of a call and the check for a worker to run
+        # it.
+        self._lock = threading.RLock()
 
 
     def start(self):
@@ -78,7 +141,8 @@ class ThreadPool:
 
 
     def startAWorker(self):
-        self.workers += 1
+        with self._lock:
+            self.workers += 1
         name = "PoolThread-%s-%s" % (self.name or id(self), self.workers)
         newThread = self.threadFactory(target=self._worker, name=name)
         self.threads.append(newThread)
@@ -86,27 +150,69 @@ class ThreadPool:
 
 
     def stopAWorker(self):
-        self.q.put(WorkerStop)
-        self.workers -= 1
+        with self._lock:
+            self._put(_STOP_PRIORITY, WorkerStop)
+            self.workers -= 1
 
 
     def __setstate__(self, state):
         self.__dict__ = state
-        ThreadPool.__init__(self, self.min, self.max)
+        ThreadPool.__init__(self, self.min, self.max,
+                            maxQueued=self.maxQueued,
+                            idleTimeout=self.idleTimeout)
 
 
     def __getstate__(self):
         state = {}
         state['min'] = self.min
         state['max'] = self.max
+        state['maxQueued'] = self.maxQueued
+        state['idleTimeout'] = self.idleTimeout
         return state
 
 
+    def _put(self, priority, item):
+        """
+        Queue an item for the workers.
+
+        @param priority: Items with lower priorities are taken first.
+
+        @param item: A tuple describing a call, or L{WorkerStop}.
+        """
+        self.q.put((priority, next(self._serial), item))
+
+
+    def _get(self):
+        """
+        Wait for an item from the queue.
+
+        If C{idleTimeout} passes while there are more workers than the
+        minimum and nothing to do, L{WorkerStop} is returned instead, and the
+        worker is no longer counted.
+        """
+        while True:
+            try:
+                item = self.q.get(timeout=self.idleTimeout)[2]
+            except Empty:
+                with self._lock:
+                    # Work queued since the timeout must still be picked up,
+                    # since it may have been counted on this worker.
+                    if self.workers > self.min and not self.q.qsize():
+                        self.workers -= 1
+                        return WorkerStop
+            else:
+                if item is not WorkerStop:
+                    with self._lock:
+                        self._queued -= 1
+                return item
+
+
     def _startSomeWorkers(self):
-        neededSize = self.q.qsize() + len(self.working)
-        # Create enough, but not too many
-        while self.workers < min(self.max, neededSize):
-            self.startAWorker()
+        with self._lock:
+            neededSize = self._queued + len(self.working)
+            # Create enough, but not too many
+            while self.workers < min(self.max, neededSize):
+                self.startAWorker()
 
 
     def callInThread(self, func, *args, **kw):
@@ -151,14 +257,38 @@ class ThreadPool:
         @param *args: positional arguments to be passed to C{func}
 
         @param **kwargs: keyword arguments to be passed to C{func}
+
+        @raise ThreadPoolFull: If C{maxQueued} calls are already waiting.
+        """
+        self.callInThreadWithPriority(0, onResult, func, *args, **kw)
+
+
+    def callInThreadWithPriority(self, priority, onResult, func, *args, **kw):
+        """
+        Call a callable object in a separate thread, like
+        L{callInThreadWithCallback}, before queued calls of a higher
+        C{priority}.
+
+        @param priority: The priority of the call: calls with lower values
+            are run first, and C{0} is the priority of calls made with
+            L{callInThreadWithCallback}.
+        @type priority: C{int}
+
+        @raise ThreadPoolFull: If C{maxQueued} calls are already waiting.
         """
         if self.joined:
             return
         ctx = context.theContextTracker.currentContext().contexts[-1]
-        o = (ctx, func, args, kw, onResult)
-        self.q.put(o)
-        if self.started:
-            self._startSomeWorkers()
+        o = (ctx, func, args, kw, onResult, self._now())
+        with self._lock:
+            if self.maxQueued and self._queued >= self.maxQueued:
+                self.rejected += 1
+                raise ThreadPoolFull(
+                    "%d calls are already queued" % (self.maxQueued,))
+            self._put(priority, o)
+            self._queued += 1
+            if self.started:
+                self._startSomeWorkers()
 
 
     @contextlib.contextmanager
@@ -186,12 +316,13 @@ class ThreadPool:
         threadpool is stopped.
         """
         ct = self.currentThread()
-        o = self.q.get()
+        o = self._get()
         while o is not WorkerStop:
             with self._workerState(self.working, ct):
-                ctx, function, args, kwargs, onResult = o
+                ctx, function, args, kwargs, onResult, queuedAt = o
                 del o
 
+                started = self._now()
                 try:
                     result = context.call(ctx, function, *args, **kwargs)
                     success = True
@@ -204,6 +335,12 @@ class ThreadPool:
                         result = failure.Failure()
 
                 del function, args, kwargs
+                finished = self._now()
+
+            with self._lock:
+                self.completed += 1
+                self.waitTime += started - queuedAt
+                self.serviceTime += finished - started
 
             if onResult is not None:
                 try:
@@ -214,7 +351,7 @@ class ThreadPool:
             del ctx, onResult, result
 
             with self._workerState(self.waiters, ct):
-                o = self.q.get()
+                o = self._get()
 
         self.threads.remove(ct)
 
@@ -226,9 +363,10 @@ class ThreadPool:
         self.joined = True
         self.started = False
         threads = copy.copy(self.threads)
-        while self.workers:
-            self.q.put(WorkerStop)
-            self.workers -= 1
+        with self._lock:
+            while self.workers:
+                self._put(_STOP_PRIORITY, WorkerStop)
+                self.workers -= 1
 
         # and let's just make sure
         # FIXME: threads that have died before calling stop() are not joined.
@@ -260,8 +398,31 @@ class ThreadPool:
         self._startSomeWorkers()
 
 
+    def stats(self):
+        """
+        Describe the load on the pool.
+
+        @return: A C{dict} with the number of calls C{queued} for a worker,
+            the numbers of C{working} and C{idle} workers and of C{workers} in
+            all, and the C{completed}, C{rejected}, C{waitTime} and
+            C{serviceTime} counters.
+        """
+        with self._lock:
+            return {
+                'queued': self._queued,
+                'working': len(self.working),
+                'idle': len(self.waiters),
+                'workers': self.workers,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'waitTime': self.waitTime,
+                'serviceTime': self.serviceTime,
+                }
+
+
     def dumpStats(self):
         log.msg('queue: %s'   % self.q.queue)
         log.msg('waiters: %s' % self.waiters)
         log.msg('workers: %s' % self.working)
         log.msg('total: %s'   % self.threads)
+        log.msg('stats: %s'   % self.stats())
@@ -87,6 +87,10 @@ class ProcessMonitor(service.Service):
     @ivar maxRestartDelay: The maximum time (in seconds) to wait before
         attempting to restart a process.  Default 3600s (1h).
 
+    @type workingDirectories: C{dict}
+    @ivar workingDirectories: A mapping from the names of processes to the
+        directories to run them in, for those added with a C{path}.
+
     @type _reactor: L{IReactorProcess} provider
     @ivar _reactor: A provider of L{IReactorProcess} and L{IReactorTime}
         which will be used to spawn processes and register delayed calls.
@@ -102,6 +106,7 @@ class ProcessMonitor(service.Service):
         self._reactor = reactor
 
         self.processes = {}
+        self.workingDirectories = {}
         self.protocols = {}
         self.delay = {}
         self.timeStarted = {}
@@ -120,7 +125,7 @@ class ProcessMonitor(service.Service):
         return dct
 
 
-    def addProcess(self, name, args, uid=None, gid=None, env={}):
+    def addProcess(self, name, args, uid=None, gid=None, env={}, path=None):
         """
         Add a new monitored process and start it immediately if the
         L{ProcessMonitor} service is running.
@@ -142,12 +147,17 @@ class ProcessMonitor(service.Service):
         @param env: The environment to give to the launched process. See
             L{IReactorProcess.spawnProcess}'s C{env} parameter.
         @type env: C{dict}
+        @param path: The directory to run the process in.  If C{None}, the
+            current directory is used.
+        @type path: C{str}
         @raises: C{KeyError} if a process with the given name already
             exists
         """
         if name in self.processes:
             raise KeyError("remove %s first" % (name,))
         self.processes[name] = args, uid, gid, env
+        if path is not None:
+            self.workingDirectories[name] = path
         self.delay[name] = self.minRestartDelay
         if self.running:
             self.startProcess(name)
@@ -163,6 +173,7 @@ class ProcessMonitor(service.Service):
         """
         self.stopProcess(name)
         del self.processes[name]
+        self.workingDirectories.pop(name, None)
 
 
     def startService(self):
@@ -248,8 +259,9 @@ class ProcessMonitor(service.Service):
         proto.name = name
         self.protocols[name] = proto
         self.timeStarted[name] = self._reactor.seconds()
+        path = self.workingDirectories.get(name)
         self._reactor.spawnProcess(proto, args[0], args, uid=uid,
-                                          gid=gid, env=env)
+                                          gid=gid, env=env, path=path)
 
 
     def _forceStopProcess(self, proc):
@@ -293,6 +305,34 @@ class ProcessMonitor(service.Service):
             self.stopProcess(name)
 
 
+    def rollingRestart(self, interval):
+        """
+        Restart all processes one at a time, C{interval} seconds apart.
+
+        Unlike L{restartAll}, this leaves all but one of the processes running
+        at any time, so that servers sharing a listening port keep accepting
+        connections while they are upgraded.
+
+        @param interval: The number of seconds between stopping one process
+            and stopping the next.
+        @type interval: C{float}
+        """
+        for i, name in enumerate(sorted(self.processes)):
+            self._reactor.callLater(i * interval, self._restartProcess, name)
+
+
+    def _restartProcess(self, name):
+        """
+        Stop the named process, if it is still monitored, so that it is
+        restarted.
+
+        @type name: C{str}
+        @param name: A string that uniquely identifies the process.
+        """
+        if self.running and name in self.processes:
+            self.stopProcess(name)
+
+
     def __repr__(self):
         l = []
         for name, proc in self.processes.items():
@@ -186,6 +186,32 @@ class ProcmonTests(unittest.TestCase):
             self.reactor.spawnedProcesses[0]._environment, fakeEnv)
 
 
+    def test_addProcessPath(self):
+        """
+        L{ProcessMonitor.addProcess} takes a C{path} parameter, the directory
+        to run the process in, which is passed to
+        L{IReactorProcess.spawnProcess}.
+        """
+        self.pm.startService()
+        self.pm.addProcess("foo", ["foo"], path="/var/run/foo")
+        self.pm.addProcess("bar", ["bar"])
+        self.reactor.advance(0)
+        self.assertEqual(
+            sorted((proc._args[0], proc._path)
+                   for proc in self.reactor.spawnedProcesses),
+            [("bar", None), ("foo", "/var/run/foo")])
+
+
+    def test_removeProcessPath(self):
+        """
+        L{ProcessMonitor.removeProcess} forgets the directory the process was
+        run in.
+        """
+        self.pm.addProcess("foo", ["foo"], path="/var/run/foo")
+        self.pm.removeProcess("foo")
+        self.assertEqual(self.pm.workingDirectories, {})
+
+
     def test_removeProcess(self):
         """
         L{ProcessMonitor.removeProcess} removes the process from the public
@@ -475,3 +501,44 @@ class ProcmonTests(unittest.TestCase):
         # all pending process restarts.
         self.assertEqual(self.pm.protocols, {})
 
+
+    def test_rollingRestart(self):
+        """
+        L{ProcessMonitor.rollingRestart} stops each process in turn, C{interval}
+        seconds apart, and each is restarted when it exits.
+        """
+        self.pm.startService()
+        self.pm.addProcess("foo", ["foo"])
+        self.pm.addProcess("bar", ["bar"])
+        self.reactor.advance(self.pm.threshold)
+        first = dict(self.pm.protocols)
+
+        self.pm.rollingRestart(5)
+        self.reactor.advance(0)
+        # The first process exits one second after it is signalled, and is
+        # restarted then; the second has not been signalled yet.
+        self.reactor.advance(1)
+        self.assertIsNot(self.pm.protocols["bar"], first["bar"])
+        self.assertIs(self.pm.protocols["foo"], first["foo"])
+
+        self.reactor.advance(4)
+        self.reactor.advance(1)
+        self.assertIsNot(self.pm.protocols["foo"], first["foo"])
+
+
+    def test_rollingRestartRemoved(self):
+        """
+        A process removed before L{ProcessMonitor.rollingRestart} reaches it
+        is not restarted.
+        """
+        self.pm.startService()
+        self.pm.addProcess("foo", ["foo"])
+        self.pm.addProcess("bar", ["bar"])
+        self.reactor.advance(self.pm.threshold)
+
+        self.pm.rollingRestart(5)
+        self.pm.removeProcess("foo")
+        for i in range(10):
+            self.reactor.advance(1)
+        self.assertEqual(list(self.pm.protocols), ["bar"])
+        self.assertEqual(self.reactor.getDelayedCalls(), [])
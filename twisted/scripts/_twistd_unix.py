@@ -2,7 +2,7 @@
 # Copyright (c) Twisted Matrix Laboratories.
 # See LICENSE for details.
 
-import os, errno, sys
+import os, errno, sys, signal
 
 from twisted.python import log, syslog, logfile, usage
 from twisted.python.util import (
@@ -42,6 +42,11 @@ class ServerOptions(app.ServerOptions):
                      ['gid', 'g', None, "The gid to run as.", gidFromString],
                      ['umask', None, None,
                       "The (octal) file creation mask to apply.", _umask],
+                     ['workers', None, None,
+                      "Run the application in this many worker processes, "
+                      "restarting any which exit.  The workers share "
+                      "listening ports given with reuseport=1, and are "
+                      "restarted one at a time on SIGHUP.", int],
                     ]
 
     compData = usage.Completions(
@@ -65,6 +70,45 @@ class ServerOptions(app.ServerOptions):
         app.ServerOptions.postOptions(self)
         if self['pidfile']:
             self['pidfile'] = os.path.abspath(self['pidfile'])
+        if self['workers'] is not None:
+            if self['workers'] < 1:
+                raise usage.UsageError("--workers must be at least 1")
+            # The application only runs in the workers.
+            self['no_save'] = True
+
+
+
+def _workerArguments(arguments, subCommand):
+    """
+    Compute the command line arguments for a worker process of
+    C{twistd --workers}.
+
+    The workers run in the foreground, without a PID file and logging to
+    standard output, which the process monitoring them logs.
+
+    @param arguments: The arguments twistd was run with, not including the
+        program name.
+    @type arguments: C{list} of C{str}
+
+    @param subCommand: The name of the plugin being run, or C{None}.  Any
+        arguments from the first occurrence of it on are the plugin's own.
+    @type subCommand: C{str} or C{NoneType}
+
+    @rtype: C{list} of C{str}
+    """
+    rest = []
+    if subCommand is not None and subCommand in arguments:
+        index = arguments.index(subCommand)
+        arguments, rest = arguments[:index], arguments[index:]
+    options = []
+    arguments = iter(arguments)
+    for argument in arguments:
+        if argument == '--workers':
+            next(arguments, None)
+        elif not argument.startswith('--workers='):
+            options.append(argument)
+    return options + ['--nodaemon', '--pidfile=', '--logfile=-'] + rest
+
 
 
 def checkPID(pidfile):
@@ -157,6 +201,67 @@ class UnixAppLogger(app.AppLogger):
 
 
 
+class _RollingRestartService(service.Service):
+    """
+    A service which restarts the processes of a L{procmon.ProcessMonitor} one
+    at a time when twistd receives I{SIGHUP}.
+
+    @ivar monitor: The L{procmon.ProcessMonitor} to restart the processes of.
+
+    @ivar restartInterval: The number of seconds between restarting one
+        process and the next.
+    """
+    restartInterval = 5
+
+    def __init__(self, monitor):
+        self.monitor = monitor
+
+
+    def startService(self):
+        service.Service.startService(self)
+        from twisted.internet import reactor
+        signal.signal(
+            signal.SIGHUP,
+            lambda signum, frame: reactor.callFromThread(
+                self.monitor.rollingRestart, self.restartInterval))
+
+
+    def stopService(self):
+        signal.signal(signal.SIGHUP, signal.SIG_DFL)
+        return service.Service.stopService(self)
+
+
+
+def _workerApplication(config, argv):
+    """
+    Create an application running C{config['workers']} twistd processes,
+    each running the application described by C{argv}.
+
+    @param config: The L{ServerOptions} twistd was run with.
+
+    @param argv: The command line twistd was run with.
+    @type argv: C{list} of C{str}
+
+    @return: An L{service.Application} with a L{procmon.ProcessMonitor} of
+        the workers and a L{_RollingRestartService} for it.
+    """
+    # Imported here as it installs the reactor.
+    from twisted.runner.procmon import ProcessMonitor
+
+    application = service.Application("twistd")
+    monitor = ProcessMonitor()
+    command = [sys.executable, argv[0]] + _workerArguments(
+        argv[1:], config.subCommand)
+    for i in range(config['workers']):
+        monitor.addProcess(
+            'worker-%d' % (i,), command, env=os.environ.copy(),
+            path=os.getcwd())
+    monitor.setServiceParent(application)
+    _RollingRestartService(monitor).setServiceParent(application)
+    return application
+
+
+
 def launchWithName(name):
     if name and name != sys.argv[0]:
         exe = os.path.realpath(sys.executable)
@@ -209,6 +314,17 @@ class UnixApplicationRunner(app.ApplicationRunner):
         self.removePID(self.config['pidfile'])
 
 
+    def createOrGetApplication(self):
+        """
+        Create or load the application, as L{app.ApplicationRunner} does,
+        unless the configuration asks for it to be run in worker processes.
+        In that case, create an application running the workers.
+        """
+        if self.config['workers']:
+            return _workerApplication(self.config, sys.argv)
+        return app.ApplicationRunner.createOrGetApplication(self)
+
+
     def removePID(self, pidfile):
         """
         Remove the specified PID file, if possible.  Errors are logged, not
@@ -385,6 +501,10 @@ class UnixApplicationRunner(app.ApplicationRunner):
             uid = process.uid
         if gid is None:
             gid = process.gid
+        if self.config['workers']:
+            # The workers change their own UID and GID, after binding any
+            # privileged ports.
+            uid = gid = None
 
         self.shedPrivileges(self.config['euid'], uid, gid)
         app.startApplication(application, not self.config['no_save'])
@@ -12,7 +12,7 @@ for more details.
 @author: Glyph Lefkowitz
 """
 
-import copy, cStringIO, struct
+import copy, re, struct
 
 from twisted.internet import protocol
 from twisted.persisted import styles
@@ -51,6 +51,27 @@ def b1282int(st):
     return i
 
 
+_b128Digits = [chr(i) for i in range(128)]
+
+def _int2b128(integer):
+    """
+    Convert a non-negative integer into its base 128 representation.
+
+    @param integer: The integer to encode.
+    @type integer: C{int} or C{long}
+
+    @return: The integer encoded in a string, as by L{int2b128}.
+    @rtype: C{str}
+    """
+    if integer < 128:
+        return _b128Digits[integer]
+    digits = []
+    while integer:
+        digits.append(_b128Digits[integer & 0x7f])
+        integer >>= 7
+    return ''.join(digits)
+
+
 # delimiter characters.
 LIST     = chr(0x80)
 INT      = chr(0x81)
@@ -65,6 +86,9 @@ VOCAB    = chr(0x87)
 
 HIGH_BIT_SET = chr(0x80)
 
+# Matches the base 128 prefix of a token, which ends at its type byte.
+_prefix = re.compile('[\x00-\x7f]*')
+
 def setPrefixLimit(limit):
     """
     Set the limit on the prefix length for all Banana connections
@@ -83,6 +107,10 @@ setPrefixLimit(64)
 
 SIZE_LIMIT = 640 * 1024   # 640k is all you'll ever need :-)
 
+# Strings at least this long are passed to the transport without being copied
+# into the surrounding tokens.
+LARGE_STRING = 16 * 1024
+
 class Banana(protocol.Protocol, styles.Ephemeral):
     knownDialects = ["pb", "none"]
 
@@ -153,75 +181,85 @@ class Banana(protocol.Protocol, styles.Ephemeral):
             self.callExpressionReceived(item)
 
     buffer = ''
+    _needed = 0
 
     def dataReceived(self, chunk):
+        """
+        Decode as many tokens as possible from the data received so far.
+
+        The data is scanned by offset rather than by slicing off each token.
+        When the next token is known to need more data than has arrived, as
+        with the rest of a long string, further chunks are kept in a list
+        and only joined once there is enough to decode it.
+        """
+        if self._needed:
+            received = self._received
+            received.append(chunk)
+            self._receivedLength += len(chunk)
+            if len(self.buffer) + self._receivedLength < self._needed:
+                return
+            chunk = ''.join(received)
+            del received[:]
+            self._receivedLength = 0
+            self._needed = 0
         buffer = self.buffer + chunk
+        end = len(buffer)
+        offset = 0
         listStack = self.listStack
         gotItem = self.gotItem
-        while buffer:
-            assert self.buffer != buffer, "This ain't right: %s %s" % (repr(self.buffer), repr(buffer))
-            self.buffer = buffer
-            pos = 0
-            for ch in buffer:
-                if ch >= HIGH_BIT_SET:
-                    break
-                pos = pos + 1
-            else:
-                if pos > self.prefixLimit:
-                    raise BananaError("Security precaution: more than %d bytes of prefix" % (self.prefixLimit,))
-                return
-            num = buffer[:pos]
-            typebyte = buffer[pos]
-            rest = buffer[pos+1:]
-            if len(num) > self.prefixLimit:
-                raise BananaError("Security precaution: longer than %d bytes worth of prefix" % (self.prefixLimit,))
-            if typebyte == LIST:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: List too long.")
-                listStack.append((num, []))
-                buffer = rest
-            elif typebyte == STRING:
-                num = b1282int(num)
-                if num > SIZE_LIMIT:
-                    raise BananaError("Security precaution: String too long.")
-                if len(rest) >= num:
-                    buffer = rest[num:]
-                    gotItem(rest[:num])
-                else:
+        prefixLimit = self.prefixLimit
+        matchPrefix = _prefix.match
+        try:
+            while offset < end:
+                typeOffset = matchPrefix(buffer, offset).end()
+                if typeOffset == end:
+                    if typeOffset - offset > prefixLimit:
+                        raise BananaError("Security precaution: more than %d bytes of prefix" % (prefixLimit,))
+                    self._needed = end - offset + 1
                     return
-            elif typebyte == INT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGINT:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(num)
-            elif typebyte == LONGNEG:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(-num)
-            elif typebyte == NEG:
-                buffer = rest
-                num = -b1282int(num)
-                gotItem(num)
-            elif typebyte == VOCAB:
-                buffer = rest
-                num = b1282int(num)
-                gotItem(self.incomingVocabulary[num])
-            elif typebyte == FLOAT:
-                if len(rest) >= 8:
-                    buffer = rest[8:]
-                    gotItem(struct.unpack("!d", rest[:8])[0])
+                if typeOffset - offset > prefixLimit:
+                    raise BananaError("Security precaution: longer than %d bytes worth of prefix" % (prefixLimit,))
+                typebyte = buffer[typeOffset]
+                if typeOffset - offset == 1:
+                    num = ord(buffer[offset])
                 else:
-                    return
-            else:
-                raise NotImplementedError(("Invalid Type Byte %r" % (typebyte,)))
-            while listStack and (len(listStack[-1][1]) == listStack[-1][0]):
-                item = listStack.pop()[1]
-                gotItem(item)
-        self.buffer = ''
+                    num = b1282int(buffer[offset:typeOffset])
+                start = typeOffset + 1
+                if typebyte == LIST:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: List too long.")
+                    offset = start
+                    listStack.append((num, []))
+                elif typebyte == STRING:
+                    if num > SIZE_LIMIT:
+                        raise BananaError("Security precaution: String too long.")
+                    if end - start < num:
+                        self._needed = start + num - offset
+                        return
+                    offset = start + num
+                    gotItem(buffer[start:offset])
+                elif typebyte == INT or typebyte == LONGINT:
+                    offset = start
+                    gotItem(num)
+                elif typebyte == NEG or typebyte == LONGNEG:
+                    offset = start
+                    gotItem(-num)
+                elif typebyte == VOCAB:
+                    offset = start
+                    gotItem(self.incomingVocabulary[num])
+                elif typebyte == FLOAT:
+                    if end - start < 8:
+                        self._needed = start + 8 - offset
+                        return
+                    offset = start + 8
+                    gotItem(struct.unpack("!d", buffer[start:offset])[0])
+                else:
+                    raise NotImplementedError(("Invalid Type Byte %r" % (typebyte,)))
+                while listStack and (len(listStack[-1][1]) == listStack[-1][0]):
+                    item = listStack.pop()[1]
+                    gotItem(item)
+        finally:
+            self.buffer = buffer[offset:]
 
 
     def expressionReceived(self, lst):
@@ -275,59 +313,74 @@ class Banana(protocol.Protocol, styles.Ephemeral):
 
     def __init__(self, isClient=1):
         self.listStack = []
+        self._received = []
+        self._receivedLength = 0
         self.outgoingSymbols = copy.copy(self.outgoingVocabulary)
         self.outgoingSymbolCount = 0
         self.isClient = isClient
 
     def sendEncoded(self, obj):
-        io = cStringIO.StringIO()
-        self._encode(obj, io.write)
-        value = io.getvalue()
-        self.transport.write(value)
+        pieces = []
+        self._encode(obj, pieces.append)
+        self.transport.writeSequence(pieces)
+
 
     def _encode(self, obj, write):
-        if isinstance(obj, (list, tuple)):
-            if len(obj) > SIZE_LIMIT:
-                raise BananaError(
-                    "list/tuple is too long to send (%d)" % (len(obj),))
-            int2b128(len(obj), write)
-            write(LIST)
-            for elem in obj:
-                self._encode(elem, write)
-        elif isinstance(obj, (int, long)):
-            if obj < self._smallestLongInt or obj > self._largestLongInt:
-                raise BananaError(
-                    "int/long is too large to send (%d)" % (obj,))
-            if obj < self._smallestInt:
-                int2b128(-obj, write)
-                write(LONGNEG)
-            elif obj < 0:
-                int2b128(-obj, write)
-                write(NEG)
-            elif obj <= self._largestInt:
-                int2b128(obj, write)
-                write(INT)
-            else:
-                int2b128(obj, write)
-                write(LONGINT)
-        elif isinstance(obj, float):
-            write(FLOAT)
-            write(struct.pack("!d", obj))
-        elif isinstance(obj, str):
-            # TODO: an API for extending banana...
-            if self.currentDialect == "pb" and obj in self.outgoingSymbols:
-                symbolID = self.outgoingSymbols[obj]
-                int2b128(symbolID, write)
-                write(VOCAB)
-            else:
+        """
+        Encode an object, passing the encoded data to C{write} in batches.
+
+        Nested lists are encoded with an explicit stack rather than by
+        recursion.  The tokens between strings of at least L{LARGE_STRING}
+        bytes are joined into one string for C{write}; those strings are
+        passed to it as they are.
+
+        @raise BananaError: If C{obj}, or anything in it, cannot be sent.
+        """
+        tokens = []
+        append = tokens.append
+        pending = [obj]
+        pop = pending.pop
+        while pending:
+            obj = pop()
+            if isinstance(obj, (list, tuple)):
                 if len(obj) > SIZE_LIMIT:
                     raise BananaError(
-                        "string is too long to send (%d)" % (len(obj),))
-                int2b128(len(obj), write)
-                write(STRING)
-                write(obj)
-        else:
-            raise BananaError("could not send object: %r" % (obj,))
+                        "list/tuple is too long to send (%d)" % (len(obj),))
+                append(_int2b128(len(obj)) + LIST)
+                pending.extend(reversed(obj))
+            elif isinstance(obj, (int, long)):
+                if obj < self._smallestLongInt or obj > self._largestLongInt:
+                    raise BananaError(
+                        "int/long is too large to send (%d)" % (obj,))
+                if obj < self._smallestInt:
+                    append(_int2b128(-obj) + LONGNEG)
+                elif obj < 0:
+                    append(_int2b128(-obj) + NEG)
+                elif obj <= self._largestInt:
+                    append(_int2b128(obj) + INT)
+                else:
+                    append(_int2b128(obj) + LONGINT)
+            elif isinstance(obj, float):
+                append(FLOAT + struct.pack("!d", obj))
+            elif isinstance(obj, str):
+                # TODO: an API for extending banana...
+                if self.currentDialect == "pb" and obj in self.outgoingSymbols:
+                    append(_int2b128(self.outgoingSymbols[obj]) + VOCAB)
+                else:
+                    if len(obj) > SIZE_LIMIT:
+                        raise BananaError(
+                            "string is too long to send (%d)" % (len(obj),))
+                    append(_int2b128(len(obj)) + STRING)
+                    if len(obj) >= LARGE_STRING:
+                        write(''.join(tokens))
+                        del tokens[:]
+                        write(obj)
+                    else:
+                        append(obj)
+            else:
+                raise BananaError("could not send object: %r" % (obj,))
+        if tokens:
+            write(''.join(tokens))
 
 
 # For use from the interactive interpreter
@@ -338,10 +391,9 @@ _i._selectDialect("none")
 
 def encode(lst):
     """Encode a list s-expression."""
-    io = cStringIO.StringIO()
-    _i.transport = io
-    _i.sendEncoded(lst)
-    return io.getvalue()
+    pieces = []
+    _i._encode(lst, pieces.append)
+    return ''.join(pieces)
 
 
 def decode(st):
@@ -354,5 +406,8 @@ def decode(st):
         _i.dataReceived(st)
     finally:
         _i.buffer = ''
+        _i._needed = 0
+        del _i._received[:]
+        _i._receivedLength = 0
         del _i.expressionReceived
     return l[0]
@@ -8,10 +8,11 @@ Tests for twisted.enterprise.adbapi.
 
 from twisted.trial import unittest
 
-import os, stat
+import os, stat, sys
 import types
 
 from twisted.enterprise.adbapi import ConnectionPool, ConnectionLost
+from twisted.enterprise.adbapi import ConnectionClosed
 from twisted.enterprise.adbapi import Connection, Transaction
 from twisted.internet import reactor, defer, interfaces
 from twisted.python.failure import Failure
@@ -435,6 +436,20 @@ class SQLiteConnector(DBTestConnector):
         kw = {'database': self.database, 'cp_max': 1}
         return args, kw
 
+class SQLite3Connector(SQLiteConnector):
+    TEST_PREFIX = 'SQLite3'
+
+    def can_connect(self):
+        try: import sqlite3
+        except: return False
+        return True
+
+    def getPoolArgs(self):
+        args = ('sqlite3',)
+        kw = {'database': self.database, 'cp_max': 1,
+              'check_same_thread': False}
+        return args, kw
+
 class PyPgSQLConnector(DBTestConnector):
     TEST_PREFIX = "PyPgSQL"
 
@@ -551,20 +566,23 @@ def makeSQLTests(base, suffix, globals):
     @param suffix: A suffix used to create test case names. Prefixes
                    are defined in the DBConnector subclasses.
     """
-    connectors = [GadflyConnector, SQLiteConnector, PyPgSQLConnector,
-                  PsycopgConnector, MySQLConnector, FirebirdConnector]
+    connectors = [GadflyConnector, SQLiteConnector, SQLite3Connector,
+                  PyPgSQLConnector, PsycopgConnector, MySQLConnector,
+                  FirebirdConnector]
     for connclass in connectors:
         name = connclass.TEST_PREFIX + suffix
         klass = types.ClassType(name, (connclass, base, unittest.TestCase),
                                 base.__dict__)
         globals[name] = klass
 
-# GadflyADBAPITestCase SQLiteADBAPITestCase PyPgSQLADBAPITestCase
-# PsycopgADBAPITestCase MySQLADBAPITestCase FirebirdADBAPITestCase
+# GadflyADBAPITestCase SQLiteADBAPITestCase SQLite3ADBAPITestCase
+# PyPgSQLADBAPITestCase PsycopgADBAPITestCase MySQLADBAPITestCase
+# FirebirdADBAPITestCase
 makeSQLTests(ADBAPITestBase, 'ADBAPITestCase', globals())
 
-# GadflyReconnectTestCase SQLiteReconnectTestCase PyPgSQLReconnectTestCase
-# PsycopgReconnectTestCase MySQLReconnectTestCase FirebirdReconnectTestCase
+# GadflyReconnectTestCase SQLiteReconnectTestCase SQLite3ReconnectTestCase
+# PyPgSQLReconnectTestCase PsycopgReconnectTestCase MySQLReconnectTestCase
+# FirebirdReconnectTestCase
 makeSQLTests(ReconnectTestBase, 'ReconnectTestCase', globals())
 
 
@@ -817,3 +835,339 @@ class ConnectionPoolTestCase(unittest.TestCase):
         pool.close()
         # But not anymore.
         self.assertFalse(reactor.triggers)
+
+
+
+class StatementCacheTestCase(unittest.TestCase):
+    """
+    Tests for L{ConnectionPool.runBatch} and the statement cache of
+    L{ConnectionPool}, using the sqlite3 module.
+    """
+    if interfaces.IReactorThreads(reactor, None) is None:
+        skip = "ADB-API requires threads, no way to test without them"
+
+    def setUp(self):
+        try:
+            import sqlite3
+        except ImportError:
+            raise unittest.SkipTest("sqlite3 is not available")
+        self.database = self.mktemp()
+        self.dbpool = ConnectionPool(
+            'sqlite3', database=self.database, check_same_thread=False,
+            cp_min=1, cp_max=1, cp_statement_cache=2)
+        self.dbpool.start()
+        self.addCleanup(self.dbpool.close)
+        return self.dbpool.runOperation(
+            "CREATE TABLE simple (x integer primary key)")
+
+
+    def test_runBatch(self):
+        """
+        L{ConnectionPool.runBatch} executes a statement once for each of a
+        sequence of parameters.
+        """
+        d = self.dbpool.runBatch(
+            "insert into simple(x) values(?)", [(1,), (2,), (3,)])
+        d.addCallback(self.assertIdentical, None)
+        d.addCallback(lambda ignored: self.dbpool.runQuery(
+                "select x from simple order by x"))
+        d.addCallback(self.assertEqual, [(1,), (2,), (3,)])
+        return d
+
+
+    def test_runBatchRollback(self):
+        """
+        If any execution of the statement in L{ConnectionPool.runBatch}
+        fails, none of them are committed.
+        """
+        d = self.dbpool.runBatch(
+            "insert into simple(x) values(?)", [(1,), (2,), (1,)])
+        d = self.assertFailure(d, Exception)
+        d.addCallback(lambda ignored: self.dbpool.runQuery(
+                "select count(1) from simple"))
+        d.addCallback(self.assertEqual, [(0,)])
+        return d
+
+
+    def test_runBatchWithoutCache(self):
+        """
+        L{ConnectionPool.runBatch} works without the statement cache too.
+        """
+        self.dbpool.statement_cache = 0
+        d = self.dbpool.runBatch(
+            "insert into simple(x) values(?)", [(1,), (2,)])
+        d.addCallback(lambda ignored: self.dbpool.runQuery(
+                "select x from simple order by x"))
+        d.addCallback(self.assertEqual, [(1,), (2,)])
+        return d
+
+
+    def test_cursorReused(self):
+        """
+        A statement in the cache is run again with the cursor which last ran
+        it.
+        """
+        sql = "select count(1) from simple"
+        cursors = []
+        def getCursor(ignored):
+            [cache] = self.dbpool._statements.values()
+            cursors.append(cache[sql][1])
+        d = self.dbpool.runQuery(sql)
+        d.addCallback(getCursor)
+        d.addCallback(lambda ignored: self.dbpool.runQuery(sql))
+        d.addCallback(self.assertEqual, [(0,)])
+        d.addCallback(getCursor)
+        d.addCallback(lambda ignored: self.assertIdentical(*cursors))
+        return d
+
+
+    def test_leastRecentlyUsedEvicted(self):
+        """
+        Once more than C{cp_statement_cache} statements have been run, the
+        one run least recently is dropped from the cache.
+        """
+        first = "select count(1) from simple"
+        second = "select x from simple"
+        third = "insert into simple(x) values(1)"
+        d = self.dbpool.runQuery(first)
+        d.addCallback(lambda ignored: self.dbpool.runQuery(second))
+        d.addCallback(lambda ignored: self.dbpool.runQuery(first))
+        d.addCallback(lambda ignored: self.dbpool.runOperation(third))
+        def check(ignored):
+            [cache] = self.dbpool._statements.values()
+            self.assertEqual(list(cache), [first, third])
+        d.addCallback(check)
+        return d
+
+
+
+class FakeAsyncCursor(object):
+    """
+    A cursor of a L{FakeAsyncConnection}.
+    """
+    def __init__(self, connection):
+        self.connection = connection
+        self.closed = False
+
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+        self.connection.states = [1, 2, 0]
+
+
+    def fetchall(self):
+        return [(len(self.connection.executed),)]
+
+
+    def close(self):
+        self.closed = True
+
+
+
+class FakeAsyncConnection(object):
+    """
+    A stand-in for an asynchronous DB-API connection, in the style of
+    psycopg2.
+
+    @ivar states: The states C{poll} will report, in order.
+
+    @ivar executed: The SQL statements executed on this connection.
+    """
+    error = None
+    closed = False
+
+    def __init__(self):
+        self.states = [2, 0]
+        self.executed = []
+
+
+    def fileno(self):
+        return 7
+
+
+    def poll(self):
+        if self.error is not None:
+            raise self.error
+        return self.states.pop(0)
+
+
+    def cursor(self):
+        return FakeAsyncCursor(self)
+
+
+    def close(self):
+        self.closed = True
+
+
+
+class PollingReactor(EventReactor):
+    """
+    An L{EventReactor} which records the readers and writers added to it.
+    """
+    def __init__(self, running):
+        EventReactor.__init__(self, running)
+        self.readers = []
+        self.writers = []
+
+
+    def addReader(self, reader):
+        self.readers.append(reader)
+
+
+    def removeReader(self, reader):
+        self.readers.remove(reader)
+
+
+    def addWriter(self, writer):
+        self.writers.append(writer)
+
+
+    def removeWriter(self, writer):
+        self.writers.remove(writer)
+
+
+
+class AsynchronousConnectionPoolTestCase(unittest.TestCase):
+    """
+    Tests for L{ConnectionPool} with C{cp_asynchronous}, using a stand-in
+    DB-API module.
+    """
+
+    def setUp(self):
+        self.connections = []
+        module = types.ModuleType('fakeasyncdb')
+        module.POLL_OK, module.POLL_READ, module.POLL_WRITE = 0, 1, 2
+        module.connect = self.connect
+        sys.modules['fakeasyncdb'] = module
+        self.addCleanup(sys.modules.pop, 'fakeasyncdb')
+        self.reactor = PollingReactor(True)
+        self.pool = ConnectionPool('fakeasyncdb', cp_reactor=self.reactor,
+                                   cp_max=1, cp_asynchronous=True)
+        self.addCleanup(self.pool.close)
+
+
+    def connect(self):
+        connection = FakeAsyncConnection()
+        self.connections.append(connection)
+        return connection
+
+
+    def poll(self):
+        """
+        Call the ready methods of every reader and writer once.
+        """
+        readers = self.reactor.readers[:]
+        writers = self.reactor.writers[:]
+        for reader in readers:
+            reader.doRead()
+        for writer in writers:
+            writer.doWrite()
+
+
+    def test_runQuery(self):
+        """
+        L{ConnectionPool.runQuery} connects, then executes the query,
+        waiting in the reactor for the connection to become ready, and
+        fires with the results.
+        """
+        results = []
+        self.pool.runQuery("select 1").addCallback(results.append)
+        self.assertEqual(len(self.reactor.writers), 1)
+        self.poll()
+        self.assertEqual(self.connections[0].executed, ["select 1"])
+        self.assertEqual(len(self.reactor.readers), 1)
+        self.poll()
+        self.assertEqual(len(self.reactor.writers), 1)
+        self.poll()
+        self.assertEqual(results, [[(1,)]])
+        self.assertEqual(self.reactor.readers, [])
+        self.assertEqual(self.reactor.writers, [])
+
+
+    def test_connectionReused(self):
+        """
+        Once a statement has run, its connection is used by the next one
+        waiting for a connection.
+        """
+        results = []
+        self.pool.runQuery("select 1").addCallback(results.append)
+        self.pool.runOperation("select 2").addCallback(results.append)
+        for i in range(6):
+            self.poll()
+        self.assertEqual(results, [[(1,)], None])
+        [connection] = self.connections
+        self.assertEqual(connection.executed, ["select 1", "select 2"])
+        self.assertEqual(self.pool._idle, [connection])
+
+
+    def test_pollFailure(self):
+        """
+        If C{poll} raises an exception, the statement fails with it and the
+        connection is closed.
+        """
+        d = self.pool.runQuery("select 1")
+        self.poll()
+        connection = self.connections[0]
+        connection.error = ValueError("broken")
+        self.poll()
+        self.assertEqual(self.reactor.readers, [])
+        self.assertTrue(connection.closed)
+        self.assertEqual(self.pool._asyncConnections, 0)
+        return self.assertFailure(d, ValueError)
+
+
+    def test_close(self):
+        """
+        L{ConnectionPool.close} closes idle asynchronous connections.
+        """
+        self.pool.runQuery("select 1")
+        for i in range(3):
+            self.poll()
+        self.pool.close()
+        self.assertTrue(self.connections[0].closed)
+
+
+    def test_closeFailsWaiting(self):
+        """
+        L{ConnectionPool.close} fails the statements waiting for an
+        asynchronous connection, and those running, with
+        L{ConnectionClosed}, stops polling their connections and closes
+        them.
+        """
+        running = self.pool.runQuery("select 1")
+        waiting = self.pool.runOperation("select 2")
+        self.poll()
+        self.assertEqual(len(self.reactor.readers), 1)
+        self.pool.close()
+        self.failureResultOf(running, ConnectionClosed)
+        self.failureResultOf(waiting, ConnectionClosed)
+        self.assertEqual(self.reactor.readers, [])
+        self.assertEqual(self.reactor.writers, [])
+        [connection] = self.connections
+        self.assertTrue(connection.closed)
+        self.assertEqual(connection.executed, ["select 1"])
+        self.assertEqual(self.pool._asyncConnections, 0)
+
+
+    def test_closeFailsConnecting(self):
+        """
+        L{ConnectionPool.close} fails a statement waiting for its
+        asynchronous connection to connect with L{ConnectionClosed}, and
+        closes the connection.
+        """
+        d = self.pool.runQuery("select 1")
+        self.pool.close()
+        self.failureResultOf(d, ConnectionClosed)
+        self.assertEqual(self.reactor.writers, [])
+        self.assertTrue(self.connections[0].closed)
+
+
+    def test_threadFallback(self):
+        """
+        If the DB-API module does not support asynchronous connections,
+        the pool uses threads.
+        """
+        pool = ConnectionPool('twisted.test.test_adbapi',
+                              cp_reactor=self.reactor, cp_asynchronous=True)
+        pool.close()
+        self.assertIdentical(pool._pollingStates, None)
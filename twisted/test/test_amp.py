@@ -17,6 +17,7 @@ from twisted.python.failure import Failure
 from twisted.protocols import amp
 from twisted.trial import unittest
 from twisted.internet import protocol, defer, error, reactor, interfaces
+from twisted.internet import task
 from twisted.test import iosim
 from twisted.test.proto_helpers import StringTransport
 
@@ -985,6 +986,25 @@ class BinaryProtocolTests(unittest.TestCase):
         self.assertTrue(transport.disconnecting)
 
 
+    def test_dataAfterExcessiveKeyLength(self):
+        """
+        Data which L{amp.BinaryBoxProtocol} receives after a key length prefix
+        larger than 255, when the key before it was split between reads, is
+        rejected again rather than parsed as a value.
+        """
+        exceeded = []
+        transport = StringTransport()
+        protocol = amp.BinaryBoxProtocol(self)
+        protocol.lengthLimitExceeded = exceeded.append
+        protocol.makeConnection(transport)
+        data = amp.AmpBox(k='v').serialize()
+        protocol.dataReceived(data[:4])
+        protocol.dataReceived(data[4:] + '\x01\x00')
+        protocol.dataReceived('x')
+        self.assertEqual(exceeded, [0x100, 0x100])
+        self.assertEqual(self.boxes, [amp.AmpBox(k='v')])
+
+
     def test_excessiveKeyFailure(self):
         """
         If L{amp.BinaryBoxProtocol} disconnects because it received a key
@@ -1191,6 +1211,79 @@ class BinaryProtocolTests(unittest.TestCase):
         self.assertEqual(clientLoser.reason, connectionFailure)
 
 
+    def test_receiveBoxesByteByByte(self):
+        """
+        Boxes are parsed correctly however the data containing them is split
+        up.
+        """
+        first = amp.AmpBox(hello='world', x='')
+        second = amp.AmpBox(y='z' * 300)
+        data = first.serialize() + second.serialize()
+        a = amp.BinaryBoxProtocol(self)
+        a.makeConnection(self)
+        for byte in data:
+            a.dataReceived(byte)
+        self.assertEqual(self.boxes, [first, second])
+        self.assertEqual(a.recvd, '')
+
+
+    def _coalescingProtocol(self):
+        """
+        Make a L{amp.BinaryBoxProtocol} with C{coalesceBoxes} set, connected to
+        a L{StringTransport} and scheduling calls with a L{task.Clock}.
+        """
+        clock = task.Clock()
+        transport = StringTransport()
+        a = amp.BinaryBoxProtocol(self)
+        a.coalesceBoxes = True
+        a.callLater = clock.callLater
+        a.makeConnection(transport)
+        return clock, transport, a
+
+
+    def test_coalesceBoxes(self):
+        """
+        If C{coalesceBoxes} is set, boxes sent in the same reactor iteration
+        are written together in the next one.
+        """
+        clock, transport, a = self._coalescingProtocol()
+        first = amp.AmpBox(a='1')
+        second = amp.AmpBox(b='2')
+        a.sendBox(first)
+        a.sendBox(second)
+        self.assertEqual(transport.value(), '')
+        clock.advance(0)
+        self.assertEqual(transport.value(),
+                         first.serialize() + second.serialize())
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_coalescedBoxesFlushedBeforeQuit(self):
+        """
+        A L{amp.QuitBox} is written at once, after any boxes held back before
+        it.
+        """
+        clock, transport, a = self._coalescingProtocol()
+        first = amp.AmpBox(a='1')
+        a.sendBox(first)
+        amp.QuitBox(b='2')._sendTo(a)
+        self.assertEqual(transport.value(),
+                         first.serialize() + amp.AmpBox(b='2').serialize())
+        self.assertTrue(transport.disconnecting)
+        self.assertEqual(clock.getDelayedCalls(), [])
+
+
+    def test_coalescedBoxesDroppedOnConnectionLost(self):
+        """
+        Boxes held back when the connection is lost are not written.
+        """
+        clock, transport, a = self._coalescingProtocol()
+        a.sendBox(amp.AmpBox(a='1'))
+        a.connectionLost(Failure(error.ConnectionDone()))
+        self.assertEqual(clock.getDelayedCalls(), [])
+        self.assertEqual(transport.value(), '')
+
+
 
 class AMPTest(unittest.TestCase):
 
@@ -2820,6 +2913,139 @@ class ListOfDecimalNanTests(unittest.TestCase, ListOfTestsMixin):
 
 
 
+class BigStringTests(unittest.TestCase):
+    """
+    Tests for L{amp.BigString} and L{amp.BigUnicode}.
+    """
+
+    def test_toBoxShort(self):
+        """
+        L{amp.BigString.toBox} sends a value no longer than
+        L{amp.MAX_VALUE_LENGTH} as L{amp.String} would.
+        """
+        strings = amp.AmpBox()
+        amp.BigString().toBox('data', strings, {'data': 'hello'}, None)
+        self.assertEqual(strings, {'data': 'hello'})
+
+
+    def test_toBoxLong(self):
+        """
+        L{amp.BigString.toBox} splits a long value into chunks of at most
+        L{amp.MAX_VALUE_LENGTH} bytes, sent under numbered keys.
+        """
+        value = 'x' * amp.MAX_VALUE_LENGTH * 2 + 'yz'
+        strings = amp.AmpBox()
+        amp.BigString().toBox('data', strings, {'data': value}, None)
+        self.assertEqual(
+            strings, {'data': 'x' * amp.MAX_VALUE_LENGTH,
+                      'data.2': 'x' * amp.MAX_VALUE_LENGTH,
+                      'data.3': 'yz'})
+        # Every chunk can be serialized.
+        strings.serialize()
+
+
+    def test_fromBox(self):
+        """
+        L{amp.BigString.fromBox} joins the chunks of a value.
+        """
+        strings = amp.AmpBox({'data': 'ab', 'data.2': 'cd', 'data.3': 'e',
+                              'other': 'f'})
+        objects = {}
+        amp.BigString().fromBox('data', strings, objects, None)
+        self.assertEqual(objects, {'data': 'abcde'})
+        self.assertEqual(strings, {'other': 'f'})
+
+
+    def test_optional(self):
+        """
+        An optional L{amp.BigString} may be omitted.
+        """
+        strings = amp.AmpBox()
+        objects = {}
+        amp.BigString(optional=True).toBox('data', strings, {}, None)
+        amp.BigString(optional=True).fromBox('data', strings, objects, None)
+        self.assertEqual(strings, {})
+        self.assertEqual(objects, {'data': None})
+
+
+    def test_unicodeRoundTrip(self):
+        """
+        L{amp.BigUnicode} encodes long unicode strings as UTF-8 and decodes
+        them again, even if a chunk boundary splits a character.
+        """
+        value = u'\N{SNOWMAN}' * amp.MAX_VALUE_LENGTH
+        strings = amp.AmpBox()
+        objects = {}
+        amp.BigUnicode().toBox('data', strings, {'data': value}, None)
+        self.assertEqual(len(strings), 3)
+        amp.BigUnicode().fromBox('data', strings, objects, None)
+        self.assertEqual(objects, {'data': value})
+
+
+
+class ArgumentSchemaTests(unittest.TestCase):
+    """
+    Tests for L{amp._ArgumentSchema}.
+    """
+
+    def test_stringsToObjects(self):
+        """
+        L{amp._ArgumentSchema.stringsToObjects} converts each argument,
+        translating its name, without changing the box it converts.
+        """
+        schema = amp._ArgumentSchema([('from', amp.Integer()),
+                                      ('some-text', amp.Unicode()),
+                                      ('maybe', amp.String(optional=True))])
+        box = amp.AmpBox({'from': '3', 'some-text': 'hi'})
+        self.assertEqual(schema.stringsToObjects(box, None),
+                         {'From': 3, 'some_text': u'hi', 'maybe': None})
+        self.assertEqual(box, {'from': '3', 'some-text': 'hi'})
+        self.assertEqual(schema.names, set(['From', 'some_text', 'maybe']))
+
+
+    def test_missingArgument(self):
+        """
+        L{amp._ArgumentSchema.stringsToObjects} and
+        L{amp._ArgumentSchema.objectsToStrings} raise L{KeyError} if a
+        required argument is missing.
+        """
+        schema = amp._ArgumentSchema([('a', amp.Integer())])
+        self.assertRaises(KeyError, schema.stringsToObjects, {}, None)
+        self.assertRaises(KeyError, schema.objectsToStrings, {}, {}, None)
+
+
+    def test_objectsToStrings(self):
+        """
+        L{amp._ArgumentSchema.objectsToStrings} converts each argument,
+        omitting optional arguments which are missing or C{None}.
+        """
+        schema = amp._ArgumentSchema([('from', amp.Integer()),
+                                      ('maybe', amp.String(optional=True))])
+        strings = amp.AmpBox()
+        result = schema.objectsToStrings({'From': 3, 'maybe': None},
+                                         strings, None)
+        self.assertIdentical(result, strings)
+        self.assertEqual(strings, {'from': '3'})
+
+
+    def test_customArgument(self):
+        """
+        If any argument overrides C{fromBox} or C{toBox}, every argument is
+        converted with its own C{fromBox} or C{toBox}.
+        """
+        self.assertTrue(amp._usesDefaultBoxMethods(amp.Integer()))
+        self.assertFalse(amp._usesDefaultBoxMethods(amp.BigString()))
+        schema = amp._ArgumentSchema([('a', amp.Integer()),
+                                      ('b', amp.BigString())])
+        value = 'x' * (amp.MAX_VALUE_LENGTH + 1)
+        strings = schema.objectsToStrings({'a': 1, 'b': value},
+                                          amp.AmpBox(), None)
+        self.assertEqual(sorted(strings), ['a', 'b', 'b.2'])
+        self.assertEqual(schema.stringsToObjects(strings, None),
+                         {'a': 1, 'b': value})
+
+
+
 class DecimalTests(unittest.TestCase):
     """
     Tests for L{amp.Decimal}.
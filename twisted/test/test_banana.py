@@ -261,6 +261,57 @@ class BananaTestCase(unittest.TestCase):
 
 
 
+    def test_largeStringChunks(self):
+        """
+        A string arriving in many chunks is decoded once it is complete,
+        without the chunks being joined onto the buffer as they arrive.
+        """
+        value = 'x' * (banana.LARGE_STRING * 4)
+        self.enc.sendEncoded(value)
+        encoded = self.io.getvalue()
+        self.enc.dataReceived(encoded[:10])
+        buffered = self.enc.buffer
+        for i in range(10, len(encoded) - 1, 1000):
+            self.enc.dataReceived(encoded[i:min(i + 1000, len(encoded) - 1)])
+            self.assertIdentical(self.enc.buffer, buffered)
+        self.enc.dataReceived(encoded[-1])
+        self.assertEqual(self.result, value)
+        self.assertEqual(self.enc.buffer, '')
+
+
+    def test_deeplyNested(self):
+        """
+        Lists nested more deeply than the recursion limit can be encoded and
+        decoded.
+        """
+        value = []
+        for i in range(sys.getrecursionlimit() + 100):
+            value = [value]
+        self.enc.sendEncoded(value)
+        self.enc.dataReceived(self.io.getvalue())
+        for i in range(sys.getrecursionlimit() + 100):
+            self.assertEqual(len(self.result), 1)
+            self.result = self.result[0]
+        self.assertEqual(self.result, [])
+
+
+    def test_writeSequence(self):
+        """
+        L{banana.Banana.sendEncoded} writes an expression with one call to
+        C{writeSequence}, passing large strings without copying them.
+        """
+        sequences = []
+        self.enc.transport.writeSequence = sequences.append
+        large = 'y' * banana.LARGE_STRING
+        self.enc.sendEncoded([1, "two", large, 3.0])
+        [pieces] = sequences
+        self.assertEqual(len(pieces), 3)
+        self.assertIdentical(pieces[1], large)
+        self.enc.dataReceived(''.join(pieces))
+        self.assertEqual(self.result, [1, "two", large, 3.0])
+
+
+
 class GlobalCoderTests(unittest.TestCase):
     """
     Tests for the free functions L{banana.encode} and L{banana.decode}.
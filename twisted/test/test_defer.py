@@ -250,6 +250,41 @@ class DeferredTestCase(unittest.SynchronousTestCase, ImmediateFailureMixin):
 
         d1.addErrback(lambda e: None)  # Swallow error
 
+    def test_deferredListConsumeErrorsAlreadyFired(self):
+        """
+        If C{consumeErrors} is true, the result of a L{defer.Deferred} which
+        has already failed when it is passed to L{defer.DeferredList} is
+        replaced with C{None}, and no unhandled error is reported for it.
+        """
+        d1 = defer.fail(GenericError('Bang'))
+        d2 = defer.succeed(2)
+        dl = defer.DeferredList([d1, d2], consumeErrors=True)
+
+        [(succeeded1, result1), (succeeded2, result2)] = (
+            self.successResultOf(dl))
+        self.assertEqual(
+            (succeeded1, result1.type, succeeded2, result2),
+            (defer.FAILURE, GenericError, defer.SUCCESS, 2))
+        self.assertIdentical(self.successResultOf(d1), None)
+        self.assertEqual(self.successResultOf(d2), 2)
+        del d1
+        gc.collect()
+        self.assertEqual(self.flushLoggedErrors(GenericError), [])
+
+
+    def test_deferredListPausedDeferred(self):
+        """
+        L{defer.DeferredList} waits for a paused L{defer.Deferred} to be
+        unpaused, even if it already has a result.
+        """
+        d = defer.succeed(1)
+        d.pause()
+        dl = defer.DeferredList([d])
+        self.assertNoResult(dl)
+        d.unpause()
+        self.assertEqual(self.successResultOf(dl), [(defer.SUCCESS, 1)])
+
+
     def testDeferredListWithAlreadyFiredDeferreds(self):
         # Create some deferreds, and err one, call the other
         d1 = defer.Deferred()
@@ -1304,6 +1339,43 @@ class DeferredTestCase(unittest.SynchronousTestCase, ImmediateFailureMixin):
         self.assertNotEquals([], globalz)
 
 
+    def test_otherAttributes(self):
+        """
+        Attributes not used by L{defer.Deferred} itself can still be set on
+        instances of it.
+        """
+        d = defer.Deferred()
+        d.someAttribute = 1
+        self.assertEqual(d.someAttribute, 1)
+
+
+    def test_callbackArguments(self):
+        """
+        Each callback and errback is called with the positional and keyword
+        arguments it was added with, and those without any are called with only
+        the result.
+        """
+        calls = []
+        def record(result, *args, **kw):
+            calls.append((result, args, kw))
+            return result
+        def fail(result):
+            raise GenericError()
+        d = defer.Deferred()
+        d.addCallback(record)
+        d.addCallback(record, 1, a=2)
+        d.addCallbacks(record, callbackArgs=(3,))
+        d.addCallback(fail)
+        d.addErrback(lambda f, *args, **kw: record("err", *args, **kw),
+                     4, b=5)
+        d.addBoth(record, 6)
+        d.callback("x")
+        self.assertEqual(
+            calls,
+            [("x", (), {}), ("x", (1,), {"a": 2}), ("x", (3,), {}),
+             ("err", (4,), {"b": 5}), ("err", (6,), {})])
+
+
     def test_errorInCallbackDoesNotCaptureVars(self):
         """
         An error raised by a callback creates a Failure.  The Failure captures
@@ -4,6 +4,8 @@ __version__ = '$Revision: 1.3 $'[11:-2]
 
 from twisted.trial import unittest
 from twisted.protocols import htb
+from twisted.internet.address import IPv4Address
+from twisted.test.proto_helpers import StringTransport
 
 class DummyClock:
     time = 0
@@ -54,6 +56,19 @@ class TestBucket(TestBucketBase):
         empty = b.drip()
         self.assertTrue(empty)
 
+    def test_charge(self):
+        """
+        L{htb.Bucket.charge} accepts tokens beyond C{maxburst} and returns
+        the time the bucket takes to drain back to it.
+        """
+        b = SomeBucket()
+        self.assertEqual(b.charge(90), 0)
+        self.assertEqual(b.charge(20), 5)
+        self.clock.set(4)
+        self.assertEqual(b.charge(0), 1)
+        self.clock.set(5)
+        self.assertEqual(b.charge(0), 0)
+
 class TestBucketNesting(TestBucketBase):
     def setUp(self):
         TestBucketBase.setUp(self)
@@ -80,6 +95,88 @@ class TestBucketNesting(TestBucketBase):
         # application.)
         self.assertEqual(10, fit)
 
+    def test_chargeParent(self):
+        """
+        L{htb.Bucket.charge} charges the parent bucket too, and returns the
+        longest delay of the two.
+        """
+        self.parent.rate = 1
+        self.assertEqual(self.child1.charge(110), 10)
+        self.assertEqual(self.child2.charge(0), 10)
+        self.clock.set(5)
+        self.assertEqual(self.child1.charge(0), 5)
+
+
+class FilterTests(TestBucketBase):
+    """
+    Tests for the L{htb.HierarchicalBucketFilter} subclasses.
+    """
+
+    def test_filterByHost(self):
+        """
+        L{htb.FilterByHost} gives a bucket for each peer host.
+        """
+        bucketFilter = htb.FilterByHost()
+        first = StringTransport(peerAddress=IPv4Address("TCP", "10.0.0.1", 1))
+        second = StringTransport(peerAddress=IPv4Address("TCP", "10.0.0.1", 2))
+        third = StringTransport(peerAddress=IPv4Address("TCP", "10.0.0.2", 1))
+        self.assertIdentical(bucketFilter.getBucketFor(first),
+                             bucketFilter.getBucketFor(second))
+        self.assertNotIdentical(bucketFilter.getBucketFor(first),
+                                bucketFilter.getBucketFor(third))
+
+
+    def test_filterByServer(self):
+        """
+        L{htb.FilterByServer} gives a bucket for each local port.
+        """
+        bucketFilter = htb.FilterByServer()
+        first = StringTransport(hostAddress=IPv4Address("TCP", "10.0.0.1", 1))
+        second = StringTransport(hostAddress=IPv4Address("TCP", "10.0.0.2", 1))
+        third = StringTransport(hostAddress=IPv4Address("TCP", "10.0.0.1", 2))
+        self.assertIdentical(bucketFilter.getBucketFor(first),
+                             bucketFilter.getBucketFor(second))
+        self.assertNotIdentical(bucketFilter.getBucketFor(first),
+                                bucketFilter.getBucketFor(third))
+
+
+    def test_filterByConnection(self):
+        """
+        L{htb.FilterByConnection} gives a bucket for each transport, whose
+        parent comes from the parent filter.
+        """
+        parentFilter = htb.HierarchicalBucketFilter()
+        bucketFilter = htb.FilterByConnection(parentFilter)
+        first, second = StringTransport(), StringTransport()
+        firstBucket = bucketFilter.getBucketFor(first)
+        self.assertIdentical(bucketFilter.getBucketFor(first), firstBucket)
+        secondBucket = bucketFilter.getBucketFor(second)
+        self.assertNotIdentical(secondBucket, firstBucket)
+        self.assertIdentical(firstBucket.parentBucket,
+                             secondBucket.parentBucket)
+
+
+    def test_sweepKeepsParentsInUse(self):
+        """
+        L{htb.HierarchicalBucketFilter.sweep} does not remove a bucket which
+        is the parent of a bucket still in its filter, and removes it once
+        its children were swept.
+        """
+        parentFilter = htb.HierarchicalBucketFilter()
+        bucketFilter = htb.FilterByConnection(parentFilter)
+        transport = StringTransport()
+        bucket = bucketFilter.getBucketFor(transport)
+        bucket._refcount += 1
+        parentFilter.sweep()
+        self.assertIdentical(parentFilter.getBucketFor(transport),
+                             bucket.parentBucket)
+
+        bucket._refcount -= 1
+        bucketFilter.sweep()
+        self.assertEqual(bucketFilter.buckets, {})
+        parentFilter.sweep()
+        self.assertEqual(parentFilter.buckets, {})
+
 
 # TODO: Test the Transport stuff?
 
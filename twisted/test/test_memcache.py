@@ -5,9 +5,10 @@
 Test the memcache client protocol.
 """
 
-from twisted.internet.error import ConnectionDone
+from twisted.internet.error import ConnectionDone, ConnectionRefusedError
 
 from twisted.protocols.memcache import MemCacheProtocol, NoSuchCommand
+from twisted.protocols.memcache import MemCacheClient
 from twisted.protocols.memcache import ClientError, ServerError
 
 from twisted.trial.unittest import TestCase
@@ -697,3 +698,293 @@ class CommandFailureTests(CommandMixin, TestCase):
         parameters except C{d} are ignored.
         """
         return self.assertFailure(d, RuntimeError)
+
+
+
+class MemCacheClientTests(TestCase):
+    """
+    Tests for L{MemCacheClient}.
+    """
+
+    def setUp(self):
+        """
+        Create a client for three servers, whose connections are made by the
+        test on a deterministic clock.
+        """
+        self.clock = Clock()
+        self.attempts = []
+        self.client = MemCacheClient(
+            [("a", 1), ("b", 2), ("c", 3)], reactor=self.clock)
+        self.client._connect = self._connect
+
+
+    def _connect(self, host, port):
+        """
+        Record a connection attempt, to be completed by L{_finishConnect}.
+        """
+        d = Deferred()
+        self.attempts.append(("%s:%d" % (host, port), d))
+        return d
+
+
+    def _finishConnect(self, index=-1):
+        """
+        Connect the protocol of a recorded attempt to a string transport.
+
+        @return: the transport.
+        """
+        name, d = self.attempts[index]
+        proto = MemCacheProtocol()
+        proto.callLater = self.clock.callLater
+        transport = StringTransportWithDisconnection()
+        transport.protocol = proto
+        proto.makeConnection(transport)
+        d.callback(proto)
+        return transport
+
+
+    def _keysFor(self, name, count=2):
+        """
+        Find C{count} keys owned by the server C{name}.
+        """
+        keys = []
+        i = 0
+        while len(keys) < count:
+            key = "key%d" % (i,)
+            if self.client._serverFor(key).name == name:
+                keys.append(key)
+            i += 1
+        return keys
+
+
+    def test_consistentHashing(self):
+        """
+        Keys are spread over all the servers, and ejecting a server only
+        moves the keys it owned.
+        """
+        keys = ["key%d" % (i,) for i in range(300)]
+        before = dict([(key, self.client._serverFor(key).name)
+                       for key in keys])
+        self.assertEqual(set(before.values()), set(["a:1", "b:2", "c:3"]))
+        self.client._servers[1]._eject()
+        after = dict([(key, self.client._serverFor(key).name)
+                      for key in keys])
+        for key in keys:
+            if before[key] != "b:2":
+                self.assertEqual(after[key], before[key])
+            else:
+                self.assertNotEqual(after[key], "b:2")
+
+
+    def test_getCoalesced(self):
+        """
+        The C{get}s made during a reactor iteration for keys of the same
+        server are sent as one command, duplicate keys being requested once.
+        """
+        first, second = self._keysFor("a:1")
+        d1 = self.client.get(first)
+        d2 = self.client.get(second)
+        d3 = self.client.get(first)
+        self.assertEqual(self.attempts, [])
+        self.clock.advance(0)
+        self.assertEqual([name for (name, d) in self.attempts], ["a:1"])
+        transport = self._finishConnect()
+        self.assertEqual(transport.value(),
+                         "get %s %s\r\n" % (first, second))
+        transport.protocol.dataReceived(
+            "VALUE %s 0 3\r\nbar\r\nEND\r\n" % (first,))
+        self.assertEqual(self.successResultOf(d1), (0, "bar"))
+        self.assertEqual(self.successResultOf(d2), (0, None))
+        self.assertEqual(self.successResultOf(d3), (0, "bar"))
+
+
+    def test_getWithIdentifier(self):
+        """
+        C{get}s with and without identifier are sent as separate commands.
+        """
+        key, = self._keysFor("a:1", 1)
+        d1 = self.client.get(key)
+        d2 = self.client.get(key, True)
+        self.clock.advance(0)
+        transport = self._finishConnect()
+        self.assertEqual(transport.value(),
+                         "get %s\r\ngets %s\r\n" % (key, key))
+        transport.protocol.dataReceived(
+            "VALUE %s 0 3\r\nbar\r\nEND\r\n"
+            "VALUE %s 0 3 1234\r\nbar\r\nEND\r\n" % (key, key))
+        self.assertEqual(self.successResultOf(d1), (0, "bar"))
+        self.assertEqual(self.successResultOf(d2), (0, "1234", "bar"))
+
+
+    def test_batchSize(self):
+        """
+        No more than C{maxBatchSize} keys are sent in one command.
+        """
+        self.client.maxBatchSize = 2
+        keys = self._keysFor("a:1", 3)
+        for key in keys:
+            self.client.get(key)
+        self.clock.advance(0)
+        transport = self._finishConnect()
+        self.assertEqual(transport.value(),
+                         "get %s %s\r\nget %s\r\n" % tuple(keys))
+
+
+    def test_getMultiple(self):
+        """
+        L{MemCacheClient.getMultiple} sends one command to each server owning
+        some of the keys, and fires with all the values.
+        """
+        aKey, = self._keysFor("a:1", 1)
+        bKey, = self._keysFor("b:2", 1)
+        d = self.client.getMultiple([aKey, bKey])
+        self.clock.advance(0)
+        self.assertEqual(sorted([name for (name, _) in self.attempts]),
+                         ["a:1", "b:2"])
+        for index, (name, _) in enumerate(self.attempts):
+            key = {"a:1": aKey, "b:2": bKey}[name]
+            transport = self._finishConnect(index)
+            self.assertEqual(transport.value(), "get %s\r\n" % (key,))
+            transport.protocol.dataReceived(
+                "VALUE %s 0 1\r\n%s\r\nEND\r\n" % (key, name[0]))
+        self.assertEqual(self.successResultOf(d),
+                         {aKey: (0, "a"), bKey: (0, "b")})
+
+
+    def test_getMultipleFailure(self):
+        """
+        If a server fails, L{MemCacheClient.getMultiple} fails with its
+        error.
+        """
+        aKey, = self._keysFor("a:1", 1)
+        d = self.client.getMultiple([aKey])
+        self.clock.advance(0)
+        self.attempts[0][1].errback(ConnectionRefusedError())
+        self.failureResultOf(d, ConnectionRefusedError)
+
+
+    def test_set(self):
+        """
+        Storage commands are sent to the server owning the key.
+        """
+        key, = self._keysFor("c:3", 1)
+        d = self.client.set(key, "bar")
+        self.assertEqual([name for (name, _) in self.attempts], ["c:3"])
+        transport = self._finishConnect()
+        self.assertEqual(transport.value(), "set %s 0 0 3\r\nbar\r\n" % (key,))
+        transport.protocol.dataReceived("STORED\r\n")
+        self.assertEqual(self.successResultOf(d), True)
+
+
+    def test_invalidKey(self):
+        """
+        Invalid keys fail with L{ClientError} without being sent.
+        """
+        self.failureResultOf(self.client.get(1), ClientError)
+        self.failureResultOf(self.client.get("x" * 300), ClientError)
+        self.failureResultOf(self.client.delete(1), ClientError)
+        self.assertEqual(self.attempts, [])
+
+
+    def test_connectionPool(self):
+        """
+        A new connection is opened when the existing ones are busy, up to
+        C{connectionsPerServer}, and commands go to the least busy one.
+        """
+        key, = self._keysFor("a:1", 1)
+        self.client.set(key, "1")
+        first = self._finishConnect()
+        self.client.set(key, "2")
+        self.assertEqual(len(self.attempts), 2)
+        second = self._finishConnect()
+        self.client.set(key, "3")
+        self.client.set(key, "4")
+        self.assertEqual(len(self.attempts), 2)
+        self.assertEqual(first.value(),
+                         "set %s 0 0 1\r\n1\r\nset %s 0 0 1\r\n2\r\n"
+                         % (key, key))
+        self.assertEqual(second.value(),
+                         "set %s 0 0 1\r\n3\r\nset %s 0 0 1\r\n4\r\n"
+                         % (key, key))
+
+
+    def test_ejection(self):
+        """
+        A server failing C{failureLimit} times in a row is ejected from the
+        continuum for C{retryDelay} seconds.
+        """
+        key, = self._keysFor("a:1", 1)
+        for i in range(self.client.failureLimit):
+            d = self.client.delete(key)
+            self.attempts[-1][1].errback(ConnectionRefusedError())
+            self.failureResultOf(d, ConnectionRefusedError)
+        self.assertTrue(self.client.metrics()["a:1"]["ejected"])
+        self.assertNotEqual(self.client._serverFor(key).name, "a:1")
+        self.clock.advance(self.client.retryDelay)
+        self.assertFalse(self.client.metrics()["a:1"]["ejected"])
+        self.assertEqual(self.client._serverFor(key).name, "a:1")
+
+
+    def test_clientErrorNotEjecting(self):
+        """
+        Errors reported by the server for a command don't count towards the
+        ejection of the server.
+        """
+        key, = self._keysFor("a:1", 1)
+        for i in range(self.client.failureLimit):
+            d = self.client.delete(key)
+            if i == 0:
+                transport = self._finishConnect()
+            transport.protocol.dataReceived("CLIENT_ERROR bad\r\n")
+            self.failureResultOf(d, ClientError)
+        self.assertFalse(self.client.metrics()["a:1"]["ejected"])
+
+
+    def test_noServer(self):
+        """
+        When all the servers are ejected, commands fail with
+        C{RuntimeError}.
+        """
+        for server in self.client._servers:
+            server._eject()
+        self.failureResultOf(self.client.get("foo"), RuntimeError)
+        self.failureResultOf(self.client.set("foo", "bar"), RuntimeError)
+
+
+    def test_metrics(self):
+        """
+        L{MemCacheClient.metrics} reports the requests, hits, misses and
+        latency of each server.
+        """
+        first, second = self._keysFor("a:1")
+        self.client.get(first)
+        self.client.get(second)
+        self.clock.advance(0)
+        transport = self._finishConnect()
+        self.clock.advance(2)
+        transport.protocol.dataReceived(
+            "VALUE %s 0 3\r\nbar\r\nEND\r\n" % (first,))
+        metrics = self.client.metrics()
+        self.assertEqual(metrics["a:1"], {
+                "requests": 1, "errors": 0, "hits": 1, "misses": 1,
+                "latency": 2.0, "ejected": False})
+        self.assertEqual(metrics["b:2"]["requests"], 0)
+
+
+    def test_disconnect(self):
+        """
+        L{MemCacheClient.disconnect} closes the connections, cancels the
+        pending calls and fails the queued C{get}s.
+        """
+        key, = self._keysFor("a:1", 1)
+        d = self.client.set(key, "bar")
+        transport = self._finishConnect()
+        get = self.client.get(key)
+        self.client._servers[1]._eject()
+        self.client.disconnect()
+        self.assertFalse(transport.connected)
+        self.failureResultOf(d, ConnectionDone)
+        self.failureResultOf(get, RuntimeError)
+        for server in self.client._servers:
+            self.assertIdentical(server._flushCall, None)
+            self.assertIdentical(server._restoreCall, None)
@@ -337,6 +337,113 @@ class PluginTestCase(unittest.TestCase):
 
 
 
+    def test_lazyPlugins(self):
+        """
+        With C{lazy=True}, L{plugin.getPlugins} returns stand-ins providing
+        the interface, which import the plugin module on the first access
+        to an attribute.
+        """
+        plugin.getCache(self.module)
+        self._unimportPythonModule(sys.modules['mypackage.testplugin'])
+
+        plugins = list(plugin.getPlugins(ITestPlugin2, self.module, lazy=True))
+        self.assertEqual(len(plugins), 2)
+        for p in plugins:
+            self.assertTrue(ITestPlugin2.providedBy(p))
+            self.assertIdentical(ITestPlugin2(p), p)
+        self.assertNotIn('mypackage.testplugin', sys.modules)
+
+        names = ['AnotherTestPlugin', 'ThirdTestPlugin']
+        for p in plugins:
+            names.remove(p.__name__)
+            p.test()
+        self.assertIn('mypackage.testplugin', sys.modules)
+
+    test_lazyPlugins = _withCacheness(test_lazyPlugins)
+
+
+    def test_lazyPluginAttributes(self):
+        """
+        The plain data attributes of a plugin are recorded in the cache, and
+        given by lazy plugins without importing the plugin module.
+        Attributes computed by descriptors are not evaluated.
+        """
+        self.package.child('lazyplugin.py').setContent(
+            "from zope.interface import implementer\n"
+            "from twisted.plugin import IPlugin\n"
+            "from twisted.test.test_plugin import ITestPlugin\n"
+            "\n"
+            "@implementer(IPlugin, ITestPlugin)\n"
+            "class Maker(object):\n"
+            "    kind = 'maker'\n"
+            "    def __init__(self, name):\n"
+            "        self.name = name\n"
+            "        self.count = 3\n"
+            "    @property\n"
+            "    def options(self):\n"
+            "        raise RuntimeError('evaluated')\n"
+            "\n"
+            "theMaker = Maker('lazy')\n")
+        plugin.getCache(self.module)
+        self._unimportPythonModule(sys.modules['mypackage.lazyplugin'])
+
+        cache = plugin.getCache(self.module)
+        cached = cache['lazyplugin'].plugins[0]
+        self.assertEqual(cached.attributes,
+                         {'kind': 'maker', 'name': 'lazy', 'count': 3})
+        maker = [p for p in plugin.getPlugins(ITestPlugin, self.module,
+                                             lazy=True)
+                 if getattr(p, 'kind', None) == 'maker'][0]
+        self.assertEqual((maker.name, maker.count), ('lazy', 3))
+        self.assertNotIn('mypackage.lazyplugin', sys.modules)
+
+
+    def test_directoryHash(self):
+        """
+        When the plugin modules haven't changed since the cache was written,
+        L{plugin.getCache} uses it without importing any of them.
+        """
+        plugin.getCache(self.module)
+        self._unimportPythonModule(sys.modules['mypackage.testplugin'])
+        cache = plugin.getCache(self.module)
+        self.assertIn(self.originalPlugin, cache)
+        self.assertNotIn('mypackage.testplugin', sys.modules)
+
+
+    def test_providedByName(self):
+        """
+        L{plugin.CachedPlugin} pickles the interfaces the plugin provides by
+        name, and resolves them when C{provided} is used.
+        """
+        cache = plugin.getCache(self.module)
+        cached = [p for p in cache[self.originalPlugin].plugins
+                  if p.name == 'TestPlugin'][0]
+        state = cached.__getstate__()
+        self.assertNotIn('_provided', state)
+        self.assertEqual(
+            state['_providedNames'],
+            ['twisted.test.test_plugin.ITestPlugin',
+             'twisted.plugin.IPlugin'])
+        loaded = plugin.pickle.loads(plugin.pickle.dumps(cached, 2))
+        self.assertEqual(loaded.provided, [ITestPlugin, plugin.IPlugin])
+
+
+    def test_oldCacheFormat(self):
+        """
+        A cache written by an older version, without the attributes of the
+        plugins, is rebuilt.
+        """
+        cache = plugin.getCache(self.module)
+        self.package.child('dropin.cache').setContent(
+            plugin.pickle.dumps(dict(cache)))
+        cache = plugin.getCache(self.module)
+        self.assertIsInstance(cache, dict)
+        self.assertIsInstance(
+            plugin.pickle.load(self.package.child('dropin.cache').open()),
+            plugin._DropinCache)
+
+
+
 # This is something like the Twisted plugins file.
 pluginInitFile = """
 from twisted.plugin import pluginPackagePaths
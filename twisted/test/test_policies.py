@@ -15,7 +15,7 @@ from twisted.test.proto_helpers import StringTransport
 from twisted.test.proto_helpers import StringTransportWithDisconnection
 
 from twisted.internet import protocol, reactor, address, defer, task
-from twisted.protocols import policies
+from twisted.protocols import policies, htb
 
 
 
@@ -498,6 +498,148 @@ class ThrottlingTestCase(unittest.TestCase):
 
 
 
+class LimitedBucket(htb.Bucket):
+    """
+    A L{htb.Bucket} letting 10 bytes through per second, with a burst of 10
+    bytes.
+    """
+    maxburst = 10
+    rate = 10
+
+
+
+class ConnectionFilter(htb.FilterByConnection):
+    """
+    A L{htb.FilterByConnection} using L{LimitedBucket}s.
+    """
+    bucketFactory = LimitedBucket
+
+
+
+class GlobalFilter(htb.HierarchicalBucketFilter):
+    """
+    A L{htb.HierarchicalBucketFilter} giving the same L{LimitedBucket} to
+    all the connections.
+    """
+    bucketFactory = LimitedBucket
+
+
+
+class BucketThrottlingTests(unittest.TestCase):
+    """
+    Tests for L{policies.ThrottlingFactory} shaping connections with the
+    buckets of its C{readFilter} and C{writeFilter}.
+    """
+
+    def setUp(self):
+        self.clock = task.Clock()
+        self.patch(htb, "time", self.clock.seconds)
+
+
+    def _connect(self, tServer):
+        """
+        Connect a new protocol of C{tServer} to a string transport.
+        """
+        proto = tServer.buildProtocol(
+            address.IPv4Address('TCP', '127.0.0.1', 0))
+        tr = StringTransportWithDisconnection()
+        tr.protocol = proto
+        proto.makeConnection(tr)
+        return proto, tr
+
+
+    def test_readFilter(self):
+        """
+        A connection receiving more than the burst size of its read bucket
+        is paused as soon as it happens, until the bucket has drained.
+        """
+        tServer = TestableThrottlingFactory(
+            self.clock, Server(), readFilter=ConnectionFilter())
+        proto, tr = self._connect(tServer)
+        proto.dataReceived(b"0123456789")
+        self.assertEqual(tr.producerState, 'producing')
+        proto.dataReceived(b"abcde")
+        self.assertEqual(tr.value(), b"0123456789abcde")
+        self.assertEqual(tr.producerState, 'paused')
+        self.clock.advance(0.4)
+        self.assertEqual(tr.producerState, 'paused')
+        self.clock.advance(0.1)
+        self.assertEqual(tr.producerState, 'producing')
+
+
+    def test_writeFilter(self):
+        """
+        A connection writing more than the burst size of its write bucket
+        has its producer paused until the bucket has drained.
+        """
+        tServer = TestableThrottlingFactory(
+            self.clock, Server(), writeFilter=ConnectionFilter())
+        proto, tr = self._connect(tServer)
+        proto.producer = proto.wrappedProtocol
+        proto.write(b"0123456789")
+        self.assertFalse(proto.wrappedProtocol.paused)
+        proto.writeSequence([b"abc", b"de"])
+        self.assertTrue(proto.wrappedProtocol.paused)
+        self.clock.advance(0.5)
+        self.assertFalse(proto.wrappedProtocol.paused)
+
+
+    def test_perConnection(self):
+        """
+        Only the connection exceeding its bucket is paused.
+        """
+        tServer = TestableThrottlingFactory(
+            self.clock, Server(), readFilter=ConnectionFilter())
+        first, firstTransport = self._connect(tServer)
+        second, secondTransport = self._connect(tServer)
+        first.dataReceived(b"x" * 20)
+        second.dataReceived(b"x" * 10)
+        self.assertEqual(firstTransport.producerState, 'paused')
+        self.assertEqual(secondTransport.producerState, 'producing')
+
+
+    def test_sharedParent(self):
+        """
+        Connections whose buckets share a parent are kept paused while other
+        connections keep the parent over its burst size.
+        """
+        tServer = TestableThrottlingFactory(
+            self.clock, Server(),
+            readFilter=ConnectionFilter(GlobalFilter()))
+        first, firstTransport = self._connect(tServer)
+        second, secondTransport = self._connect(tServer)
+        # The first connection takes the global bucket over its burst size
+        # until 0.5 seconds, then the second one keeps it there until 1.
+        first.dataReceived(b"x" * 15)
+        self.assertEqual(firstTransport.producerState, 'paused')
+        self.clock.advance(0.4)
+        second.dataReceived(b"x" * 5)
+        self.assertEqual(secondTransport.producerState, 'paused')
+        self.clock.advance(0.2)
+        self.assertEqual(firstTransport.producerState, 'paused')
+        self.clock.advance(0.41)
+        self.assertEqual(firstTransport.producerState, 'producing')
+        self.assertEqual(secondTransport.producerState, 'producing')
+
+
+    def test_connectionLost(self):
+        """
+        When a connection is lost, its pending unthrottling is cancelled and
+        its buckets released.
+        """
+        tServer = TestableThrottlingFactory(
+            self.clock, Server(), readFilter=ConnectionFilter(),
+            writeFilter=ConnectionFilter())
+        proto, tr = self._connect(tServer)
+        proto.dataReceived(b"x" * 20)
+        self.assertEqual(proto._readBucket._refcount, 1)
+        tr.loseConnection()
+        self.assertEqual(self.clock.getDelayedCalls(), [])
+        self.assertEqual(proto._readBucket._refcount, 0)
+        self.assertEqual(proto._writeBucket._refcount, 0)
+
+
+
 class TimeoutTestCase(unittest.TestCase):
     """
     Tests for L{policies.TimeoutFactory}.
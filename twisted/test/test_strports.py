@@ -49,6 +49,23 @@ class DeprecatedParseTestCase(ParserTestCase):
 
 
 
+class ListenTestCase(TestCase):
+    """
+    Tests for L{strports.listen}.
+    """
+
+    def test_reusePortRejected(self):
+        """
+        L{strports.listen} raises L{ValueError} for a description with
+        C{reuseport}, rather than passing it to C{listenTCP}, which does not
+        accept it.
+        """
+        exc = self.assertRaises(
+            ValueError, strports.listen, "tcp:0:reuseport=1", Factory())
+        self.assertIn("serverFromString", str(exc))
+
+
+
 class ServiceTestCase(TestCase):
     """
     Tests for L{strports.service}.
@@ -248,6 +248,17 @@ class ThreadPoolTestCase(unittest.SynchronousTestCase):
         self.assertEqual(copy.max, 20)
 
 
+    def test_persistenceOfLimits(self):
+        """
+        Unpickled threadpools have the same C{maxQueued} and C{idleTimeout}
+        as the threadpool which was pickled.
+        """
+        pool = threadpool.ThreadPool(0, 5, maxQueued=10, idleTimeout=2)
+        copy = pickle.loads(pickle.dumps(pool))
+        self.assertEqual(copy.maxQueued, 10)
+        self.assertEqual(copy.idleTimeout, 2)
+
+
     def _threadpoolTest(self, method):
         """
         Test synchronization of calls made with C{method}, which should be
@@ -483,6 +494,138 @@ class ThreadPoolTestCase(unittest.SynchronousTestCase):
             tp.stop()
 
 
+    def test_maxQueued(self):
+        """
+        Once C{maxQueued} calls are waiting for a worker, further calls raise
+        L{threadpool.ThreadPoolFull}, and are counted as rejected.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=2)
+        pool.callInThread(lambda: None)
+        pool.callInThreadWithCallback(None, lambda: None)
+        self.assertRaises(
+            threadpool.ThreadPoolFull, pool.callInThread, lambda: None)
+        self.assertRaises(
+            threadpool.ThreadPoolFull, pool.callInThreadWithPriority,
+            -1, None, lambda: None)
+        self.assertEqual(pool.q.qsize(), 2)
+        self.assertEqual(pool.rejected, 2)
+
+
+    def test_maxQueuedCountsCalls(self):
+        """
+        Only calls count towards C{maxQueued}, not the requests to stop
+        workers which are queued with them.
+        """
+        pool = threadpool.ThreadPool(0, 1, maxQueued=1)
+        pool._put(threadpool._STOP_PRIORITY, threadpool.WorkerStop)
+        pool.callInThread(lambda: None)
+        self.assertEqual(pool.stats()['queued'], 1)
+        self.assertRaises(
+            threadpool.ThreadPoolFull, pool.callInThread, lambda: None)
+
+
+    def test_callWhileLastWorkerExits(self):
+        """
+        A call made while the last idle worker is deciding to exit is run,
+        by a new worker if that one exits.
+        """
+        pool = threadpool.ThreadPool(0, 1, idleTimeout=0.001)
+        queueClass = pool.q.__class__
+        mainThread = threading.currentThread()
+        checked = threading.Event()
+
+        class SlowCheckQueue(queueClass):
+            def qsize(self):
+                size = queueClass.qsize(self)
+                if (threading.currentThread() is not mainThread and
+                        not checked.isSet()):
+                    # Give a call made now the chance to be queued after the
+                    # worker has seen that the queue is empty.
+                    checked.set()
+                    time.sleep(0.1)
+                return size
+
+        pool.q = SlowCheckQueue(0)
+        pool.start()
+        self.addCleanup(pool.stop)
+        pool.callInThread(lambda: None)
+        checked.wait(self.getTimeout())
+        done = threading.Lock()
+        done.acquire()
+        pool.callInThread(done.release)
+        self._waitForLock(done)
+
+
+    def test_priority(self):
+        """
+        Calls made with L{ThreadPool.callInThreadWithPriority} are run in
+        order of priority, and in the order they were made within a priority.
+        """
+        done = threading.Lock()
+        done.acquire()
+        order = []
+        pool = threadpool.ThreadPool(0, 1)
+        pool.callInThreadWithPriority(1, None, order.append, "low")
+        pool.callInThread(order.append, "first")
+        pool.callInThreadWithPriority(-1, None, order.append, "high")
+        pool.callInThread(order.append, "second")
+        pool.callInThreadWithPriority(2, None, done.release)
+        pool.start()
+        self.addCleanup(pool.stop)
+        self._waitForLock(done)
+        self.assertEqual(order, ["high", "first", "second", "low"])
+
+
+    def test_stats(self):
+        """
+        L{ThreadPool.stats} reports the number of queued calls and of workers,
+        and the time calls spent waiting for a worker and being run.
+        """
+        pool = threadpool.ThreadPool(0, 1)
+        times = [1.0, 3.0, 7.0]
+        pool._now = lambda: times.pop(0)
+        done = threading.Event()
+        pool.callInThreadWithCallback(
+            lambda success, result: done.set(), lambda: None)
+        self.assertEqual(pool.stats(), {
+                'queued': 1, 'working': 0, 'idle': 0, 'workers': 0,
+                'completed': 0, 'rejected': 0, 'waitTime': 0.0,
+                'serviceTime': 0.0})
+        pool.start()
+        self.addCleanup(pool.stop)
+        done.wait(self.getTimeout())
+        stats = pool.stats()
+        self.assertEqual(stats['queued'], 0)
+        self.assertEqual(stats['workers'], 1)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['waitTime'], 2.0)
+        self.assertEqual(stats['serviceTime'], 4.0)
+
+
+    def test_idleTimeout(self):
+        """
+        Workers beyond the minimum exit once they have been idle for
+        C{idleTimeout} seconds.
+        """
+        pool = threadpool.ThreadPool(1, 3, idleTimeout=0.01)
+        pool.start()
+        self.addCleanup(pool.stop)
+        release = threading.Event()
+        for i in range(3):
+            pool.callInThread(release.wait, self.getTimeout())
+        self.assertEqual(pool.workers, 3)
+        release.set()
+        deadline = time.time() + self.getTimeout()
+        while pool.workers > 1 and time.time() < deadline:
+            time.sleep(0.001)
+        self.assertEqual(pool.workers, 1)
+        # The remaining worker still runs calls.
+        done = threading.Lock()
+        done.acquire()
+        pool.callInThread(done.release)
+        self._waitForLock(done)
+
+
     def test_workerStateTransition(self):
         """
         As the worker receives and completes work, it transitions between
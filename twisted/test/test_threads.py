@@ -327,6 +327,17 @@ class DeferToThreadPoolTestCase(unittest.TestCase):
         return self.assertFailure(d, NewError)
 
 
+    def test_deferredFull(self):
+        """
+        L{threads.deferToThreadPool} returns a L{Deferred} which has failed
+        with L{threadpool.ThreadPoolFull} if the threadpool's queue is full.
+        """
+        tp = threadpool.ThreadPool(0, 1, maxQueued=1)
+        tp.callInThread(lambda: None)
+        d = threads.deferToThreadPool(reactor, tp, lambda: None)
+        self.failureResultOf(d, threadpool.ThreadPoolFull)
+
+
 
 _callBeforeStartupProgram = """
 import time
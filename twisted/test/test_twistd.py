@@ -194,8 +194,9 @@ class ServerOptionsTest(unittest.TestCase):
         coconut = FakePlugin('coconut')
         donut = FakePlugin('donut')
 
-        def getPlugins(interface):
+        def getPlugins(interface, lazy=False):
             self.assertEqual(interface, IServiceMaker)
+            self.assertTrue(lazy)
             yield coconut
             yield banana
             yield donut
@@ -788,6 +789,127 @@ class UnixApplicationRunnerStartApplicationTests(unittest.TestCase):
 
 
 
+class WorkersTests(unittest.TestCase):
+    """
+    Tests for the C{--workers} option of twistd.
+    """
+    if _twistd_unix is None:
+        skip = "twistd unix not available"
+
+    def test_workers(self):
+        """
+        The value given for the C{workers} option is parsed as an integer,
+        and the application is not saved on shutdown.
+        """
+        config = twistd.ServerOptions()
+        config.parseOptions(['--workers', '4'])
+        self.assertEqual(config['workers'], 4)
+        self.assertTrue(config['no_save'])
+
+
+    def test_invalidWorkers(self):
+        """
+        L{UsageError} is raised if the value of the C{workers} option is not
+        a positive integer.
+        """
+        config = twistd.ServerOptions()
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', '0'])
+        self.assertRaises(UsageError, config.parseOptions, ['--workers', 'x'])
+
+
+    def test_workerArguments(self):
+        """
+        L{_twistd_unix._workerArguments} removes the C{workers} option from
+        the arguments twistd was run with, and adds options to run in the
+        foreground, without a PID file and logging to standard output before
+        the plugin's arguments.
+        """
+        self.assertEqual(
+            _twistd_unix._workerArguments(
+                ['--workers', '4', '-u', '1', '--workers=2',
+                 'web', '--workers', '3'], 'web'),
+            ['-u', '1', '--nodaemon', '--pidfile=', '--logfile=-',
+             'web', '--workers', '3'])
+        self.assertEqual(
+            _twistd_unix._workerArguments(
+                ['--workers=2', '-y', 'app.tac'], None),
+            ['-y', 'app.tac', '--nodaemon', '--pidfile=', '--logfile=-'])
+
+
+    def test_createOrGetApplication(self):
+        """
+        If the C{workers} option is given,
+        L{UnixApplicationRunner.createOrGetApplication} creates an application
+        with a L{ProcessMonitor} running that many twistd processes, in the
+        current directory.
+        """
+        from twisted.runner.procmon import ProcessMonitor
+        argv = ['/usr/bin/twistd', '--workers', '2', '-y', 'app.tac']
+        self.patch(sys, 'argv', argv)
+        config = twistd.ServerOptions()
+        config.parseOptions(argv[1:])
+        application = UnixApplicationRunner(config).createOrGetApplication()
+
+        monitors = [s for s in service.IServiceCollection(application)
+                    if isinstance(s, ProcessMonitor)]
+        self.assertEqual(len(monitors), 1)
+        [monitor] = monitors
+        command = [sys.executable, '/usr/bin/twistd', '-y', 'app.tac',
+                   '--nodaemon', '--pidfile=', '--logfile=-']
+        self.assertEqual(
+            sorted((name, args) for name, (args, uid, gid, env)
+                   in monitor.processes.items()),
+            [('worker-0', command), ('worker-1', command)])
+        self.assertEqual(
+            monitor.workingDirectories,
+            {'worker-0': os.getcwd(), 'worker-1': os.getcwd()})
+
+
+    def test_workersShedPrivileges(self):
+        """
+        If the C{workers} option is given,
+        L{UnixApplicationRunner.startApplication} leaves the workers to change
+        their own UID and GID, so that they can bind privileged ports.
+        """
+        options = twistd.ServerOptions()
+        options.parseOptions(['--workers', '2', '--uid', '1234'])
+        runner = UnixApplicationRunner(options)
+        privileges = []
+        self.patch(UnixApplicationRunner, 'setupEnvironment',
+                   lambda *a, **kw: None)
+        self.patch(UnixApplicationRunner, 'shedPrivileges',
+                   lambda self, euid, uid, gid: privileges.append((uid, gid)))
+        self.patch(app, 'startApplication', lambda *a, **kw: None)
+        runner.startApplication(service.Application("test_workers"))
+        self.assertEqual(privileges, [(None, None)])
+
+
+    def test_rollingRestartOnHangUp(self):
+        """
+        L{_twistd_unix._RollingRestartService} restarts the processes of its
+        monitor one at a time when the process receives I{SIGHUP}, until it is
+        stopped.
+        """
+        from twisted.internet import reactor
+        self.addCleanup(
+            signal.signal, signal.SIGHUP, signal.getsignal(signal.SIGHUP))
+        self.patch(reactor, 'callFromThread', lambda f, *a: f(*a))
+
+        restarts = []
+        class FakeMonitor(object):
+            def rollingRestart(self, interval):
+                restarts.append(interval)
+
+        restartService = _twistd_unix._RollingRestartService(FakeMonitor())
+        restartService.startService()
+        signal.getsignal(signal.SIGHUP)(signal.SIGHUP, None)
+        self.assertEqual(restarts, [restartService.restartInterval])
+
+        restartService.stopService()
+        self.assertEqual(signal.getsignal(signal.SIGHUP), signal.SIG_DFL)
+
+
+
 class UnixApplicationRunnerRemovePID(unittest.TestCase):
     """
     Tests for L{UnixApplicationRunner.removePID}.
@@ -177,6 +177,181 @@ def _getSlotValue(name, slotData, default=None):
 
 
 
+class _AttributeValue(object):
+    """
+    The value of an attribute in a L{_CompiledTemplate} which could not be
+    serialized ahead of time, and which must be flattened within the context
+    of that attribute.
+
+    @ivar value: The value of the attribute; anything flattenable.
+    """
+
+    def __init__(self, value):
+        self.value = value
+
+
+
+class _CompiledTemplate(list):
+    """
+    A template document, as returned by the C{load} method of the template
+    loaders in L{twisted.web.template}, along with a precompiled form of it.
+
+    The document is still a C{list} of the Stan objects it was created from,
+    but when it is flattened as content, L{_flattenElement} writes out
+    L{fragments} instead of walking it.  If the list no longer holds the
+    objects it was compiled from, it is flattened as a plain C{list}.  The
+    objects compiled into static markup must not be modified in place; those
+    under a L{Tag} with a renderer are not compiled, since the renderer is
+    given them and may change them.
+
+    @ivar fragments: The serialized form of the document: L{bytes}, already
+        escaped for inclusion in content, interleaved with the objects which
+        can only be flattened at render time (L{slot}s, L{Tag}s with a
+        renderer or slot data, L{IRenderable} providers, and so on) and with
+        L{_AttributeValue}s.
+    @type fragments: C{tuple}
+
+    @ivar _enclosing: For each of L{fragments}, a C{tuple} of the L{Tag}s
+        compiled into static markup which enclose it, outermost first, so
+        that they can be reported if flattening it fails.
+    @type _enclosing: C{tuple}
+
+    @ivar _source: The objects the document held when it was compiled.
+    @type _source: C{tuple}
+    """
+
+    def __init__(self, document):
+        list.__init__(self, document)
+        self._source = tuple(document)
+        fragments = []
+        _compile(self._source, fragments, ())
+        joined = []
+        enclosingTags = []
+        for fragment in _joinFragments(fragments):
+            if type(fragment) is tuple:
+                enclosing, fragment = fragment
+            else:
+                enclosing = ()
+            joined.append(fragment)
+            enclosingTags.append(enclosing)
+        self.fragments = tuple(joined)
+        self._enclosing = tuple(enclosingTags)
+
+
+    def isCurrent(self):
+        """
+        Determine whether this document still holds the objects it was
+        compiled from.
+
+        @rtype: C{bool}
+        """
+        source = self._source
+        if len(self) != len(source):
+            return False
+        for current, compiled in zip(self, source):
+            if current is not compiled:
+                return False
+        return True
+
+
+
+def _compile(root, fragments, enclosing):
+    """
+    Append the precompiled form of C{root} to C{fragments}.
+
+    Strings, comments, CDATA sections, character references and L{Tag}s
+    without a renderer or slot data are serialized as L{_flattenElement}
+    would serialize them as content.  Everything else is appended as it is,
+    along with everything under it, to be flattened at render time.
+
+    @param root: The Stan object to compile.
+
+    @param fragments: The C{list} to which L{bytes} are appended, and
+        2-tuples of C{enclosing} and an object to flatten at render time.
+
+    @param enclosing: The L{Tag}s compiled into static markup which enclose
+        C{root}, outermost first.
+    @type enclosing: C{tuple}
+    """
+    if isinstance(root, (bytes, unicode)):
+        fragments.append(escapeForContent(root))
+    elif isinstance(root, (tuple, list)):
+        for element in root:
+            _compile(element, fragments, enclosing)
+    elif isinstance(root, CDATA):
+        fragments.append('<![CDATA[' + escapedCDATA(root.data) + ']]>')
+    elif isinstance(root, Comment):
+        fragments.append('<!--' + escapedComment(root.data) + '-->')
+    elif isinstance(root, CharRef):
+        fragments.append('&#%d;' % (root.ordinal,))
+    elif isinstance(root, Tag):
+        try:
+            if isinstance(root.tagName, unicode):
+                tagName = root.tagName.encode('ascii')
+            else:
+                tagName = str(root.tagName)
+            attributes = []
+            for k, v in root.attributes.iteritems():
+                if isinstance(k, unicode):
+                    k = k.encode('ascii')
+                attributes.append((k, v))
+        except UnicodeError:
+            # Leave the error to be reported when the tag is flattened.
+            fragments.append((enclosing, root))
+            return
+
+        if root.render is not None or root.slotData is not None:
+            fragments.append((enclosing, root))
+            return
+
+        enclosing += (root,)
+        if not tagName:
+            _compile(root.children, fragments, enclosing)
+            return
+
+        fragments.append('<' + tagName)
+        for k, v in attributes:
+            if isinstance(v, (bytes, unicode)):
+                fragments.append(' %s="%s"' % (
+                    k, escapeForContent(v).replace('"', '&quot;')))
+            else:
+                fragments.append(' ' + k + '="')
+                fragments.append((enclosing, _AttributeValue(v)))
+                fragments.append('"')
+        if root.children or tagName not in voidElements:
+            fragments.append('>')
+            _compile(root.children, fragments, enclosing)
+            fragments.append('</' + tagName + '>')
+        else:
+            fragments.append(' />')
+    else:
+        fragments.append((enclosing, root))
+
+
+
+def _joinFragments(fragments):
+    """
+    Join each run of adjacent L{bytes} in C{fragments}.
+
+    @param fragments: L{bytes} and other objects.
+    @type fragments: C{list}
+
+    @return: An iterator over the joined L{bytes} and the other objects.
+    """
+    run = []
+    for fragment in fragments:
+        if type(fragment) is str:
+            run.append(fragment)
+        else:
+            if run:
+                yield ''.join(run)
+                run = []
+            yield fragment
+    if run:
+        yield ''.join(run)
+
+
+
 def _flattenElement(request, root, slotData, renderFactory, dataEscaper):
     """
     Make C{root} slightly more flat by yielding all its immediate contents as
@@ -275,6 +450,18 @@ def _flattenElement(request, root, slotData, renderFactory, dataEscaper):
         else:
             yield ' />'
 
+    elif (type(root) is _CompiledTemplate and
+          dataEscaper is escapeForContent and root.isCurrent()):
+        # The enclosing tags of the fragment being flattened are reported by
+        # _flattenTree if it fails.
+        for fragment, enclosing in zip(root.fragments, root._enclosing):
+            if type(fragment) is str:
+                yield fragment
+            elif type(fragment) is _AttributeValue:
+                yield flattenWithAttributeEscaping(
+                    keepGoing(fragment.value, attributeEscapingDoneOutside))
+            else:
+                yield keepGoing(fragment)
     elif isinstance(root, (tuple, list, GeneratorType)):
         for element in root:
             yield keepGoing(element)
@@ -320,9 +507,10 @@ def _flattenTree(request, root):
         except Exception, e:
             stack.pop()
             roots = []
-            for generator in stack:
-                roots.append(generator.gi_frame.f_locals['root'])
-            roots.append(frame.f_locals['root'])
+            frames = [generator.gi_frame for generator in stack] + [frame]
+            for generatorFrame in frames:
+                roots.append(generatorFrame.f_locals['root'])
+                roots.extend(generatorFrame.f_locals.get('enclosing', ()))
             raise FlattenerError(e, roots, extract_tb(exc_info()[2]))
         else:
             if type(element) is str:
@@ -336,16 +524,26 @@ def _flattenTree(request, root):
                 stack.append(element)
 
 
+# The number of bytes of flattened output collected by _writeFlattenedData
+# before they are written.
+_WRITE_BATCH_SIZE = 2 ** 16
+
+
+
 def _writeFlattenedData(state, write, result):
     """
     Take strings from an iterator and pass them to a writer function.
 
+    Consecutive strings are joined and passed to C{write} together, once
+    L{_WRITE_BATCH_SIZE} bytes have been collected, and before waiting on a
+    L{Deferred} or finishing.
+
     @param state: An iterator of C{str} and L{Deferred}.  C{str} instances will
         be passed to C{write}.  L{Deferred} instances will be waited on before
         resuming iteration of C{state}.
 
-    @param write: A callable which will be invoked with each C{str}
-        produced by iterating C{state}.
+    @param write: A callable which will be invoked with the C{str}s produced
+        by iterating C{state}.
 
     @param result: A L{Deferred} which will be called back when C{state} has
         been completely flattened into C{write} or which will be errbacked if
@@ -354,18 +552,31 @@ def _writeFlattenedData(state, write, result):
 
     @return: C{None}
     """
+    batch = []
+    size = 0
     while True:
         try:
             element = state.next()
         except StopIteration:
+            if batch:
+                write(''.join(batch))
             result.callback(None)
         except:
+            if batch:
+                write(''.join(batch))
             result.errback()
         else:
             if type(element) is str:
-                write(element)
+                batch.append(element)
+                size += len(element)
+                if size >= _WRITE_BATCH_SIZE:
+                    write(''.join(batch))
+                    batch = []
+                    size = 0
                 continue
             else:
+                if batch:
+                    write(''.join(batch))
                 def cby(original):
                     _writeFlattenedData(state, write, result)
                     return original
@@ -1342,6 +1342,9 @@ class HTTP11ClientProtocol(Protocol):
 
     @ivar _abortDeferreds: A list of C{Deferred} instances that will fire when
         the connection is lost.
+
+    @ivar _connectionLostCallback: A callable taking this protocol, called
+        after the connection is lost.
     """
     _state = 'QUIESCENT'
     _parser = None
@@ -1351,8 +1354,10 @@ class HTTP11ClientProtocol(Protocol):
     _responseDeferred = None
 
 
-    def __init__(self, quiescentCallback=lambda c: None):
+    def __init__(self, quiescentCallback=lambda c: None,
+                 connectionLostCallback=lambda c: None):
         self._quiescentCallback = quiescentCallback
+        self._connectionLostCallback = connectionLostCallback
         self._abortDeferreds = []
 
 
@@ -1532,9 +1537,18 @@ class HTTP11ClientProtocol(Protocol):
     def connectionLost(self, reason):
         """
         The underlying transport went away.  If appropriate, notify the parser
-        object.
+        object, then call the connection lost callback.
+        """
+        self._dispatchConnectionLost(reason)
+        self._connectionLostCallback(self)
+
+
+    def _dispatchConnectionLost(self, reason):
+        """
+        Handle the loss of the connection as appropriate for the current state.
         """
-    connectionLost = makeStatefulDispatcher('connectionLost', connectionLost)
+    _dispatchConnectionLost = makeStatefulDispatcher(
+        'connectionLost', _dispatchConnectionLost)
 
 
     def _connectionLost_QUIESCENT(self, reason):
@@ -930,14 +930,21 @@ class _HTTP11ClientFactory(protocol.Factory):
     @ivar _quiescentCallback: The quiescent callback to be passed to protocol
         instances, used to return them to the connection pool.
 
+    @ivar _connectionLostCallback: The connection lost callback to be passed
+        to protocol instances, used to tell the connection pool that they are
+        no longer open.
+
     @since: 11.1
     """
-    def __init__(self, quiescentCallback):
+    def __init__(self, quiescentCallback,
+                 connectionLostCallback=lambda c: None):
         self._quiescentCallback = quiescentCallback
+        self._connectionLostCallback = connectionLostCallback
 
 
     def buildProtocol(self, addr):
-        return HTTP11ClientProtocol(self._quiescentCallback)
+        return HTTP11ClientProtocol(
+            self._quiescentCallback, self._connectionLostCallback)
 
 
 
@@ -1009,6 +1016,10 @@ class HTTPConnectionPool(object):
     Features:
      - Cached connections will eventually time out.
      - Limits on maximum number of persistent connections.
+     - Optional limits on the number of open connections, per destination and
+       in total.  Requests for connections beyond them wait in a queue and
+       are served in order.
+     - Counters of how connections are supplied.
 
     Connections are stored using keys, which should be chosen such that any
     connections stored under a given key can be used interchangeably.
@@ -1024,12 +1035,45 @@ class HTTPConnectionPool(object):
         connections for a C{host:port} destination.
     @type maxPersistentPerHost: C{int}
 
+    @ivar maxConnectionsPerHost: The maximum number of connections open at
+        once for one key, whether being established, in use or cached, or
+        C{None} for no limit.
+    @type maxConnectionsPerHost: C{int}
+
+    @ivar maxConnections: The maximum number of connections open at once for
+        all keys, or C{None} for no limit.  When it is reached, cached
+        connections are closed, least recently used first, to make room for
+        new ones.
+    @type maxConnections: C{int}
+
     @ivar cachedConnectionTimeout: Number of seconds a cached persistent
         connection will stay open before disconnecting.
 
     @ivar retryAutomatically: C{boolean} indicating whether idempotent
         requests should be retried once if no response was received.
 
+    @ivar openConnections: The number of connections this pool has opened
+        which have not yet been closed.
+    @type openConnections: C{int}
+
+    @ivar hits: The number of connections supplied from the cache.
+    @type hits: C{int}
+
+    @ivar misses: The number of new connections made to supply a connection.
+    @type misses: C{int}
+
+    @ivar waits: The number of requests for connections which had to wait for
+        one because of C{maxConnectionsPerHost} or C{maxConnections}.
+    @type waits: C{int}
+
+    @ivar waitTime: The total number of seconds spent waiting for
+        connections.
+    @type waitTime: C{float}
+
+    @ivar evictions: The number of cached connections closed before they
+        were used again.
+    @type evictions: C{int}
+
     @ivar _factory: The factory used to connect to the proxy.
 
     @ivar _connections: Map (scheme, host, port) to lists of
@@ -1038,19 +1082,50 @@ class HTTPConnectionPool(object):
     @ivar _timeouts: Map L{HTTP11ClientProtocol} instances to a
         C{IDelayedCall} instance of their timeout.
 
+    @ivar _open: Map keys to the number of connections open for them.
+
+    @ivar _keys: Map the connections this pool has opened, until they are
+        closed, to their keys.
+
+    @ivar _waiting: A C{list} of C{[key, endpoint, deferred, queuedAt,
+        connecting]} entries for the requests waiting for connections, oldest
+        first.  C{connecting} is set to the L{Deferred} for the new connection
+        once one is being made.
+
     @since: 12.1
     """
 
     _factory = _HTTP11ClientFactory
     maxPersistentPerHost = 2
+    maxConnectionsPerHost = None
+    maxConnections = None
     cachedConnectionTimeout = 240
     retryAutomatically = True
 
+    openConnections = 0
+    hits = misses = waits = evictions = 0
+    waitTime = 0.0
+
     def __init__(self, reactor, persistent=True):
         self._reactor = reactor
         self.persistent = persistent
         self._connections = {}
         self._timeouts = {}
+        self._open = {}
+        self._keys = {}
+        self._waiting = []
+
+
+    @property
+    def reuseRate(self):
+        """
+        The fraction of connections supplied which came from the cache, or
+        C{0.0} if none have been supplied.
+        """
+        supplied = self.hits + self.misses
+        if not supplied:
+            return 0.0
+        return self.hits / supplied
 
 
     def getConnection(self, key, endpoint):
@@ -1082,13 +1157,74 @@ class HTTPConnectionPool(object):
             self._timeouts[connection].cancel()
             del self._timeouts[connection]
             if connection.state == "QUIESCENT":
-                if self.retryAutomatically:
-                    newConnection = lambda: self._newConnection(key, endpoint)
-                    connection = _RetryingHTTP11ClientProtocol(
-                        connection, newConnection)
-                return defer.succeed(connection)
+                self.hits += 1
+                return defer.succeed(
+                    self._wrapCached(key, endpoint, connection))
+
+        if self._mayConnect(key):
+            self.misses += 1
+            return self._newConnection(key, endpoint)
+
+        # Wait for a connection to be returned to the pool or closed.
+        def cancel(d):
+            if entry in self._waiting:
+                self._waiting.remove(entry)
+            elif entry[4] is not None:
+                entry[4].cancel()
+        d = defer.Deferred(cancel)
+        entry = [key, endpoint, d, self._reactor.seconds(), None]
+        self._waiting.append(entry)
+        self.waits += 1
+        return d
+
+
+    def _wrapCached(self, key, endpoint, connection):
+        """
+        Prepare a cached connection to be supplied by L{getConnection}.
+        """
+        if self.retryAutomatically:
+            newConnection = lambda: self._newConnection(key, endpoint)
+            connection = _RetryingHTTP11ClientProtocol(
+                connection, newConnection)
+        return connection
+
+
+    def _mayConnect(self, key):
+        """
+        Determine whether a new connection may be opened for C{key}, closing a
+        cached connection for another key if only C{maxConnections} prevents
+        it.
+
+        @return: C{True} if a connection may be opened.
+        """
+        perHost = self.maxConnectionsPerHost
+        if perHost is not None and self._open.get(key, 0) >= perHost:
+            return False
+        if (self.maxConnections is not None and
+            self.openConnections >= self.maxConnections):
+            return self._evictOldest()
+        return True
+
 
-        return self._newConnection(key, endpoint)
+    def _evictOldest(self):
+        """
+        Close the cached connection, among those this pool opened, which has
+        been cached the longest.
+
+        @return: C{True} if there was one to close.
+        """
+        oldest = None
+        for connection, call in self._timeouts.items():
+            if connection in self._keys and (
+                oldest is None or call.getTime() < oldest[1].getTime()):
+                oldest = (connection, call)
+        if oldest is None:
+            return False
+        connection, call = oldest
+        call.cancel()
+        self._removeConnection(self._keys[connection], connection)
+        self._connectionClosed(connection)
+        return True
 
 
     def _newConnection(self, key, endpoint):
@@ -1099,8 +1235,69 @@ class HTTPConnectionPool(object):
         """
         def quiescentCallback(protocol):
             self._putConnection(key, protocol)
-        factory = self._factory(quiescentCallback)
-        return endpoint.connect(factory)
+        factory = self._factory(quiescentCallback, self._connectionClosed)
+        self._open[key] = self._open.get(key, 0) + 1
+        self.openConnections += 1
+        d = endpoint.connect(factory)
+        def connected(protocol):
+            if getattr(protocol, "state", None) == "CONNECTION_LOST":
+                self._release(key)
+            else:
+                self._keys[protocol] = key
+            return protocol
+        def failed(reason):
+            self._release(key)
+            return reason
+        return d.addCallbacks(connected, failed)
+
+
+    def _connectionClosed(self, connection):
+        """
+        Stop counting C{connection} as open.  Called when it is lost, or
+        closed by the pool.
+        """
+        key = self._keys.pop(connection, None)
+        if key is None:
+            return
+        connections = self._connections.get(key)
+        if connections and connection in connections:
+            # A cached connection was closed by the server.
+            connections.remove(connection)
+            self._timeouts.pop(connection).cancel()
+        self._release(key)
+
+
+    def _release(self, key):
+        """
+        Account for a connection for C{key} having been closed.
+        """
+        self._open[key] -= 1
+        if not self._open[key]:
+            del self._open[key]
+        self.openConnections -= 1
+        self._admitWaiting()
+
+
+    def _admitWaiting(self):
+        """
+        Open connections for as many waiting requests, in order, as the limits
+        allow.
+        """
+        for entry in self._waiting[:]:
+            if (self.maxConnections is not None and
+                self.openConnections >= self.maxConnections and
+                not self._timeouts):
+                break
+            key, endpoint, d, queuedAt, connecting = entry
+            # Closing an idle connection to make room may already have
+            # admitted this request, and others, through a nested call.
+            if entry in self._waiting and self._mayConnect(key) and (
+                entry in self._waiting):
+                self._waiting.remove(entry)
+                self.waitTime += self._reactor.seconds() - queuedAt
+                self.misses += 1
+                connecting = entry[4] = self._newConnection(key, endpoint)
+                connecting.chainDeferred(d)
 
 
     def _removeConnection(self, key, connection):
@@ -1110,6 +1307,7 @@ class HTTPConnectionPool(object):
         connection.transport.loseConnection()
         self._connections[key].remove(connection)
         del self._timeouts[connection]
+        self.evictions += 1
 
 
     def _putConnection(self, key, connection):
@@ -1125,17 +1323,29 @@ class HTTPConnectionPool(object):
             except:
                 log.err()
             return
+        for entry in self._waiting:
+            if entry[0] == key:
+                # Hand the connection straight to a waiting request.
+                self._waiting.remove(entry)
+                self.waitTime += self._reactor.seconds() - entry[3]
+                self.hits += 1
+                entry[2].callback(self._wrapCached(key, entry[1], connection))
+                return
         connections = self._connections.setdefault(key, [])
         if len(connections) == self.maxPersistentPerHost:
             dropped = connections.pop(0)
             dropped.transport.loseConnection()
             self._timeouts[dropped].cancel()
             del self._timeouts[dropped]
+            self.evictions += 1
         connections.append(connection)
         cid = self._reactor.callLater(self.cachedConnectionTimeout,
                                       self._removeConnection,
                                       key, connection)
         self._timeouts[connection] = cid
+        if self._waiting:
+            # Requests for other keys are waiting for connections to close.
+            self._admitWaiting()
 
 
     def closeCachedConnections(self):
@@ -1589,12 +1589,31 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
     """
     A receiver for HTTP requests.
 
+    Requests may be pipelined: each is parsed and handed to its L{Request} as
+    soon as it has been received, and responses are written in order.  The
+    request line and headers of each request are parsed together, once all
+    of them have been received, rather than a line at a time; L{lineReceived}
+    is only used to finish a request whose headers it has started parsing.
+
     @ivar _transferDecoder: C{None} or an instance of
         L{_ChunkedTransferDecoder} if the request body uses the I{chunked}
         Transfer-Encoding.
+
+    @ivar maxHeadSize: The largest number of bytes the request line and
+        headers of a request may take, delimiters included.
+
+    @ivar _headSearched: The number of bytes at the start of the buffer which
+        are known not to contain the end of the request headers.
+
+    @ivar _headCounted: The number of bytes at the start of the buffer whose
+        line delimiters are counted in C{_headLines}.
+
+    @ivar _headLines: The number of line delimiters of the request headers
+        received so far.
     """
 
     maxHeaders = 500 # max number of headers allowed per request
+    maxHeadSize = 2 ** 18
 
     length = 0
     persistent = 1
@@ -1607,6 +1626,9 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
 
     _savedTimeOut = None
     _receivedHeaderCount = 0
+    _headSearched = 0
+    _headCounted = 0
+    _headLines = 0
 
     def __init__(self):
         # the request queue
@@ -1617,6 +1639,244 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
     def connectionMade(self):
         self.setTimeout(self.timeOut)
 
+
+    def dataReceived(self, data):
+        """
+        Parse the requests in C{data}, and in any data buffered before it.
+
+        @type data: C{bytes}
+        @param data: Data received from the client.
+        """
+        if self._busyReceiving:
+            self._buffer += data
+            return
+
+        try:
+            self._busyReceiving = True
+            self._buffer += data
+            while self._buffer and not self.paused:
+                if not self.line_mode:
+                    data = self._buffer
+                    self._buffer = b''
+                    self.rawDataReceived(data)
+                    continue
+                if self.__first_line:
+                    if not self._headReceived():
+                        return
+                else:
+                    # lineReceived was called directly to parse some of the
+                    # headers of this request, so it must parse the rest.
+                    try:
+                        line, self._buffer = self._buffer.split(
+                            self.delimiter, 1)
+                    except ValueError:
+                        if len(self._buffer) > self.MAX_LENGTH:
+                            line, self._buffer = self._buffer, b''
+                            return self.lineLengthExceeded(line)
+                        return
+                    if len(line) > self.MAX_LENGTH:
+                        exceeded = line + self.delimiter + self._buffer
+                        self._buffer = b''
+                        return self.lineLengthExceeded(exceeded)
+                    self.lineReceived(line)
+                if self.transport.disconnecting:
+                    return
+        finally:
+            self._busyReceiving = False
+
+
+    def _headReceived(self):
+        """
+        Parse the request line and headers at the start of the buffer, if all
+        of them have been received.
+
+        @return: C{True} if the buffer may hold more to parse, C{False} if
+            more data must be received first.
+        """
+        self.resetTimeout()
+
+        # if this connection is not persistent, drop any data which the
+        # client (illegally) sent after the last request.
+        if not self.persistent:
+            self._buffer = b''
+            self.dataReceived = self.lineReceived = lambda *args: None
+            return False
+
+        buf = self._buffer
+        # IE sends an extraneous empty line (\r\n) after a POST request; eat
+        # up such a line, but only ONCE
+        if self.__first_line == 1 and buf.startswith(b'\r\n'):
+            self.__first_line = 2
+            self._buffer = buf = buf[2:]
+            if not buf:
+                return False
+
+        # Only the bytes received since the last call are searched, starting
+        # just before them so that delimiters split between reads are found.
+        end = buf.find(b'\r\n\r\n', self._headSearched)
+        if end == -1:
+            self._headSearched = max(len(buf) - 3, 0)
+            self._headLines += buf.count(
+                b'\r\n', max(self._headCounted - 1, 0))
+            self._headCounted = len(buf)
+            first = -1
+            if self._headLines:
+                first = buf.find(b'\r\n')
+            start = buf.rfind(b'\r\n') + 2
+            if first != -1 and len(buf[:first].split()) != 3:
+                # Reject a bad request line without waiting for headers.
+                self._buffer = b''
+                self._resetHeadSearch()
+                self._requestLineReceived(buf[:first])
+            elif len(buf) - start > self.MAX_LENGTH:
+                self._buffer = b''
+                self._resetHeadSearch()
+                self.lineLengthExceeded(buf[start:])
+            elif (self._headLines > self.maxHeaders + 1 or
+                  len(buf) > self.maxHeadSize):
+                self._buffer = b''
+                self._resetHeadSearch()
+                self._respondToBadRequestAndDisconnect()
+            return False
+
+        head = buf[:end]
+        self._buffer = buf[end + 4:]
+        self._resetHeadSearch()
+        if end > self.maxHeadSize:
+            self._buffer = b''
+            self._respondToBadRequestAndDisconnect()
+            return False
+        lines = head.split(b'\r\n')
+        if len(head) > self.MAX_LENGTH:
+            for line in lines:
+                if len(line) > self.MAX_LENGTH:
+                    self._buffer = b''
+                    self.lineLengthExceeded(head[head.find(line):])
+                    return False
+
+        self._requestLineReceived(lines[0])
+        if self.transport.disconnecting:
+            return False
+        self._headersReceived(lines[1:])
+        if self.transport.disconnecting:
+            return False
+        self._endOfHeaders()
+        return True
+
+
+    def _resetHeadSearch(self):
+        """
+        Forget what is known of the head at the start of the buffer, once it
+        has been parsed or rejected.
+        """
+        self._headSearched = 0
+        self._headCounted = 0
+        self._headLines = 0
+
+
+    def _requestLineReceived(self, line):
+        """
+        Create a L{Request} for the request line C{line}.
+
+        @type line: C{bytes}
+        @param line: The first line of a request, excluding the line delimiter.
+        """
+        request = self.requestFactory(self, len(self.requests))
+        self.requests.append(request)
+
+        self.__first_line = 0
+        parts = line.split()
+        if len(parts) != 3:
+            self._respondToBadRequestAndDisconnect()
+            return
+        command, request, version = parts
+        self._command = command
+        self._path = request
+        self._version = version
+
+
+    def _headersReceived(self, lines):
+        """
+        Store the headers of a request, given all at once.
+
+        Lines starting with whitespace continue the header on the line before.
+        Unless L{headerReceived} is overridden, only the headers which
+        determine the length of the request body are passed to it, and the
+        rest are stored all at once.
+
+        @type lines: C{list} of C{bytes}
+        @param lines: The lines of the header section of a request, excluding
+            the line delimiters.
+        """
+        headers = []
+        for line in lines:
+            if line[:1] in (b' ', b'\t'):
+                if headers:
+                    headers[-1] = headers[-1] + b'\n' + line
+                else:
+                    headers.append(b'\n' + line)
+            else:
+                headers.append(line)
+
+        headerReceived = self.headerReceived
+        if (getattr(headerReceived, '__func__', None) is not
+            HTTPChannel.__dict__['headerReceived']):
+            for header in headers:
+                headerReceived(header)
+                if self.transport.disconnecting:
+                    return
+            return
+
+        self._receivedHeaderCount += len(headers)
+        if self._receivedHeaderCount > self.maxHeaders:
+            self._respondToBadRequestAndDisconnect()
+            return
+
+        received = {}
+        for header in headers:
+            name, value = header.split(b':', 1)
+            name = name.lower()
+            value = value.strip()
+            if name == b'content-length' or name == b'transfer-encoding':
+                self._bodyHeaderReceived(name, value)
+                if self.transport.disconnecting:
+                    return
+            values = received.get(name)
+            if values is None:
+                received[name] = [value]
+            else:
+                values.append(value)
+
+        reqHeaders = self.requests[-1].requestHeaders
+        for name, values in received.items():
+            existing = reqHeaders.getRawHeaders(name)
+            if existing is None:
+                reqHeaders.setRawHeaders(name, values)
+            else:
+                existing.extend(values)
+
+
+    def _endOfHeaders(self):
+        """
+        Finish handling the headers of a request, and prepare to receive its
+        body.
+        """
+        self.__header = ''
+        self.allHeadersReceived()
+        if self.length == 0:
+            self.allContentReceived()
+        else:
+            self.setRawMode()
+
+
+    def _respondToBadRequestAndDisconnect(self):
+        """
+        Respond with I{400 Bad Request} and close the connection.
+        """
+        self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.transport.loseConnection()
+
+
     def lineReceived(self, line):
         self.resetTimeout()
 
@@ -1633,29 +1893,11 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
                 self.__first_line = 2
                 return
 
-            # create a new Request object
-            request = self.requestFactory(self, len(self.requests))
-            self.requests.append(request)
-
-            self.__first_line = 0
-            parts = line.split()
-            if len(parts) != 3:
-                self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
-                self.transport.loseConnection()
-                return
-            command, request, version = parts
-            self._command = command
-            self._path = request
-            self._version = version
+            self._requestLineReceived(line)
         elif line == b'':
             if self.__header:
                 self.headerReceived(self.__header)
-            self.__header = ''
-            self.allHeadersReceived()
-            if self.length == 0:
-                self.allContentReceived()
-            else:
-                self.setRawMode()
+            self._endOfHeaders()
         elif line[0] in b' \t':
             self.__header = self.__header + '\n' + line
         else:
@@ -1681,33 +1923,48 @@ class HTTPChannel(basic.LineReceiver, policies.TimeoutMixin):
         header, data = line.split(b':', 1)
         header = header.lower()
         data = data.strip()
+        if header == b'content-length' or header == b'transfer-encoding':
+            self._bodyHeaderReceived(header, data)
+            if self.transport.disconnecting:
+                return
+        reqHeaders = self.requests[-1].requestHeaders
+        values = reqHeaders.getRawHeaders(header)
+        if values is not None:
+            values.append(data)
+        else:
+            reqHeaders.setRawHeaders(header, [data])
+
+        self._receivedHeaderCount += 1
+        if self._receivedHeaderCount > self.maxHeaders:
+            self._respondToBadRequestAndDisconnect()
+
+
+    def _bodyHeaderReceived(self, header, data):
+        """
+        Prepare to receive the body of a request as described by its
+        I{Content-Length} or I{Transfer-Encoding} header.
+
+        @type header: C{bytes}
+        @param header: The lowercased name of the header.
+
+        @type data: C{bytes}
+        @param data: The value of the header.
+        """
         if header == b'content-length':
             try:
                 self.length = int(data)
             except ValueError:
-                self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
                 self.length = None
-                self.transport.loseConnection()
+                self._respondToBadRequestAndDisconnect()
                 return
             self._transferDecoder = _IdentityTransferDecoder(
                 self.length, self.requests[-1].handleContentChunk, self._finishRequestBody)
-        elif header == b'transfer-encoding' and data.lower() == b'chunked':
+        elif data.lower() == b'chunked':
             # XXX Rather poorly tested code block, apparently only exercised by
             # test_chunkedEncoding
             self.length = None
             self._transferDecoder = _ChunkedTransferDecoder(
                 self.requests[-1].handleContentChunk, self._finishRequestBody)
-        reqHeaders = self.requests[-1].requestHeaders
-        values = reqHeaders.getRawHeaders(header)
-        if values is not None:
-            values.append(data)
-        else:
-            reqHeaders.setRawHeaders(header, [data])
-
-        self._receivedHeaderCount += 1
-        if self._receivedHeaderCount > self.maxHeaders:
-            self.transport.write(b"HTTP/1.1 400 Bad Request\r\n\r\n")
-            self.transport.loseConnection()
 
 
     def allContentReceived(self):
@@ -23,7 +23,7 @@ from twisted.web import http
 from twisted.web.util import redirectTo
 
 from twisted.python import components, filepath, log
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
 from twisted.persisted import styles
 from twisted.python.util import InsensitiveDict
 from twisted.python.runtime import platformType
@@ -700,6 +700,59 @@ class StaticProducer(object):
         self.request = None
 
 
+    def _sendFile(self, offset, count):
+        """
+        Send the body of the response with the transport's
+        L{interfaces.ISendFileTransport.sendFile}, if possible.
+
+        This is only possible over a plaintext connection, and only when the
+        body is neither compressed nor chunked on its way out.
+
+        @param offset: See L{interfaces.ISendFileTransport.sendFile}.
+        @param count: See L{interfaces.ISendFileTransport.sendFile}.
+
+        @return: C{True} if the body is being sent, C{False} if the caller
+            must write it to the request itself.
+        """
+        request = self.request
+        transport = getattr(request, 'transport', None)
+        if (not interfaces.ISendFileTransport.providedBy(transport) or
+                request.isSecure() or
+                getattr(request, '_encoder', None) is not None):
+            return False
+        # Send the status line and headers ahead of the file.
+        request.write('')
+        if request.chunked:
+            return False
+        d = transport.sendFile(self.fileObject, offset, count)
+        d.addCallbacks(self._fileSent, self._fileNotSent,
+                       errbackArgs=(transport,))
+        return True
+
+
+    def _fileSent(self, sent):
+        """
+        Finish the request once L{_sendFile} has sent the whole body.
+        """
+        if self.request is not None:
+            self.request.sentLength += sent
+            self.request.finish()
+            self.stopProducing()
+
+
+    def _fileNotSent(self, reason, transport):
+        """
+        Clean up after L{_sendFile} failed to send the body.  Unless this was
+        because the connection was lost, the response can't be completed, so
+        drop the connection.
+        """
+        if not reason.check(error.ConnectionLost):
+            log.err(reason, "Failed to send file")
+            transport.loseConnection()
+        if self.request is not None:
+            self.stopProducing()
+
+
 
 class NoRangeStaticProducer(StaticProducer):
     """
@@ -707,7 +760,8 @@ class NoRangeStaticProducer(StaticProducer):
     """
 
     def start(self):
-        self.request.registerProducer(self, False)
+        if not self._sendFile(0, None):
+            self.request.registerProducer(self, False)
 
 
     def resumeProducing(self):
@@ -745,9 +799,10 @@ class SingleRangeStaticProducer(StaticProducer):
 
 
     def start(self):
-        self.fileObject.seek(self.offset)
-        self.bytesWritten = 0
-        self.request.registerProducer(self, 0)
+        if not self._sendFile(self.offset, self.size):
+            self.fileObject.seek(self.offset)
+            self.bytesWritten = 0
+            self.request.registerProducer(self, 0)
 
 
     def resumeProducing(self):
@@ -379,7 +379,14 @@ class XMLString(object):
     """
     An L{ITemplateLoader} that loads and parses XML from a string.
 
-    @ivar _loadedTemplate: The loaded document.
+    The document is compiled once, when it is loaded, so that its static
+    markup is not serialized again each time it is rendered.  Changes made in
+    place to the tags of the loaded document, such as filling their slots or
+    changing their attributes, are therefore not rendered.  Tags with a
+    renderer, and everything under them, are not compiled; a renderer is free
+    to change the tag it is given.
+
+    @ivar _loadedTemplate: The loaded and compiled document.
     @type _loadedTemplate: a C{list} of Stan objects.
     """
     implements(ITemplateLoader)
@@ -391,13 +398,19 @@ class XMLString(object):
         @param s: The string from which to load the XML.
         @type s: C{str}
         """
-        self._loadedTemplate = _flatsaxParse(StringIO(s))
+        self._loadedTemplate = _CompiledTemplate(_flatsaxParse(StringIO(s)))
 
 
     def load(self):
         """
         Return the document.
 
+        The same document is returned each time.  Its contents may be replaced
+        but the objects in it must not be changed in place: the markup they
+        were compiled to is rendered instead.  To render the document with
+        some of its slots filled, wrap it in a tag, for example
+        C{tags.transparent(loader.load()).fillSlots(...)}.
+
         @return: the loaded document.
         @rtype: a C{list} of Stan objects.
         """
@@ -409,7 +422,15 @@ class XMLFile(object):
     """
     An L{ITemplateLoader} that loads and parses XML from a file.
 
-    @ivar _loadedTemplate: The loaded document, or C{None}, if not loaded.
+    The document is compiled once, when it is first loaded, so that its
+    static markup is not serialized again each time it is rendered.  Changes
+    made in place to the tags of the loaded document, such as filling their
+    slots or changing their attributes, are therefore not rendered.  Tags
+    with a renderer, and everything under them, are not compiled; a renderer
+    is free to change the tag it is given.
+
+    @ivar _loadedTemplate: The loaded and compiled document, or C{None}, if
+        not loaded.
     @type _loadedTemplate: a C{list} of Stan objects, or C{None}.
 
     @ivar _path: The L{FilePath}, file object, or filename that is being
@@ -458,11 +479,17 @@ class XMLFile(object):
         """
         Return the document, first loading it if necessary.
 
+        The same document is returned each time.  Its contents may be replaced
+        but the objects in it must not be changed in place: the markup they
+        were compiled to is rendered instead.  To render the document with
+        some of its slots filled, wrap it in a tag, for example
+        C{tags.transparent(loader.load()).fillSlots(...)}.
+
         @return: the loaded document.
         @rtype: a C{list} of Stan objects.
         """
         if self._loadedTemplate is None:
-            self._loadedTemplate = self._loadDoc()
+            self._loadedTemplate = _CompiledTemplate(self._loadDoc())
         return self._loadedTemplate
 
 
@@ -562,5 +589,5 @@ def renderElement(request, element,
 
 
 from twisted.web._element import Element, renderer
-from twisted.web._flatten import flatten, flattenString
+from twisted.web._flatten import flatten, flattenString, _CompiledTemplate
 import twisted.web.util
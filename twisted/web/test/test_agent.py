@@ -354,7 +354,7 @@ class DummyFactory(Factory):
     """
     Create C{StubHTTPProtocol} instances.
     """
-    def __init__(self, quiescentCallback):
+    def __init__(self, quiescentCallback, connectionLostCallback=None):
         pass
 
     protocol = StubHTTPProtocol
@@ -669,6 +669,178 @@ class HTTPConnectionPoolTests(TestCase, FakeReactorAndConnectMixin):
 
 
 
+class HTTPConnectionPoolLimitTests(TestCase):
+    """
+    Tests for the limits on open connections of L{HTTPConnectionPool}, and
+    its counters.
+    """
+    def setUp(self):
+        self.clock = MemoryReactorClock()
+        self.pool = HTTPConnectionPool(self.clock)
+        self.pool.retryAutomatically = False
+
+
+    def connect(self, key, endpoint=None):
+        """
+        Ask the pool for a connection for C{key}.
+
+        @return: A C{list} which will hold the connection when it is
+            supplied.
+        """
+        result = []
+        self.pool.getConnection(key, endpoint or DummyEndpoint()).addCallback(
+            result.append)
+        return result
+
+
+    def test_noLimits(self):
+        """
+        By default, any number of connections are opened, and counted.
+        """
+        connections = [self.connect("a") for i in range(5)]
+        self.assertEqual([len(c) for c in connections], [1] * 5)
+        self.assertEqual(self.pool.openConnections, 5)
+        self.assertEqual(self.pool.misses, 5)
+        self.assertEqual(self.pool.waits, 0)
+
+
+    def test_maxConnectionsPerHostWaits(self):
+        """
+        Once C{maxConnectionsPerHost} connections are open for a key, requests
+        for connections to it wait for one to be returned to the pool, while
+        connections for other keys are still opened.
+        """
+        self.pool.maxConnectionsPerHost = 1
+        [first] = self.connect("a")
+        second = self.connect("a")
+        self.assertEqual(second, [])
+        self.assertEqual(self.pool.waits, 1)
+        self.assertEqual(len(self.connect("b")), 1)
+
+        self.clock.advance(3)
+        first._quiescentCallback(first)
+        self.assertEqual(second, [first])
+        self.assertEqual(self.pool._connections, {})
+        self.assertEqual(self.pool.hits, 1)
+        self.assertEqual(self.pool.waitTime, 3)
+
+
+    def test_waitingServedInOrder(self):
+        """
+        When a connection is closed, waiting requests are given new
+        connections in the order they were made.
+        """
+        self.pool.maxConnectionsPerHost = 1
+        [first] = self.connect("a")
+        second = self.connect("a")
+        third = self.connect("a")
+        first.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(len(second), 1)
+        self.assertNotIdentical(second[0], first)
+        self.assertEqual(third, [])
+        self.assertEqual(self.pool.openConnections, 1)
+        self.assertEqual(self.pool.misses, 2)
+
+
+    def test_maxConnectionsClosesIdle(self):
+        """
+        Once C{maxConnections} connections are open, the connection which has
+        been cached the longest is closed to make room for a new one.
+        """
+        self.pool.maxConnections = 2
+        [first] = self.connect("a")
+        [second] = self.connect("b")
+        first._quiescentCallback(first)
+        self.clock.advance(1)
+        second._quiescentCallback(second)
+        [third] = self.connect("c")
+        self.assertTrue(first.transport.disconnecting)
+        self.assertFalse(second.transport.disconnecting)
+        self.assertEqual(self.pool._connections["a"], [])
+        self.assertEqual(self.pool.openConnections, 2)
+        self.assertEqual(self.pool.evictions, 1)
+
+
+    def test_maxConnectionsWaits(self):
+        """
+        Once C{maxConnections} connections are open and in use, requests for
+        connections wait, and when a connection is returned to the pool it is
+        closed to make room for a waiting request for another key.
+        """
+        self.pool.maxConnections = 1
+        [first] = self.connect("a")
+        second = self.connect("b")
+        third = self.connect("c")
+        self.assertEqual((second, third), ([], []))
+        first._quiescentCallback(first)
+        self.assertTrue(first.transport.disconnecting)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(third, [])
+        self.assertEqual(self.pool.openConnections, 1)
+
+
+    def test_cachedConnectionLost(self):
+        """
+        A cached connection which is closed by the server is removed from the
+        pool straight away.
+        """
+        [first] = self.connect("a")
+        first._quiescentCallback(first)
+        first.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(self.pool._connections["a"], [])
+        self.assertEqual(self.pool._timeouts, {})
+        self.assertEqual(self.pool.openConnections, 0)
+
+
+    def test_connectFailed(self):
+        """
+        If a new connection can't be made, it is no longer counted, and a
+        waiting request is given a connection.
+        """
+        self.pool.maxConnectionsPerHost = 1
+        connecting = Deferred()
+        class Endpoint(object):
+            def connect(self, factory):
+                return connecting
+        failed = []
+        self.pool.getConnection("a", Endpoint()).addErrback(failed.append)
+        second = self.connect("a")
+        connecting.errback(ConnectionRefusedError())
+        failed[0].trap(ConnectionRefusedError)
+        self.assertEqual(len(second), 1)
+        self.assertEqual(self.pool.openConnections, 1)
+
+
+    def test_cancelWaiting(self):
+        """
+        Cancelling the L{Deferred} for a waiting request stops it waiting.
+        """
+        self.pool.maxConnectionsPerHost = 1
+        [first] = self.connect("a")
+        d = self.pool.getConnection("a", BadEndpoint())
+        d.cancel()
+        self.failureResultOf(d).trap(CancelledError)
+        self.assertEqual(self.pool._waiting, [])
+        first.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(self.pool.openConnections, 0)
+
+
+    def test_reuseRate(self):
+        """
+        L{HTTPConnectionPool.reuseRate} is the fraction of connections which
+        were supplied from the cache.
+        """
+        self.assertEqual(self.pool.reuseRate, 0.0)
+        [first] = self.connect("a")
+        first._quiescentCallback(first)
+        self.connect("a")
+        self.connect("a")
+        self.connect("a")
+        self.assertEqual((self.pool.hits, self.pool.misses), (1, 3))
+        self.assertEqual(self.pool.reuseRate, 0.25)
+
+
+
 class AgentTestsMixin(object):
     """
     Tests for any L{IAgent} implementation.
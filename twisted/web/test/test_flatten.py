@@ -13,16 +13,20 @@ from xml.etree.cElementTree import XML
 
 from zope.interface import implements, implementer
 
+from twisted.python.filepath import FilePath
 from twisted.trial.unittest import TestCase
 from twisted.test.testutils import XMLAssertionMixin
 
-from twisted.internet.defer import passthru, succeed, gatherResults
+from twisted.internet.defer import Deferred, passthru, succeed, gatherResults
 
 from twisted.web.iweb import IRenderable
 from twisted.web.error import UnfilledSlot, UnsupportedType, FlattenerError
 
 from twisted.web.template import tags, Tag, Comment, CDATA, CharRef, slot
 from twisted.web.template import Element, renderer, TagLoader, flattenString
+from twisted.web.template import flatten, XMLString, XMLFile
+from twisted.web import _flatten
+from twisted.web._flatten import _CompiledTemplate, _AttributeValue
 
 from twisted.web.test._util import FlattenTestCase
 
@@ -415,6 +419,213 @@ class TestSerialization(FlattenTestCase, XMLAssertionMixin):
         return self.assertFlatteningRaises(None, UnsupportedType)
 
 
+class CompiledTemplateTests(FlattenTestCase):
+    """
+    Tests for flattening the compiled documents returned by the template
+    loaders, L{_CompiledTemplate}.
+    """
+
+    def test_staticFragment(self):
+        """
+        Static markup is compiled into a single fragment, which is what it
+        flattens to without being compiled.
+        """
+        document = [
+            tags.p(u'\N{SNOWMAN} & <', CharRef(9731), id='a"b'),
+            Comment('c'), CDATA('d'), tags.br(), tags.transparent('e')]
+        expected = self.assertFlattensImmediately(document, (
+            '<p id="a&quot;b">\xe2\x98\x83 &amp; &lt;&#9731;</p>'
+            '<!--c--><![CDATA[d]]><br />e'))
+        compiled = _CompiledTemplate(document)
+        self.assertEqual(compiled.fragments, (expected,))
+        self.assertEqual(compiled, document)
+        self.assertFlattensImmediately(compiled, expected)
+
+
+    def test_dynamicFragments(self):
+        """
+        Slots, tags with render directives and attribute values which are not
+        strings are left in the compiled form between the static fragments,
+        and are flattened each time the document is.
+        """
+        class Renderer(Element):
+            @renderer
+            def greeting(self, request, tag):
+                return tag.fillSlots(name=u'world')
+
+        inner = tags.em(u'Hello, ', slot('name'), render='greeting')
+        link = tags.a(href=tags.transparent(slot('href')))
+        compiled = _CompiledTemplate([tags.div(inner, link)])
+        self.assertEqual(
+            compiled.fragments[:3], ('<div>', inner, '<a href="'))
+        self.assertIsInstance(compiled.fragments[3], _AttributeValue)
+        self.assertEqual(compiled.fragments[4:], ('"></a></div>',))
+        self.assertNotIsInstance(inner.children, _CompiledTemplate)
+
+        root = tags.transparent(compiled).fillSlots(href='/"')
+        self.assertFlattensImmediately(
+            Renderer(loader=TagLoader(root)),
+            '<div><em>Hello, world</em><a href="/&quot;"></a></div>')
+
+
+    def test_modifiedByRenderer(self):
+        """
+        If a renderer changes the children of the tag it is given, the tag is
+        flattened with its new children.
+        """
+        class Renderer(Element):
+            @renderer
+            def more(self, request, tag):
+                return tag(u'!')
+
+        inner = tags.p(u'Hello', render='more')
+        compiled = _CompiledTemplate([inner])
+        element = Renderer(loader=TagLoader(tags.transparent(compiled)))
+        self.assertFlattensImmediately(element, '<p>Hello!</p>')
+        self.assertFlattensImmediately(element, '<p>Hello!</p>')
+        self.assertEqual(inner.children, [u'Hello'])
+
+
+    def test_nestedSlotsFilledByRenderer(self):
+        """
+        A renderer may fill the slots of the tags under the tag it is given,
+        in place.
+        """
+        class Renderer(Element):
+            loader = XMLString(
+                '<ul xmlns:t="http://twistedmatrix.com/ns/twisted.web.template'
+                '/0.1" t:render="fill"><li><t:slot name="v" /></li></ul>')
+
+            @renderer
+            def fill(self, request, tag):
+                for child in tag.children:
+                    child.fillSlots(v=u'filled')
+                return tag
+
+        self.assertFlattensImmediately(Renderer(), '<ul><li>filled</li></ul>')
+
+
+    def test_nestedAttributesChangedByRenderer(self):
+        """
+        A renderer may change the attributes of the tags under the tag it is
+        given, in place.
+        """
+        class Renderer(Element):
+            loader = XMLString(
+                '<p xmlns:t="http://twistedmatrix.com/ns/twisted.web.template'
+                '/0.1" t:render="change"><a href="/old">x</a><b>y</b></p>')
+
+            @renderer
+            def change(self, request, tag):
+                tag.children[0].attributes['href'] = u'/new'
+                tag.children[1].attributes['class'] = u'c'
+                return tag
+
+        self.assertFlattensImmediately(
+            Renderer(), '<p><a href="/new">x</a><b class="c">y</b></p>')
+
+
+    def test_modified(self):
+        """
+        A compiled document which no longer holds the objects it was compiled
+        from is flattened as a C{list}.
+        """
+        compiled = _CompiledTemplate([u'a', tags.br()])
+        compiled[0] = u'b'
+        self.assertFlattensImmediately(compiled, 'b<br />')
+        compiled.append(u'c')
+        self.assertFlattensImmediately(compiled, 'b<br />c')
+
+
+    def test_inAttribute(self):
+        """
+        A compiled document flattened within an attribute is quoted as it
+        would be if it had not been compiled.
+        """
+        compiled = _CompiledTemplate([u'a&"', tags.b(u'<')])
+        self.assertFlattensImmediately(
+            tags.p(title=compiled),
+            '<p title="a&amp;&quot;&lt;b&gt;&amp;lt;&lt;/b&gt;"></p>')
+
+
+    def test_errorLocation(self):
+        """
+        If flattening a dynamic fragment of a compiled document fails, the
+        L{FlattenerError} lists the tags compiled into static markup which
+        enclose it, along with their location in the template.
+        """
+        path = FilePath(self.mktemp())
+        path.setContent(
+            '<html xmlns:t="http://twistedmatrix.com/ns/twisted.web.template'
+            '/0.1">\n<body>\n<div>\n<p><t:slot name="missing" /></p>\n'
+            '</div>\n</body>\n</html>')
+        compiled = XMLFile(path).load()
+        failure = self.failureResultOf(
+            flattenString(None, compiled), FlattenerError)
+        roots = failure.value._roots
+        self.assertIdentical(roots[0], compiled)
+        self.assertEqual(
+            [root.tagName for root in roots[1:5]],
+            ['html', 'body', 'div', 'p'])
+        self.assertIsInstance(roots[5], slot)
+        self.assertIn(
+            'File "%s", line 3, column 0, in "div"' % (path.path,),
+            str(failure.value))
+        self.assertIsInstance(failure.value._exception, UnfilledSlot)
+
+
+
+class WriteBatchingTests(TestCase):
+    """
+    Tests for the batching of the output of L{flatten}.
+    """
+
+    def test_batched(self):
+        """
+        L{flatten} joins the strings it produces and passes them to C{write}
+        together.
+        """
+        written = []
+        flatten(None, [tags.p(str(i)) for i in range(10)], written.append)
+        self.assertEqual(
+            written, [''.join(['<p>%d</p>' % (i,) for i in range(10)])])
+
+
+    def test_batchSize(self):
+        """
+        L{flatten} writes the strings it has collected once they add up to
+        L{_WRITE_BATCH_SIZE} bytes.
+        """
+        self.patch(_flatten, '_WRITE_BATCH_SIZE', 10)
+        written = []
+        flatten(None, ['abcdef', 'ghijkl', 'mn'], written.append)
+        self.assertEqual(written, ['abcdefghijkl', 'mn'])
+
+
+    def test_beforeDeferred(self):
+        """
+        L{flatten} writes the strings it has collected before waiting for a
+        L{Deferred}.
+        """
+        d = Deferred()
+        written = []
+        flatten(None, ['a', 'b', d, 'c'], written.append)
+        self.assertEqual(written, ['ab'])
+        d.callback('d')
+        self.assertEqual(written, ['ab', 'dc'])
+
+
+    def test_beforeError(self):
+        """
+        L{flatten} writes the strings it has collected before failing.
+        """
+        written = []
+        d = flatten(None, ['a', 'b', None], written.append)
+        self.assertEqual(written, ['ab'])
+        self.failureResultOf(d, FlattenerError)
+
+
+
 # Use the co_filename mechanism (instead of the __file__ mechanism) because
 # it is the mechanism traceback formatting uses.  The two do not necessarily
 # agree with each other.  This requires a code object compiled in this file.
@@ -803,6 +803,233 @@ class ParsingTestCase(unittest.TestCase):
             b'\r\n')
 
 
+    def _channelWithData(self, data, requestClass):
+        """
+        Deliver C{data} to a new L{HTTPChannel} in a single call to
+        C{dataReceived}.
+
+        @return: The L{HTTPChannel}.
+        """
+        channel = http.HTTPChannel()
+        channel.requestFactory = requestClass
+        channel.makeConnection(StringTransport())
+        channel.dataReceived(data)
+        return channel
+
+
+    def test_pipelinedRequests(self):
+        """
+        Several requests, with and without bodies, received at once are all
+        processed, and responded to in order.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append((self.path, self.content.read()))
+                self.write(self.path)
+                self.finish()
+
+        channel = self._channelWithData(
+            b"GET /a HTTP/1.1\r\n"
+            b"\r\n"
+            b"POST /b HTTP/1.1\r\n"
+            b"Content-Length: 5\r\n"
+            b"\r\n"
+            b"hello"
+            b"POST /c HTTP/1.1\r\n"
+            b"Transfer-Encoding: chunked\r\n"
+            b"\r\n"
+            b"3\r\nabc\r\n0\r\n\r\n"
+            b"GET /d HTTP/1.1\r\n"
+            b"\r\n", MyRequest)
+        self.assertEqual(processed, [
+                (b"/a", b""), (b"/b", b"hello"), (b"/c", b"abc"),
+                (b"/d", b"")])
+        self.assertEqual(
+            channel.transport.value().split(b"HTTP/1.1 200 OK\r\n")[1:],
+            [b"Transfer-Encoding: chunked\r\n\r\n2\r\n" + path +
+             b"\r\n0\r\n\r\n"
+             for path in [b"/a", b"/b", b"/c", b"/d"]])
+
+
+    def test_headerBlock(self):
+        """
+        Headers received together with their request line are all made
+        available to the L{Request}, with continuation lines joined to the
+        header before them.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        self._channelWithData(
+            b"GET / HTTP/1.0\r\n"
+            b"Foo: bar\r\n"
+            b"baz: Quux\r\n"
+            b"X-Multiline: line-0\r\n"
+            b"\tline-1\r\n"
+            b"baz: quux\r\n"
+            b"\r\n", MyRequest)
+        [request] = processed
+        self.assertEqual(
+            request.requestHeaders.getRawHeaders(b'foo'), [b'bar'])
+        self.assertEqual(
+            request.requestHeaders.getRawHeaders(b'bAz'), [b'Quux', b'quux'])
+        self.assertEqual(
+            request.requestHeaders.getRawHeaders(b'x-multiline'),
+            [b'line-0\n\tline-1'])
+
+
+    def test_headerReceivedOverridden(self):
+        """
+        If L{HTTPChannel.headerReceived} is overridden, it is called with each
+        header received.
+        """
+        headers = []
+        class MyChannel(http.HTTPChannel):
+            def headerReceived(self, line):
+                headers.append(line)
+                http.HTTPChannel.headerReceived(self, line)
+
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self.content.read())
+                self.finish()
+
+        channel = MyChannel()
+        channel.requestFactory = MyRequest
+        channel.makeConnection(StringTransport())
+        channel.dataReceived(
+            b"POST / HTTP/1.0\r\n"
+            b"Foo: bar\r\n"
+            b"Content-Length: 2\r\n"
+            b"\r\n"
+            b"hi")
+        self.assertEqual(headers, [b"Foo: bar", b"Content-Length: 2"])
+        self.assertEqual(processed, [b"hi"])
+
+
+    def test_lineReceivedThenDataReceived(self):
+        """
+        If L{HTTPChannel.lineReceived} has been used to deliver part of the
+        headers of a request, the rest are parsed from data delivered to
+        L{HTTPChannel.dataReceived}.
+        """
+        processed = []
+        class MyRequest(http.Request):
+            def process(self):
+                processed.append(self)
+                self.finish()
+
+        channel = http.HTTPChannel()
+        channel.requestFactory = MyRequest
+        channel.makeConnection(StringTransport())
+        channel.lineReceived(b"GET / HTTP/1.1")
+        channel.lineReceived(b"Foo: bar")
+        channel.dataReceived(b"Baz: quux\r\n\r\nGET /2 HTTP/1.1\r\n\r\n")
+        [first, second] = processed
+        self.assertEqual(first.getHeader(b"foo"), b"bar")
+        self.assertEqual(first.getHeader(b"baz"), b"quux")
+        self.assertEqual(second.path, b"/2")
+
+
+    def test_headerLineTooLong(self):
+        """
+        If a line of the request headers is longer than
+        L{HTTPChannel.MAX_LENGTH}, the connection is closed without the request
+        being processed.
+        """
+        channel = self._channelWithData(
+            b"GET / HTTP/1.1\r\n"
+            b"Foo: " + b"x" * http.HTTPChannel.MAX_LENGTH + b"\r\n"
+            b"\r\n", http.Request)
+        self.assertEqual(channel.transport.value(), b"")
+        self.assertTrue(channel.transport.disconnecting)
+        self.assertEqual(channel.requests, [])
+
+
+    def test_tooManyHeaderLines(self):
+        """
+        If more lines than L{HTTPChannel.maxHeaders} allows are received
+        before the end of the request headers, a 400 (Bad Request) response
+        is sent without waiting for the rest of them.
+        """
+        self.patch(http.HTTPChannel, 'maxHeaders', 2)
+        channel = self._channelWithData(
+            b"GET / HTTP/1.1\r\n"
+            b"A: a\r\n"
+            b"B: b\r\n"
+            b"C: c\r\n", http.Request)
+        self.assertEqual(
+            channel.transport.value(),
+            b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+
+
+    def test_headerLinesCountedAcrossReads(self):
+        """
+        The lines of request headers received a byte at a time are each
+        counted once against L{HTTPChannel.maxHeaders}, including those whose
+        delimiter is split between reads.
+        """
+        self.patch(http.HTTPChannel, 'maxHeaders', 2)
+        channel = http.HTTPChannel()
+        channel.requestFactory = http.Request
+        channel.makeConnection(StringTransport())
+        for byte in b"GET / HTTP/1.1\r\nA: a\r\nB: b\r\nC: c\r":
+            channel.dataReceived(byte)
+        self.assertEqual(channel.transport.value(), b"")
+        self.assertFalse(channel.transport.disconnecting)
+        channel.dataReceived(b"\n")
+        self.assertEqual(
+            channel.transport.value(),
+            b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+
+
+    def test_headTooLarge(self):
+        """
+        If the request line and headers take more than
+        L{HTTPChannel.maxHeadSize} bytes, a 400 (Bad Request) response is sent
+        without waiting for the rest of them, and the head received so far is
+        discarded.
+        """
+        self.patch(http.HTTPChannel, 'maxHeadSize', 100)
+        channel = http.HTTPChannel()
+        channel.requestFactory = http.Request
+        channel.makeConnection(StringTransport())
+        channel.dataReceived(b"GET / HTTP/1.1\r\n")
+        for i in range(10):
+            if channel.transport.disconnecting:
+                break
+            channel.dataReceived(b"X-%d: %s\r\n" % (i, b"x" * 10))
+        self.assertEqual(
+            channel.transport.value(),
+            b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+        self.assertEqual(channel._buffer, b"")
+
+
+    def test_completeHeadTooLarge(self):
+        """
+        A complete request head received at once which takes more than
+        L{HTTPChannel.maxHeadSize} bytes gets a 400 (Bad Request) response
+        without the request being processed.
+        """
+        self.patch(http.HTTPChannel, 'maxHeadSize', 100)
+        channel = self._channelWithData(
+            b"GET / HTTP/1.1\r\n" + b"X: " + b"x" * 100 + b"\r\n\r\n",
+            http.Request)
+        self.assertEqual(
+            channel.transport.value(),
+            b"HTTP/1.1 400 Bad Request\r\n\r\n")
+        self.assertTrue(channel.transport.disconnecting)
+        self.assertEqual(channel.requests, [])
+
+
     def testCookies(self):
         """
         Test cookies parsing and reading.
@@ -1417,6 +1417,24 @@ class HTTP11ClientProtocolTests(TestCase):
         return deferred.addCallback(checkError)
 
 
+    def test_connectionLostCallback(self):
+        """
+        The C{connectionLostCallback} given to L{HTTP11ClientProtocol} is
+        called with the protocol instance after its connection is lost,
+        whatever state it is in.
+        """
+        lost = []
+        def callback(p):
+            lost.append((p, p.state))
+
+        protocol = HTTP11ClientProtocol(connectionLostCallback=callback)
+        protocol.makeConnection(StringTransport())
+        d = protocol.request(Request('GET', '/', _boringHeaders, None))
+        protocol.connectionLost(Failure(ConnectionDone()))
+        self.assertEqual(lost, [(protocol, "CONNECTION_LOST")])
+        self.failureResultOf(d).trap(ResponseNeverReceived)
+
+
     def test_quiescentCallbackCalled(self):
         """
         If after a response is done the {HTTP11ClientProtocol} stays open and
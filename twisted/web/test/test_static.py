@@ -10,12 +10,15 @@ import os
 import re
 import StringIO
 
+from zope.interface import implementer
 from zope.interface.verify import verifyObject
 
-from twisted.internet import abstract, interfaces
+from twisted.internet import abstract, interfaces, error
+from twisted.internet.defer import Deferred
 from twisted.python.runtime import platform
 from twisted.python.filepath import FilePath
 from twisted.python import log
+from twisted.python.failure import Failure
 from twisted.trial.unittest import TestCase
 from twisted.web import static, http, script, resource
 from twisted.web.server import UnsupportedMethod
@@ -772,6 +775,151 @@ class SingleRangeStaticProducerTests(TestCase):
 
 
 
+@implementer(interfaces.ISendFileTransport)
+class SendFileTransport(object):
+    """
+    A fake L{interfaces.ISendFileTransport} which records calls to
+    C{sendFile}.
+
+    @ivar sent: A C{list} of C{(fileObject, offset, count, deferred)} tuples,
+        one for each call to C{sendFile}.
+    """
+    def __init__(self):
+        self.sent = []
+        self.disconnecting = False
+
+
+    def sendFile(self, fileObject, offset=0, count=None):
+        d = Deferred()
+        self.sent.append((fileObject, offset, count, d))
+        return d
+
+
+    def loseConnection(self):
+        self.disconnecting = True
+
+
+
+class SendFileTests(TestCase):
+    """
+    Tests for the use of L{interfaces.ISendFileTransport.sendFile} by
+    L{NoRangeStaticProducer} and L{SingleRangeStaticProducer}.
+    """
+
+    def makeRequest(self, secure=False):
+        """
+        Make a L{DummyRequest} for a plaintext, unencoded and unchunked
+        response over a L{SendFileTransport}.
+        """
+        request = DummyRequest([])
+        request.transport = SendFileTransport()
+        request.chunked = False
+        request.sentLength = 0
+        request.isSecure = lambda: secure
+        return request
+
+
+    def test_noRange(self):
+        """
+        L{NoRangeStaticProducer.start} writes the headers and hands the whole
+        file to the transport's C{sendFile}, then finishes the request and
+        closes the file once it has been sent.
+        """
+        request = self.makeRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        static.NoRangeStaticProducer(request, fileObject).start()
+        self.assertEqual([''], request.written)
+        [(sentFile, offset, count, d)] = request.transport.sent
+        self.assertEqual((fileObject, 0, None), (sentFile, offset, count))
+        self.assertEqual(0, request.finished)
+        d.callback(6)
+        self.assertEqual(1, request.finished)
+        self.assertEqual(6, request.sentLength)
+        self.assertTrue(fileObject.closed)
+
+
+    def test_singleRange(self):
+        """
+        L{SingleRangeStaticProducer.start} hands the requested range of the
+        file to the transport's C{sendFile}.
+        """
+        request = self.makeRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        static.SingleRangeStaticProducer(request, fileObject, 1, 3).start()
+        [(sentFile, offset, count, d)] = request.transport.sent
+        self.assertEqual((fileObject, 1, 3), (sentFile, offset, count))
+        d.callback(3)
+        self.assertEqual(1, request.finished)
+
+
+    def test_secure(self):
+        """
+        Over a TLS connection the file is written to the request instead.
+        """
+        request = self.makeRequest(secure=True)
+        static.NoRangeStaticProducer(
+            request, StringIO.StringIO('abcdef')).start()
+        self.assertEqual([], request.transport.sent)
+        self.assertEqual('abcdef', ''.join(request.written))
+
+
+    def test_encoded(self):
+        """
+        When the response is being encoded, for example compressed, the file
+        is written to the request instead.
+        """
+        request = self.makeRequest()
+        request._encoder = object()
+        static.NoRangeStaticProducer(
+            request, StringIO.StringIO('abcdef')).start()
+        self.assertEqual([], request.transport.sent)
+        self.assertEqual('abcdef', ''.join(request.written))
+
+
+    def test_chunked(self):
+        """
+        When the response is chunked the file is written to the request
+        instead.
+        """
+        request = self.makeRequest()
+        request.chunked = True
+        static.SingleRangeStaticProducer(
+            request, StringIO.StringIO('abcdef'), 2, 2).start()
+        self.assertEqual([], request.transport.sent)
+        self.assertEqual('cd', ''.join(request.written))
+
+
+    def test_connectionLost(self):
+        """
+        If the connection is lost before the file is sent, the file is closed
+        and the request is not finished.
+        """
+        request = self.makeRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        static.NoRangeStaticProducer(request, fileObject).start()
+        [(sentFile, offset, count, d)] = request.transport.sent
+        d.errback(Failure(error.ConnectionLost()))
+        self.assertTrue(fileObject.closed)
+        self.assertEqual(0, request.finished)
+        self.assertFalse(request.transport.disconnecting)
+
+
+    def test_sendFailed(self):
+        """
+        If the file can't be sent for any other reason, the error is logged
+        and the connection dropped.
+        """
+        request = self.makeRequest()
+        fileObject = StringIO.StringIO('abcdef')
+        static.NoRangeStaticProducer(request, fileObject).start()
+        [(sentFile, offset, count, d)] = request.transport.sent
+        d.errback(Failure(IOError("disk on fire")))
+        self.assertEqual(1, len(self.flushLoggedErrors(IOError)))
+        self.assertTrue(fileObject.closed)
+        self.assertTrue(request.transport.disconnecting)
+
+
+
 class MultipleRangeStaticProducerTests(TestCase):
     """
     Tests for L{MultipleRangeStaticProducer}.
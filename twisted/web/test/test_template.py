@@ -24,6 +24,7 @@ from twisted.web.error import (FlattenerError, MissingTemplateLoader,
 
 from twisted.web.template import renderElement
 from twisted.web._element import UnexposedMethodError
+from twisted.web._flatten import _CompiledTemplate
 from twisted.web.test._util import FlattenTestCase
 from twisted.web.test.test_web import DummyRequest
 from twisted.web.server import NOT_DONE_YET
@@ -256,6 +257,19 @@ class XMLLoaderTestsMixin(object):
     test_loadTwice.suppress = [_xmlFileSuppress]
 
 
+    def test_loadCompiled(self):
+        """
+        The loader compiles the document once, and returns the compiled
+        document each time it is loaded.
+        """
+        loader = self.loaderFactory()
+        tags1 = loader.load()
+        self.assertIsInstance(tags1, _CompiledTemplate)
+        self.assertEqual(tags1.fragments, ('<p>Hello, world.</p>',))
+        self.assertIdentical(tags1, loader.load())
+    test_loadCompiled.suppress = [_xmlFileSuppress]
+
+
 
 class XMLStringLoaderTests(TestCase, XMLLoaderTestsMixin):
     """
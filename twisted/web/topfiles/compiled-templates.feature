@@ -0,0 +1 @@
+twisted.web.template.XMLString and XMLFile now compile the documents they load, so that their static markup is not serialized again each time they are rendered.  Changes made in place to the tags of a loaded document, such as filling their slots or changing their attributes, are no longer rendered; wrap the document in a tag instead, for example tags.transparent(loader.load()).fillSlots(...).